@@ -0,0 +1,174 @@
+"""
+Local fakes for everything the benchmarked endpoints call out to.
+
+`stub_externals()` swaps in, for the duration of a run:
+
+- a transport adapter answering every `requests` call (Telegram, weather,
+  DVLA, postcode/geocoding lookups, Web Push, FCM) from canned responses after
+  a fixed simulated latency. It replaces `HTTPAdapter.send`, underneath
+  `Session.send`, so the perf hooks still count the calls.
+- an in-memory bucket behind the shared `s3_client`, so presigning, uploads
+  and HEAD requests behave as if S3 were configured.
+
+Nothing leaves the machine, and the simulated latency keeps outbound calls
+visible in the timings rather than free.
+"""
+import io
+import json
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from botocore.exceptions import ClientError
+from requests.adapters import HTTPAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+from src.utils.s3_client import PresignedURLCache, s3_client
+
+HTTP_LATENCY_MS = 20
+
+_WEATHER = {
+    'weather': [{'id': 800, 'main': 'Clear', 'description': 'clear sky', 'icon': '01d'}],
+    'main': {'temp': 14.2, 'feels_like': 13.1, 'humidity': 71, 'pressure': 1016},
+    'wind': {'speed': 4.1, 'deg': 240}, 'name': 'Birmingham', 'cod': 200,
+    'list': [],
+}
+_DVLA = {
+    'registrationNumber': 'AB12CDE', 'make': 'FORD', 'colour': 'WHITE', 'yearOfManufacture': 2018,
+    'fuelType': 'DIESEL', 'motStatus': 'Valid', 'taxStatus': 'Taxed',
+}
+_POSTCODE = {'status': 200, 'result': {'postcode': 'B1 1AA', 'latitude': 52.4796, 'longitude': -1.9026}}
+_NOMINATIM = [{'lat': '52.4796', 'lon': '-1.9026', 'display_name': 'Birmingham, West Midlands, England'}]
+
+CANNED = {
+    'api.telegram.org': (200, {'ok': True, 'result': {'message_id': 1}}),
+    'api.openweathermap.org': (200, _WEATHER),
+    'driver-vehicle-licensing.api.gov.uk': (200, _DVLA),
+    'api.postcodes.io': (200, _POSTCODE),
+    'nominatim.openstreetmap.org': (200, _NOMINATIM),
+    'fcm.googleapis.com': (200, {'name': 'projects/bench/messages/1'}),
+    'oauth2.googleapis.com': (200, {'access_token': 'bench', 'expires_in': 3600, 'token_type': 'Bearer'}),
+}
+DEFAULT_RESPONSE = (201, {})
+
+
+class FakeHTTP:
+    """Answers requests by host and records how many calls each host received."""
+
+    def __init__(self, latency_ms=HTTP_LATENCY_MS, canned=None):
+        self.latency = latency_ms / 1000
+        self.canned = dict(CANNED, **(canned or {}))
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def send(self, adapter, request, **kwargs):
+        host = urlparse(request.url).hostname or ''
+        with self._lock:
+            self.calls[host] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        status, body = self.canned.get(host, DEFAULT_RESPONSE)
+        response = Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict({'Content-Type': 'application/json'})
+        response._content = json.dumps(body).encode('utf-8')
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        response.raw = io.BytesIO(response._content)
+        response.connection = adapter
+        return response
+
+
+class FakeBucket:
+    """The subset of the boto3 S3 client the app uses, backed by a dict."""
+
+    endpoint = 'https://bench-bucket.s3.local'
+
+    def __init__(self):
+        self.objects = {}
+        self._lock = threading.Lock()
+
+    def _missing(self, operation):
+        return ClientError({'Error': {'Code': '404', 'Message': 'Not Found'}}, operation)
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        data = Body.read() if hasattr(Body, 'read') else Body
+        with self._lock:
+            self.objects[Key] = (bytes(data), kwargs.get('ContentType', 'application/octet-stream'))
+        return {'ETag': '"bench"'}
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None, **kwargs):
+        self.put_object(Bucket, Key, Fileobj, **(ExtraArgs or {}))
+
+    def head_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise self._missing('HeadObject')
+        data, content_type = self.objects[Key]
+        return {'ContentLength': len(data), 'ContentType': content_type}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        if Key not in self.objects:
+            raise self._missing('GetObject')
+        data, content_type = self.objects[Key]
+        return {'Body': io.BytesIO(data), 'ContentLength': len(data), 'ContentType': content_type}
+
+    def delete_object(self, Bucket, Key):
+        with self._lock:
+            self.objects.pop(Key, None)
+        return {}
+
+    def copy_object(self, Bucket, Key, CopySource, **kwargs):
+        with self._lock:
+            self.objects[Key] = self.objects[CopySource['Key']]
+        return {}
+
+    def list_objects_v2(self, Bucket, Prefix='', **kwargs):
+        contents = [{'Key': key, 'Size': len(data)} for key, (data, _) in sorted(self.objects.items())
+                    if key.startswith(Prefix)]
+        return {'Contents': contents, 'KeyCount': len(contents), 'IsTruncated': False}
+
+    def get_paginator(self, operation):
+        bucket = self
+
+        class Paginator:
+            def paginate(self, **kwargs):
+                kwargs.pop('PaginationConfig', None)
+                yield bucket.list_objects_v2(**kwargs)
+
+        return Paginator()
+
+    def generate_presigned_url(self, ClientMethod, Params, ExpiresIn=3600, **kwargs):
+        return f"{self.endpoint}/{Params['Key']}?X-Amz-Expires={ExpiresIn}&X-Amz-Signature=bench"
+
+    def generate_presigned_post(self, Bucket, Key, Fields=None, Conditions=None, ExpiresIn=900):
+        return {'url': self.endpoint, 'fields': dict(Fields or {}, key=Key, policy='bench', signature='bench')}
+
+
+@contextmanager
+def stub_externals(http_latency_ms=HTTP_LATENCY_MS):
+    """Route outbound HTTP and S3 to local fakes; yields (FakeHTTP, FakeBucket)."""
+    http = FakeHTTP(http_latency_ms)
+    bucket = FakeBucket()
+    original_send = HTTPAdapter.send
+    saved = {name: getattr(s3_client, name, None)
+             for name in ('s3_client', 'bucket_name', 'configured', 'error_message', 'presign_cache')}
+
+    def send(adapter, request, **kwargs):
+        return http.send(adapter, request, **kwargs)
+
+    HTTPAdapter.send = send
+    s3_client.s3_client = bucket
+    s3_client.bucket_name = 'bench-bucket'
+    s3_client.configured = True
+    s3_client.error_message = None
+    s3_client.presign_cache = PresignedURLCache()
+    try:
+        yield http, bucket
+    finally:
+        HTTPAdapter.send = original_send
+        for name, value in saved.items():
+            setattr(s3_client, name, value)
@@ -0,0 +1,326 @@
+"""
+Benchmark the hot API endpoints against a seeded database.
+
+    python -m benchmarks.run                      # seed a scratch SQLite db at 10% scale, run, compare
+    python -m benchmarks.run --scale 1 --repeat 3 # production-sized volumes (slow: minutes per endpoint)
+    python -m benchmarks.run --db postgresql://localhost/v3_bench --reuse
+    python -m benchmarks.run --only crm_contacts --only agent_dashboard
+    python -m benchmarks.run --update-baseline    # after a deliberate change
+
+Each endpoint is called through the Flask test client `--warmup` times and
+then `--repeat` times, with outbound HTTP and S3 answered by the fakes in
+benchmarks/fakes.py. The report gives p50/p95 latency, SQL statements and
+outbound calls per request, and compares them with benchmarks/baselines.json
+when that was recorded at the same scale on the same database backend.
+
+Query counts are deterministic for a given seed, so any increase counts as a
+regression. Latency depends on the machine: it only fails the run when p95
+is both `--tolerance` (default 25%) and `--min-delta-ms` slower than the
+baseline. The exit status is 1 on regression, so the script can gate CI.
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import nullcontext, redirect_stdout
+from datetime import date, timedelta
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baselines.json')
+SEED_SETTING = 'benchmark_seed'
+DEFAULT_SCALE = 0.1
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_MIN_DELTA_MS = 5.0
+
+
+class Benchmark:
+    """One endpoint call: `path` and `body` may be callables of the seed context."""
+
+    def __init__(self, name, method, path, role, body=None, expect=200):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.role = role
+        self.body = body
+        self.expect = expect
+
+    def resolve(self, value, ctx):
+        return value(ctx) if callable(value) else value
+
+
+def _finance_window(ctx):
+    return f"/api/admin/finance/summary?from={(date.today() - timedelta(days=365)).isoformat()}&to={date.today().isoformat()}"
+
+
+def _new_job(ctx):
+    return {
+        'title': 'Benchmark site', 'job_type': 'TRAVELLER_EVICTION', 'address': '1 Retail Park, Coventry',
+        'postcode': 'CV1 2AB', 'arrival_time': (date.today() + timedelta(days=2)).isoformat() + 'T08:00:00',
+        'agents_required': 3, 'hourly_rate': 20, 'urgency_level': 'Urgent',
+    }
+
+
+BENCHMARKS = [
+    Benchmark('agent_dashboard', 'GET', '/api/agent/dashboard', 'agent'),
+    Benchmark('agent_invoiceable_jobs', 'GET', '/api/agent/invoiceable-jobs', 'agent'),
+    Benchmark('finance_summary', 'GET', _finance_window, 'admin'),
+    Benchmark('analytics_agents', 'GET', '/api/analytics/agents?days=30', 'admin'),
+    Benchmark('analytics_agent_detail', 'GET', lambda ctx: f"/api/analytics/agents/{ctx['agent_id']}", 'admin'),
+    Benchmark('analytics_jobs', 'GET', '/api/analytics/jobs?days=30', 'admin'),
+    Benchmark('analytics_response_rates', 'GET', '/api/analytics/response-rates?days=30', 'admin'),
+    Benchmark('analytics_dashboard', 'GET', '/api/analytics/dashboard', 'admin'),
+    Benchmark('crm_contacts', 'GET', '/api/crm/contacts', 'crm'),
+    Benchmark('crm_contact_emails', 'GET', lambda ctx: f"/api/crm/contacts/{ctx['crm_contact_id']}/emails", 'crm'),
+    Benchmark('crm_email', 'GET', lambda ctx: f"/api/crm/emails/{ctx['crm_email_id']}", 'crm'),
+    Benchmark('crm_dashboard', 'GET', '/api/crm/dashboard', 'crm'),
+    Benchmark('crm_priority_counts', 'GET', '/api/crm/contacts/priority-counts', 'crm'),
+    Benchmark('crm_contacts_team_search', 'GET', '/api/crm/contacts?view=team&search=Smith', 'crm'),
+    Benchmark('jobs_search', 'GET', '/api/jobs/search?q=station&limit=20', 'admin'),
+    Benchmark('search_jobs', 'GET', '/api/search?q=cv1&types=job', 'admin'),
+    Benchmark('search_crm_contacts', 'GET', '/api/search?q=smi', 'crm'),
+    Benchmark('create_job', 'POST', '/api/jobs', 'admin', body=_new_job, expect=201),
+]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile; stable for the small samples a benchmark run takes."""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def auth_headers(ctx):
+    from flask_jwt_extended import create_access_token
+    return {
+        'admin': {'Authorization': f"Bearer {create_access_token(identity=str(ctx['admin_id']))}"},
+        'agent': {'Authorization': f"Bearer {create_access_token(identity=str(ctx['agent_id']))}"},
+        'crm': {'Authorization': f"Bearer {create_access_token(identity=str(ctx['crm_user_id']), additional_claims={'crm_user': True})}"},
+    }
+
+
+def _quiet():
+    """Silence the app's own prints and logging while a request is timed."""
+    class Quiet:
+        def __enter__(self):
+            self.redirect = redirect_stdout(io.StringIO())
+            self.redirect.__enter__()
+            logging.disable(logging.CRITICAL)
+
+        def __exit__(self, *exc):
+            logging.disable(logging.NOTSET)
+            return self.redirect.__exit__(*exc)
+
+    return Quiet()
+
+
+def run_benchmarks(app, ctx, repeat=5, warmup=1, only=None, http=None, verbose=False, log=print):
+    """Drive each benchmark through the test client; returns {name: result}."""
+    from src.utils import perf
+
+    client = app.test_client()
+    with app.app_context():
+        headers = auth_headers(ctx)
+        marks = _high_water_marks()
+
+    results = {}
+    for bench in BENCHMARKS:
+        if only and bench.name not in only:
+            continue
+        timings, queries, calls, statuses = [], [], [], set()
+        for i in range(warmup + repeat):
+            path = bench.resolve(bench.path, ctx)
+            body = bench.resolve(bench.body, ctx)
+            http_before = sum(http.calls.values()) if http else 0
+            with perf.count_queries() as statements, (nullcontext() if verbose else _quiet()):
+                started = time.perf_counter()
+                response = client.open(path, method=bench.method, json=body, headers=headers[bench.role])
+                elapsed_ms = (time.perf_counter() - started) * 1000
+            statuses.add(response.status_code)
+            if i < warmup:
+                continue
+            timings.append(elapsed_ms)
+            queries.append(len(statements))
+            calls.append((sum(http.calls.values()) if http else 0) - http_before)
+
+        results[bench.name] = {
+            'path': f"{bench.method} {bench.resolve(bench.path, ctx).split('?')[0]}",
+            'ok': statuses == {bench.expect},
+            'statuses': sorted(statuses),
+            'p50_ms': round(percentile(timings, 50), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'mean_ms': round(statistics.fmean(timings), 2),
+            'queries': int(statistics.median(queries)),
+            'http_calls': int(statistics.median(calls)),
+        }
+        log(f"  {bench.name:<28} p50 {results[bench.name]['p50_ms']:>9.1f}ms  "
+            f"p95 {results[bench.name]['p95_ms']:>9.1f}ms  {results[bench.name]['queries']:>6} queries")
+    discard_writes(app, marks)
+    return results
+
+
+def _high_water_marks():
+    from src.extensions import db
+    from src.models.user import AgentAvailability, Job
+    return {model: db.session.query(db.func.max(model.id)).scalar() or 0 for model in (Job, AgentAvailability)}
+
+
+def discard_writes(app, marks):
+    """Delete what POST /api/jobs created so a reused seed gives the same query counts next time."""
+    from src.extensions import db
+    from src.models.user import AgentAvailability, Job, JobAssignment, Notification
+    with app.app_context():
+        job_ids = db.session.query(Job.id).filter(Job.id > marks[Job])
+        Notification.query.filter(Notification.job_id.in_(job_ids)).delete(synchronize_session=False)
+        JobAssignment.query.filter(JobAssignment.job_id.in_(job_ids)).delete(synchronize_session=False)
+        Job.query.filter(Job.id > marks[Job]).delete(synchronize_session=False)
+        AgentAvailability.query.filter(AgentAvailability.id > marks[AgentAvailability]).delete(synchronize_session=False)
+        db.session.commit()
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE, min_delta_ms=DEFAULT_MIN_DELTA_MS):
+    """Regression messages for `results` against a baseline's endpoints."""
+    regressions = []
+    for name, result in results.items():
+        if not result['ok']:
+            regressions.append(f"{name}: unexpected status {result['statuses']}")
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result['queries'] > base['queries']:
+            regressions.append(f"{name}: {result['queries']} queries, baseline {base['queries']}")
+        allowed = max(base['p95_ms'] * (1 + tolerance), base['p95_ms'] + min_delta_ms)
+        if result['p95_ms'] > allowed:
+            regressions.append(f"{name}: p95 {result['p95_ms']:.1f}ms, baseline {base['p95_ms']:.1f}ms")
+    return regressions
+
+
+def format_report(results, baseline=None):
+    baseline = baseline or {}
+    lines = [f"{'endpoint':<28} {'p50 ms':>9} {'p95 ms':>9} {'Δp95':>8} {'queries':>8} {'Δq':>6} {'http':>5}"]
+    for name, result in results.items():
+        base = baseline.get(name)
+        delta_ms = f"{(result['p95_ms'] / base['p95_ms'] - 1) * 100:+.0f}%" if base and base['p95_ms'] else '-'
+        delta_q = f"{result['queries'] - base['queries']:+d}" if base else '-'
+        lines.append(f"{name:<28} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {delta_ms:>8} "
+                     f"{result['queries']:>8} {delta_q:>6} {result['http_calls']:>5}")
+    return '\n'.join(lines)
+
+
+def load_baseline(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def prepare_database(app, scale, reuse, log=print):
+    """Create and seed the schema (or pick up a previous seed with --reuse); returns the seed context."""
+    from benchmarks.seed import seed
+    from src.extensions import db
+    from src.models.user import Setting
+
+    with app.app_context():
+        if reuse:
+            stored = Setting.get(SEED_SETTING) if db.inspect(db.engine).has_table('settings') else None
+            if stored and json.loads(stored)['scale'] == scale:
+                log("reusing seeded database")
+                return json.loads(stored)
+            log("no seed at this scale to reuse; seeding")
+        db.drop_all()
+        db.create_all()
+        started = time.perf_counter()
+        ctx = seed(scale=scale, log=lambda message: log(f"  {message}"))
+        ctx['scale'] = scale
+        Setting.set(SEED_SETTING, json.dumps(ctx))
+        log(f"seeded in {time.perf_counter() - started:.1f}s")
+        return ctx
+
+
+def configure_app(app):
+    """Settings that make the app behave like production, minus anything that would throttle or leak."""
+    app.config.update(TESTING=True, TELEGRAM_ENABLED=True, TELEGRAM_BOT_TOKEN='bench-token',
+                      TELEGRAM_ADMIN_CHAT_ID='-1000000000001', NOTIFICATIONS_ENABLED='true')
+    from main import limiter
+    limiter.enabled = False
+    from src.scheduler import scheduler
+    if scheduler.running:
+        scheduler.pause()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=os.environ.get('BENCHMARK_DATABASE_URL'),
+                        help='database URL (default: a scratch SQLite file in the temp dir)')
+    parser.add_argument('--scale', type=float, default=DEFAULT_SCALE, help='fraction of the production-sized volumes to seed')
+    parser.add_argument('--reuse', action='store_true', help='reuse an existing seed at the same scale')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--only', action='append', help='benchmark name to run (repeatable)')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--min-delta-ms', type=float, default=DEFAULT_MIN_DELTA_MS)
+    parser.add_argument('--http-latency-ms', type=float, default=None, help='simulated latency of outbound calls')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--json', dest='json_path', help='also write the results to this file')
+    parser.add_argument('--verbose', action='store_true', help="show the app's own output during requests")
+    args = parser.parse_args(argv)
+
+    # The app binds its database when main is imported
+    url = args.db or f"sqlite:///{os.path.join(tempfile.gettempdir(), 'v3_benchmark.db')}"
+    os.environ['DATABASE_URL'] = url
+    os.environ.setdefault('SECRET_KEY', 'benchmark-only-secret-key-not-for-production')
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+    from main import app
+    from benchmarks.fakes import HTTP_LATENCY_MS, stub_externals
+    from src.extensions import db
+
+    configure_app(app)
+    ctx = prepare_database(app, args.scale, args.reuse)
+    with app.app_context():
+        backend = db.engine.dialect.name
+
+    latency = HTTP_LATENCY_MS if args.http_latency_ms is None else args.http_latency_ms
+    print(f"running on {backend} at scale {args.scale} ({args.repeat} runs per endpoint)")
+    with stub_externals(latency) as (http, _bucket):
+        results = run_benchmarks(app, ctx, repeat=args.repeat, warmup=args.warmup, only=args.only, http=http,
+                                 verbose=args.verbose)
+
+    stored = load_baseline(args.baseline)
+    baseline = {}
+    if stored and stored.get('scale') == args.scale and stored.get('backend') == backend:
+        baseline = stored['endpoints']
+    elif stored:
+        print(f"baseline was recorded at scale {stored.get('scale')} on {stored.get('backend')}; not comparing")
+
+    print()
+    print(format_report(results, baseline))
+
+    if args.json_path:
+        with open(args.json_path, 'w') as fh:
+            json.dump({'scale': args.scale, 'backend': backend, 'endpoints': results}, fh, indent=2)
+
+    if args.update_baseline:
+        endpoints = dict(baseline, **{name: {key: result[key] for key in ('p50_ms', 'p95_ms', 'queries', 'http_calls')}
+                                      for name, result in results.items()})
+        with open(args.baseline, 'w') as fh:
+            json.dump({'scale': args.scale, 'backend': backend, 'http_latency_ms': latency,
+                       'endpoints': endpoints}, fh, indent=2, sort_keys=True)
+            fh.write('\n')
+        print(f"\nbaseline written to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+    if regressions:
+        print('\nREGRESSIONS:')
+        for message in regressions:
+            print(f"  {message}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,259 @@
+"""
+Deterministic synthetic data for the benchmark suite.
+
+`seed(scale)` fills an empty schema with production-shaped volumes (see
+VOLUMES) using batched Core inserts with explicit ids, so 500k rows load in
+seconds on SQLite and foreign keys can be wired without round trips. The same
+`scale` and `seed` always produce the same rows, which keeps query counts
+comparable between runs.
+"""
+import random
+from datetime import datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+from src.extensions import db
+from src.models.crm_contact import CRMContact
+from src.models.crm_email import CRMEmail, CRMEmailBody, preview_of
+from src.models.crm_user import CRMUser
+from src.models.user import (AgentAvailability, AgentWeeklyAvailability, Invoice, InvoiceJob, Job,
+                             JobAssignment, JobBilling, User)
+from src.services import invoice_ledger, search
+
+VOLUMES = {
+    'agents': 2000,
+    'jobs': 100000,
+    'assignments': 500000,
+    'invoices': 50000,
+    'crm_users': 10,
+    'crm_contacts': 20000,
+    'crm_emails': 60000,
+}
+BATCH_SIZE = 5000
+HISTORY_DAYS = 730
+FUTURE_DAYS = 30
+FUTURE_SHARE = 0.05
+AVAILABILITY_DAYS = 14  # daily availability rows either side of today
+
+BENCH_PASSWORD = 'benchmark'
+ADMIN_EMAIL = 'bench-admin@v3-services.test'
+
+_FIRST_NAMES = ['Sam', 'Alex', 'Jordan', 'Chris', 'Taylor', 'Morgan', 'Jamie', 'Casey', 'Robin', 'Charlie',
+                'Danny', 'Lee', 'Kim', 'Jo', 'Pat', 'Ashley', 'Drew', 'Frankie', 'Jesse', 'Kai']
+_LAST_NAMES = ['Smith', 'Jones', 'Taylor', 'Brown', 'Williams', 'Wilson', 'Johnson', 'Davies', 'Patel', 'Wright',
+               'Walker', 'Thompson', 'White', 'Hughes', 'Edwards', 'Green', 'Hall', 'Wood', 'Harris', 'Clarke']
+_TOWNS = [('Birmingham', 'B'), ('Manchester', 'M'), ('Leeds', 'LS'), ('Bristol', 'BS'), ('Coventry', 'CV'),
+          ('Nottingham', 'NG'), ('Leicester', 'LE'), ('Sheffield', 'S'), ('Liverpool', 'L'), ('Derby', 'DE')]
+_STREETS = ['High Street', 'Station Road', 'Church Lane', 'Mill Lane', 'Park Road', 'Industrial Estate',
+            'Retail Park', 'Victoria Road', 'Green Lane', 'Manor Way']
+_JOB_TYPES = ['TRAVELLER_EVICTION', 'SQUATTER_EVICTION', 'TRAVELLER_NOTICE_SERVE', 'SQUATTER_NOTICE_SERVE',
+              'VEHICLE_TORTS_NOTICE', 'LEASE_FORFEITURE', 'ROUGH_SLEEPER', 'SURVEILLANCE']
+_CONTACT_TYPES = ['eviction_client', 'prevention_prospect', 'referral_partner']
+_STAGES = ['new_inquiry', 'quote_sent', 'negotiating', 'won', 'lost']
+_CONTACT_STATUSES = ['active', 'active', 'active', 'won', 'lost', 'dormant']
+_WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+_PRIORITIES = ['urgent', 'hot', 'nurture', 'routine', 'none']
+_WORDS = ('site vehicles caravans notice served access gate fence landowner possession order court bailiff '
+          'quote invoice attendance agents tomorrow morning police liaison photos report confirm thanks '
+          'regards please update schedule eviction squatters unit warehouse yard entrance security').split()
+
+
+def scaled_volumes(scale=1.0):
+    """VOLUMES multiplied by `scale`, never so small that the relationships break."""
+    volumes = {name: max(1, int(count * scale)) for name, count in VOLUMES.items()}
+    volumes['agents'] = max(volumes['agents'], 10)
+    volumes['jobs'] = max(volumes['jobs'], 20)
+    volumes['assignments'] = max(volumes['assignments'], volumes['jobs'])
+    return volumes
+
+
+def _insert(model, rows):
+    table = model.__table__
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(table.insert(), rows[start:start + BATCH_SIZE])
+
+
+def _sentence(rng, words):
+    return ' '.join(rng.choice(_WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def _address(rng):
+    town, area = rng.choice(_TOWNS)
+    postcode = f"{area}{rng.randint(1, 30)} {rng.randint(1, 9)}{rng.choice('ABDEFGHJLNPQRSTUWXYZ')}{rng.choice('ABDEFGHJLNPQRSTUWXYZ')}"
+    return f"{rng.randint(1, 250)} {rng.choice(_STREETS)}, {town}", postcode
+
+
+def _reset_sequences(models):
+    """Explicit ids leave Postgres sequences behind; move them past the seeded rows."""
+    if db.engine.dialect.name != 'postgresql':
+        return
+    for model in models:
+        table = model.__tablename__
+        db.session.execute(db.text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT MAX(id) FROM {table}), 1))"
+        ))
+
+
+def seed(scale=1.0, seed=42, now=None, log=print):
+    """Seed an empty schema; returns the ids the benchmarks log in as."""
+    if User.query.first() is not None or CRMUser.query.first() is not None:
+        raise RuntimeError("Refusing to seed: the database already has users")
+
+    rng = random.Random(seed)
+    now = (now or datetime.utcnow()).replace(microsecond=0)
+    volumes = scaled_volumes(scale)
+    password_hash = generate_password_hash(BENCH_PASSWORD)
+
+    # --- Users ---
+    users = [{'id': 1, 'email': ADMIN_EMAIL, 'password_hash': password_hash, 'role': 'admin',
+              'first_name': 'Bench', 'last_name': 'Admin', 'verification_status': 'verified',
+              'created_at': now - timedelta(days=HISTORY_DAYS)}]
+    agent_ids = list(range(2, volumes['agents'] + 2))
+    agent_names = {}
+    for agent_id in agent_ids:
+        first, last = rng.choice(_FIRST_NAMES), rng.choice(_LAST_NAMES)
+        agent_names[agent_id] = f"{first} {last}"
+        town, _ = rng.choice(_TOWNS)
+        users.append({'id': agent_id, 'email': f"agent{agent_id}@v3-services.test", 'password_hash': password_hash,
+                      'role': 'agent', 'first_name': first, 'last_name': last, 'city': town,
+                      'phone': f"07{rng.randint(100000000, 999999999)}", 'verification_status': 'verified',
+                      'telegram_chat_id': str(900000 + agent_id) if rng.random() < 0.3 else None,
+                      'telegram_opt_in': True,
+                      'created_at': now - timedelta(days=rng.randint(0, HISTORY_DAYS))})
+    _insert(User, users)
+
+    availability, weekly = [], []
+    for agent_id in agent_ids:
+        for offset in range(-AVAILABILITY_DAYS, AVAILABILITY_DAYS + 1):
+            if rng.random() < 0.6:
+                day = (now + timedelta(days=offset)).date()
+                availability.append({'agent_id': agent_id, 'date': day, 'is_available': rng.random() < 0.7,
+                                     'is_away': rng.random() < 0.05, 'created_at': now, 'updated_at': now})
+        if rng.random() < 0.5:
+            weekly.append(dict({day: rng.random() < 0.6 for day in _WEEKDAYS}, agent_id=agent_id))
+    _insert(AgentAvailability, availability)
+    _insert(AgentWeeklyAvailability, weekly)
+    log(f"seeded {len(users)} users, {len(availability)} availability days, {len(weekly)} weekly schedules")
+
+    # --- Jobs, billing and assignments ---
+    jobs, billing, assignments = [], [], []
+    accepted_by_agent = {}
+    per_job, extra = divmod(volumes['assignments'], volumes['jobs'])
+    per_job_cap = len(agent_ids)
+    assignment_id = 0
+    for job_id in range(1, volumes['jobs'] + 1):
+        future = rng.random() < FUTURE_SHARE
+        if future:
+            arrival = now + timedelta(days=rng.uniform(0.1, FUTURE_DAYS))
+        else:
+            arrival = now - timedelta(days=rng.uniform(0.1, HISTORY_DAYS))
+        arrival = arrival.replace(minute=0, second=0, microsecond=0)
+        address, postcode = _address(rng)
+        agents_required = rng.choice([1, 2, 2, 3, 4])
+        count = min(per_job + (1 if job_id <= extra else 0), per_job_cap)
+        picked = rng.sample(agent_ids, count)
+        accepted = [] if future and rng.random() < 0.5 else picked[:agents_required]
+        lead = agent_names[accepted[0]] if accepted else None
+        rate = rng.choice([18, 20, 22, 25])
+        jobs.append({'id': job_id, 'title': address, 'job_type': rng.choice(_JOB_TYPES), 'address': address,
+                     'postcode': postcode, 'arrival_time': arrival, 'agents_required': agents_required,
+                     'lead_agent_name': lead, 'urgency_level': rng.choice(['Standard', 'Standard', 'Urgent']),
+                     'status': 'open' if future else 'completed', 'slots_filled': len(accepted),
+                     'created_by': 1, 'created_at': arrival - timedelta(days=rng.randint(1, 7)),
+                     'updated_at': arrival, 'hourly_rate': rate})
+        if not future:
+            billing.append({'job_id': job_id, 'agent_count': agents_required, 'hourly_rate_net': rate + 20,
+                            'vat_rate': 0.20, 'billable_hours_override': rng.choice([2, 4, 6, 8]),
+                            'billable_hours_calculated': 0, 'first_hour_units': 0,
+                            'created_at': arrival, 'updated_at': arrival})
+        for agent_id in picked:
+            assignment_id += 1
+            if agent_id in accepted:
+                status = 'accepted'
+                accepted_by_agent.setdefault(agent_id, []).append(job_id)
+            elif future:
+                status = 'pending'
+            else:
+                status = 'declined'
+            created = arrival - timedelta(days=rng.randint(1, 7))
+            assignments.append({'id': assignment_id, 'job_id': job_id, 'agent_id': agent_id, 'status': status,
+                                'created_at': created,
+                                'response_time': None if status == 'pending' else created + timedelta(minutes=rng.randint(1, 600))})
+    _insert(Job, jobs)
+    _insert(JobBilling, billing)
+    _insert(JobAssignment, assignments)
+    log(f"seeded {len(jobs)} jobs, {len(billing)} billing rows, {len(assignments)} assignments")
+
+    # --- Agent invoices ---
+    invoices, invoice_jobs = [], []
+    invoicing_agents = sorted(accepted_by_agent)
+    next_number = {}
+    for invoice_id in range(1, volumes['invoices'] + 1):
+        agent_id = rng.choice(invoicing_agents)
+        job_ids = rng.sample(accepted_by_agent[agent_id], min(len(accepted_by_agent[agent_id]), rng.randint(1, 3)))
+        issue_date = (now - timedelta(days=rng.randint(0, HISTORY_DAYS))).date()
+        hours = [rng.choice([2, 4, 6, 8]) for _ in job_ids]
+        next_number[agent_id] = next_number.get(agent_id, 0) + 1
+        invoices.append({'id': invoice_id, 'agent_id': agent_id, 'invoice_number': f"V3-BENCH-{invoice_id:06d}",
+                         'agent_invoice_number': next_number[agent_id], 'issue_date': issue_date,
+                         'due_date': issue_date + timedelta(days=30), 'total_amount': sum(hours) * 20,
+                         'status': rng.choice(['sent', 'sent', 'paid', 'paid', 'draft']),
+                         'finalisation_attempts': 0})
+        for job_id, worked in zip(job_ids, hours):
+            invoice_jobs.append({'invoice_id': invoice_id, 'job_id': job_id, 'hours_worked': worked,
+                                 'hourly_rate_at_invoice': 20})
+    _insert(Invoice, invoices)
+    _insert(InvoiceJob, invoice_jobs)
+    log(f"seeded {len(invoices)} invoices, {len(invoice_jobs)} invoice lines")
+    # Core inserts skip the invoice ledger as well; derive it the way the migration does
+    log(f"derived invoice state for {invoice_ledger.recompute()} assignments")
+
+    # --- CRM ---
+    crm_users = [{'id': n, 'username': f"bench-crm-{n - 1}", 'email': f"crm{n - 1}@v3-services.test",
+                  'password_hash': password_hash, 'is_super_admin': n == 1,
+                  'created_at': now - timedelta(days=HISTORY_DAYS)}
+                 for n in range(1, volumes['crm_users'] + 1)]
+    _insert(CRMUser, crm_users)
+
+    contacts, emails, bodies = [], [], []
+    for contact_id in range(1, volumes['crm_contacts'] + 1):
+        first, last = rng.choice(_FIRST_NAMES), rng.choice(_LAST_NAMES)
+        address, _ = _address(rng)
+        created = now - timedelta(days=rng.randint(0, HISTORY_DAYS))
+        contacts.append({'id': contact_id, 'name': f"{first} {last}", 'email': f"contact{contact_id}@example.test",
+                         'phone': f"01{rng.randint(100000000, 999999999)}",
+                         'company_name': f"{last} Estates Ltd" if rng.random() < 0.6 else None,
+                         'contact_type': rng.choice(_CONTACT_TYPES), 'property_address': address,
+                         'current_stage': rng.choice(_STAGES), 'status': rng.choice(_CONTACT_STATUSES),
+                         'priority': rng.choice(_PRIORITIES),
+                         'next_followup_date': (now + timedelta(days=rng.randint(-30, 60))).date() if rng.random() < 0.7 else None,
+                         'potential_value': rng.randint(500, 15000), 'total_revenue': 0, 'total_jobs_referred': 0,
+                         'owner_id': (contact_id % len(crm_users)) + 1, 'created_at': created, 'updated_at': created})
+    for email_id in range(1, volumes['crm_emails'] + 1):
+        contact = contacts[(email_id - 1) % len(contacts)]
+        sent = rng.random() < 0.4
+        mailbox = f"crm{contact['owner_id'] - 1}@v3-services.test"
+        emails.append({'id': email_id, 'contact_id': contact['id'], 'user_id': contact['owner_id'],
+                       'email_uid': f"bench-{email_id}", 'subject': _sentence(rng, 6),
+                       'sender': mailbox if sent else contact['email'],
+                       'recipient': contact['email'] if sent else mailbox,
+                       'date': now - timedelta(minutes=rng.randint(0, HISTORY_DAYS * 1440)),
+                       'is_sent': sent, 'synced_at': now, 'created_at': now})
+        text = '\n\n'.join(_sentence(rng, rng.randint(12, 40)) for _ in range(rng.randint(3, 12)))
+        emails[-1]['preview'] = preview_of(text)
+        bodies.append({'email_id': email_id, 'text': text,
+                       'html': '<html><body>' + ''.join(f"<p>{p}</p>" for p in text.split('\n\n')) + '</body></html>'})
+    _insert(CRMContact, contacts)
+    _insert(CRMEmail, emails)
+    _insert(CRMEmailBody, bodies)
+    log(f"seeded {len(crm_users)} CRM users, {len(contacts)} contacts, {len(emails)} emails")
+
+    _reset_sequences([User, Job, JobAssignment, Invoice, CRMUser, CRMContact, CRMEmail])
+    db.session.commit()
+    # Core inserts skip the flush listener that maintains the search index
+    log(f"indexed {search.reindex()}")
+
+    busiest = max(agent_ids, key=lambda agent_id: len(accepted_by_agent.get(agent_id, ())))
+    # Contact n and email n belong to CRM user 1 (owners are assigned round robin)
+    return {'admin_id': 1, 'agent_id': busiest, 'crm_user_id': 1, 'crm_contact_id': len(crm_users),
+            'crm_email_id': len(crm_users), 'volumes': volumes}
@@ -0,0 +1,135 @@
+"""
+Time JSON serialisation and compression of a large admin-style list payload.
+
+    python -m benchmarks.serialize                 # 10k rows, 5 runs each
+    python -m benchmarks.serialize --rows 50000 --repeat 3
+
+Rows look like the admin invoice/job lists (Decimal money, dates, datetimes,
+nested job lines). Compared:
+
+- `flask+helpers`: the existing path, every value converted with as_float/as_iso
+  in Python and the dict dumped by Flask's default provider;
+- `fast/stdlib`: FastJSONProvider on the raw rows without orjson installed;
+- `fast/orjson`: FastJSONProvider on the raw rows with orjson (when installed);
+
+then gzip and brotli (when installed) over the resulting body, as the
+compression layer would send it. No database is needed.
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from src.utils import compression, json_provider
+from src.utils.serialize import as_float, as_iso
+
+STATUSES = ('draft', 'sent', 'paid', 'overdue')
+
+
+def make_rows(count, seed=42):
+    rng = random.Random(seed)
+    now = datetime(2026, 10, 1, 9, 0, 0)
+    rows = []
+    for n in range(count):
+        issued = now - timedelta(days=rng.randint(0, 720), minutes=rng.randint(0, 1440))
+        rows.append({
+            'id': n + 1,
+            'invoice_number': f"V3-{n + 1:06d}",
+            'agent_id': rng.randint(1, 2000),
+            'agent_name': f"Agent {rng.randint(1, 2000)}",
+            'status': rng.choice(STATUSES),
+            'issue_date': issued.date(),
+            'due_date': (issued + timedelta(days=30)).date(),
+            'created_at': issued,
+            'updated_at': issued + timedelta(hours=rng.randint(0, 48)),
+            'hours': Decimal(rng.randint(4, 60)) / 2,
+            'rate': Decimal('20.00'),
+            'subtotal': Decimal(rng.randint(4000, 120000)) / 100,
+            'vat': Decimal(rng.randint(0, 24000)) / 100,
+            'total': Decimal(rng.randint(4000, 144000)) / 100,
+            'address': f"{rng.randint(1, 200)} Station Road, Leeds LS{rng.randint(1, 28)} {rng.randint(1, 9)}QW",
+            'jobs': [{'job_id': rng.randint(1, 100000), 'hours': Decimal(rng.randint(2, 24)) / 2}
+                     for _ in range(rng.randint(1, 3))],
+        })
+    return rows
+
+
+def _helpers(value):
+    """What to_dict() does today: convert every value by hand before dumping."""
+    if isinstance(value, dict):
+        return {key: _helpers(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_helpers(item) for item in value]
+    if isinstance(value, Decimal):
+        return as_float(value)
+    if hasattr(value, 'isoformat'):
+        return as_iso(value)
+    return value
+
+
+def timed(fn, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    app = Flask(__name__)
+    default = DefaultJSONProvider(app)
+    fast = json_provider.FastJSONProvider(app)
+    rows = make_rows(args.rows)
+    payload = {'items': rows, 'total': len(rows)}
+    orjson = json_provider.orjson
+
+    def fast_stdlib():
+        json_provider.orjson = None
+        try:
+            return fast.dump_bytes(payload, separators=(',', ':'))
+        finally:
+            json_provider.orjson = orjson
+
+    cases = [
+        ('flask+helpers', lambda: default.dumps(_helpers(payload), separators=(',', ':')).encode('utf-8')),
+        ('fast/stdlib', fast_stdlib),
+    ]
+    if orjson is not None:
+        cases.append(('fast/orjson', lambda: fast.dump_bytes(payload, separators=(',', ':'))))
+    results = {name: timed(fn, args.repeat) for name, fn in cases}
+
+    print(f"{args.rows} rows, median of {args.repeat} runs")
+    print(f"{'serialiser':<16}{'ms':>10}{'MB':>10}")
+    body = None
+    for name, _ in cases:
+        ms, body = results[name]
+        print(f"{name:<16}{ms:>10.1f}{len(body) / 1e6:>10.2f}")
+    if orjson is None:
+        print("(orjson not installed: pip install orjson)")
+
+    print()
+    print(f"{'encoding':<16}{'ms':>10}{'MB':>10}{'ratio':>8}")
+    encodings = ['gzip'] + (['br'] if compression.brotli is not None else [])
+    for encoding in encodings:
+        ms, packed = timed(lambda: compression.compress(body, encoding), args.repeat)
+        print(f"{encoding:<16}{ms:>10.1f}{len(packed) / 1e6:>10.2f}{len(body) / len(packed):>8.1f}")
+    if compression.brotli is None:
+        print("(brotli not installed: pip install brotli)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
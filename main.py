@@ -7,13 +7,7 @@ import os
 import sys
 import requests
 import logging
-import threading
-import random
-import time
-import smtplib
 from datetime import datetime, timedelta
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 
 # --- Get Git SHA for version tracking ---
 GIT_SHA = os.environ.get('GIT_SHA', 'dev')
@@ -34,6 +28,11 @@ from src.models.vehicle import VehicleSighting
 from src.models.vehicle_details import VehicleDetails
 from src.scheduler import init_scheduler
 from src.models.user import Setting
+from src.models.contact_form import ContactFormSubmission
+from src.services import contact_intake
+from src.utils.perf import init_perf
+from src.utils.compression import init_compression
+from src.utils.json_provider import FastJSONProvider
 
 # --- Route Blueprint Imports ---
 from src.routes.user import user_bp
@@ -41,7 +40,7 @@ from src.routes.intelligence import intelligence_bp
 from src.routes.auth import auth_bp, check_if_token_revoked
 from src.routes.availability import availability_bp
 from src.routes.jobs import jobs_bp
-from src.routes.notifications import notifications_bp
+from src.routes.notifications import notifications_bp, stream_notifications
 from src.routes.fcm_notifications import fcm_bp
 from src.routes.weather import weather_bp
 from src.routes.analytics import analytics_bp
@@ -57,11 +56,13 @@ from src.routes.forms import forms_bp
 from src.routes.authority_to_act import authority_bp
 from src.routes.contact_forms import contact_forms_bp
 from src.routes.crm import crm_bp
+from src.routes.search import search_bp
 
 
 # --- Flask App Initialization ---
 static_folder_path = os.path.join(os.path.dirname(__file__), 'dist')
 app = Flask(__name__, static_folder=static_folder_path)
+app.json = FastJSONProvider(app)
 
 # --- App Configuration ---
 # Get SECRET_KEY - must be set, no defaults allowed
@@ -102,6 +103,7 @@ if os.environ.get('FLASK_ENV') == 'production':
 # Use dummy values in development if not set
 app.config['VAPID_PUBLIC_KEY'] = VAPID_PUBLIC or 'dev-vapid-public-key'
 app.config['VAPID_PRIVATE_KEY'] = VAPID_PRIVATE or 'dev-vapid-private-key'
+app.config['VAPID_CLAIM_SUB'] = os.environ.get('VAPID_CLAIM_SUB', 'mailto:your_email@example.com')
 
 # --- Database Configuration for Heroku ---
 DATABASE_URL = os.environ.get('DATABASE_URL')
@@ -146,6 +148,11 @@ app.config['TELEGRAM_ADMIN_CHAT_ID'] = os.environ.get('TELEGRAM_ADMIN_CHAT_ID')
 app.config['TELEGRAM_ADMIN_THREAD_ID'] = os.environ.get('TELEGRAM_ADMIN_THREAD_ID')
 app.config['TELEGRAM_SET_WEBHOOK_ON_START'] = os.environ.get('TELEGRAM_SET_WEBHOOK_ON_START', 'false')
 app.config['NOTIFICATIONS_ENABLED'] = env_bool('NOTIFICATIONS_ENABLED', True)
+# Query/latency instrumentation (Server-Timing header, /api/admin/perf)
+app.config['PERF_INSTRUMENTATION'] = env_bool('PERF_INSTRUMENTATION', True)
+# gzip/brotli for JSON and text responses of at least COMPRESS_MIN_BYTES
+app.config['RESPONSE_COMPRESSION'] = env_bool('RESPONSE_COMPRESSION', True)
+app.config['COMPRESS_MIN_BYTES'] = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))
 
 # --- CORS Configuration for Heroku ---
 LIVE_APP_URL = os.environ.get('LIVE_APP_URL', 'https://v3-app-49c3d1eff914.herokuapp.com')
@@ -159,6 +166,8 @@ CORS(app, origins=origins, supports_credentials=True, allow_headers=["Content-Ty
 db.init_app(app)
 migrate = Migrate(app, db)
 jwt = JWTManager(app)
+init_perf(app)
+init_compression(app)
 
 # Initialize rate limiter to prevent brute force attacks
 from flask_limiter import Limiter
@@ -171,6 +180,8 @@ limiter = Limiter(
     storage_uri="memory://",
     headers_enabled=True
 )
+# Long-lived SSE stream: reconnects are paced by the stream cap's Retry-After, not the hourly limit
+limiter.exempt(stream_notifications)
 
 # --- JWT Configuration ---
 @jwt.token_in_blocklist_loader
@@ -219,6 +230,7 @@ app.register_blueprint(forms_bp, url_prefix='/api')
 app.register_blueprint(authority_bp, url_prefix='/api')
 app.register_blueprint(contact_forms_bp, url_prefix='/api')
 app.register_blueprint(crm_bp, url_prefix='/api/crm')
+app.register_blueprint(search_bp, url_prefix='/api')
 
 # ==================== CONTACT FORM AUTOMATION ====================
 # Contact Form Endpoint with OpenAI Auto-Reply, Telegram & Email Integration
@@ -227,7 +239,8 @@ app.register_blueprint(crm_bp, url_prefix='/api/crm')
 def contact_form():
     """
     Handle contact form submissions with automated GPT replies, Telegram notifications, and email sending.
-    Replaces Cognito Forms integration.
+    Replaces Cognito Forms integration. The submission is saved and handed to the
+    intake pipeline (src/services/contact_intake.py); the response doesn't wait on it.
     """
     # Handle preflight OPTIONS request
     if request.method == 'OPTIONS':
@@ -274,77 +287,48 @@ def contact_form():
 
         app.logger.info(f"[Contact Form {request_id}] Processing submission from {fields['name']} ({email})")
 
-        # STEP 1: Generate GPT Reply FIRST
-        app.logger.info(f"[Contact Form {request_id}] Generating GPT reply...")
-        gpt_reply = generate_gpt_reply(fields, request_id)
+        # Save first; GPT reply, Telegram and emails run in the intake pipeline
+        submission = ContactFormSubmission(
+            first_name=first_name,
+            last_name=last_name,
+            company_name=company_name if company_name else None,
+            email=email,
+            phone=phone,
+            site_postcode=site_postcode if site_postcode else None,
+            callback_requested=bool(request_callback),
+            comments=comments,
+            request_id=request_id,
+            status='pending',
+            stage=contact_intake.STAGE_SAVED,
+            due_at=datetime.utcnow(),
+        )
+        db.session.add(submission)
+        db.session.commit()
+        app.logger.info(f"[Contact Form {request_id}] Saved to database with ID: {submission.id}")
 
-        # STEP 1.5: Save to database
-        app.logger.info(f"[Contact Form {request_id}] Saving to database...")
         try:
-            from src.models.contact_form import ContactFormSubmission
-            submission = ContactFormSubmission(
-                first_name=first_name,
-                last_name=last_name,
-                company_name=company_name if company_name else None,
-                email=email,
-                phone=phone,
-                site_postcode=site_postcode if site_postcode else None,
-                callback_requested=request_callback,
-                comments=comments,
-                gpt_reply=gpt_reply,
-                request_id=request_id,
-                telegram_sent=False,  # Will update after sending
-                email_sent=False,  # Will update after sending
-                status='pending'
-            )
-            db.session.add(submission)
-            db.session.commit()
-            app.logger.info(f"[Contact Form {request_id}] Saved to database with ID: {submission.id}")
+            contact_intake.enqueue(submission.id, app)
         except Exception as e:
-            app.logger.error(f"[Contact Form {request_id}] Failed to save to database: {str(e)}")
-            db.session.rollback()
-
-        # STEP 2: Send Telegram Notification (immediately)
-        app.logger.info(f"[Contact Form {request_id}] Sending Telegram notification...")
-        telegram_sent = send_telegram_notification(fields, gpt_reply, request_id)
-
-        # Update telegram status in database
-        try:
-            submission.telegram_sent = telegram_sent
-            db.session.commit()
-        except Exception:
-            pass
-
-        # STEP 3: Queue customer email with delay (background thread)
-        app.logger.info(f"[Contact Form {request_id}] Queuing customer email...")
-        threading.Thread(
-            target=send_customer_email_delayed,
-            args=(fields, gpt_reply, request_id)
-        ).start()
-
-        # STEP 4: Send team notification if callback requested (background thread)
-        if fields['callback_requested'] == "Yes":
-            app.logger.info(f"[Contact Form {request_id}] Queuing team notification email...")
-            threading.Thread(
-                target=send_team_notification,
-                args=(fields, gpt_reply, request_id)
-            ).start()
+            # The scheduler sweep will pick the submission up
+            app.logger.warning(f"[Contact Form {request_id}] Could not queue processing: {str(e)}")
 
         # Return success response immediately
         response = jsonify({
             'status': 'success',
-            'message': 'Contact form processed successfully',
+            'message': 'Contact form received successfully',
             'request_id': request_id,
             'data': {
                 'email_queued': True,
-                'gpt_reply_generated': True,
-                'telegram_notification_sent': telegram_sent
+                'gpt_reply_generated': False,
+                'telegram_notification_sent': False,
+                'stage': submission.stage
             }
         })
         response.headers.add('Access-Control-Allow-Origin', '*')
         return response, 200
 
     except Exception as e:
+        db.session.rollback()
         app.logger.error(f"[Contact Form] Error processing form: {str(e)}")
         response = jsonify({
             'status': 'error',
@@ -354,336 +338,6 @@ def contact_form():
         return response, 500
 
 
-def generate_gpt_reply(fields, request_id):
-    """
-    Generate personalized GPT reply using OpenAI API.
-    Returns fallback message if OpenAI fails.
-    """
-    try:
-        import openai
-
-        openai_api_key = os.environ.get('OPENAI_API_KEY')
-        if not openai_api_key:
-            app.logger.warning(f"[Contact Form {request_id}] OPENAI_API_KEY not set, using fallback")
-            return generate_fallback_reply(fields)
-
-        # Set API key
-        openai.api_key = openai_api_key
-
-        # Prepare callback instruction
-        if fields['callback_requested'] == "Yes":
-            callback_instruction = """
-CALLBACK REQUESTED: The person has requested a callback.
-- For Eviction/Trespass matters: Say the "Eviction Team" will call within 2 hours.
-- For Security/Prevention matters: Say a "Security Specialist" will call within 2 hours.
-- For General inquiries: Say "The Team" will call within 2 hours."""
-        else:
-            callback_instruction = """
-NO CALLBACK REQUESTED: The person has NOT requested a callback.
-- For Eviction/Trespass matters: Say the "Eviction Team" will be in touch within 2 hours.
-- For Security/Prevention matters: Say a "Security Specialist" will be in touch within 2 hours.
-- For General inquiries: Say "The Team" will be in touch within 2 hours."""
-
-        # System prompt
-        system_prompt = f"""You are a senior dispatcher at V3 Services. You are efficient, calm, and empathetic.
-
-Your goal is to confirm receipt of a message and confirm the next step.
-
-STRICT RULES:
-1. START with "Hi" and their first name if provided (e.g., "Hi John,").
-2. SECOND SENTENCE: Briefly acknowledge the specific issue the user mentioned (e.g., "I understand the urgency regarding the caravans," or "I've noted your request for the CCTV towers").
-3. THIRD SENTENCE: State the action taken and the time promise.
-4. You MUST include the specific time promise: "within 2 hours".
-5. Sign off with: "- Admin Team"
-
-ROUTING:
-- Eviction/Trespass -> "Eviction Team"
-- Security/Prevention -> "Security Specialist"
-- General -> "The Team"
-
-{callback_instruction}"""
-
-        # User message
-        user_message = f"Name: {fields['name']}\nComments: {fields['comments']}\nCallback Requested: {fields['callback_requested']}"
-
-        # Call OpenAI API
-        response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_message}
-            ],
-            temperature=0.7,
-            max_tokens=200
-        )
-
-        gpt_reply = response.choices[0].message.content.strip()
-        app.logger.info(f"[Contact Form {request_id}] GPT reply generated successfully")
-        return gpt_reply
-
-    except Exception as e:
-        app.logger.error(f"[Contact Form {request_id}] OpenAI error: {str(e)}, using fallback")
-        return generate_fallback_reply(fields)
-
-
-def generate_fallback_reply(fields):
-    """
-    Generate intelligent fallback reply based on keywords and callback status.
-    """
-    comments_lower = fields['comments'].lower()
-    callback_requested = fields['callback_requested'] == "Yes"
-    name_part = fields['name'].split()[0] if fields['name'] != "Not provided" else ""
-
-    # Detect keywords
-    is_eviction = any(word in comments_lower for word in ['traveller', 'trespasser', 'squatter', 'eviction', 'unauthorised'])
-    is_security = any(word in comments_lower for word in ['security', 'cctv', 'vacant', 'barrier', 'protection', 'surveillance'])
-
-    # Generate response based on context
-    if callback_requested:
-        if is_eviction:
-            reply = f"Someone from our eviction team will call you within 2 hours during working hours to discuss your situation."
-        elif is_security:
-            reply = f"A security specialist will call you within 2 hours during working hours to discuss your requirements."
-        else:
-            reply = f"Someone from our team will call you to discuss your requirements."
-    else:
-        if is_eviction:
-            reply = f"Someone from our eviction team will be in touch within 2 hours during working hours."
-        elif is_security:
-            reply = f"A security specialist will get back to you within 2 hours during working hours."
-        else:
-            reply = f"Someone from our team will be in touch shortly."
-
-    return f"{reply}\n\n- Admin Team"
-
-
-def send_telegram_notification(fields, gpt_reply, request_id):
-    """
-    Send Telegram notification to admin group.
-    Returns True if successful, False otherwise.
-    """
-    try:
-        bot_token = os.environ.get('TELEGRAM_BOT_TOKEN')
-        chat_id = os.environ.get('TELEGRAM_ADMIN_CHAT_ID')
-
-        if not bot_token or not chat_id:
-            app.logger.warning(f"[Contact Form {request_id}] Telegram credentials not set")
-            return False
-
-        # Format message
-        message = f"""📬 New Contact Form Submission
-
-👤 Name: {fields['name']}
-📧 Email: {fields['email']}
-📱 Phone: {fields['phone']}
-🏢 Company: {fields['company_name']}
-📞 Callback: {fields['callback_requested']}
-
-💬 Comments:
-{fields['comments']}
-
-🤖 GPT Reply:
-{gpt_reply}
-
-🆔 Request ID: {request_id}"""
-
-        # Send to Telegram
-        url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-        payload = {
-            'chat_id': chat_id,
-            'text': message,
-            'parse_mode': 'HTML'
-        }
-
-        response = requests.post(url, json=payload, timeout=10)
-
-        if response.status_code == 200:
-            app.logger.info(f"[Contact Form {request_id}] Telegram notification sent successfully")
-            return True
-        else:
-            app.logger.error(f"[Contact Form {request_id}] Telegram API error: {response.status_code}")
-            return False
-
-    except Exception as e:
-        app.logger.error(f"[Contact Form {request_id}] Telegram error: {str(e)}")
-        return False
-
-
-def get_time_based_greeting():
-    """
-    Get appropriate greeting based on UK time (morning/afternoon/evening).
-    """
-    from datetime import datetime
-    import pytz
-
-    # Get current time in UK timezone
-    uk_tz = pytz.timezone('Europe/London')
-    uk_time = datetime.now(uk_tz)
-    hour = uk_time.hour
-
-    if 5 <= hour < 12:
-        return "Good morning"
-    elif 12 <= hour < 17:
-        return "Good afternoon"
-    else:
-        return "Good evening"
-
-
-def send_customer_email_delayed(fields, gpt_reply, request_id):
-    """
-    Send customer auto-reply email with random delay (30-60 seconds).
-    Runs in background thread.
-    """
-    try:
-        # Random delay between 30-60 seconds
-        delay = random.randint(30, 60)
-        app.logger.info(f"[Contact Form {request_id}] Waiting {delay} seconds before sending customer email...")
-        time.sleep(delay)
-
-        app.logger.info(f"[Contact Form {request_id}] Sending customer email...")
-
-        # Get email configuration
-        mail_server = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
-        mail_port = int(os.environ.get('MAIL_PORT', 587))
-        mail_username = os.environ.get('MAIL_USERNAME')
-        mail_password = os.environ.get('MAIL_PASSWORD')
-
-        if not mail_username or not mail_password:
-            app.logger.error(f"[Contact Form {request_id}] Email credentials not set")
-            return
-
-        # Get first name from the full name
-        first_name = fields['name'].split()[0] if fields['name'] and fields['name'] != "Not provided" else ""
-
-        # Get time-appropriate greeting
-        greeting = get_time_based_greeting()
-
-        # Create personalized greeting
-        if first_name:
-            personal_greeting = f"{greeting} {first_name},"
-        else:
-            personal_greeting = f"{greeting},"
-
-        # Replace newlines with <br> for HTML
-        gpt_reply_html = gpt_reply.replace('\n', '<br>')
-
-        # Email body
-        email_body = f"""<p>{personal_greeting}</p>
-<p>Thank you for getting in touch with V3 Services.</p>
-<p>{gpt_reply_html}</p>
-<p>&nbsp;</p>
-<table style="color: #242424; font-size: small; font-family: Arial, Helvetica, sans-serif; background-color: white;" cellspacing="0" cellpadding="0">
-<tbody>
-<tr>
-<td colspan="2">
-<p style="margin: 0; padding: 0;"><span style="color: #ff753d; font-size: 18pt; font-family: Arial, sans-serif;"><strong>V3 Services Ltd</strong></span></p>
-<p style="margin: 0 0 10px 0; padding: 0;"><span style="color: #f8723a; font-size: 10pt; font-family: Arial, sans-serif;"><strong><a style="color: #f8723a;" title="http://www.v3-services.com/" href="http://www.v3-services.com/" rel="noopener">www.V3-Services.com</a></strong></span></p>
-</td>
-</tr>
-<tr>
-<td style="padding-bottom: 10px;" colspan="2">
-<div style="height: 1px; background-color: #ff753d; width: 498px;">&nbsp;</div>
-</td>
-</tr>
-<tr>
-<td style="padding-right: 10px; vertical-align: top;"><img style="display: block; border: 0;" src="https://v3-app-49c3d1eff914.herokuapp.com/static/v3-logo.png" alt="V3 Services Logo" width="88" /></td>
-<td style="vertical-align: top;">
-<p style="margin: 0; padding: 0; line-height: 1.5;"><span style="color: black; font-size: 9pt; font-family: Arial, sans-serif;"><strong>T:&nbsp;</strong>0203 576 1343<br /><strong>E:&nbsp;</strong><a style="color: black;" title="mailto:info@v3-services.com" href="mailto:info@v3-services.com" rel="noopener">info@v3-services.com</a><br /><strong>W:&nbsp;</strong><a style="color: black;" title="http://www.v3-services.com/" href="http://www.v3-services.com/" rel="noopener">www.v3-services.com</a><br /><strong>A:&nbsp;</strong>V3 Services Ltd, 117 Dartford Road, Dartford, DA1 3EN</span></p>
-</td>
-</tr>
-<tr>
-<td style="padding-top: 10px;" colspan="2"><img style="display: block; border: 0;" src="https://files.manuscdn.com/user_upload_by_module/session_file/310419663031516064/uXbfYfMdRRQBFEzF.png" alt="signature_banner" width="498" height="128" /></td>
-</tr>
-<tr>
-<td style="padding-top: 10px;" colspan="2" width="498px">
-<p style="margin: 0px 0px 10px; padding: 0px; text-align: left;"><span style="color: #ff753d; font-size: 8pt; font-family: Helvetica; text-align: center;"><strong><span style="color: #ff753d;"><a style="color: #ff753d;" href="https://www.v3-services.com/services/trace-locate/" rel="noopener">INVESTIGATION&nbsp;</a></span>|<span>&nbsp;</span><span style="color: #ff753d;"><a style="color: #ff753d;" href="https://www.v3-services.com/services/surveillance/">SURVEILLANCE&nbsp;</a></span>|<span>&nbsp;</span><a style="color: #ff753d;" title="https://www.v3-services.com/services/traveller-evictions/" href="https://www.v3-services.com/services/traveller-evictions/">TRAVELLER EVICTIONS</a>&nbsp;|<span>&nbsp;</span><a style="color: #ff753d;" title="https://www.v3-services.com/services/squatter-evictions/" href="https://www.v3-services.com/services/squatter-evictions/" rel="noopener">SQUATTER EVICTIONS</a>&nbsp;|<span>&nbsp;</span><a style="color: #ff753d;" title="https://www.v3-services.com/services/site-security-access-prevention/" href="https://www.v3-services.com/services/site-security-access-prevention/" rel="noopener">SECURITY</a></strong></span></p>
-<p style="margin: 0px; padding: 0px; text-align: justify;"><span style="color: #959595; font-size: 7pt; font-family: Arial, sans-serif;"><strong>The principal is a Member of the United Kingdom Professional Investigators Network</strong>&nbsp;(UKPIN) V3 Services Limited Registered in England No.10653477 Registered Office: 117 Dartford Road, Dartford DA1 3EN VAT No.269383460 ICO: ZA458365 This email and any files transmitted with it are confidential and are intended for the addressee(s) only. If you have received this email in error or there are any problems, please notify the originator immediately. The unauthorised use, disclosure, copying or alteration of this email is strictly forbidden.</span></p>
-</td>
-</tr>
-</tbody>
-</table>"""
-
-        # Create message
-        msg = MIMEMultipart('alternative')
-        msg['From'] = mail_username
-        msg['To'] = fields['email']
-        msg['Bcc'] = mail_username
-        msg['Subject'] = "Thanks for contacting V3 Services"
-        msg.attach(MIMEText(email_body, 'html'))
-
-        # Send email
-        with smtplib.SMTP(mail_server, mail_port) as server:
-            server.starttls()
-            server.login(mail_username, mail_password)
-            server.send_message(msg)
-
-        app.logger.info(f"[Contact Form {request_id}] Customer email sent successfully to {fields['email']}")
-
-    except Exception as e:
-        app.logger.error(f"[Contact Form {request_id}] Error sending customer email: {str(e)}")
-
-
-def send_team_notification(fields, gpt_reply, request_id):
-    """
-    Send team notification email when callback is requested.
-    Runs in background thread.
-    """
-    try:
-        app.logger.info(f"[Contact Form {request_id}] Sending team notification email...")
-
-        # Get email configuration
-        mail_server = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
-        mail_port = int(os.environ.get('MAIL_PORT', 587))
-        mail_username = os.environ.get('MAIL_USERNAME')
-        mail_password = os.environ.get('MAIL_PASSWORD')
-
-        if not mail_username or not mail_password:
-            app.logger.error(f"[Contact Form {request_id}] Email credentials not set")
-            return
-
-        # Team recipients
-        team_emails = ['info@v3-services.com', 'Tom@v3-services.com', 'lance@v3-Services.com']
-
-        # Email body
-        email_body = f"""<h2>🔔 CALLBACK REQUESTED</h2>
-<p><strong>A customer has requested a callback. Please contact them as soon as possible.</strong></p>
-
-<h3>Contact Details:</h3>
-<ul>
-<li><strong>Name:</strong> {fields['name']}</li>
-<li><strong>Email:</strong> {fields['email']}</li>
-<li><strong>Phone:</strong> {fields['phone']}</li>
-<li><strong>Company:</strong> {fields['company_name']}</li>
-</ul>
-
-<h3>Comments:</h3>
-<p>{fields['comments']}</p>
-
-<h3>GPT Auto-Reply Sent:</h3>
-<p>{gpt_reply.replace(chr(10), '<br>')}</p>
-
-<hr>
-<p><small>Request ID: {request_id}<br>
-Submitted: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</small></p>"""
-
-        # Create message
-        msg = MIMEMultipart('alternative')
-        msg['From'] = mail_username
-        msg['To'] = ', '.join(team_emails)
-        msg['Subject'] = f"🔔 CALLBACK REQUESTED - {fields['name']}"
-        msg.attach(MIMEText(email_body, 'html'))
-
-        # Send email
-        with smtplib.SMTP(mail_server, mail_port) as server:
-            server.starttls()
-            server.login(mail_username, mail_password)
-            server.send_message(msg)
-
-        app.logger.info(f"[Contact Form {request_id}] Team notification sent successfully")
-
-    except Exception as e:
-        app.logger.error(f"[Contact Form {request_id}] Error sending team notification: {str(e)}")
-
 # ==================== END CONTACT FORM AUTOMATION ====================
 
 # --- Version tracking routes and headers ---
@@ -0,0 +1,110 @@
+"""Add numeric coordinates and geohash index to jobs and vehicle_sightings
+
+Jobs keep their string location_lat/location_lng columns (the frontend writes
+them); numeric latitude/longitude plus a geohash are derived from them on save.
+vehicle_sightings already has numeric coordinates and only gains the geohash.
+Existing rows are backfilled here.
+
+Revision ID: 20261019_add_geo_columns
+Revises: 20251124_add_site_postcode
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from src.utils.geo import geohash_encode, parse_lat_lng
+
+
+# revision identifiers, used by Alembic.
+revision = '20261019_add_geo_columns'
+down_revision = '20251124_add_site_postcode'
+branch_labels = None
+depends_on = None
+
+
+def _columns(inspector, table):
+    try:
+        return [c['name'] for c in inspector.get_columns(table)]
+    except Exception:
+        return []
+
+
+def _indexes(inspector, table):
+    try:
+        return [i['name'] for i in inspector.get_indexes(table)]
+    except Exception:
+        return []
+
+
+def _add_geo_columns(inspector, table, coordinates=True):
+    existing = _columns(inspector, table)
+    with op.batch_alter_table(table, schema=None) as batch_op:
+        if coordinates and 'latitude' not in existing:
+            batch_op.add_column(sa.Column('latitude', sa.Float(), nullable=True))
+        if coordinates and 'longitude' not in existing:
+            batch_op.add_column(sa.Column('longitude', sa.Float(), nullable=True))
+        if 'geohash' not in existing:
+            batch_op.add_column(sa.Column('geohash', sa.String(length=12), nullable=True))
+    index_name = f'ix_{table}_geohash'
+    if index_name not in _indexes(inspector, table):
+        op.create_index(index_name, table, ['geohash'], unique=False)
+
+
+def _backfill(conn, select_sql, table):
+    rows = conn.execute(sa.text(select_sql)).fetchall()
+    updated = 0
+    for row_id, lat_raw, lng_raw in rows:
+        lat, lng = parse_lat_lng(lat_raw, lng_raw)
+        if lat is None:
+            continue
+        conn.execute(
+            sa.text(f"UPDATE {table} SET latitude = :lat, longitude = :lng, geohash = :gh WHERE id = :id"),
+            {'lat': lat, 'lng': lng, 'gh': geohash_encode(lat, lng), 'id': row_id},
+        )
+        updated += 1
+    print(f"Backfilled geohash for {updated} {table} rows")
+
+
+def upgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+
+    if 'jobs' in tables:
+        _add_geo_columns(inspector, 'jobs')
+        _backfill(
+            conn,
+            "SELECT id, location_lat, location_lng FROM jobs "
+            "WHERE location_lat IS NOT NULL AND location_lng IS NOT NULL",
+            'jobs',
+        )
+
+    if 'vehicle_sightings' in tables:
+        # latitude/longitude come from acvs_20250819b1, an ancestor of this revision
+        _add_geo_columns(sa.inspect(conn), 'vehicle_sightings', coordinates=False)
+        _backfill(
+            conn,
+            "SELECT id, latitude, longitude FROM vehicle_sightings "
+            "WHERE latitude IS NOT NULL AND longitude IS NOT NULL",
+            'vehicle_sightings',
+        )
+
+
+def downgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+
+    if 'ix_jobs_geohash' in _indexes(inspector, 'jobs'):
+        op.drop_index('ix_jobs_geohash', table_name='jobs')
+    existing = _columns(inspector, 'jobs')
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        for col in ('geohash', 'longitude', 'latitude'):
+            if col in existing:
+                batch_op.drop_column(col)
+
+    # vehicle_sightings.latitude/longitude belong to acvs_20250819b1; only drop the geohash
+    if 'ix_vehicle_sightings_geohash' in _indexes(inspector, 'vehicle_sightings'):
+        op.drop_index('ix_vehicle_sightings_geohash', table_name='vehicle_sightings')
+    if 'geohash' in _columns(inspector, 'vehicle_sightings'):
+        with op.batch_alter_table('vehicle_sightings', schema=None) as batch_op:
+            batch_op.drop_column('geohash')
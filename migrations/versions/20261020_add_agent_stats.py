@@ -0,0 +1,83 @@
+"""Add agent_stats table for incremental agent reliability and geocoded home location
+
+Revision ID: 20261020_add_agent_stats
+Revises: 20261019_add_geo_columns
+Create Date: 2026-10-20
+"""
+from datetime import datetime, timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261020_add_agent_stats'
+down_revision = '20261019_add_geo_columns'
+branch_labels = None
+depends_on = None
+
+# A 30-day half-life weights history by 0.5**(t/30); its integral is 30/ln(2) ~= 43 days,
+# so at a steady offer rate the decayed counters equal the plain counts over that window.
+DECAY_EQUIVALENT_DAYS = 43
+
+
+def upgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    if 'agent_stats' in inspector.get_table_names():
+        print("agent_stats table already exists - skipping")
+        return
+
+    op.create_table(
+        'agent_stats',
+        sa.Column('agent_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('offered_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('accepted_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('declined_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('decayed_offered', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('decayed_accepted', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('decayed_at', sa.DateTime(), nullable=True),
+        sa.Column('last_offered_at', sa.DateTime(), nullable=True),
+        sa.Column('last_accepted_at', sa.DateTime(), nullable=True),
+        sa.Column('home_latitude', sa.Float(), nullable=True),
+        sa.Column('home_longitude', sa.Float(), nullable=True),
+        sa.Column('geocoded_postcode', sa.String(length=10), nullable=True),
+        sa.Column('geocoded_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+    )
+
+    # Backfill from existing assignments
+    now = datetime.utcnow()
+    conn.execute(
+        sa.text(
+            """
+            INSERT INTO agent_stats (
+                agent_id, offered_count, accepted_count, declined_count,
+                decayed_offered, decayed_accepted, decayed_at,
+                last_offered_at, last_accepted_at, updated_at
+            )
+            SELECT
+                ja.agent_id,
+                COUNT(*),
+                SUM(CASE WHEN ja.status = 'accepted' THEN 1 ELSE 0 END),
+                SUM(CASE WHEN ja.status = 'declined' THEN 1 ELSE 0 END),
+                SUM(CASE WHEN ja.created_at >= :cutoff THEN 1 ELSE 0 END),
+                SUM(CASE WHEN ja.created_at >= :cutoff AND ja.status = 'accepted' THEN 1 ELSE 0 END),
+                :now,
+                MAX(ja.created_at),
+                MAX(CASE WHEN ja.status = 'accepted' THEN COALESCE(ja.response_time, ja.created_at) END),
+                :now
+            FROM job_assignments ja
+            JOIN users u ON u.id = ja.agent_id
+            GROUP BY ja.agent_id
+            """
+        ),
+        {'cutoff': now - timedelta(days=DECAY_EQUIVALENT_DAYS), 'now': now},
+    )
+
+
+def downgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    if 'agent_stats' in inspector.get_table_names():
+        op.drop_table('agent_stats')
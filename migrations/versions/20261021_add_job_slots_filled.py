@@ -0,0 +1,46 @@
+"""Add jobs.slots_filled counter for atomic slot allocation
+
+Revision ID: 20261021_add_job_slots_filled
+Revises: 20261020_add_agent_stats
+Create Date: 2026-10-21
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261021_add_job_slots_filled'
+down_revision = '20261020_add_agent_stats'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    columns = [c['name'] for c in inspector.get_columns('jobs')]
+    if 'slots_filled' in columns:
+        print("jobs.slots_filled already exists - skipping")
+        return
+
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('slots_filled', sa.Integer(), nullable=False, server_default='0'))
+
+    # Backfill from accepted assignments
+    conn.execute(sa.text(
+        """
+        UPDATE jobs SET slots_filled = (
+            SELECT COUNT(*) FROM job_assignments ja
+            WHERE ja.job_id = jobs.id AND ja.status = 'accepted'
+        )
+        """
+    ))
+
+
+def downgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    columns = [c['name'] for c in inspector.get_columns('jobs')]
+    if 'slots_filled' in columns:
+        with op.batch_alter_table('jobs', schema=None) as batch_op:
+            batch_op.drop_column('slots_filled')
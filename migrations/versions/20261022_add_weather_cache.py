@@ -0,0 +1,43 @@
+"""Add weather_cache table for grid-cell weather and geocode responses
+
+Revision ID: 20261022_add_weather_cache
+Revises: 20261021_add_job_slots_filled
+Create Date: 2026-10-22
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261022_add_weather_cache'
+down_revision = '20261021_add_job_slots_filled'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    if 'weather_cache' in inspector.get_table_names():
+        print("weather_cache table already exists - skipping")
+        return
+
+    op.create_table(
+        'weather_cache',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('kind', sa.String(length=20), nullable=False),
+        sa.Column('cell_key', sa.String(length=64), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('fetched_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.UniqueConstraint('kind', 'cell_key', name='uq_weather_cache_kind_cell'),
+    )
+    op.create_index('ix_weather_cache_expires_at', 'weather_cache', ['expires_at'], unique=False)
+
+
+def downgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    if 'weather_cache' in inspector.get_table_names():
+        op.drop_index('ix_weather_cache_expires_at', table_name='weather_cache')
+        op.drop_table('weather_cache')
@@ -0,0 +1,51 @@
+"""Add email_outbox table for queued SMTP delivery
+
+Revision ID: 20261024_add_email_outbox
+Revises: 20261023_add_contact_form_pipeline
+Create Date: 2026-10-24
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261024_add_email_outbox'
+down_revision = '20261023_add_contact_form_pipeline'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    if 'email_outbox' in inspector.get_table_names():
+        print("email_outbox table already exists - skipping")
+        return
+
+    op.create_table(
+        'email_outbox',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('category', sa.String(length=50), nullable=True),
+        sa.Column('sender', sa.String(length=255), nullable=False),
+        sa.Column('recipients', sa.Text(), nullable=False),
+        sa.Column('subject', sa.String(length=255), nullable=True),
+        sa.Column('message', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='queued'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('locked_until', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_email_outbox_status', 'email_outbox', ['status'], unique=False)
+    op.create_index('ix_email_outbox_next_attempt_at', 'email_outbox', ['next_attempt_at'], unique=False)
+
+
+def downgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    if 'email_outbox' in inspector.get_table_names():
+        op.drop_index('ix_email_outbox_next_attempt_at', table_name='email_outbox')
+        op.drop_index('ix_email_outbox_status', table_name='email_outbox')
+        op.drop_table('email_outbox')
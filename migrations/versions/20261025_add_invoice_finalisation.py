@@ -0,0 +1,49 @@
+"""Add background finalisation columns to invoices
+
+Revision ID: 20261025_add_invoice_finalisation
+Revises: 20261024_add_email_outbox
+Create Date: 2026-10-25
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261025_add_invoice_finalisation'
+down_revision = '20261024_add_email_outbox'
+branch_labels = None
+depends_on = None
+
+COLUMNS = ('finalisation_status', 'finalisation_payload', 'finalisation_attempts', 'finalisation_error',
+           'finalisation_due_at', 'finalisation_locked_until', 'pdf_file_key')
+
+
+def upgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    columns = [c['name'] for c in inspector.get_columns('invoices')]
+    if 'finalisation_status' in columns:
+        print("invoices.finalisation_status already exists - skipping")
+        return
+
+    # Existing invoices were finalised inline and keep finalisation_status NULL
+    with op.batch_alter_table('invoices', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('finalisation_status', sa.String(length=20), nullable=True))
+        batch_op.add_column(sa.Column('finalisation_payload', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('finalisation_attempts', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('finalisation_error', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('finalisation_due_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('finalisation_locked_until', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('pdf_file_key', sa.String(length=500), nullable=True))
+        batch_op.create_index('ix_invoices_finalisation_status', ['finalisation_status'], unique=False)
+
+
+def downgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    columns = [c['name'] for c in inspector.get_columns('invoices')]
+    if 'finalisation_status' in columns:
+        with op.batch_alter_table('invoices', schema=None) as batch_op:
+            batch_op.drop_index('ix_invoices_finalisation_status')
+            for column in reversed(COLUMNS):
+                batch_op.drop_column(column)
@@ -0,0 +1,54 @@
+"""Add report_photos table for direct uploads and thumbnails
+
+Revision ID: 20261026_add_report_photos
+Revises: 20261025_add_invoice_finalisation
+Create Date: 2026-10-26
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261026_add_report_photos'
+down_revision = '20261025_add_invoice_finalisation'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    if 'report_photos' in inspector.get_table_names():
+        print("report_photos table already exists - skipping")
+        return
+
+    op.create_table(
+        'report_photos',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('owner_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('file_key', sa.String(length=500), nullable=False, unique=True),
+        sa.Column('original_filename', sa.String(length=255), nullable=True),
+        sa.Column('content_type', sa.String(length=100), nullable=True),
+        sa.Column('size', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='pending'),
+        sa.Column('thumbnail_key', sa.String(length=500), nullable=True),
+        sa.Column('width', sa.Integer(), nullable=True),
+        sa.Column('height', sa.Integer(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('due_at', sa.DateTime(), nullable=True),
+        sa.Column('locked_until', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('uploaded_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_report_photos_owner_id', 'report_photos', ['owner_id'], unique=False)
+    op.create_index('ix_report_photos_status', 'report_photos', ['status'], unique=False)
+
+
+def downgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    if 'report_photos' in inspector.get_table_names():
+        op.drop_index('ix_report_photos_status', table_name='report_photos')
+        op.drop_index('ix_report_photos_owner_id', table_name='report_photos')
+        op.drop_table('report_photos')
@@ -0,0 +1,35 @@
+"""Index fcm_tokens on (user_id, is_active) for push fan-out
+
+Revision ID: 20261027_fcm_token_active_index
+Revises: 20261026_add_report_photos
+Create Date: 2026-10-27
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261027_fcm_token_active_index'
+down_revision = '20261026_add_report_photos'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    if 'fcm_tokens' not in inspector.get_table_names():
+        print("fcm_tokens table does not exist - skipping")
+        return
+    if 'ix_fcm_tokens_user_active' in {ix['name'] for ix in inspector.get_indexes('fcm_tokens')}:
+        print("ix_fcm_tokens_user_active already exists - skipping")
+        return
+    op.create_index('ix_fcm_tokens_user_active', 'fcm_tokens', ['user_id', 'is_active'], unique=False)
+
+
+def downgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    if 'fcm_tokens' in inspector.get_table_names() and \
+            'ix_fcm_tokens_user_active' in {ix['name'] for ix in inspector.get_indexes('fcm_tokens')}:
+        op.drop_index('ix_fcm_tokens_user_active', table_name='fcm_tokens')
@@ -0,0 +1,37 @@
+"""Add users.unread_notifications counter for the notification badge
+
+Revision ID: 20261028_user_unread_notifications
+Revises: 20261027_fcm_token_active_index
+Create Date: 2026-10-28
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261028_user_unread_notifications'
+down_revision = '20261027_fcm_token_active_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    if 'unread_notifications' in {c['name'] for c in inspector.get_columns('users')}:
+        print("users.unread_notifications already exists - skipping")
+        return
+    op.add_column('users', sa.Column('unread_notifications', sa.Integer(), nullable=False, server_default='0'))
+    if 'notifications' in inspector.get_table_names():
+        op.execute(
+            "UPDATE users SET unread_notifications = ("
+            "SELECT COUNT(*) FROM notifications "
+            "WHERE notifications.user_id = users.id AND (notifications.is_read IS NULL OR notifications.is_read = false))"
+        )
+
+
+def downgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    if 'unread_notifications' in {c['name'] for c in inspector.get_columns('users')}:
+        op.drop_column('users', 'unread_notifications')
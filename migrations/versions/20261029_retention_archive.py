@@ -0,0 +1,56 @@
+"""Add archived_records and the notifications (user_id, sent_at) index
+
+Revision ID: 20261029_retention_archive
+Revises: 20261028_user_unread_notifications
+Create Date: 2026-10-29
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261029_retention_archive'
+down_revision = '20261028_user_unread_notifications'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+
+    if 'archived_records' in tables:
+        print("archived_records table already exists - skipping")
+    else:
+        op.create_table(
+            'archived_records',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('source_table', sa.String(length=64), nullable=False),
+            sa.Column('source_id', sa.Integer(), nullable=False),
+            sa.Column('owner_id', sa.Integer(), nullable=True),
+            sa.Column('recorded_at', sa.DateTime(), nullable=False),
+            sa.Column('archived_at', sa.DateTime(), nullable=False),
+            sa.Column('payload', sa.LargeBinary(), nullable=False),
+            sa.UniqueConstraint('source_table', 'source_id', name='uq_archived_records_source'),
+        )
+        op.create_index('ix_archived_records_lookup', 'archived_records', ['source_table', 'owner_id', 'recorded_at'])
+
+    if 'notifications' not in tables:
+        print("notifications table does not exist - skipping index")
+    elif 'ix_notifications_user_sent_at' in {ix['name'] for ix in inspector.get_indexes('notifications')}:
+        print("ix_notifications_user_sent_at already exists - skipping")
+    else:
+        op.create_index('ix_notifications_user_sent_at', 'notifications', ['user_id', 'sent_at'])
+
+
+def downgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+    if 'notifications' in tables and \
+            'ix_notifications_user_sent_at' in {ix['name'] for ix in inspector.get_indexes('notifications')}:
+        op.drop_index('ix_notifications_user_sent_at', table_name='notifications')
+    if 'archived_records' in tables:
+        op.drop_index('ix_archived_records_lookup', table_name='archived_records')
+        op.drop_table('archived_records')
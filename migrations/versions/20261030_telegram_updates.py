@@ -0,0 +1,69 @@
+"""Add telegram_updates and index the Telegram link/chat lookups
+
+Revision ID: 20261030_telegram_updates
+Revises: 20261029_retention_archive
+Create Date: 2026-10-30
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261030_telegram_updates'
+down_revision = '20261029_retention_archive'
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ('ix_users_telegram_link_token', 'users', 'telegram_link_token'),
+    ('ix_users_telegram_chat_id', 'users', 'telegram_chat_id'),
+    ('ix_crm_users_telegram_link_code', 'crm_users', 'telegram_link_code'),
+)
+
+
+def upgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+
+    if 'telegram_updates' in tables:
+        print("telegram_updates table already exists - skipping")
+    else:
+        op.create_table(
+            'telegram_updates',
+            sa.Column('update_id', sa.BigInteger(), primary_key=True, autoincrement=False),
+            sa.Column('chat_id', sa.String(length=32), nullable=True),
+            sa.Column('payload', sa.Text(), nullable=False),
+            sa.Column('status', sa.String(length=20), nullable=False, server_default='pending'),
+            sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('last_error', sa.Text(), nullable=True),
+            sa.Column('due_at', sa.DateTime(), nullable=True),
+            sa.Column('locked_until', sa.DateTime(), nullable=True),
+            sa.Column('received_at', sa.DateTime(), nullable=False),
+            sa.Column('processed_at', sa.DateTime(), nullable=True),
+        )
+        op.create_index('ix_telegram_updates_status', 'telegram_updates', ['status'])
+        op.create_index('ix_telegram_updates_chat_status', 'telegram_updates', ['chat_id', 'status', 'update_id'])
+
+    for name, table, column in INDEXES:
+        if table not in tables:
+            print(f"{table} table does not exist - skipping {name}")
+        elif column not in {c['name'] for c in inspector.get_columns(table)}:
+            print(f"{table}.{column} does not exist - skipping {name}")
+        elif name in {ix['name'] for ix in inspector.get_indexes(table)}:
+            print(f"{name} already exists - skipping")
+        else:
+            op.create_index(name, table, [column])
+
+
+def downgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+    for name, table, column in INDEXES:
+        if table in tables and name in {ix['name'] for ix in inspector.get_indexes(table)}:
+            op.drop_index(name, table_name=table)
+    if 'telegram_updates' in tables:
+        op.drop_index('ix_telegram_updates_chat_status', table_name='telegram_updates')
+        op.drop_index('ix_telegram_updates_status', table_name='telegram_updates')
+        op.drop_table('telegram_updates')
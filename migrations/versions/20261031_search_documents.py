@@ -0,0 +1,75 @@
+"""Add search_documents with its full-text index, and backfill it; index jobs for pickers
+
+The full-text part is dialect specific (FTS5 on SQLite, tsvector + pg_trgm on
+Postgres) and shared with db.create_all() through FULL_TEXT_DDL.
+
+Revision ID: 20261031_search_documents
+Revises: 20261030_telegram_updates
+Create Date: 2026-10-31
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261031_search_documents'
+down_revision = '20261030_telegram_updates'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    from src.models.search_document import FULL_TEXT_DDL
+    from src.services import search
+
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+
+    if 'jobs' not in tables:
+        print("jobs table does not exist - skipping ix_jobs_status_created_at")
+    elif 'ix_jobs_status_created_at' in {ix['name'] for ix in inspector.get_indexes('jobs')}:
+        print("ix_jobs_status_created_at already exists - skipping")
+    else:
+        op.create_index('ix_jobs_status_created_at', 'jobs', ['status', 'created_at'])
+
+    if 'search_documents' in tables:
+        print("search_documents table already exists - skipping")
+        return
+
+    op.create_table(
+        'search_documents',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('entity', sa.String(length=32), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('owner_id', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('title', sa.String(length=255), nullable=True),
+        sa.Column('subtitle', sa.String(length=255), nullable=True),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column('keys', sa.String(length=255), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.UniqueConstraint('entity', 'entity_id', name='uq_search_documents_entity'),
+    )
+    op.create_index('ix_search_documents_entity_owner', 'search_documents', ['entity', 'owner_id'])
+    for statement in FULL_TEXT_DDL.get(conn.dialect.name, []):
+        op.execute(statement)
+
+    counts = search.reindex(connection=conn)
+    print(f"Indexed {counts}")
+
+
+def downgrade():
+    from src.models.search_document import DROP_DDL
+
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+    if 'jobs' in tables and 'ix_jobs_status_created_at' in {ix['name'] for ix in inspector.get_indexes('jobs')}:
+        op.drop_index('ix_jobs_status_created_at', table_name='jobs')
+    if 'search_documents' not in tables:
+        return
+    for statement in DROP_DDL.get(conn.dialect.name, []):
+        op.execute(statement)
+    op.drop_index('ix_search_documents_entity_owner', table_name='search_documents')
+    op.drop_table('search_documents')
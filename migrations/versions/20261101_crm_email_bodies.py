@@ -0,0 +1,103 @@
+"""Move CRM email bodies to compressed crm_email_bodies; keep a preview on crm_emails
+
+Bodies are copied in batches (zlib via CompressedText) before the
+body_text/body_html columns are dropped, and the preview is computed from
+them on the way.
+
+Revision ID: 20261101_crm_email_bodies
+Revises: 20261031_search_documents
+Create Date: 2026-11-01
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261101_crm_email_bodies'
+down_revision = '20261031_search_documents'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+
+def upgrade():
+    from src.models.crm_email import PREVIEW_LENGTH, CRMEmailBody, preview_of
+
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+
+    if 'crm_emails' not in tables:
+        print("crm_emails table does not exist - skipping")
+        return
+
+    if 'crm_email_bodies' in tables:
+        print("crm_email_bodies table already exists - skipping")
+    else:
+        op.create_table(
+            'crm_email_bodies',
+            sa.Column('email_id', sa.Integer(), sa.ForeignKey('crm_emails.id', ondelete='CASCADE'), primary_key=True),
+            sa.Column('text', sa.LargeBinary(), nullable=True),
+            sa.Column('html', sa.LargeBinary(), nullable=True),
+        )
+
+    columns = {c['name'] for c in inspector.get_columns('crm_emails')}
+    if 'preview' not in columns:
+        op.add_column('crm_emails', sa.Column('preview', sa.String(length=PREVIEW_LENGTH), nullable=True))
+    if 'body_text' not in columns:
+        print("crm_emails bodies already moved - skipping")
+        return
+
+    emails = sa.table('crm_emails', sa.column('id', sa.Integer()), sa.column('preview', sa.String()),
+                      sa.column('body_text', sa.Text()), sa.column('body_html', sa.Text()))
+    bodies = CRMEmailBody.__table__
+    moved, last_id = 0, 0
+    while True:
+        rows = conn.execute(
+            sa.select(emails.c.id, emails.c.body_text, emails.c.body_html)
+            .where(emails.c.id > last_id).order_by(emails.c.id).limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        conn.execute(bodies.insert(), [{'email_id': row.id, 'text': row.body_text, 'html': row.body_html}
+                                       for row in rows])
+        for row in rows:
+            preview = preview_of(row.body_text, row.body_html)
+            if preview:
+                conn.execute(emails.update().where(emails.c.id == row.id).values(preview=preview))
+        moved += len(rows)
+        last_id = rows[-1].id
+    print(f"Moved {moved} email bodies")
+
+    with op.batch_alter_table('crm_emails') as batch_op:
+        batch_op.drop_column('body_html')
+        batch_op.drop_column('body_text')
+
+
+def downgrade():
+    from src.models.crm_email import CRMEmailBody
+
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    tables = inspector.get_table_names()
+    if 'crm_emails' not in tables:
+        return
+
+    columns = {c['name'] for c in inspector.get_columns('crm_emails')}
+    if 'body_text' not in columns:
+        op.add_column('crm_emails', sa.Column('body_text', sa.Text(), nullable=True))
+        op.add_column('crm_emails', sa.Column('body_html', sa.Text(), nullable=True))
+
+    if 'crm_email_bodies' in tables:
+        emails = sa.table('crm_emails', sa.column('id', sa.Integer()),
+                          sa.column('body_text', sa.Text()), sa.column('body_html', sa.Text()))
+        bodies = CRMEmailBody.__table__
+        for row in conn.execute(sa.select(bodies)):
+            conn.execute(emails.update().where(emails.c.id == row.email_id)
+                         .values(body_text=row.text, body_html=row.html))
+        op.drop_table('crm_email_bodies')
+
+    if 'preview' in columns:
+        with op.batch_alter_table('crm_emails') as batch_op:
+            batch_op.drop_column('preview')
@@ -0,0 +1,61 @@
+"""Add crm_tasks.remind_at / reminded_at and arm reminders for open tasks
+
+Revision ID: 20261102_crm_task_reminders
+Revises: 20261101_crm_email_bodies
+Create Date: 2026-11-02
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261102_crm_task_reminders'
+down_revision = '20261101_crm_email_bodies'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    from src.models.crm_task import OPEN_STATUSES, REMINDER_LEAD
+
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    if 'crm_tasks' not in inspector.get_table_names():
+        print("crm_tasks table does not exist - skipping")
+        return
+
+    columns = {c['name'] for c in inspector.get_columns('crm_tasks')}
+    if 'remind_at' in columns:
+        print("crm_tasks.remind_at already exists - skipping")
+        return
+
+    op.add_column('crm_tasks', sa.Column('remind_at', sa.DateTime(), nullable=True))
+    op.add_column('crm_tasks', sa.Column('reminded_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_crm_tasks_remind_at', 'crm_tasks', ['remind_at'])
+
+    # Only tasks still ahead of their due time get a reminder; overdue ones have the daily summary
+    tasks = sa.table('crm_tasks', sa.column('id', sa.Integer()), sa.column('status', sa.String()),
+                     sa.column('due_date', sa.DateTime()), sa.column('remind_at', sa.DateTime()))
+    rows = conn.execute(
+        sa.select(tasks.c.id, tasks.c.due_date)
+        .where(tasks.c.status.in_(OPEN_STATUSES), tasks.c.due_date > datetime.utcnow())
+    ).all()
+    for row in rows:
+        conn.execute(tasks.update().where(tasks.c.id == row.id).values(remind_at=row.due_date - REMINDER_LEAD))
+    print(f"Armed reminders for {len(rows)} open tasks")
+
+
+def downgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    if 'crm_tasks' not in inspector.get_table_names():
+        return
+    columns = {c['name'] for c in inspector.get_columns('crm_tasks')}
+    if 'remind_at' not in columns:
+        return
+    op.drop_index('ix_crm_tasks_remind_at', table_name='crm_tasks')
+    with op.batch_alter_table('crm_tasks') as batch_op:
+        batch_op.drop_column('reminded_at')
+        batch_op.drop_column('remind_at')
@@ -0,0 +1,71 @@
+"""Add job_assignments.invoice_state (uninvoiced-work ledger) and backfill it
+
+The state is derived once from the legacy rules (invoice line on the
+assignment, invoice_jobs link, or an agent invoice line on the job's arrival
+date) by the same statement the app uses to maintain it. The
+(supplied_by_email, invoice_state) index supersedes the single-column
+supplied_by_email one.
+
+Revision ID: 20261103_invoice_ledger
+Revises: 20261102_crm_task_reminders
+Create Date: 2026-11-03
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '20261103_invoice_ledger'
+down_revision = '20261102_crm_task_reminders'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    from src.services import invoice_ledger
+
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    if 'job_assignments' not in inspector.get_table_names():
+        print("job_assignments table does not exist - skipping")
+        return
+
+    columns = {c['name'] for c in inspector.get_columns('job_assignments')}
+    if 'invoice_state' in columns:
+        print("job_assignments.invoice_state already exists - skipping")
+        return
+
+    # Older databases may predate the supplier columns the ledger reads
+    with op.batch_alter_table('job_assignments') as batch_op:
+        if 'supplied_by_email' not in columns:
+            batch_op.add_column(sa.Column('supplied_by_email', sa.String(length=255), nullable=True))
+        if 'supplier_headcount' not in columns:
+            batch_op.add_column(sa.Column('supplier_headcount', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('invoice_state', sa.String(length=16), nullable=True))
+
+    indexes = {ix['name'] for ix in inspector.get_indexes('job_assignments')}
+    op.create_index('ix_job_assignments_agent_invoice_state', 'job_assignments', ['agent_id', 'invoice_state'])
+    op.create_index('ix_job_assignments_supplier_invoice_state', 'job_assignments',
+                    ['supplied_by_email', 'invoice_state'])
+    if 'ix_job_assignments_supplied_by_email' in indexes:
+        op.drop_index('ix_job_assignments_supplied_by_email', table_name='job_assignments')
+
+    updated = invoice_ledger.recompute(connection=conn)
+    print(f"Derived invoice_state for {updated} job assignments")
+
+
+def downgrade():
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    if 'job_assignments' not in inspector.get_table_names():
+        return
+    columns = {c['name'] for c in inspector.get_columns('job_assignments')}
+    if 'invoice_state' not in columns:
+        return
+    indexes = {ix['name'] for ix in inspector.get_indexes('job_assignments')}
+    if 'ix_job_assignments_supplied_by_email' not in indexes:
+        op.create_index('ix_job_assignments_supplied_by_email', 'job_assignments', ['supplied_by_email'])
+    op.drop_index('ix_job_assignments_supplier_invoice_state', table_name='job_assignments')
+    op.drop_index('ix_job_assignments_agent_invoice_state', table_name='job_assignments')
+    with op.batch_alter_table('job_assignments') as batch_op:
+        batch_op.drop_column('invoice_state')
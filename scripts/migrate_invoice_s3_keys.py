@@ -0,0 +1,42 @@
+"""
+Move invoice PDFs from invoices/{agent_id}/ to invoices/YYYY/MM/{agent_id}/.
+
+Usage:
+    python scripts/migrate_invoice_s3_keys.py              # dry run
+    python scripts/migrate_invoice_s3_keys.py --apply
+    python scripts/migrate_invoice_s3_keys.py --apply --delete-old
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from main import app
+from src.services.invoice_storage import migrate_invoice_keys
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--apply', action='store_true', help='copy objects and update Invoice.pdf_file_key')
+    parser.add_argument('--delete-old', action='store_true', help='delete legacy objects after copying (requires --apply)')
+    args = parser.parse_args()
+
+    with app.app_context():
+        summary = migrate_invoice_keys(apply=args.apply, delete_old=args.apply and args.delete_old)
+
+    for move in summary['moved']:
+        print(f"{'MOVED' if summary['applied'] else 'WOULD MOVE'} {move['from']} -> {move['to']}")
+    for key in summary['missing']:
+        print(f"MISSING {key}")
+    for key in summary['errors']:
+        print(f"ERROR {key}")
+    print(f"{len(summary['moved'])} moved, {len(summary['missing'])} missing, "
+          f"{len(summary['errors'])} errors, {summary['orphans']} objects without an invoice row")
+    if not summary['applied']:
+        print("Dry run only; re-run with --apply to migrate.")
+    return 1 if summary['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
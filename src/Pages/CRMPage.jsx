@@ -134,6 +134,8 @@ export default function CRMPage() {
   const [syncingEmails, setSyncingEmails] = useState(false);
   const [showEmailsModal, setShowEmailsModal] = useState(false);
   const [selectedContactEmails, setSelectedContactEmails] = useState([]);
+  const [emailsPage, setEmailsPage] = useState({ page: 0, pages: 0, count: 0 });
+  const [loadingMoreEmails, setLoadingMoreEmails] = useState(false);
   const [selectedEmail, setSelectedEmail] = useState(null);
 
   // Task states
@@ -751,7 +753,7 @@ export default function CRMPage() {
       const data = await response.json();
       toast.success(data.message);
 
-      // If emails modal is open, reload emails
+      // If emails modal is open, reload emails from the first page
       if (showEmailsModal) {
         loadContactEmails(contactId);
       }
@@ -762,11 +764,12 @@ export default function CRMPage() {
     }
   };
 
-  const loadContactEmails = async (contactId) => {
+  // The list endpoint is paged (25 per page) and returns headers + preview only
+  const loadContactEmails = async (contactId, page = 1) => {
     const token = localStorage.getItem('crm_token');
 
     try {
-      const response = await fetch(`/api/crm/contacts/${contactId}/emails`, {
+      const response = await fetch(`/api/crm/contacts/${contactId}/emails?page=${page}`, {
         headers: {
           'Authorization': `Bearer ${token}`,
           'Content-Type': 'application/json'
@@ -776,10 +779,47 @@ export default function CRMPage() {
       if (!response.ok) throw new Error('Failed to load emails');
 
       const data = await response.json();
-      setSelectedContactEmails(data.emails);
+      setSelectedContactEmails(prev => (page === 1 ? data.emails : [...prev, ...data.emails]));
+      setEmailsPage({ page: data.page, pages: data.pages, count: data.count });
     } catch (error) {
       console.error('Error loading emails:', error);
-      setSelectedContactEmails([]);
+      if (page === 1) {
+        setSelectedContactEmails([]);
+        setEmailsPage({ page: 0, pages: 0, count: 0 });
+      }
+    }
+  };
+
+  const loadMoreEmails = async () => {
+    if (!selectedContact || emailsPage.page >= emailsPage.pages) return;
+    setLoadingMoreEmails(true);
+    try {
+      await loadContactEmails(selectedContact.id, emailsPage.page + 1);
+    } finally {
+      setLoadingMoreEmails(false);
+    }
+  };
+
+  // Bodies are only returned by the single-email endpoint
+  const openEmail = async (email) => {
+    setSelectedEmail(email);
+    const token = localStorage.getItem('crm_token');
+
+    try {
+      const response = await fetch(`/api/crm/emails/${email.id}`, {
+        headers: {
+          'Authorization': `Bearer ${token}`,
+          'Content-Type': 'application/json'
+        }
+      });
+
+      if (!response.ok) throw new Error('Failed to load email');
+
+      const data = await response.json();
+      setSelectedEmail(current => (current && current.id === email.id ? data.email : current));
+    } catch (error) {
+      console.error('Error loading email:', error);
+      toast.error('Failed to load email');
     }
   };
 
@@ -2319,6 +2359,9 @@ export default function CRMPage() {
           notes={notes}
           tasks={tasks}
           emails={selectedContactEmails}
+          hasMoreEmails={emailsPage.page < emailsPage.pages}
+          loadingMoreEmails={loadingMoreEmails}
+          onLoadMoreEmails={loadMoreEmails}
           editMode={editMode}
           formData={formData}
           setFormData={setFormData}
@@ -2402,7 +2445,9 @@ export default function CRMPage() {
                   </div>
 
                   <div className="border-t border-v3-bg-darker pt-4">
-                    {selectedEmail.body_html ? (
+                    {selectedEmail.body_text === undefined ? (
+                      <p className="text-v3-text-muted">Loading...</p>
+                    ) : selectedEmail.body_html ? (
                       <div
                         className="prose prose-invert max-w-none"
                         dangerouslySetInnerHTML={{ __html: selectedEmail.body_html }}
@@ -2426,7 +2471,7 @@ export default function CRMPage() {
                   selectedContactEmails.map((email) => (
                     <div
                       key={email.id}
-                      onClick={() => setSelectedEmail(email)}
+                      onClick={() => openEmail(email)}
                       className="p-4 bg-v3-bg-card rounded hover:bg-v3-bg-darker cursor-pointer transition-colors"
                     >
                       <div className="flex items-start justify-between gap-4">
@@ -2457,6 +2502,17 @@ export default function CRMPage() {
                     </div>
                   ))
                 )}
+                {emailsPage.page < emailsPage.pages && (
+                  <button
+                    onClick={loadMoreEmails}
+                    disabled={loadingMoreEmails}
+                    className="w-full py-2 text-sm text-v3-brand hover:underline disabled:opacity-50"
+                  >
+                    {loadingMoreEmails
+                      ? 'Loading...'
+                      : `Load more (${selectedContactEmails.length} of ${emailsPage.count})`}
+                  </button>
+                )}
               </div>
             )}
           </div>
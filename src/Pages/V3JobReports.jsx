@@ -137,35 +137,40 @@ const V3JobReports = () => {
       if (submissionData.photos && submissionData.photos.length > 0) {
         toast.info('Uploading photos...', { description: `${submissionData.photos.length} photos found` });
 
-        // Create FormData for photo upload
-        const formData = new FormData();
-        submissionData.photos.forEach((photo) => {
-          formData.append('photos', photo);
-        });
-
-        // Upload photos to S3 (use admin or agent endpoint based on role)
-        const uploadEndpoint = (user?.role === 'admin' || user?.role === 'manager')
-          ? '/admin/v3-reports/upload-photos'
-          : '/agent/v3-reports/upload-photos';
-
-        const API_BASE_URL = import.meta.env.PROD
-          ? 'https://v3-app-49c3d1eff914.herokuapp.com/api'
-          : 'http://localhost:5001/api';
+        // Photos go straight to S3: presign one POST per file, upload, then confirm
+        const photoBase = (user?.role === 'admin' || user?.role === 'manager')
+          ? '/admin/v3-reports'
+          : '/agent/v3-reports';
 
         try {
-          const uploadResponse = await fetch(`${API_BASE_URL}${uploadEndpoint}`, {
+          const { uploads = [], errors } = await apiCall(`${photoBase}/photo-uploads`, {
             method: 'POST',
-            headers: {
-              'Authorization': `Bearer ${localStorage.getItem('token')}`
-            },
-            body: formData
+            body: JSON.stringify({
+              files: submissionData.photos.map((photo) => ({
+                filename: photo.name,
+                content_type: photo.type,
+                size: photo.size
+              }))
+            })
           });
-
-          if (!uploadResponse.ok) {
+          if (errors) console.warn('Photos rejected:', errors);
+
+          const uploaded = await Promise.all(uploads.map(async ({ index, photo_id, upload }) => {
+            const body = new FormData();
+            Object.entries(upload.fields).forEach(([key, value]) => body.append(key, value));
+            body.append('file', submissionData.photos[index]);  // S3 expects the file last
+            const s3Response = await fetch(upload.url, { method: upload.method, body }).catch(() => null);
+            return s3Response?.ok ? photo_id : null;
+          }));
+          const photoIds = uploaded.filter(Boolean);
+          if (photoIds.length === 0) {
             throw new Error('Photo upload failed');
           }
 
-          const uploadData = await uploadResponse.json();
+          const uploadData = await apiCall(`${photoBase}/photo-uploads/complete`, {
+            method: 'POST',
+            body: JSON.stringify({ photo_ids: photoIds })
+          });
           photoUrls = uploadData.photos || [];
 
           toast.success(`${photoUrls.length} photos uploaded successfully`);
@@ -1,10 +1,25 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { 
   Bell, Briefcase, Calendar, DollarSign, AlertTriangle, 
   CheckCircle, X, Eye, EyeOff, Trash2, Filter, Search,
   MessageSquare, Star, Clock, MapPin, RefreshCw, ServerCrash
 } from 'lucide-react';
-import { useAuth } from "../useAuth";
+import { useAuth, API_BASE_URL } from "../useAuth";
+
+// Parse one SSE frame ("id: ..\nevent: ..\ndata: ..") into { id, event, data }
+const parseFrame = (frame) => {
+  const parsed = { id: null, event: 'message', data: '' };
+  frame.split('\n').forEach((line) => {
+    const sep = line.indexOf(':');
+    if (sep <= 0) return;
+    const field = line.slice(0, sep);
+    const value = line.slice(sep + 1).replace(/^ /, '');
+    if (field === 'id') parsed.id = value;
+    else if (field === 'event') parsed.event = value;
+    else if (field === 'data') parsed.data += value;
+  });
+  return parsed;
+};
 
 const AgentNotifications = () => {
   const [notifications, setNotifications] = useState([]);
@@ -13,10 +28,67 @@ const AgentNotifications = () => {
   const [filterType, setFilterType] = useState('all');
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
+  const [serverUnread, setServerUnread] = useState(null);
+  const lastEventId = useRef(null);
   const { apiCall } = useAuth();
 
   useEffect(() => {
-    loadNotifications();
+    const controller = new AbortController();
+    let retryTimer;
+
+    // Live updates: new notifications and the unread count arrive over SSE.
+    // fetch() is used instead of EventSource so the JWT goes in a header.
+    const connect = async () => {
+      try {
+        const headers = { 'Authorization': `Bearer ${localStorage.getItem('token')}` };
+        if (lastEventId.current) headers['Last-Event-ID'] = String(lastEventId.current);
+        const response = await fetch(`${API_BASE_URL}/notifications/stream`, { headers, signal: controller.signal });
+        if (response.status === 503) {
+          // Server is at its stream cap; back off for as long as it asks
+          const wait = Number(response.headers.get('Retry-After')) || 30;
+          retryTimer = setTimeout(connect, (wait + Math.random() * 5) * 1000);
+          return;
+        }
+        if (!response.ok) throw new Error(`Stream failed: ${response.status}`);
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        for (;;) {
+          const { done, value } = await reader.read();
+          if (done) break;
+          buffer += decoder.decode(value, { stream: true });
+          const frames = buffer.split('\n\n');
+          buffer = frames.pop();
+          frames.forEach((frame) => {
+            const { id, event, data } = parseFrame(frame);
+            if (!data) return;
+            if (event === 'notification') {
+              const item = JSON.parse(data);
+              lastEventId.current = Number(id);
+              setNotifications(prev => prev.some(n => n.id === item.id) ? prev : [item, ...prev]);
+            } else if (event === 'unread') {
+              setServerUnread(JSON.parse(data).unread);
+            }
+          });
+        }
+        // The server ends streams periodically; resume straight away
+        retryTimer = setTimeout(connect, 1000);
+      } catch (err) {
+        if (!controller.signal.aborted) retryTimer = setTimeout(connect, 5000);
+      }
+    };
+
+    loadNotifications().then((data) => {
+      if (controller.signal.aborted) return;
+      const ids = (data || []).map(n => n.id).filter(id => typeof id === 'number');
+      if (ids.length) lastEventId.current = Math.max(...ids);
+      connect();
+    });
+
+    return () => {
+      controller.abort();
+      clearTimeout(retryTimer);
+    };
   }, []);
 
   useEffect(() => {
@@ -48,6 +120,7 @@ const AgentNotifications = () => {
       const data = await apiCall('/notifications');
       setNotifications(data);
       setFilteredNotifications(data);
+      return data;
     } catch (error) {
       setError('Failed to load notifications');
       console.error('Notifications error:', error);
@@ -227,7 +300,7 @@ const AgentNotifications = () => {
     }
   };
 
-  const unreadCount = notifications.filter(n => !n.read).length;
+  const unreadCount = serverUnread ?? notifications.filter(n => !n.read).length;
 
   if (loading && notifications.length === 0) {
     return (
@@ -33,6 +33,9 @@ export default function CRMContactModal({
   notes,
   tasks,
   emails,
+  hasMoreEmails,
+  loadingMoreEmails,
+  onLoadMoreEmails,
   editMode,
   formData,
   setFormData,
@@ -519,8 +522,8 @@ export default function CRMContactModal({
                                   <p className="text-xs text-v3-text-muted">
                                     {email.is_sent ? `To: ${email.recipient}` : `From: ${email.sender}`}
                                   </p>
-                                  {email.body_text && (
-                                    <p className="text-xs text-v3-text-light mt-2 line-clamp-2">{email.body_text.substring(0, 150)}...</p>
+                                  {email.preview && (
+                                    <p className="text-xs text-v3-text-light mt-2 line-clamp-2">{email.preview}</p>
                                   )}
                                 </div>
                               </div>
@@ -562,6 +565,15 @@ export default function CRMContactModal({
                         return null;
                       })
                     )}
+                    {hasMoreEmails && (
+                      <button
+                        onClick={onLoadMoreEmails}
+                        disabled={loadingMoreEmails}
+                        className="w-full py-2 text-sm text-v3-accent hover:underline disabled:opacity-50"
+                      >
+                        {loadingMoreEmails ? 'Loading...' : 'Load older emails'}
+                      </button>
+                    )}
                   </div>
                 ) : (
                   /* Files & Documents Tab */
@@ -3,9 +3,14 @@ import logging
 import os
 import time
 from flask import current_app
+from requests.adapters import HTTPAdapter
 
 API_BASE = "https://api.telegram.org"
 
+# One keep-alive pool for every call to the Bot API (reminder batches, webhook replies, alerts)
+_http = requests.Session()
+_http.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=int(os.environ.get("TELEGRAM_HTTP_POOL_SIZE", 8))))
+
 # Cache for bot info (username) - expires after 10 minutes
 _bot_info_cache = {"data": None, "expires": 0}
 
@@ -41,7 +46,7 @@ def send_message(chat_id: str, text: str, parse_mode: str | None = None, message
         payload["message_thread_id"] = message_thread_id
     
     try:
-        r = requests.post(url, json=payload, timeout=timeout)
+        r = _http.post(url, json=payload, timeout=timeout)
         if r.ok:
             data = r.json()
             # Normalize to { ok, result }
@@ -80,7 +85,7 @@ def get_bot_info() -> dict:
     url = f"{API_BASE}/bot{token}/getMe"
     
     try:
-        r = requests.get(url, timeout=10)
+        r = _http.get(url, timeout=10)
         r.raise_for_status()
         result = r.json()
         
@@ -119,7 +124,7 @@ def set_webhook(webhook_url: str,
     payload["drop_pending_updates"] = bool(drop_pending_updates)
     
     try:
-        r = requests.post(url, json=payload, timeout=10)
+        r = _http.post(url, json=payload, timeout=10)
         r.raise_for_status()
         return r.json()
     except requests.RequestException as e:
@@ -143,7 +148,7 @@ def get_webhook_info() -> dict:
     url = f"{API_BASE}/bot{token}/getWebhookInfo"
     
     try:
-        r = requests.get(url, timeout=10)
+        r = _http.get(url, timeout=10)
         r.raise_for_status()
         return r.json()
     except requests.RequestException as e:
@@ -107,9 +107,7 @@ export async function getReliableAgents(limit = 20, apiCall) {
  */
 export async function getAgentsPicker(dateISO, apiCall) {
   try {
-    const params = new URLSearchParams({
-      window_days: '90'
-    })
+    const params = new URLSearchParams()
 
     if (dateISO) {
       params.set('date', dateISO.slice(0, 10)) // Ensure YYYY-MM-DD format
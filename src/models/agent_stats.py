@@ -0,0 +1,48 @@
+from datetime import datetime
+from src.extensions import db
+
+
+class AgentStats(db.Model):
+    """Precomputed per-agent ranking inputs, maintained incrementally.
+
+    Counters are updated in the same flush as the JobAssignment change that caused
+    them (see src/services/agent_ranking.py). The `decayed_*` counters are
+    exponentially time-decayed so recent behaviour dominates without re-scanning
+    the assignments table. Home coordinates are geocoded once per postcode.
+    """
+    __tablename__ = 'agent_stats'
+
+    agent_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+
+    offered_count = db.Column(db.Integer, nullable=False, default=0)
+    accepted_count = db.Column(db.Integer, nullable=False, default=0)
+    declined_count = db.Column(db.Integer, nullable=False, default=0)
+    decayed_offered = db.Column(db.Float, nullable=False, default=0.0)
+    decayed_accepted = db.Column(db.Float, nullable=False, default=0.0)
+    decayed_at = db.Column(db.DateTime, nullable=True)
+    last_offered_at = db.Column(db.DateTime, nullable=True)
+    last_accepted_at = db.Column(db.DateTime, nullable=True)
+
+    # Geocoded home location; geocoded_postcode records which postcode produced it
+    home_latitude = db.Column(db.Float, nullable=True)
+    home_longitude = db.Column(db.Float, nullable=True)
+    geocoded_postcode = db.Column(db.String(10), nullable=True)
+    geocoded_at = db.Column(db.DateTime, nullable=True)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    agent = db.relationship('User', backref=db.backref('stats', uselist=False, passive_deletes=True))
+
+    def to_dict(self):
+        return {
+            'agent_id': self.agent_id,
+            'offered': self.offered_count or 0,
+            'accepted': self.accepted_count or 0,
+            'declined': self.declined_count or 0,
+            'decayed_offered': round(self.decayed_offered or 0.0, 3),
+            'decayed_accepted': round(self.decayed_accepted or 0.0, 3),
+            'last_offered_at': self.last_offered_at.isoformat() if self.last_offered_at else None,
+            'last_accepted_at': self.last_accepted_at.isoformat() if self.last_accepted_at else None,
+            'home_latitude': self.home_latitude,
+            'home_longitude': self.home_longitude,
+        }
@@ -0,0 +1,45 @@
+import json
+import zlib
+from datetime import datetime
+from src.extensions import db
+
+
+class ArchivedRecord(db.Model):
+    """A row moved out of a hot table by src/services/retention.py.
+
+    The row itself is kept as zlib-compressed JSON; the columns alongside it
+    are just enough to find it again (which table, which row, whose, when).
+    """
+    __tablename__ = 'archived_records'
+
+    id = db.Column(db.Integer, primary_key=True)
+    source_table = db.Column(db.String(64), nullable=False)
+    source_id = db.Column(db.Integer, nullable=False)
+    owner_id = db.Column(db.Integer, nullable=True)          # user / agent / contact the row belonged to
+    recorded_at = db.Column(db.DateTime, nullable=False)     # the row's own timestamp
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    payload = db.Column(db.LargeBinary, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('source_table', 'source_id', name='uq_archived_records_source'),
+        db.Index('ix_archived_records_lookup', 'source_table', 'owner_id', 'recorded_at'),
+    )
+
+    @staticmethod
+    def compress(row: dict) -> bytes:
+        return zlib.compress(json.dumps(row, separators=(',', ':')).encode('utf-8'), 6)
+
+    @property
+    def data(self) -> dict:
+        return json.loads(zlib.decompress(self.payload).decode('utf-8'))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'source_table': self.source_table,
+            'source_id': self.source_id,
+            'owner_id': self.owner_id,
+            'recorded_at': self.recorded_at.isoformat() if self.recorded_at else None,
+            'archived_at': self.archived_at.isoformat() if self.archived_at else None,
+            'data': self.data,
+        }
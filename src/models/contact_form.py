@@ -24,6 +24,14 @@ class ContactFormSubmission(db.Model):
     request_id = db.Column(db.String(100), nullable=True, unique=True)
     telegram_sent = db.Column(db.Boolean, default=False, nullable=False)
     email_sent = db.Column(db.Boolean, default=False, nullable=False)
+    team_email_sent = db.Column(db.Boolean, default=False, nullable=False)
+
+    # Intake pipeline (see src/services/contact_intake.py)
+    stage = db.Column(db.String(30), default='saved', nullable=False)  # saved, reply_generated, telegram_sent, email_scheduled, email_sent, failed, legacy
+    due_at = db.Column(db.DateTime, nullable=True, index=True)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.Text, nullable=True)
+    locked_until = db.Column(db.DateTime, nullable=True)
 
     # Admin Management
     status = db.Column(db.String(20), default='pending', nullable=False)  # pending, contacted, resolved, spam
@@ -61,6 +69,11 @@ class ContactFormSubmission(db.Model):
             'request_id': self.request_id,
             'telegram_sent': self.telegram_sent,
             'email_sent': self.email_sent,
+            'team_email_sent': self.team_email_sent,
+            'stage': self.stage,
+            'due_at': self.due_at.isoformat() if self.due_at else None,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
             'status': self.status,
             'assigned_to_user_id': self.assigned_to_user_id,
             'assigned_to_name': assigned_to_name,
@@ -2,9 +2,46 @@
 CRM Email Model - Email tracking for contacts
 """
 
+import re
+import zlib
+from sqlalchemy.types import LargeBinary, TypeDecorator
 from src.extensions import db
 from datetime import datetime
 
+PREVIEW_LENGTH = 200
+
+
+class CompressedText(TypeDecorator):
+    """Text stored zlib-compressed; reads and writes see plain str."""
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return zlib.compress(value.encode('utf-8'), 6)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return zlib.decompress(value).decode('utf-8')
+
+
+def preview_of(text, html=None):
+    """First PREVIEW_LENGTH characters of the plain-text body, falling back to the HTML with tags stripped."""
+    source = text or (re.sub(r'<[^>]+>', ' ', html) if html else '')
+    source = ' '.join(source.split())
+    return source[:PREVIEW_LENGTH] or None
+
+
+class CRMEmailBody(db.Model):
+    """Full body of a CRMEmail, kept apart so listing emails never reads it."""
+    __tablename__ = 'crm_email_bodies'
+
+    email_id = db.Column(db.Integer, db.ForeignKey('crm_emails.id', ondelete='CASCADE'), primary_key=True)
+    text = db.Column(CompressedText)
+    html = db.Column(CompressedText)
+
 
 class CRMEmail(db.Model):
     __tablename__ = 'crm_emails'
@@ -17,8 +54,7 @@ class CRMEmail(db.Model):
     sender = db.Column(db.String(255), nullable=False)
     recipient = db.Column(db.String(255), nullable=False)
     date = db.Column(db.DateTime, nullable=False)
-    body_text = db.Column(db.Text)
-    body_html = db.Column(db.Text)
+    preview = db.Column(db.String(PREVIEW_LENGTH))  # Computed from the body when it is set
     is_sent = db.Column(db.Boolean, default=False, nullable=False)  # True if sent by user, False if received
     synced_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -26,18 +62,45 @@ class CRMEmail(db.Model):
     # Relationships
     contact = db.relationship('CRMContact', backref='emails')
     user = db.relationship('CRMUser', backref='synced_emails')
+    body = db.relationship('CRMEmailBody', uselist=False, cascade='all, delete-orphan', passive_deletes=True)
+
+    # body_text / body_html read and write through the separate body row (loaded on first access)
+    def _set_body(self, **parts):
+        if self.body is None:
+            self.body = CRMEmailBody()
+        for name, value in parts.items():
+            setattr(self.body, name, value)
+        self.preview = preview_of(self.body.text, self.body.html)
+
+    @property
+    def body_text(self):
+        return self.body.text if self.body is not None else None
+
+    @body_text.setter
+    def body_text(self, value):
+        self._set_body(text=value)
+
+    @property
+    def body_html(self):
+        return self.body.html if self.body is not None else None
+
+    @body_html.setter
+    def body_html(self, value):
+        self._set_body(html=value)
 
-    def to_dict(self):
-        return {
+    def to_dict(self, include_body=False):
+        data = {
             'id': self.id,
             'contact_id': self.contact_id,
             'subject': self.subject or '(No Subject)',
             'sender': self.sender,
             'recipient': self.recipient,
             'date': self.date.isoformat() if self.date else None,
-            'body_text': self.body_text,
-            'body_html': self.body_html,
             'is_sent': self.is_sent,
             'synced_at': self.synced_at.isoformat() if self.synced_at else None,
-            'preview': (self.body_text or '')[:200] if self.body_text else '(No content)'
+            'preview': self.preview or '(No content)'
         }
+        if include_body:
+            data['body_text'] = self.body_text
+            data['body_html'] = self.body_html
+        return data
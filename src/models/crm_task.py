@@ -1,5 +1,11 @@
+import os
 from src.extensions import db
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import event, inspect
+
+# Reminders fire this long before a task is due
+REMINDER_LEAD = timedelta(minutes=int(os.environ.get('CRM_TASK_REMINDER_LEAD_MINUTES', 30)))
+OPEN_STATUSES = ('pending', 'snoozed')
 
 class CRMTask(db.Model):
     __tablename__ = 'crm_tasks'
@@ -13,6 +19,8 @@ class CRMTask(db.Model):
     status = db.Column(db.String(20), nullable=False, default='pending')  # pending, completed, snoozed
     completed_at = db.Column(db.DateTime, nullable=True)
     notes = db.Column(db.Text, nullable=True)
+    remind_at = db.Column(db.DateTime, nullable=True, index=True)  # Next reminder; NULL once sent or closed
+    reminded_at = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -36,3 +44,23 @@ class CRMTask(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'is_overdue': self.due_date < datetime.utcnow() if self.status == 'pending' else False
         }
+
+
+@event.listens_for(CRMTask, 'before_insert')
+@event.listens_for(CRMTask, 'before_update')
+def _schedule_reminder(mapper, connection, target):
+    """(Re)arm the reminder when a task is created, rescheduled or reopened; disarm it when closed."""
+    state = inspect(target)
+    if state.persistent and not (state.attrs.due_date.history.has_changes()
+                                 or state.attrs.status.history.has_changes()):
+        return
+    due = target.due_date
+    if due is not None and due.tzinfo is not None:
+        due = due.astimezone(timezone.utc).replace(tzinfo=None)
+    if (target.status or 'pending') in OPEN_STATUSES and due is not None and due > datetime.utcnow():
+        if state.persistent and not state.attrs.due_date.history.has_changes() and target.reminded_at:
+            return  # Status change only (e.g. snoozed -> pending): already reminded for this due date
+        target.remind_at = due - REMINDER_LEAD
+        target.reminded_at = None
+    else:
+        target.remind_at = None
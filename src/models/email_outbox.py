@@ -0,0 +1,36 @@
+from datetime import datetime
+from src.extensions import db
+
+
+class OutboxEmail(db.Model):
+    """A rendered email waiting to be (or already) delivered by src/services/mailer.py."""
+    __tablename__ = 'email_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    category = db.Column(db.String(50), nullable=True)               # invoice, password_reset, ...
+    sender = db.Column(db.String(255), nullable=False)
+    recipients = db.Column(db.Text, nullable=False)                  # JSON list, includes Cc/Bcc
+    subject = db.Column(db.String(255), nullable=True)
+    message = db.Column(db.Text, nullable=False)                     # RFC 5322 text, Bcc stripped
+
+    status = db.Column(db.String(20), default='queued', nullable=False, index=True)  # queued, sent, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.Text, nullable=True)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    locked_until = db.Column(db.DateTime, nullable=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'category': self.category,
+            'subject': self.subject,
+            'status': self.status,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None,
+        }
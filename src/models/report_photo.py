@@ -0,0 +1,50 @@
+from datetime import datetime
+from src.extensions import db
+
+
+class ReportPhoto(db.Model):
+    """A V3 report photo uploaded straight to S3, and its web-sized thumbnail."""
+    __tablename__ = 'report_photos'
+
+    id = db.Column(db.Integer, primary_key=True)
+    owner_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    file_key = db.Column(db.String(500), unique=True, nullable=False)
+    original_filename = db.Column(db.String(255), nullable=True)
+    content_type = db.Column(db.String(100), nullable=True)
+    size = db.Column(db.Integer, nullable=True)
+
+    # pending (upload URL issued) -> uploaded (object confirmed) -> ready (thumbnail stored) or failed
+    status = db.Column(db.String(20), default='pending', nullable=False, index=True)
+    thumbnail_key = db.Column(db.String(500), nullable=True)
+    width = db.Column(db.Integer, nullable=True)
+    height = db.Column(db.Integer, nullable=True)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.Text, nullable=True)
+    due_at = db.Column(db.DateTime, nullable=True)
+    locked_until = db.Column(db.DateTime, nullable=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    uploaded_at = db.Column(db.DateTime, nullable=True)
+
+    def to_photo_entry(self):
+        """The dict stored in V3JobReport.photo_urls."""
+        return {
+            'url': self.file_key,
+            'filename': self.original_filename,
+            'upload_date': (self.uploaded_at or self.created_at).isoformat(),
+            'photo_id': self.id,
+        }
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'file_key': self.file_key,
+            'filename': self.original_filename,
+            'status': self.status,
+            'thumbnail_key': self.thumbnail_key,
+            'width': self.width,
+            'height': self.height,
+            'size': self.size,
+            'last_error': self.last_error,
+            'uploaded_at': self.uploaded_at.isoformat() if self.uploaded_at else None,
+        }
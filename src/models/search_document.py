@@ -0,0 +1,82 @@
+from datetime import datetime
+from sqlalchemy import DDL, event
+from src.extensions import db
+
+
+class SearchDocument(db.Model):
+    """One searchable row (job, police interaction, CRM contact), kept by src/services/search.py.
+
+    `body` is the free text; `keys` holds compacted identifiers (postcodes,
+    references, phone numbers) so "SW1A1" finds "SW1A 1AA". The full-text
+    index over them is dialect specific and lives outside the ORM, see
+    FULL_TEXT_DDL below.
+    """
+    __tablename__ = 'search_documents'
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(32), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    owner_id = db.Column(db.Integer, nullable=True)      # CRM owner, for per-user scoping
+    status = db.Column(db.String(20), nullable=True)
+    title = db.Column(db.String(255), nullable=True)
+    subtitle = db.Column(db.String(255), nullable=True)
+    body = db.Column(db.Text, nullable=False, default='')
+    keys = db.Column(db.String(255), nullable=False, default='')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('entity', 'entity_id', name='uq_search_documents_entity'),
+        db.Index('ix_search_documents_entity_owner', 'entity', 'owner_id'),
+    )
+
+    def to_dict(self):
+        return {
+            'type': self.entity,
+            'id': self.entity_id,
+            'title': self.title,
+            'subtitle': self.subtitle,
+            'status': self.status,
+        }
+
+
+ENTITIES = ('job', 'police_interaction', 'crm_contact')
+
+
+def _sqlite_ddl(entity):
+    """An external-content FTS5 table per entity, so one entity's matches never crowd out another's."""
+    fts = f"search_fts_{entity}"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"body, keys, content='search_documents', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON search_documents WHEN new.entity = '{entity}' BEGIN "
+        f"INSERT INTO {fts}(rowid, body, keys) VALUES (new.id, new.body, new.keys); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON search_documents WHEN old.entity = '{entity}' BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, body, keys) VALUES ('delete', old.id, old.body, old.keys); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON search_documents WHEN old.entity = '{entity}' BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, body, keys) VALUES ('delete', old.id, old.body, old.keys); "
+        f"INSERT INTO {fts}(rowid, body, keys) VALUES (new.id, new.body, new.keys); END",
+    ]
+
+
+# SQLite: FTS5 tables kept in step by triggers.
+# Postgres: a generated tsvector with a GIN index, plus pg_trgm on `keys` for prefix/substring matches.
+FULL_TEXT_DDL = {
+    'sqlite': [statement for entity in ENTITIES for statement in _sqlite_ddl(entity)],
+    'postgresql': [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "ALTER TABLE search_documents ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('simple', coalesce(keys, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(body, '')), 'B')) STORED",
+        "CREATE INDEX IF NOT EXISTS ix_search_documents_vector ON search_documents USING gin (search_vector)",
+        "CREATE INDEX IF NOT EXISTS ix_search_documents_keys_trgm ON search_documents USING gin (keys gin_trgm_ops)",
+    ],
+}
+DROP_DDL = {'sqlite': [f"DROP TABLE IF EXISTS search_fts_{entity}" for entity in ENTITIES]}
+
+for _dialect, _statements in FULL_TEXT_DDL.items():
+    for _statement in _statements:
+        event.listen(SearchDocument.__table__, 'after_create', DDL(_statement).execute_if(dialect=_dialect))
+for _dialect, _statements in DROP_DDL.items():
+    for _statement in _statements:
+        event.listen(SearchDocument.__table__, 'before_drop', DDL(_statement).execute_if(dialect=_dialect))
@@ -0,0 +1,26 @@
+from datetime import datetime
+from src.extensions import db
+
+
+class TelegramUpdate(db.Model):
+    """A raw Telegram webhook update, stored on receipt and handled by src/services/telegram_updates.py."""
+    __tablename__ = 'telegram_updates'
+
+    # Telegram's own update_id: a redelivered update collides here and is dropped
+    update_id = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    chat_id = db.Column(db.String(32), nullable=True)
+    payload = db.Column(db.Text, nullable=False)
+
+    # pending -> done, or failed after MAX_ATTEMPTS
+    status = db.Column(db.String(20), default='pending', nullable=False, index=True)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.Text, nullable=True)
+    due_at = db.Column(db.DateTime, nullable=True)
+    locked_until = db.Column(db.DateTime, nullable=True)
+
+    received_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    processed_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_telegram_updates_chat_status', 'chat_id', 'status', 'update_id'),
+    )
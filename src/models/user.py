@@ -1,4 +1,7 @@
 from src.extensions import db
+from sqlalchemy import case, event, func, inspect
+from sqlalchemy.orm import Session
+from src.utils.geo import geohash_encode, parse_lat_lng
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
 
@@ -32,10 +35,12 @@ class User(db.Model):
     current_invoice_number = db.Column(db.Integer, nullable=True, default=0)  # New flexible numbering system
     
     # Telegram integration fields
-    telegram_chat_id = db.Column(db.String(32), nullable=True)
+    telegram_chat_id = db.Column(db.String(32), nullable=True, index=True)
     telegram_username = db.Column(db.String(64), nullable=True)
     telegram_opt_in = db.Column(db.Boolean, default=False)
-    telegram_link_code = db.Column('telegram_link_token', db.String(16), nullable=True)
+    telegram_link_code = db.Column('telegram_link_token', db.String(16), nullable=True, index=True)
+    # Maintained by _maintain_unread_counters so the badge never needs a COUNT(*)
+    unread_notifications = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     assignments = db.relationship('JobAssignment', back_populates='agent', lazy=True)
     availability = db.relationship('AgentAvailability', back_populates='agent', lazy=True, cascade="all, delete-orphan")
@@ -80,6 +85,10 @@ class User(db.Model):
 
 class Job(db.Model):
     __tablename__ = 'jobs'
+    __table_args__ = (
+        # Job pickers list open work newest first
+        db.Index('ix_jobs_status_created_at', 'status', 'created_at'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=True)
     job_type = db.Column(db.String(50), nullable=False)
@@ -91,6 +100,8 @@ class Job(db.Model):
     instructions = db.Column(db.Text)
     urgency_level = db.Column(db.String(20), default='Standard')
     status = db.Column(db.String(20), default='open')
+    # Accepted assignments; only changed through src/services/slot_allocation.py
+    slots_filled = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     created_by = db.Column(db.Integer, db.ForeignKey('users.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -102,6 +113,10 @@ class Job(db.Model):
     location_lat = db.Column(db.String(20))
     location_lng = db.Column(db.String(20)) 
     maps_link = db.Column(db.String(500))
+    # Numeric copies of location_lat/location_lng for proximity queries (kept in sync on save)
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+    geohash = db.Column(db.String(12), nullable=True, index=True)
 
     assignments = db.relationship('JobAssignment', back_populates='job', cascade="all, delete-orphan")
     invoice_jobs = db.relationship('InvoiceJob', back_populates='job', cascade="all, delete-orphan")
@@ -237,14 +252,31 @@ class Job(db.Model):
             'weather': weather_info
         }
 
+@event.listens_for(Job, 'before_insert')
+@event.listens_for(Job, 'before_update')
+def _sync_job_coordinates(mapper, connection, target):
+    """Derive numeric coordinates and geohash from the string location fields."""
+    lat, lng = parse_lat_lng(target.location_lat, target.location_lng)
+    target.latitude, target.longitude = lat, lng
+    target.geohash = geohash_encode(lat, lng) if lat is not None else None
+
 class JobAssignment(db.Model):
     __tablename__ = 'job_assignments'
+    __table_args__ = (
+        # Uninvoiced-work lookups (agent invoice picker, supplier pending list)
+        db.Index('ix_job_assignments_agent_invoice_state', 'agent_id', 'invoice_state'),
+        db.Index('ix_job_assignments_supplier_invoice_state', 'supplied_by_email', 'invoice_state'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     job_id = db.Column(db.Integer, db.ForeignKey('jobs.id'), nullable=False)
     agent_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     status = db.Column(db.String(20), default='pending')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     response_time = db.Column(db.DateTime)
+    supplied_by_email = db.Column(db.String(255), nullable=True)
+    supplier_headcount = db.Column(db.Integer, nullable=True)
+    # 'uninvoiced' (accepted, not yet billed), 'invoiced', or NULL; kept by src.services.invoice_ledger
+    invoice_state = db.Column(db.String(16), nullable=True)
 
     job = db.relationship('Job', back_populates='assignments')
     agent = db.relationship('User', back_populates='assignments')
@@ -318,6 +350,10 @@ class Notification(db.Model):
     job_id = db.Column(db.Integer, db.ForeignKey('jobs.id'))
     user = db.relationship('User', back_populates='notifications')
 
+    __table_args__ = (
+        db.Index('ix_notifications_user_sent_at', 'user_id', 'sent_at'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -330,6 +366,53 @@ class Notification(db.Model):
             'job_id': self.job_id
         }
 
+@event.listens_for(Session, 'after_flush')
+def _maintain_unread_counters(session, flush_context):
+    """Keep users.unread_notifications in step with ORM inserts, reads and deletes.
+
+    Bulk query.update()/delete() on notifications bypass this and must adjust
+    the counter themselves (see delete_notifications).
+    """
+    deltas = {}
+    for obj in session.new:
+        if isinstance(obj, Notification) and not obj.is_read:
+            deltas[obj.user_id] = deltas.get(obj.user_id, 0) + 1
+    for obj in session.dirty:
+        if isinstance(obj, Notification):
+            history = inspect(obj).attrs.is_read.history
+            if history.deleted and bool(history.deleted[0]) != bool(obj.is_read):
+                deltas[obj.user_id] = deltas.get(obj.user_id, 0) + (-1 if obj.is_read else 1)
+    for obj in session.deleted:
+        if isinstance(obj, Notification) and not obj.is_read:
+            deltas[obj.user_id] = deltas.get(obj.user_id, 0) - 1
+
+    if deltas:
+        adjust_unread_counters(session.connection(), deltas)
+
+def delete_notifications(*criteria):
+    """Bulk-delete the notifications matching `criteria`, taking their unread ones off the counters."""
+    unread = (
+        db.session.query(Notification.user_id, func.count(Notification.id))
+        .filter(*criteria, Notification.is_read.isnot(True))
+        .group_by(Notification.user_id)
+        .all()
+    )
+    adjust_unread_counters(db.session.connection(), {user_id: -count for user_id, count in unread})
+    return Notification.query.filter(*criteria).delete(synchronize_session=False)
+
+def adjust_unread_counters(connection, deltas):
+    """Apply {user_id: delta} to users.unread_notifications, one UPDATE per distinct delta."""
+    by_delta = {}
+    for user_id, delta in deltas.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(user_id)
+    users = User.__table__
+    for delta, user_ids in by_delta.items():
+        counter = users.c.unread_notifications + delta
+        connection.execute(
+            users.update().where(users.c.id.in_(user_ids))
+            .values(unread_notifications=case((counter < 0, 0), else_=counter)))
+
 class Invoice(db.Model):
     __tablename__ = 'invoices'
     id = db.Column(db.Integer, primary_key=True)
@@ -345,6 +428,15 @@ class Invoice(db.Model):
     # Snapshotted job details for PDF generation
     job_type = db.Column(db.String(50), nullable=True)
     address = db.Column(db.String(200), nullable=True)
+
+    # Background finalisation (see src/services/invoice_finalisation.py); NULL for invoices created elsewhere
+    finalisation_status = db.Column(db.String(20), nullable=True, index=True)  # pending, uploaded, emailed, complete, failed
+    finalisation_payload = db.Column(db.Text, nullable=True)  # PDF line items as JSON
+    finalisation_attempts = db.Column(db.Integer, default=0, nullable=False)
+    finalisation_error = db.Column(db.Text, nullable=True)
+    finalisation_due_at = db.Column(db.DateTime, nullable=True)
+    finalisation_locked_until = db.Column(db.DateTime, nullable=True)
+    pdf_file_key = db.Column(db.String(500), nullable=True)
     
     # Unique constraint will be added by migration script
     
@@ -376,6 +468,7 @@ class Invoice(db.Model):
             'supplier_id': getattr(self, 'supplier_id', None),
             'vat_rate': float(self.vat_rate) if getattr(self, 'vat_rate', None) is not None else None,
             'lines': lines_dict,
+            'finalisation_status': getattr(self, 'finalisation_status', None),
             # Multi-day totals
             'total_hours': total_hours,
             'calculated_total': calculated_total
@@ -492,6 +585,10 @@ class FCMToken(db.Model):
     Allows multiple tokens per user (mobile app, web browser, etc.)
     """
     __tablename__ = 'fcm_tokens'
+    __table_args__ = (
+        # Fan-out looks up the live devices of a set of users
+        db.Index('ix_fcm_tokens_user_active', 'user_id', 'is_active'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -1,5 +1,7 @@
 from src.extensions import db
 from datetime import datetime
+from sqlalchemy import event
+from src.utils.geo import geohash_encode, parse_lat_lng
 
 class VehicleSighting(db.Model):
     __tablename__ = 'vehicle_sightings'
@@ -10,8 +12,9 @@ class VehicleSighting(db.Model):
     sighted_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     address_seen = db.Column(db.String(255), nullable=False)
-    # latitude = db.Column(db.Float, nullable=True)  # TODO: Add back after proper migration
-    # longitude = db.Column(db.Float, nullable=True)  # TODO: Add back after proper migration
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+    geohash = db.Column(db.String(12), nullable=True, index=True)
     agent_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
 
     # This relationship connects back to the User model
@@ -25,7 +28,16 @@ class VehicleSighting(db.Model):
             'is_dangerous': self.is_dangerous,
             'sighted_at': self.sighted_at.isoformat(),
             'agent_name': f"{self.agent.first_name} {self.agent.last_name}" if self.agent else "Unknown",
-            'address_seen': self.address_seen
-            # 'latitude': self.latitude,  # TODO: Add back after proper migration
-            # 'longitude': self.longitude  # TODO: Add back after proper migration
-        }
\ No newline at end of file
+            'address_seen': self.address_seen,
+            'latitude': self.latitude,
+            'longitude': self.longitude
+        }
+
+
+@event.listens_for(VehicleSighting, 'before_insert')
+@event.listens_for(VehicleSighting, 'before_update')
+def _sync_sighting_geohash(mapper, connection, target):
+    """Keep the geohash index column in step with the coordinates."""
+    lat, lng = parse_lat_lng(target.latitude, target.longitude)
+    target.latitude, target.longitude = lat, lng
+    target.geohash = geohash_encode(lat, lng) if lat is not None else None
\ No newline at end of file
@@ -0,0 +1,17 @@
+from datetime import datetime
+from src.extensions import db
+
+
+class WeatherCacheEntry(db.Model):
+    """Persisted weather/geocode responses keyed by grid cell (see src/services/weather.py)."""
+    __tablename__ = 'weather_cache'
+    __table_args__ = (
+        db.UniqueConstraint('kind', 'cell_key', name='uq_weather_cache_kind_cell'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)       # current / forecast / geocode
+    cell_key = db.Column(db.String(64), nullable=False)   # grid cell or normalised postcode
+    payload = db.Column(db.Text, nullable=False)          # upstream JSON
+    fetched_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
@@ -1,15 +1,18 @@
 # src/routes/admin.py
 from flask import Blueprint, jsonify, request, current_app, send_file
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from src.models.user import User, Job, JobAssignment, AgentAvailability, Invoice, InvoiceJob, InvoiceLine, Notification, JobBilling, Expense, db
+from src.models.user import User, Job, JobAssignment, AgentAvailability, Invoice, InvoiceJob, InvoiceLine, Notification, JobBilling, Expense, db, delete_notifications
 from src.models.admin_message import AdminMessage, AdminMessageDelivery
-from src.utils.s3_client import s3_client
+from src.utils.s3_client import s3_client, invoice_file_key
 from src.utils.finance import (
     update_job_hours, calculate_job_revenue, calculate_expense_vat,
     get_job_expense_totals, get_job_agent_invoice_totals, calculate_job_profit,
     lock_job_revenue_snapshot, get_financial_summary
 )
 from src.utils.dbcheck import full_health_check
+from src.utils import perf
+from src.services.agent_ranking import delete_assignments, rank_agents_for_job, rebuild_agent_stats, top_reliable_agents
+from src.services import invoice_ledger, report_photos, retention
 from datetime import datetime, date, timedelta
 import requests
 import json
@@ -152,12 +155,23 @@ def get_agents_available():
 @admin_bp.route('/agents/reliability', methods=['GET'])
 @jwt_required()
 def get_agents_reliability():
-    """Get most reliable agents based on job acceptance rate."""
+    """Get most reliable agents based on job acceptance rate.
+
+    Without start/end the ranking comes from the precomputed all-time stats,
+    ordered by the time-decayed reliability score; pass a range for exact
+    counts over that window.
+    """
     try:
         user = require_admin()
         if not user:
             return jsonify({'error': 'Forbidden'}), 403
-        # Default to last 90 days
+        limit = int(request.args.get('limit', 20))
+
+        # Default view reads the incrementally maintained stats instead of re-aggregating
+        if not request.args.get('start') and not request.args.get('end'):
+            return jsonify({'agents': top_reliable_agents(limit)})
+
+        # Explicit date range: exact counts over the window
         end_date = date.today()
         start_date = end_date - timedelta(days=90)
 
@@ -167,8 +181,6 @@ def get_agents_reliability():
         if request.args.get('end'):
             end_date = _parse_date_param(request.args.get('end'))
 
-        limit = int(request.args.get('limit', 20))
-
         # Count job assignments (accepted) per agent in date range
         accepted_subq = (
             db.session.query(
@@ -243,7 +255,8 @@ def get_agents_reliability():
 def agents_picker():
     """
     Aggregator endpoint that returns all, available, and reliable agents in one call.
-    Always returns 200 with stable JSON structure.
+    Always returns 200 with stable JSON structure. `reliable` is ranked by the
+    precomputed, time-decayed stats (see get_agents_reliability for windowed counts).
     """
     try:
         user = require_admin()
@@ -251,10 +264,8 @@ def agents_picker():
             return jsonify({'error': 'Forbidden'}), 403
 
         date_s = request.args.get('date')  # optional
-        win_s = request.args.get('window_days', '90')
-        window_days = int(win_s) if win_s.isdigit() else 90
 
-        current_app.logger.info(f"agents_picker called with date={date_s}, window_days={window_days}")
+        current_app.logger.info(f"agents_picker called with date={date_s}")
 
         # Helper function to format agent data
         def row_agent(a):
@@ -298,84 +309,78 @@ def agents_picker():
             except Exception as e:
                 current_app.logger.warning(f"picker available parse error: {e}")
 
-        # --- RELIABLE AGENTS (based on acceptance rate) ---
+        # --- RELIABLE AGENTS (precomputed, time-decayed acceptance stats) ---
         reliable = []
         try:
-            end_d = date.today()
-            start_d = end_d - timedelta(days=window_days)
-
-            # Count total assignments offered per agent in window
-            offered_subq = (
-                db.session.query(
-                    JobAssignment.agent_id,
-                    db.func.count().label('offered')
-                )
-                .filter(JobAssignment.created_at.between(start_d, end_d))
-                .group_by(JobAssignment.agent_id)
-                .subquery()
-            )
-
-            # Count accepted assignments per agent in window
-            accepted_subq = (
-                db.session.query(
-                    JobAssignment.agent_id,
-                    db.func.count().label('accepted')
-                )
-                .filter(
-                    JobAssignment.status == 'accepted',
-                    JobAssignment.created_at.between(start_d, end_d)
-                )
-                .group_by(JobAssignment.agent_id)
-                .subquery()
-            )
-
-            # Join with User table to get agent details
-            q = (
-                db.session.query(
-                    User.id,
-                    User.first_name,
-                    User.last_name,
-                    User.email,
-                    db.func.coalesce(accepted_subq.c.accepted, 0).label('accepted'),
-                    db.func.coalesce(offered_subq.c.offered, 0).label('offered')
-                )
-                .filter(User.role == 'agent')
-                .outerjoin(offered_subq, offered_subq.c.agent_id == User.id)
-                .outerjoin(accepted_subq, accepted_subq.c.agent_id == User.id)
-            )
-
-            rows = q.all()
-            reliable_data = []
-            for id_, first_name, last_name, email, acc, off in rows:
-                display_name = f"{first_name or ''} {last_name or ''}".strip() or email
-                rate = float(acc) / float(off) if off > 0 else (1.0 if acc > 0 else 0.0)
-                reliable_data.append({
-                    "id": id_,
-                    "display_name": display_name,
-                    "accepted": int(acc),
-                    "offered": int(off),
-                    "accept_rate": rate
-                })
-
-            # Sort by accept_rate desc, then by accepted count desc
-            reliable_data.sort(key=lambda r: (r["accept_rate"], r["accepted"]), reverse=True)
-            reliable = reliable_data
-
+            reliable = [
+                {k: r[k] for k in ('id', 'display_name', 'accepted', 'offered', 'accept_rate', 'reliability')}
+                for r in top_reliable_agents()
+            ]
         except Exception as e:
             current_app.logger.warning(f"picker reliable error: {e}")
             reliable = []
 
+        # --- RANKED FOR A JOB (distance + availability + reliability) ---
+        ranked = []
+        job_id = request.args.get('job_id', type=int)
+        if job_id:
+            try:
+                job = Job.query.get(job_id)
+                if job:
+                    ranked = rank_agents_for_job(job, k=request.args.get('k', 20, type=int))
+            except Exception as e:
+                current_app.logger.warning(f"picker ranked error: {e}")
+                ranked = []
+
         current_app.logger.info(f"picker counts all={len(all_agents)} avail={len(available)} rel={len(reliable)}")
 
         return jsonify({
             "all": all_agents,
             "available": available,
-            "reliable": reliable
+            "reliable": reliable,
+            "ranked": ranked
         })
 
     except Exception as e:
         current_app.logger.exception(f"agents_picker fatal: {e}")
-        return jsonify({"all": [], "available": [], "reliable": []})
+        return jsonify({"all": [], "available": [], "reliable": [], "ranked": []})
+
+
+@admin_bp.route('/admin/jobs/<int:job_id>/ranked-agents', methods=['GET'])
+@jwt_required()
+def get_ranked_agents_for_job(job_id):
+    """Top-k agents for a job by distance, availability and reliability."""
+    user = require_admin()
+    if not user:
+        return jsonify({'error': 'Forbidden'}), 403
+    job = Job.query.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+
+    k = max(1, min(request.args.get('k', 20, type=int), 200))
+    include_unavailable = str(request.args.get('include_unavailable', 'false')).lower() in ('1', 'true', 'yes')
+    try:
+        ranked = rank_agents_for_job(job, k=k, include_unavailable=include_unavailable)
+        return jsonify({'job_id': job.id, 'agents': ranked})
+    except Exception as e:
+        current_app.logger.exception(f"ranked agents failed for job {job_id}: {e}")
+        return jsonify({'job_id': job.id, 'agents': []})
+
+
+@admin_bp.route('/admin/agents/stats/rebuild', methods=['POST'])
+@jwt_required()
+def rebuild_agents_stats():
+    """Recompute agent reliability stats from job assignments (backfill/repair)."""
+    user = require_admin()
+    if not user:
+        return jsonify({'error': 'Forbidden'}), 403
+    try:
+        count = rebuild_agent_stats()
+        return jsonify({'success': True, 'agents': count})
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception(f"rebuild agent stats failed: {e}")
+        return jsonify({'error': 'Failed to rebuild agent stats'}), 500
 
 
 @admin_bp.route('/admin/telegram/messages', methods=['POST'])
@@ -513,6 +518,82 @@ def admin_db_health_check():
         }), 500
 
 
+@admin_bp.route('/admin/perf', methods=['GET'])
+@jwt_required()
+def get_perf_stats():
+    """Per-endpoint query counts, SQL/HTTP time and N+1 suspects for this worker.
+
+    Query params: sort=total_ms|queries|n_plus_one, limit (default 50), reset=true
+    """
+    user = require_admin()
+    if not user:
+        return jsonify({'error': 'Forbidden'}), 403
+
+    sort = request.args.get('sort', 'total_ms')
+    limit = request.args.get('limit', 50, type=int)
+    endpoints = perf.registry.snapshot(sort=sort)[:max(limit, 1)]
+    result = {
+        'since': datetime.utcfromtimestamp(perf.registry.since).isoformat(),
+        'n_plus_one_threshold': perf.N_PLUS_ONE_THRESHOLD,
+        'endpoints': endpoints,
+    }
+    if request.args.get('reset', '').lower() in ('1', 'true', 'yes'):
+        perf.registry.reset()
+    return jsonify(result), 200
+
+
+@admin_bp.route('/admin/retention', methods=['GET'])
+@jwt_required()
+def get_retention_status():
+    """Retention policies and the outcome of the last archival run."""
+    user = require_admin()
+    if not user:
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify(retention.status()), 200
+
+
+@admin_bp.route('/admin/retention/run', methods=['POST'])
+@jwt_required()
+def run_retention():
+    """Run archival now. Body: {"tables": [...], "max_seconds": 30} (both optional)."""
+    user = require_admin()
+    if not user:
+        return jsonify({'error': 'Forbidden'}), 403
+    data = request.get_json(silent=True) or {}
+    tables = data.get('tables') or None
+    unknown = [t for t in tables or [] if t not in retention.POLICIES]
+    if unknown:
+        return jsonify({'error': f"Unknown tables: {', '.join(unknown)}"}), 400
+    max_seconds = min(float(data.get('max_seconds', 30)), retention.MAX_SECONDS)
+    return jsonify(retention.run(tables=tables, max_seconds=max_seconds)), 200
+
+
+@admin_bp.route('/admin/archive/<table>', methods=['GET'])
+@jwt_required()
+def search_archive(table):
+    """Archived rows of one table, newest first.
+
+    Query params: owner_id, source_id, start/end (YYYY-MM-DD), page, per_page (max 200)
+    """
+    user = require_admin()
+    if not user:
+        return jsonify({'error': 'Forbidden'}), 403
+    if table not in retention.POLICIES:
+        return jsonify({'error': 'Unknown archive table'}), 404
+    start = _parse_date_param(request.args.get('start'))
+    end = _parse_date_param(request.args.get('end'))
+    result = retention.search_archive(
+        table,
+        owner_id=request.args.get('owner_id', type=int),
+        source_id=request.args.get('source_id', type=int),
+        since=datetime.combine(start, datetime.min.time()) if start else None,
+        until=datetime.combine(end + timedelta(days=1), datetime.min.time()) if end else None,
+        page=max(request.args.get('page', 1, type=int), 1),
+        per_page=min(max(request.args.get('per_page', 50, type=int), 1), 200),
+    )
+    return jsonify(result), 200
+
+
 def _daterange_from_period(period, ref_date=None):
     today = ref_date or date.today()
     if period == 'this_month':
@@ -903,7 +984,8 @@ def get_invoice_pdf_admin(invoice_id):
         s3_result = s3_client.generate_invoice_download_url(
             agent_id=invoice.agent_id,
             invoice_number=invoice.invoice_number,
-            expiration=3600
+            expiration=3600,
+            file_key=invoice_file_key(invoice)
         )
         
         if not s3_result.get('success'):
@@ -1596,7 +1678,8 @@ def download_invoice_admin(invoice_id):
         s3_result = s3_client.generate_invoice_download_url(
             agent_id=invoice.agent_id,
             invoice_number=invoice.invoice_number,
-            expiration=3600
+            expiration=3600,
+            file_key=invoice_file_key(invoice)
         )
         
         if not s3_result.get('success'):
@@ -1690,7 +1773,7 @@ def create_invoice_batch_download():
         for inv in invoices:
             if inv.status == 'draft':
                 continue  # skip drafts
-            file_keys.append(f"invoices/{inv.agent_id}/{inv.invoice_number}.pdf")
+            file_keys.append(invoice_file_key(inv))
         
         if not file_keys:
             return jsonify({'error': 'No invoice PDFs available for batch download'}), 404
@@ -1732,8 +1815,9 @@ def admin_delete_invoice(invoice_id):
             return jsonify({'error': 'Invoice not found'}), 404
 
         # Delete invoice job links first
-        InvoiceJob.query.filter_by(invoice_id=invoice.id).delete()
-        db.session.delete(invoice)
+        with invoice_ledger.updating([invoice.id]):
+            InvoiceJob.query.filter_by(invoice_id=invoice.id).delete()
+            db.session.delete(invoice)
         db.session.commit()
         return jsonify({'message': 'Invoice deleted'}), 200
     except Exception as e:
@@ -1757,8 +1841,8 @@ def admin_delete_job(job_id):
             return jsonify({'error': 'Job not found'}), 404
 
         # Delete assignments, notifications, and invoice links
-        JobAssignment.query.filter_by(job_id=job_id).delete()
-        Notification.query.filter_by(job_id=job_id).delete()
+        delete_assignments(JobAssignment.job_id == job_id)
+        delete_notifications(Notification.job_id == job_id)
         InvoiceJob.query.filter_by(job_id=job_id).delete()
         db.session.delete(job)
         db.session.commit()
@@ -2599,7 +2683,8 @@ def get_invoices_for_job(job_id):
                     s3_result = s3_client.generate_invoice_download_url(
                         agent_id=inv.agent_id,
                         invoice_number=inv.invoice_number,
-                        expiration=3600
+                        expiration=3600,
+                        file_key=invoice_file_key(inv)
                     )
                     if s3_result.get('success') and s3_result.get('download_url'):
                         invoice_dict['pdf_url'] = s3_result['download_url']
@@ -3087,6 +3172,7 @@ def admin_upload_v3_report_photos():
             if upload_result.get('success'):
                 file_key = upload_result.get('file_key')
                 if file_key:
+                    report_photos.register_uploaded(user.id, upload_result)
                     photo_urls.append({
                         'url': file_key,
                         'filename': upload_result.get('original_filename'),
@@ -3109,6 +3195,72 @@ def admin_upload_v3_report_photos():
         return jsonify({'error': 'Failed to upload photos', 'details': str(e)}), 500
 
 
+@admin_bp.route('/admin/v3-reports/photo-uploads', methods=['POST'])
+@jwt_required()
+def admin_create_v3_report_photo_uploads():
+    """
+    Admin endpoint: start direct-to-S3 photo uploads for a V3 report.
+    Same flow as /agent/v3-reports/photo-uploads.
+    """
+    try:
+        user = User.query.get(int(get_jwt_identity()))
+        if not user or user.role not in ['admin', 'manager']:
+            return jsonify({'error': 'Access denied. Admin role required.'}), 403
+
+        if not s3_client.is_configured():
+            return jsonify({
+                'error': 'File upload service not available',
+                'details': 'S3 storage not configured'
+            }), 503
+
+        files = (request.get_json(silent=True) or {}).get('files')
+        if not files or not isinstance(files, list):
+            return jsonify({'error': 'No photos provided'}), 400
+
+        uploads, errors = report_photos.create_uploads(user.id, files)
+        if not uploads:
+            return jsonify({'error': 'No valid photos to upload', 'details': errors}), 400
+
+        return jsonify({'uploads': uploads, 'errors': errors or None}), 201
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Admin photo upload start error: {str(e)}")
+        return jsonify({'error': 'Failed to start photo uploads'}), 500
+
+
+@admin_bp.route('/admin/v3-reports/photo-uploads/complete', methods=['POST'])
+@jwt_required()
+def admin_complete_v3_report_photo_uploads():
+    """
+    Admin endpoint: register photos uploaded directly to S3.
+    Same flow as /agent/v3-reports/photo-uploads/complete.
+    """
+    try:
+        user = User.query.get(int(get_jwt_identity()))
+        if not user or user.role not in ['admin', 'manager']:
+            return jsonify({'error': 'Access denied. Admin role required.'}), 403
+
+        photo_ids = (request.get_json(silent=True) or {}).get('photo_ids') or []
+        if not photo_ids:
+            return jsonify({'error': 'No photos provided'}), 400
+
+        photos, errors = report_photos.complete_uploads(user.id, photo_ids)
+        if not photos:
+            return jsonify({'error': 'No uploads were received', 'details': errors}), 400
+
+        return jsonify({
+            'message': f'{len(photos)} photo(s) uploaded successfully',
+            'photos': photos,
+            'errors': errors or None
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Admin photo upload completion error: {str(e)}")
+        return jsonify({'error': 'Failed to register photos'}), 500
+
+
 @admin_bp.route('/admin/v3-reports/submit', methods=['POST'])
 @jwt_required()
 def admin_submit_v3_report():
@@ -3207,26 +3359,22 @@ def get_job_v3_reports(job_id):
 
 			# Convert S3 keys to signed URLs
 			if report_dict.get('photo_urls'):
-				current_app.logger.info(f"📸 Raw photo_urls from DB: {report_dict['photo_urls']}")
 				signed_urls = []
-				for photo in report_dict['photo_urls']:
-					# photo might be a dict with 'url' key or just a string
-					s3_key = photo.get('url') if isinstance(photo, dict) else photo
-					current_app.logger.info(f"🔑 S3 key: {s3_key}")
+				# photo might be a dict with 'url' key or just a string
+				photo_keys = [photo.get('url') if isinstance(photo, dict) else photo for photo in report_dict['photo_urls']]
+				thumbs = report_photos.thumbnail_keys(photo_keys)
+				presigned = s3_client.presign_many(photo_keys + list(thumbs.values()), expiration=3600) if s3_client.is_configured() else {}
+				for photo, s3_key in zip(report_dict['photo_urls'], photo_keys):
 					if s3_key and s3_client.is_configured():
-						signed_url = s3_client.generate_presigned_url(s3_key, expiration=3600)
-						current_app.logger.info(f"✅ Generated signed URL: {signed_url[:100] if signed_url else 'None'}")
+						signed_url = presigned.get(s3_key)
 						if signed_url:
-							if isinstance(photo, dict):
-								photo_copy = photo.copy()
-								photo_copy['url'] = signed_url
-								signed_urls.append(photo_copy)
-							else:
-								signed_urls.append({'url': signed_url})
+							photo_copy = photo.copy() if isinstance(photo, dict) else {}
+							photo_copy['url'] = signed_url
+							photo_copy['thumbnail_url'] = presigned.get(thumbs.get(s3_key)) or signed_url
+							signed_urls.append(photo_copy)
 						else:
 							signed_urls.append(photo)
 					else:
-						current_app.logger.info(f"⚠️ S3 not configured or empty key")
 						signed_urls.append(photo)
 				report_dict['photo_urls'] = signed_urls
 				current_app.logger.info(f"📤 Final photo_urls being sent: {signed_urls}")
@@ -3579,11 +3727,13 @@ def generate_v3_report_pdf(report, agent_name=None):
 		elements.append(Paragraph(f"Photos & Evidence ({len(photo_urls)})", styles['SectionTitle']))
 		elements.append(Spacer(1, 0.1*inch))
 
-		# Download and embed each photo
+		# Download and embed each photo, using the web-sized thumbnail when ready
 		photo_images = []
+		thumbs = report_photos.thumbnail_keys(photo.get('url') if isinstance(photo, dict) else photo for photo in photo_urls)
 		for i, photo in enumerate(photo_urls):
 			try:
 				s3_key = photo.get('url') if isinstance(photo, dict) else photo
+				s3_key = thumbs.get(s3_key, s3_key)
 				if s3_key and s3_client.is_configured():
 					signed_url = s3_client.generate_presigned_url(s3_key, expiration=300)
 					if signed_url:
@@ -3830,13 +3980,16 @@ def get_public_report(report_id):
 		# Convert S3 keys to signed URLs for photos
 		photo_urls = []
 		if report.photo_urls:
-			for photo in report.photo_urls:
-				s3_key = photo.get('url') if isinstance(photo, dict) else photo
+			photo_keys = [photo.get('url') if isinstance(photo, dict) else photo for photo in report.photo_urls]
+			thumbs = report_photos.thumbnail_keys(photo_keys)
+			presigned = s3_client.presign_many(photo_keys + list(thumbs.values()), expiration=3600) if s3_client.is_configured() else {}
+			for s3_key in photo_keys:
 				if s3_key and s3_client.is_configured():
-					signed_url = s3_client.generate_presigned_url(s3_key, expiration=3600)
+					signed_url = presigned.get(s3_key)
 					if signed_url:
 						photo_urls.append({
 							'url': signed_url,
+							'thumbnail_url': presigned.get(thumbs.get(s3_key)) or signed_url,
 							's3_key': s3_key
 						})
 
@@ -3857,12 +4010,16 @@ def get_public_report(report_id):
 
 @admin_bp.route('/public/report/<int:report_id>/photos/download', methods=['GET'])
 def download_report_photos(report_id):
-	"""Download all photos from a report as a ZIP file."""
+	"""Download all photos from a report as a ZIP file.
+
+	The archive is streamed as photos are fetched (a few at a time, in
+	parallel) and supports Range requests so interrupted downloads resume.
+	"""
 	try:
-		import zipfile
-		import io
-		import requests
+		import hashlib
 		from src.models.v3_report import V3JobReport
+		from src.models.report_photo import ReportPhoto
+		from src.utils import zip_stream
 
 		report = V3JobReport.query.get(report_id)
 		if not report:
@@ -3871,41 +4028,46 @@ def download_report_photos(report_id):
 		if not report.photo_urls:
 			return jsonify({'error': 'No photos in this report'}), 404
 
-		# Create ZIP file in memory
-		zip_buffer = io.BytesIO()
-		with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-			for i, photo in enumerate(report.photo_urls):
-				s3_key = photo.get('url') if isinstance(photo, dict) else photo
-				if s3_key and s3_client.is_configured():
-					signed_url = s3_client.generate_presigned_url(s3_key, expiration=300)
-					if signed_url:
-						try:
-							# Download the image
-							response = requests.get(signed_url, timeout=30)
-							if response.status_code == 200:
-								# Determine file extension
-								ext = '.jpg'
-								if 'png' in s3_key.lower():
-									ext = '.png'
-								elif 'gif' in s3_key.lower():
-									ext = '.gif'
-
-								zip_file.writestr(f'photo_{i+1}{ext}', response.content)
-						except Exception as download_err:
-							current_app.logger.warning(f"Failed to download photo {i}: {str(download_err)}")
-
-		zip_buffer.seek(0)
+		if not s3_client.is_configured():
+			return jsonify({'error': 'Photo storage not available'}), 503
+
+		photo_keys = [photo.get('url') if isinstance(photo, dict) else photo for photo in report.photo_urls]
+		known = [k for k in photo_keys if k]
+
+		# Sizes fix the archive layout; use the recorded ones and look up the rest in parallel
+		sizes = dict(db.session.query(ReportPhoto.file_key, ReportPhoto.size).filter(
+			ReportPhoto.file_key.in_(known), ReportPhoto.size.isnot(None)).all()) if known else {}
+		missing = [k for k in dict.fromkeys(known) if k not in sizes]
+		for key, info in zip(missing, zip_stream.parallel_map(s3_client.get_object_info, missing)):
+			if info and info.get('size'):
+				sizes[key] = info['size']
+			else:
+				current_app.logger.warning(f"Report {report_id}: photo {key} not found in storage, skipping")
+
+		entries = []
+		for i, s3_key in enumerate(photo_keys):
+			if s3_key not in sizes:
+				continue
+			# Determine file extension
+			ext = '.jpg'
+			if 'png' in s3_key.lower():
+				ext = '.png'
+			elif 'gif' in s3_key.lower():
+				ext = '.gif'
+			entries.append(zip_stream.ZipEntry(f'photo_{i+1}{ext}', sizes[s3_key],
+			                                   lambda key=s3_key: s3_client.download_bytes(key), cache_key=s3_key))
+
+		if not entries:
+			return jsonify({'error': 'No photos available for download'}), 404
+
+		archive = zip_stream.StreamingZip(entries, report.submitted_at or datetime(1980, 1, 1))
+		etag = hashlib.sha1(repr([(e.name, e.cache_key) for e in entries]).encode()).hexdigest()
 
 		# Get client name for filename
 		client_name = report.report_data.get('client', 'Unknown').replace(' ', '_')[:30]
 		filename = f'report_{report.id}_{client_name}_photos.zip'
 
-		return send_file(
-			zip_buffer,
-			mimetype='application/zip',
-			as_attachment=True,
-			download_name=filename
-		)
+		return zip_stream.zip_response(archive, filename, etag, request)
 
 	except Exception as e:
 		current_app.logger.error(f"Error downloading photos: {str(e)}")
@@ -3967,6 +4129,7 @@ def backfill_invoice_jobs():
 		fixed = 0
 		skipped = 0
 		errors = []
+		fixed_ids = []
 
 		# Get all invoices that have lines but no invoice_jobs
 		invoices_with_lines = (
@@ -4027,11 +4190,13 @@ def backfill_invoice_jobs():
 					hourly_rate_at_invoice=avg_rate
 				))
 				fixed += 1
+				fixed_ids.append(invoice.id)
 
 			except Exception as e:
 				errors.append(f"Invoice {invoice.id}: {str(e)}")
 				continue
 
+		invoice_ledger.refresh(fixed_ids)
 		db.session.commit()
 
 		return jsonify({
@@ -1,6 +1,5 @@
 # --- IMPORTS (Added boto3) ---
 import os
-import smtplib
 import boto3
 from botocore.client import Config
 from email.mime.multipart import MIMEMultipart
@@ -12,12 +11,16 @@ from flask import Blueprint, jsonify, request, current_app, redirect, send_file,
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.models.user import User, Job, JobAssignment, AgentAvailability, Notification, Invoice, InvoiceJob, SupplierProfile, InvoiceLine, db
 from src.utils.serialize import as_float, as_iso
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import contains_eager, selectinload
 from sqlalchemy import select, union_all
 from src.services.invoicing import build_supplier_invoice
 from src.utils.finance import update_job_hours
 from src.services.telegram_notifications import _send_admin_group
-from src.utils.s3_client import s3_client
+from src.services import mailer
+from src.services import invoice_finalisation
+from src.services import invoice_ledger
+from src.services import report_photos
+from src.utils.s3_client import s3_client, invoice_file_key
 from datetime import datetime, date, time, timedelta
 from decimal import Decimal, InvalidOperation
 from reportlab.pdfgen import canvas
@@ -659,7 +662,8 @@ def generate_invoice_pdf(agent,
                     agent_id=agent.id,
                     invoice_number=invoice_number,
                     pdf_data=file_path,
-                    filename=f"{invoice_number}.pdf"
+                    filename=f"{invoice_number}.pdf",
+                    issue_date=invoice_date
                 )
                 if upload_result.get('success'):
                     current_app.logger.info(f"PDF S3 upload OK: {upload_result.get('file_key')}")
@@ -688,7 +692,7 @@ def generate_invoice_pdf(agent,
 
 
 def send_invoice_email(recipient_email, agent_name, pdf_path, invoice_number, cc_email=None):
-    """Sends the invoice PDF via email."""
+    """Queues the invoice PDF for delivery via the email outbox."""
     try:
         msg = MIMEMultipart()
         mail_sender = current_app.config['MAIL_DEFAULT_SENDER']
@@ -705,16 +709,11 @@ def send_invoice_email(recipient_email, agent_name, pdf_path, invoice_number, cc
             attach = MIMEApplication(f.read(), _subtype="pdf")
             attach.add_header('Content-Disposition', 'attachment', filename=os.path.basename(pdf_path))
             msg.attach(attach)
-            
-        server = smtplib.SMTP(current_app.config['MAIL_SERVER'], current_app.config['MAIL_PORT'])
-        if current_app.config['MAIL_USE_TLS']:
-            server.starttls()
-        server.login(current_app.config['MAIL_USERNAME'], current_app.config['MAIL_PASSWORD'])
-        server.send_message(msg)
-        server.quit()
+
+        mailer.queue_email(msg, category='invoice')
         return True
     except Exception as e:
-        current_app.logger.error(f"Failed to send email: {e}")
+        current_app.logger.error(f"Failed to queue invoice email: {e}")
         return False
 
 
@@ -896,54 +895,20 @@ def get_invoiceable_jobs():
     try:
         current_user_id = int(get_jwt_identity())
 
-        # Method 1: jobs linked via InvoiceJob table (legacy + new invoices)
-        invoiced_via_invoice_job = set(
-            row[0] for row in
-            db.session.query(InvoiceJob.job_id)
-            .join(Invoice, Invoice.id == InvoiceJob.invoice_id)
-            .filter(Invoice.agent_id == current_user_id)
-            .all()
-        )
-
-        # Method 2: jobs matched by arrival date against InvoiceLine work dates
-        # This catches old time-entry invoices that never had InvoiceJob records
-        agent_invoice_ids = set(
-            row[0] for row in
-            db.session.query(Invoice.id)
-            .filter(Invoice.agent_id == current_user_id)
-            .all()
-        )
-        invoiced_dates = set()
-        if agent_invoice_ids:
-            date_rows = (
-                db.session.query(InvoiceLine.work_date)
-                .filter(InvoiceLine.invoice_id.in_(agent_invoice_ids))
-                .all()
-            )
-            invoiced_dates = set(row[0] for row in date_rows if row[0])
-
-        # Get all accepted jobs for this agent
-        all_accepted_jobs = (
+        # The ledger already applies both legacy rules (InvoiceJob links and
+        # InvoiceLine work dates), so this is one indexed lookup
+        invoiceable_jobs = (
             db.session.query(Job)
             .join(JobAssignment)
+            .options(selectinload(Job.assignments))
             .filter(
                 JobAssignment.agent_id == current_user_id,
-                JobAssignment.status == 'accepted'
+                JobAssignment.invoice_state == invoice_ledger.UNINVOICED
             )
             .order_by(Job.arrival_time.desc())
             .all()
         )
 
-        # Exclude jobs that are already invoiced by either method
-        invoiceable_jobs = []
-        for job in all_accepted_jobs:
-            if job.id in invoiced_via_invoice_job:
-                continue
-            # Check if any invoice line date matches this job's arrival date
-            if job.arrival_time and job.arrival_time.date() in invoiced_dates:
-                continue
-            invoiceable_jobs.append(job)
-
         return jsonify([job.to_dict_agent_safe() for job in invoiceable_jobs]), 200
 
     except Exception as e:
@@ -960,14 +925,14 @@ def get_my_supplier_pending_assignments():
     supplier = SupplierProfile.find_by_email(user.email)
     if not supplier:
         return jsonify({'error': 'Not a supplier account'}), 403
-    # Uninvoiced = assignments with no invoice_line and supplied_by_email == supplier.email
-    subq = db.session.query(InvoiceLine.job_assignment_id)
+    # Uninvoiced = accepted assignments supplied by this supplier with no invoice line yet
     assignments = (
         JobAssignment.query
         .join(Job)
+        .options(contains_eager(JobAssignment.job))
         .filter(
             JobAssignment.supplied_by_email == supplier.email,
-            ~JobAssignment.id.in_(subq)
+            JobAssignment.invoice_state == invoice_ledger.UNINVOICED
         )
         .order_by(Job.arrival_time.desc())
         .all()
@@ -993,13 +958,13 @@ def get_supplier_pending_assignments_admin(email):
     supplier = SupplierProfile.find_by_email(email)
     if not supplier:
         return jsonify({'error': 'Supplier not found'}), 404
-    subq = db.session.query(InvoiceLine.job_assignment_id)
     assignments = (
         JobAssignment.query
         .join(Job)
+        .options(contains_eager(JobAssignment.job))
         .filter(
             JobAssignment.supplied_by_email == supplier.email,
-            ~JobAssignment.id.in_(subq)
+            JobAssignment.invoice_state == invoice_ledger.UNINVOICED
         )
         .order_by(Job.arrival_time.desc())
         .all()
@@ -1088,11 +1053,28 @@ def create_supplier_invoice_admin(email):
     return jsonify({'invoice_number': inv.invoice_number, 'invoice_id': inv.id}), 201
 
 
+def _as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _load_by_id(model, ids):
+    """{id: row} for every id in ids, fetched with a single IN query."""
+    wanted = {i for i in (_as_int(v) for v in ids) if i is not None}
+    if not wanted:
+        return {}
+    return {row.id: row for row in model.query.filter(model.id.in_(wanted))}
+
+
 @agent_bp.route('/agent/invoice', methods=['POST'])
 @jwt_required()
 def create_invoice():
     """
-    Creates an invoice from selected jobs, saves it, generates a PDF, and emails it.
+    Validates and saves an invoice from selected jobs in one transaction, then hands
+    PDF rendering, S3 upload, email and notifications to the finalisation pipeline
+    (poll GET /agent/invoices/<id>/status).
     """
     try:
         current_user_id = int(get_jwt_identity())
@@ -1144,6 +1126,14 @@ def create_invoice():
         time_entries_to_invoice = []
         supplier_assignment_lines = []
 
+        # Load every referenced job (or assignment) with one IN query
+        if is_supplier_invoice:
+            assignments_by_id = _load_by_id(JobAssignment, [item.get('job_assignment_id') for item in job_items])
+        elif time_entries:
+            jobs_by_id = _load_by_id(Job, [job_entry.get('jobId') for job_entry in time_entries])
+        else:
+            jobs_by_id = _load_by_id(Job, [item.get('jobId') for item in job_items])
+
         if is_supplier_invoice:
             # items: { job_assignment_id, hours, rate_per_hour }
             from decimal import Decimal as D
@@ -1153,7 +1143,7 @@ def create_invoice():
                 rate = D(str(item.get('rate_per_hour', '0')))
                 if hours <= 0 or rate <= 0:
                     return jsonify({'error': 'Hours and Rate/hour must be > 0 for each line'}), 400
-                assignment = JobAssignment.query.get(ja_id)
+                assignment = assignments_by_id.get(ja_id)
                 if not assignment:
                     return jsonify({'error': f'Assignment {ja_id} not found'}), 404
                 if (assignment.supplied_by_email or '').lower() != supplier.email.lower():
@@ -1180,7 +1170,7 @@ def create_invoice():
                 if not job_id or not entries:
                     return jsonify({'error': 'Each time entry must have jobId and entries'}), 400
 
-                job = Job.query.get(job_id)
+                job = jobs_by_id.get(_as_int(job_id))
                 if not job:
                     return jsonify({'error': f"Job with ID {job_id} not found."}), 404
 
@@ -1216,7 +1206,7 @@ def create_invoice():
         else:
             # Legacy single-day job_items format
             for item in job_items:
-                job = Job.query.get(item['jobId'])
+                job = jobs_by_id.get(_as_int(item['jobId']))
                 if not job:
                     return jsonify({'error': f"Job with ID {item['jobId']} not found."}), 404
                 hours = Decimal(item.get('hours', 0))
@@ -1390,7 +1380,8 @@ def create_invoice():
             'total_amount': total_amount,
             'status': 'submitted',
             'job_type': job_type_snapshot,
-            'address': address_snapshot
+            'address': address_snapshot,
+            'finalisation_status': invoice_finalisation.STATUS_PENDING
         }
         # VAT rate decision
         from decimal import Decimal as D
@@ -1424,27 +1415,25 @@ def create_invoice():
 
         # 2. Link items to invoice
         if is_supplier_invoice:
-            for ln in supplier_assignment_lines:
-                db.session.add(InvoiceLine(
-                    invoice_id=new_invoice.id,
-                    job_assignment_id=ln['assignment'].id,
-                    work_date=datetime.utcnow().date(),  # Default work date for supplier invoices
-                    hours=ln['hours'],
-                    rate_net=ln['rate'],
-                    line_net=ln['line_total'],
-                    headcount=ln['headcount']
-                ))
+            db.session.execute(db.insert(InvoiceLine), [dict(
+                invoice_id=new_invoice.id,
+                job_assignment_id=ln['assignment'].id,
+                work_date=datetime.utcnow().date(),  # Default work date for supplier invoices
+                hours=ln['hours'],
+                rate_net=ln['rate'],
+                line_net=ln['line_total'],
+                headcount=ln['headcount']
+            ) for ln in supplier_assignment_lines])
         elif time_entries_to_invoice:
             # New multi-day time entries - create InvoiceLine entries
-            for entry in time_entries_to_invoice:
-                db.session.add(InvoiceLine(
-                    invoice_id=new_invoice.id,
-                    work_date=entry['work_date'],
-                    hours=entry['hours'],
-                    rate_net=entry['rate_net'],
-                    line_net=entry['line_net'],
-                    notes=entry['notes']
-                ))
+            db.session.execute(db.insert(InvoiceLine), [dict(
+                invoice_id=new_invoice.id,
+                work_date=entry['work_date'],
+                hours=entry['hours'],
+                rate_net=entry['rate_net'],
+                line_net=entry['line_net'],
+                notes=entry['notes']
+            ) for entry in time_entries_to_invoice])
             # Also create InvoiceJob records for each unique job so the
             # 'uninvoiced jobs' filter works correctly
             seen_job_ids = set()
@@ -1456,25 +1445,21 @@ def create_invoice():
                     total_hours_by_job[job_obj.id] = {'job': job_obj, 'hours': Decimal('0'), 'rate': entry.get('rate_net', Decimal('0'))}
                 if job_obj:
                     total_hours_by_job[job_obj.id]['hours'] += entry.get('hours', Decimal('0'))
-            for job_id, job_data in total_hours_by_job.items():
-                db.session.add(InvoiceJob(
-                    invoice_id=new_invoice.id,
-                    job_id=job_id,
-                    hours_worked=job_data['hours'],
-                    hourly_rate_at_invoice=job_data['rate']
-                ))
+            db.session.execute(db.insert(InvoiceJob), [dict(
+                invoice_id=new_invoice.id,
+                job_id=job_id,
+                hours_worked=job_data['hours'],
+                hourly_rate_at_invoice=job_data['rate']
+            ) for job_id, job_data in total_hours_by_job.items()])
         else:
             # Legacy job_items format - keep InvoiceJob for backward compatibility
-            for item in jobs_to_invoice:
-                job = item['job']
-                hours = item['hours']
-                rate = job.hourly_rate
-                db.session.add(InvoiceJob(
-                    invoice_id=new_invoice.id,
-                    job_id=job.id,
-                    hours_worked=hours,
-                    hourly_rate_at_invoice=rate
-                ))
+            db.session.execute(db.insert(InvoiceJob), [dict(
+                invoice_id=new_invoice.id,
+                job_id=item['job'].id,
+                hours_worked=item['hours'],
+                hourly_rate_at_invoice=item['job'].hourly_rate
+            ) for item in jobs_to_invoice])
+        invoice_ledger.refresh([new_invoice.id])
 
         # --- PDF and Emailing ---
         # Get the actual job date BEFORE adding any synthetic line items
@@ -1634,8 +1619,7 @@ def create_invoice():
                 'vat': float(vat_amount),
                 'total': float(grand_total),
             }
-            # Temporarily pass grand_total to original function; it recomputes totals but we give exact lines
-            pdf_result = generate_invoice_pdf(agent, jobs_pdf, float(grand_total), invoice_number, upload_to_s3=True, agent_invoice_number=final_agent_invoice_number)
+            pdf_items = jobs_pdf
         elif time_entries_to_invoice:
             # DEBUG: Using time_entries path
             current_app.logger.info(f"DEBUG: Using time_entries_to_invoice path with {len(time_entries_to_invoice)} entries")
@@ -1670,110 +1654,35 @@ def create_invoice():
                 entries_pdf.sort(key=lambda x: (_coerce_date(x.get('date')) or date_cls.today(), x.get('job', object()).__hash__()))
             except Exception:
                 pass
-            pdf_result = generate_invoice_pdf(agent, entries_pdf, total_amount, invoice_number, upload_to_s3=True, agent_invoice_number=final_agent_invoice_number)
+            pdf_items = entries_pdf
         else:
             # DEBUG: Using legacy jobs path
             current_app.logger.info(f"DEBUG: Using jobs_to_invoice path with {len(jobs_to_invoice)} jobs")
-            current_app.logger.info(f"DEBUG jobs_to_invoice structure: {[(j.get('description'), j.get('job_type'), getattr(j.get('job'), 'job_type', None) if j.get('job') else None) for j in jobs_to_invoice]}")
-            pdf_result = generate_invoice_pdf(agent, jobs_to_invoice, total_amount, invoice_number, upload_to_s3=True, agent_invoice_number=final_agent_invoice_number)
-        
-        # Handle different return formats (with or without S3 upload)
-        if isinstance(pdf_result, tuple):
-            pdf_path, s3_file_key = pdf_result
-            # Store S3 file key in database
-            # Temporarily disabled - pdf_file_url field doesn't exist in database yet
-            # new_invoice.pdf_file_url = s3_file_key
-        else:
-            pdf_path = pdf_result
-
-        # Send in-app notification to agent
-        notification = Notification(
-            user_id=agent.id,
-            title=f"Invoice {invoice_number} Generated",
-            message=f"Your invoice {invoice_number} for £{total_amount:.2f} has been generated and is ready for download.",
-            type="invoice_generated"
-        )
-        db.session.add(notification)
-        # Skip Telegram notification (agent already knows they created it)
-        
-        current_app.logger.info(f"Invoice {invoice_number} created for agent {agent.email} - stored in S3")
+            pdf_items = jobs_to_invoice
 
-        # --- Admin Telegram: notify invoice submission (agent name + invoice number) ---
-        try:
-            agent_name = f"{agent.first_name} {agent.last_name}".strip()
-            _send_admin_group(
-                (
-                    "📄 <b>Invoice Submitted</b>\n\n"
-                    f"<b>Agent:</b> {agent_name}\n"
-                    f"<b>Invoice #:</b> {getattr(new_invoice, 'agent_invoice_number', None) or new_invoice.invoice_number}"
-                )
-            )
-        except Exception as _e:
-            current_app.logger.warning(f"Admin invoice notify failed: {_e}")
+        # PDF line items for the finalisation pipeline
+        new_invoice.finalisation_payload = invoice_finalisation.encode_pdf_items(pdf_items)
 
         # --- Commit Transaction ---
         db.session.commit()
-        
-        # Trigger hours aggregation for all linked jobs (skip premium charges with no job)
-        for item in jobs_to_invoice:
-            if item.get('job') is not None:  # Skip first hour premium and other non-job items
-                try:
-                    update_job_hours(item['job'].id)
-                except Exception as e:
-                    current_app.logger.warning(f"Failed to update hours for job {item['job'].id}: {e}")
+        current_app.logger.info(f"Invoice {invoice_number} saved for agent {agent.email} - finalising in background")
 
-        # --- Admin Telegram: if all agents linked to each job have invoiced, remind admin to complete job ---
         try:
-            for item in jobs_to_invoice:
-                job = item.get('job')
-                if job is None:  # Skip first hour premium and other non-job items
-                    continue
-                # agents required for job
-                required = int(getattr(job, 'agents_required', 1) or 1)
-                # agent_ids who accepted the job
-                accepted_assignments = JobAssignment.query.filter_by(job_id=job.id, status='accepted').all()
-                accepted_agent_ids = [a.agent_id for a in accepted_assignments]
-                # invoices for this job
-                invoice_jobs = InvoiceJob.query.filter_by(job_id=job.id).all()
-                invoiced_agent_ids = []
-                for ij in invoice_jobs:
-                    try:
-                        inv = Invoice.query.get(ij.invoice_id)
-                        if inv and inv.agent_id not in invoiced_agent_ids:
-                            invoiced_agent_ids.append(inv.agent_id)
-                    except Exception:
-                        continue
-                # Check if all accepted up to required count have invoiced
-                accepted_unique = list(dict.fromkeys(accepted_agent_ids))
-                if len(invoiced_agent_ids) >= min(required, len(accepted_unique)) and len(invoiced_agent_ids) > 0:
-                    # Compose agent name list
-                    names = []
-                    for uid in invoiced_agent_ids:
-                        u = User.query.get(uid)
-                        if u:
-                            names.append(f"{u.first_name} {u.last_name}".strip())
-                    agents_list = "\n".join([f"• {n}" for n in names]) if names else "(names unavailable)"
-                    _send_admin_group(
-                        (
-                            "🧾 <b>All Invoices Submitted</b>\n\n"
-                            f"<b>Job:</b> #{job.id} — {job.title or job.job_type}\n"
-                            f"<b>Location:</b> {_admin_location_from_job(job)}\n"
-                            f"<b>Agents ({len(names)}):</b>\n{agents_list}\n\n"
-                            "Please review and mark the job as complete."
-                        )
-                    )
-        except Exception as _e:
-            current_app.logger.warning(f"Admin all-invoiced notify failed: {_e}")
-        
+            invoice_finalisation.enqueue(new_invoice.id, current_app._get_current_object())
+        except Exception as e:
+            # The scheduler sweep will pick the invoice up
+            current_app.logger.warning(f"Could not queue finalisation for invoice {invoice_number}: {e}")
+
         return jsonify({
-            'message': 'Invoice created and sent successfully!',
-            'invoice_number': invoice_number
+            'message': 'Invoice created successfully!',
+            'invoice_number': invoice_number,
+            'invoice_id': new_invoice.id,
+            'finalisation_status': new_invoice.finalisation_status,
+            'status_url': url_for('agent.get_invoice_finalisation_status', invoice_id=new_invoice.id)
         }), 201
 
     except Exception as e:
         db.session.rollback()
-        if 'pdf_path' in locals() and os.path.exists(pdf_path):
-            os.remove(pdf_path)
         import traceback
         error_traceback = traceback.format_exc()
         current_app.logger.error(f"Invoice creation failed: {error_traceback}")
@@ -1861,18 +1770,17 @@ def update_invoice(invoice_id):
             if not invoice_job:
                 return jsonify({'error': 'Invoice job not found'}), 404
 
-            # Delete existing InvoiceLines for this invoice
-            InvoiceLine.query.filter_by(invoice_id=invoice.id).delete()
-
-            # Create new InvoiceLines from time_entries
-            for entry in time_entries_to_invoice:
-                db.session.add(InvoiceLine(
-                    invoice_id=invoice.id,
-                    work_date=entry['work_date'],
-                    hours=entry['hours'],
-                    rate_net=entry['rate_net'],
-                    line_net=entry['line_net']
-                ))
+            # Replace the InvoiceLines for this invoice with the new time_entries
+            with invoice_ledger.updating([invoice.id]):
+                InvoiceLine.query.filter_by(invoice_id=invoice.id).delete()
+                for entry in time_entries_to_invoice:
+                    db.session.add(InvoiceLine(
+                        invoice_id=invoice.id,
+                        work_date=entry['work_date'],
+                        hours=entry['hours'],
+                        rate_net=entry['rate_net'],
+                        line_net=entry['line_net']
+                    ))
 
             # Update invoice_job with total hours and average rate
             total_hours = sum(entry['hours'] for entry in time_entries_to_invoice)
@@ -1985,8 +1893,7 @@ def update_invoice(invoice_id):
             
             if isinstance(pdf_result, tuple):
                 pdf_path, s3_file_key = pdf_result
-                # Optional: persist file key if schema supports it
-                # invoice.pdf_file_url = s3_file_key
+                invoice.pdf_file_key = s3_file_key
                 db.session.commit()
             else:
                 pdf_path = pdf_result
@@ -2073,6 +1980,17 @@ def get_invoice_details(invoice_id):
         return jsonify({'error': 'Failed to fetch invoice details'}), 500
 
 
+@agent_bp.route('/agent/invoices/<int:invoice_id>/status', methods=['GET'])
+@jwt_required()
+def get_invoice_finalisation_status(invoice_id):
+    """Poll background finalisation (PDF, S3 upload, email, notifications) of a submitted invoice."""
+    current_user_id = int(get_jwt_identity())
+    invoice = Invoice.query.filter_by(id=invoice_id, agent_id=current_user_id).first()
+    if not invoice:
+        return jsonify({'error': 'Invoice not found'}), 404
+    return jsonify(invoice_finalisation.status_for(invoice)), 200
+
+
 @agent_bp.route('/agent/invoices/<int:invoice_id>', methods=['DELETE'])
 @jwt_required()
 def delete_invoice(invoice_id):
@@ -2098,12 +2016,13 @@ def delete_invoice(invoice_id):
 
         invoice_number = invoice.invoice_number
 
-        # Delete related records first (foreign key constraints)
-        InvoiceJob.query.filter_by(invoice_id=invoice.id).delete()
-        InvoiceLine.query.filter_by(invoice_id=invoice.id).delete()
+        with invoice_ledger.updating([invoice.id]):
+            # Delete related records first (foreign key constraints)
+            InvoiceJob.query.filter_by(invoice_id=invoice.id).delete()
+            InvoiceLine.query.filter_by(invoice_id=invoice.id).delete()
 
-        # Delete the invoice
-        db.session.delete(invoice)
+            # Delete the invoice
+            db.session.delete(invoice)
         db.session.commit()
 
         current_app.logger.info(f"Agent {current_user_id} deleted invoice {invoice_number} (ID: {invoice_id})")
@@ -2347,8 +2266,9 @@ def delete_agent_invoice(invoice_id):
             return jsonify({'error': 'Invoice not found'}), 404
 
         # Remove links and invoice
-        InvoiceJob.query.filter_by(invoice_id=invoice.id).delete()
-        db.session.delete(invoice)
+        with invoice_ledger.updating([invoice.id]):
+            InvoiceJob.query.filter_by(invoice_id=invoice.id).delete()
+            db.session.delete(invoice)
         db.session.commit()
         return jsonify({'message': 'Invoice deleted'}), 200
     except Exception as e:
@@ -2384,7 +2304,8 @@ def download_agent_invoice(invoice_id):
                     filename = f"{invoice.agent_invoice_number}.pdf"
             except Exception:
                 filename = None
-            signed = s3_client.generate_invoice_download_url(agent.id, invoice.invoice_number, expiration=3600)
+            signed = s3_client.generate_invoice_download_url(agent.id, invoice.invoice_number, expiration=3600,
+                                                             file_key=invoice_file_key(invoice))
             if signed.get('success'):
                 return jsonify({
                     'download_url': signed['download_url'],
@@ -2428,7 +2349,8 @@ def download_invoice_direct(invoice_id):
             return jsonify({'error': 'Invoice has no amount. Please update the invoice with hours and rate before downloading.'}), 400
 
         if s3_client.is_configured():
-            signed = s3_client.generate_invoice_download_url(agent.id, invoice.invoice_number, expiration=300)
+            signed = s3_client.generate_invoice_download_url(agent.id, invoice.invoice_number, expiration=300,
+                                                             file_key=invoice_file_key(invoice))
             if signed.get('success'):
                 return redirect(signed['download_url'])
 
@@ -2582,7 +2504,7 @@ def diagnose_s3_invoice(invoice_id):
             return jsonify({'error': 'Invoice not found'}), 404
         
         # Run S3 diagnosis for this specific invoice file
-        file_key = f"invoices/{agent.id}/{invoice.invoice_number}.pdf"
+        file_key = invoice_file_key(invoice)
         diagnosis = s3_client.diagnose_s3_permissions(file_key)
         
         return jsonify({
@@ -3043,6 +2965,7 @@ def upload_v3_report_photos():
                 # Generate S3 URL (you may need to adjust this based on your s3_client implementation)
                 file_key = upload_result.get('file_key')
                 if file_key:
+                    report_photos.register_uploaded(agent.id, upload_result)
                     # Store the S3 key/URL
                     photo_urls.append({
                         'url': file_key,
@@ -3066,6 +2989,81 @@ def upload_v3_report_photos():
         return jsonify({'error': 'Failed to upload photos'}), 500
 
 
+@agent_bp.route('/agent/v3-reports/photo-uploads', methods=['POST'])
+@jwt_required()
+def create_v3_report_photo_uploads():
+    """
+    Start direct-to-S3 photo uploads for a V3 report.
+
+    Expected JSON body:
+    - files: list of {filename, content_type, size}
+
+    Returns a presigned POST per photo; the app uploads each file straight to
+    S3 and then calls /agent/v3-reports/photo-uploads/complete.
+    """
+    try:
+        agent = User.query.get(int(get_jwt_identity()))
+        if not agent or agent.role != 'agent':
+            return jsonify({'error': 'Access denied. Agent role required.'}), 403
+
+        if not s3_client.is_configured():
+            return jsonify({
+                'error': 'File upload service not available',
+                'details': 'S3 storage not configured'
+            }), 503
+
+        files = (request.get_json(silent=True) or {}).get('files')
+        if not files or not isinstance(files, list):
+            return jsonify({'error': 'No photos provided'}), 400
+
+        uploads, errors = report_photos.create_uploads(agent.id, files)
+        if not uploads:
+            return jsonify({'error': 'No valid photos to upload', 'details': errors}), 400
+
+        return jsonify({'uploads': uploads, 'errors': errors or None}), 201
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error creating V3 report photo uploads: {str(e)}")
+        return jsonify({'error': 'Failed to start photo uploads'}), 500
+
+
+@agent_bp.route('/agent/v3-reports/photo-uploads/complete', methods=['POST'])
+@jwt_required()
+def complete_v3_report_photo_uploads():
+    """
+    Register photos uploaded directly to S3 and queue their thumbnails.
+
+    Expected JSON body:
+    - photo_ids: list of ids returned by /agent/v3-reports/photo-uploads
+
+    Returns the same `photos` entries as the multipart upload endpoint.
+    """
+    try:
+        agent = User.query.get(int(get_jwt_identity()))
+        if not agent or agent.role != 'agent':
+            return jsonify({'error': 'Access denied. Agent role required.'}), 403
+
+        photo_ids = (request.get_json(silent=True) or {}).get('photo_ids') or []
+        if not photo_ids:
+            return jsonify({'error': 'No photos provided'}), 400
+
+        photos, errors = report_photos.complete_uploads(agent.id, photo_ids)
+        if not photos:
+            return jsonify({'error': 'No uploads were received', 'details': errors}), 400
+
+        return jsonify({
+            'message': f'{len(photos)} photos uploaded successfully',
+            'photos': photos,
+            'errors': errors or None
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error completing V3 report photo uploads: {str(e)}")
+        return jsonify({'error': 'Failed to register photos'}), 500
+
+
 @agent_bp.route('/agent/v3-reports/submit', methods=['POST'])
 @jwt_required()
 def submit_v3_report():
@@ -173,7 +173,7 @@ def get_single_agent_metrics(agent_id):
         ).all()
         
         total_days = len(availability_records)
-        available_days = len([a for a in assignments if a.is_available and not a.is_away])
+        available_days = len([a for a in availability_records if a.is_available and not a.is_away])
         away_days = len([a for a in availability_records if a.is_away])
         
         # Check if availability is stale (no updates in last 7 days)
@@ -1,8 +1,8 @@
 from flask import Blueprint, jsonify, request, current_app
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, verify_jwt_in_request, get_jwt
 from src.models.user import User, db, SupplierProfile
+from src.services import mailer
 from werkzeug.security import check_password_hash
-import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.utils import formataddr
@@ -138,15 +138,10 @@ def send_password_reset_email(recipient_email, reset_token):
         body = f"Hello,\n\nTo reset your password, click the following link:\nhttps://v3-app-49c3d1eff914.herokuapp.com/reset-password?token={reset_token}\n\nIf you did not request this, ignore this email.\n\nThank you,\nV3 Services"
         msg.attach(MIMEText(body, 'plain'))
 
-        server = smtplib.SMTP(current_app.config['MAIL_SERVER'], current_app.config['MAIL_PORT'])
-        if current_app.config['MAIL_USE_TLS']:
-            server.starttls()
-        server.login(current_app.config['MAIL_USERNAME'], current_app.config['MAIL_PASSWORD'])
-        server.send_message(msg)
-        server.quit()
+        mailer.queue_email(msg, category='password_reset')
         return True
     except Exception as e:
-        current_app.logger.error(f"Failed to send reset email: {e}")
+        current_app.logger.error(f"Failed to queue reset email: {e}")
         return False
 
 @auth_bp.route('/auth/forgot-password', methods=['POST'])
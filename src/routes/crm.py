@@ -14,9 +14,11 @@ from src.models.crm_email import CRMEmail
 from src.models.crm_email_config import CRMEmailConfig
 from src.models.crm_task import CRMTask
 from src.services.email_sync import EmailSyncService
+from src.services import crm_dashboard
+from src.services import search as search_index
 from src.utils.s3_client import s3_client
-from datetime import datetime, date, timedelta
-from sqlalchemy import or_, and_, func
+from datetime import datetime, timedelta
+from sqlalchemy import and_, select
 import logging
 
 crm_bp = Blueprint('crm', __name__)
@@ -378,15 +380,9 @@ def list_contacts():
 
         # Search filter
         search = request.args.get('search', '').strip()
-        if search:
-            search_pattern = f'%{search}%'
-            query = query.filter(
-                or_(
-                    CRMContact.name.ilike(search_pattern),
-                    CRMContact.email.ilike(search_pattern),
-                    CRMContact.company_name.ilike(search_pattern)
-                )
-            )
+        hits = search_index.hits('crm_contact', search)
+        if hits is not None:
+            query = query.filter(CRMContact.id.in_(select(hits.c.entity_id)))
 
         # Priority-based sorting: urgent first, then hot, nurture, routine, none (if column exists)
         # Within same priority, sort by next follow-up date, then updated_at
@@ -679,34 +675,8 @@ def get_priority_counts():
         return jsonify({'error': 'CRM access required'}), 403
 
     try:
-        # Check if priority column exists
-        if not hasattr(CRMContact, 'priority'):
-            # Priority column doesn't exist yet, return zeros
-            return jsonify({
-                'urgent': 0,
-                'hot': 0,
-                'nurture': 0,
-                'routine': 0
-            })
-
-        # Base query for user's active contacts
-        query = CRMContact.query.filter(
-            CRMContact.owner_id == crm_user.id,
-            CRMContact.status == 'active'
-        )
-
-        # Count by priority
-        urgent_count = query.filter(CRMContact.priority == 'urgent').count()
-        hot_count = query.filter(CRMContact.priority == 'hot').count()
-        nurture_count = query.filter(CRMContact.priority == 'nurture').count()
-        routine_count = query.filter(CRMContact.priority == 'routine').count()
-
-        return jsonify({
-            'urgent': urgent_count,
-            'hot': hot_count,
-            'nurture': nurture_count,
-            'routine': routine_count
-        })
+        # Same cached aggregate as the 'my' dashboard (active contacts only)
+        return jsonify(crm_dashboard.summary(crm_user.id)['priority'])
 
     except Exception as e:
         logger.exception("Error getting priority counts: %s", e)
@@ -831,7 +801,12 @@ def sync_contact_emails(contact_id):
 @crm_bp.route('/contacts/<int:contact_id>/emails', methods=['GET'])
 @jwt_required()
 def get_contact_emails(contact_id):
-    """Get all emails for a contact"""
+    """
+    Get a page of emails for a contact, newest first (headers and preview only)
+    Query params:
+    - page, per_page (default 25, max 100)
+    Full bodies come from GET /emails/<id>.
+    """
     crm_user = require_crm_user()
     if not crm_user:
         return jsonify({'error': 'CRM access required'}), 403
@@ -846,15 +821,21 @@ def get_contact_emails(contact_id):
         if contact.owner_id != crm_user.id and not crm_user.is_super_admin:
             return jsonify({'error': 'Access denied'}), 403
 
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 25, type=int), 1), 100)
+
         # Get emails, ordered by date descending
-        emails = CRMEmail.query.filter_by(
+        paginated = CRMEmail.query.filter_by(
             contact_id=contact_id,
             user_id=crm_user.id
-        ).order_by(CRMEmail.date.desc()).all()
+        ).order_by(CRMEmail.date.desc(), CRMEmail.id.desc()).paginate(page=page, per_page=per_page, error_out=False)
 
         return jsonify({
-            'emails': [email.to_dict() for email in emails],
-            'count': len(emails)
+            'emails': [email.to_dict() for email in paginated.items],
+            'count': paginated.total,
+            'page': page,
+            'pages': paginated.pages,
+            'per_page': per_page
         }), 200
 
     except Exception as e:
@@ -862,6 +843,30 @@ def get_contact_emails(contact_id):
         return jsonify({'error': 'Failed to load emails'}), 500
 
 
+@crm_bp.route('/emails/<int:email_id>', methods=['GET'])
+@jwt_required()
+def get_email(email_id):
+    """Get one email including its full text and HTML body"""
+    crm_user = require_crm_user()
+    if not crm_user:
+        return jsonify({'error': 'CRM access required'}), 403
+
+    try:
+        email = CRMEmail.query.get(email_id)
+        if not email:
+            return jsonify({'error': 'Email not found'}), 404
+
+        # Emails are per mailbox: only the CRM user who synced it can read it
+        if email.user_id != crm_user.id:
+            return jsonify({'error': 'Access denied'}), 403
+
+        return jsonify({'email': email.to_dict(include_body=True)}), 200
+
+    except Exception as e:
+        logger.exception("Error getting email %s: %s", email_id, e)
+        return jsonify({'error': 'Failed to load email'}), 500
+
+
 # ============================================================================
 # FILE UPLOAD ENDPOINTS
 # ============================================================================
@@ -969,84 +974,15 @@ def get_dashboard():
     try:
         view = request.args.get('view', 'my')
 
-        # Base query
-        if view == 'my':
-            base_query = CRMContact.query.filter_by(owner_id=crm_user.id)
-        elif view == 'team':
+        if view == 'team':
             # Team view - super admin only
             if not crm_user.is_super_admin:
                 return jsonify({'error': 'Super admin access required for team view'}), 403
-            base_query = CRMContact.query
+            figures = crm_dashboard.summary(None)
         else:
-            base_query = CRMContact.query.filter_by(owner_id=crm_user.id)
-
-        today = date.today()
-
-        # Follow-ups due today
-        followups_today = base_query.filter(
-            CRMContact.next_followup_date == today,
-            CRMContact.status == 'active'
-        ).count()
-
-        # Overdue follow-ups
-        overdue_followups = base_query.filter(
-            CRMContact.next_followup_date < today,
-            CRMContact.status == 'active'
-        ).count()
-
-        # Quotes awaiting response
-        quotes_pending = base_query.filter(
-            CRMContact.current_stage.in_(['quote_sent', 'thinking_about_it']),
-            CRMContact.status == 'active'
-        ).count()
-
-        # Jobs in progress
-        jobs_in_progress = base_query.filter(
-            CRMContact.current_stage.in_(['job_booked', 'job_in_progress']),
-            CRMContact.contact_type == 'eviction_client'
-        ).count()
-
-        # Potential revenue this month (active contacts only)
-        potential_revenue = db.session.query(
-            func.sum(CRMContact.potential_value)
-        ).filter(
-            CRMContact.owner_id == crm_user.id if view == 'my' else True,
-            CRMContact.status == 'active',
-            CRMContact.potential_value.isnot(None)
-        ).scalar() or 0
-
-        # Total active contacts
-        active_contacts = base_query.filter(CRMContact.status == 'active').count()
-
-        # Breakdown by type
-        eviction_clients = base_query.filter(
-            CRMContact.contact_type == 'eviction_client',
-            CRMContact.status == 'active'
-        ).count()
-
-        prevention_prospects = base_query.filter(
-            CRMContact.contact_type == 'prevention_prospect',
-            CRMContact.status == 'active'
-        ).count()
-
-        referral_partners = base_query.filter(
-            CRMContact.contact_type == 'referral_partner',
-            CRMContact.status == 'active'
-        ).count()
+            figures = crm_dashboard.summary(crm_user.id)
 
-        return jsonify({
-            'followups_today': followups_today,
-            'overdue_followups': overdue_followups,
-            'quotes_pending': quotes_pending,
-            'jobs_in_progress': jobs_in_progress,
-            'potential_revenue': float(potential_revenue),
-            'active_contacts': active_contacts,
-            'breakdown': {
-                'eviction_clients': eviction_clients,
-                'prevention_prospects': prevention_prospects,
-                'referral_partners': referral_partners
-            }
-        })
+        return jsonify({key: value for key, value in figures.items() if key != 'priority'})
 
     except Exception as e:
         logger.exception("Error getting CRM dashboard: %s", e)
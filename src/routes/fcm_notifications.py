@@ -148,6 +148,7 @@ def test_fcm_notification():
             }
         )
         
+        db.session.commit()  # persist token pruning / last_used
         logger.info(f"Test FCM notification sent to user {target_user_id}: {result}")
         
         return jsonify({
@@ -180,18 +181,6 @@ def send_job_notification_to_agents(agent_ids, job_title, job_message, job_data=
         
         logger.info(f"Sending FCM job notifications to {len(agent_ids)} agents")
         
-        # Get all active FCM tokens for the agents
-        tokens = FCMToken.get_active_tokens_for_users(agent_ids)
-        
-        if not tokens:
-            logger.warning(f"No active FCM tokens found for agents: {agent_ids}")
-            return {'success': False, 'error': 'No active FCM tokens found'}
-        
-        # Extract token strings
-        token_strings = [token.token for token in tokens]
-        
-        logger.info(f"Found {len(token_strings)} active FCM tokens for job notification")
-        
         # Prepare notification data
         notification_data = job_data or {}
         notification_data.update({
@@ -199,19 +188,25 @@ def send_job_notification_to_agents(agent_ids, job_title, job_message, job_data=
             'timestamp': str(datetime.utcnow())
         })
         
-        # Send push notification using FCM service
-        result = fcm_service.send_push_notification(
-            fcm_tokens=token_strings,
+        # Send to the agents' active devices; dead tokens are deactivated as
+        # part of the caller's transaction
+        result = fcm_service.send_to_users(
+            user_ids=agent_ids,
             title=job_title,
             body=job_message,
             data=notification_data
         )
         
-        logger.info(f"FCM job notification result: {result}")
+        if not result.get('total_tokens'):
+            logger.warning(f"No active FCM tokens found for {len(agent_ids)} agents")
+            return {'success': False, 'error': 'No active FCM tokens found'}
+        
+        logger.info(f"FCM job notification result: {result['success_count']} sent, "
+                    f"{result['failure_count']} failed, {result.get('deactivated_tokens', 0)} deactivated")
         
         return {
             'success': True,
-            'tokens_sent': len(token_strings),
+            'tokens_sent': result['total_tokens'],
             'agents_targeted': len(agent_ids),
             'fcm_result': result
         }
@@ -8,7 +8,7 @@ from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
 from sqlalchemy.orm import joinedload
 
 from src.models.user import User, Invoice, InvoiceJob, InvoiceLine, db
-from src.utils.s3_client import s3_client
+from src.utils.s3_client import s3_client, invoice_file_key
 from src.pdf.invoice_builder import build_invoice_pdf
 
 invoices_bp = Blueprint('invoices', __name__)
@@ -202,7 +202,8 @@ def get_invoice_pdf(id_or_ref):
     pdf_bytes = None
     if s3_client.is_configured():
         try:
-            signed = s3_client.generate_invoice_download_url(inv.agent_id, inv.invoice_number, expiration=300)
+            signed = s3_client.generate_invoice_download_url(inv.agent_id, inv.invoice_number, expiration=300,
+                                                             file_key=invoice_file_key(inv))
             if signed.get('success') and signed.get('download_url'):
                 # proxy via redirect would expose URL; instead fetch & stream is heavy. Return direct stream from S3 is not possible here without revealing URL.
                 # For iframe we prefer presigned link: let caller use pdf_url endpoint.
@@ -220,7 +221,11 @@ def get_invoice_pdf(id_or_ref):
         # Upload to S3 for durability if configured
         try:
             if s3_client.is_configured():
-                _ = s3_client.upload_invoice_pdf(agent_id=inv.agent_id, invoice_number=inv.invoice_number, pdf_data=BytesIO(pdf_bytes), filename=f"{inv.invoice_number}.pdf")
+                uploaded = s3_client.upload_invoice_pdf(agent_id=inv.agent_id, invoice_number=inv.invoice_number, pdf_data=BytesIO(pdf_bytes),
+                                                        filename=f"{inv.invoice_number}.pdf", issue_date=inv.issue_date)
+                if uploaded.get('success'):
+                    inv.pdf_file_key = uploaded.get('file_key')
+                    db.session.commit()
         except Exception as e:
             current_app.logger.warning(f"Invoice {inv.id}: PDF upload failed: {e}")
 
@@ -2,6 +2,7 @@ import os
 import requests
 import json
 import calendar
+import hashlib
 from flask import Blueprint, jsonify, request, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, date, timedelta
@@ -18,6 +19,15 @@ from src.routes.notifications import trigger_push_notification_for_users
 from src.services.telegram_notifications import send_job_acceptance_notification
 from src.services.telegram_notifications import _send_admin_group, _format_dt, _area_label
 from src.constants.job_types import ALLOWED_JOB_TYPE_CODES, JOB_TYPES, get_job_type_label
+from src.services.geo_index import geo_query
+from src.services import weather as weather_service
+from src.services import search
+from src.services.agent_ranking import delete_assignments
+from src.services.dispatch import dispatch_jobs, offer_message, DEFAULT_TIME_BUDGET_MS
+from src.services.slot_allocation import (
+    accept_assignment, decline_assignment,
+    FILLED as SLOT_FILLED, FULL as SLOT_FULL, NOT_PENDING as SLOT_NOT_PENDING,
+)
 
 jobs_bp = Blueprint('jobs', __name__)
 
@@ -60,15 +70,50 @@ def require_agent_or_admin():
     return user
 
 # === Helper: job filled check ===
-def _accepted_count(job_id: int) -> int:
-    return JobAssignment.query.filter_by(job_id=job_id, status='accepted').count()
-
 def _is_job_filled(job: Job) -> bool:
     try:
-        return _accepted_count(job.id) >= int(job.agents_required or 1)
+        return int(job.slots_filled or 0) >= int(job.agents_required or 1)
     except Exception:
         return False
 
+# === Helper: push + Telegram for new job offers (after the offers are committed) ===
+def _job_notification_data(job: Job) -> dict:
+    return {
+        'title': job.title,
+        'job_type': job.job_type,
+        'job_type_label': get_job_type_label(job.job_type),
+        'address': job.address,
+        'postcode': job.postcode,
+        'arrival_time': job.arrival_time.strftime('%Y-%m-%d %H:%M'),
+        'agents_required': job.agents_required,
+        'hourly_rate': float(job.hourly_rate) if job.hourly_rate else None,
+        'instructions': job.instructions,
+        'urgency_level': job.urgency_level,
+        'lead_agent_name': job.lead_agent_name,
+        'police_liaison_required': job.police_liaison_required,
+        'maps_link': job.maps_link,
+        'location_lat': job.location_lat,
+        'location_lng': job.location_lng
+    }
+
+def _notify_job_offer(job: Job, agent_ids) -> None:
+    if not agent_ids:
+        return
+    try:
+        trigger_push_notification_for_users(agent_ids, "New Job Available", offer_message(job))
+    except Exception as e:
+        logger.warning(f"Failed to send push notifications: {str(e)}")
+    try:
+        from src.services.notifications import notify_job_assignment
+        job_notification_data = _job_notification_data(job)
+        for agent_id in agent_ids:
+            try:
+                notify_job_assignment(agent_id, job_notification_data)
+            except Exception as e:
+                logger.warning(f"Failed to send Telegram notification to agent {agent_id}: {str(e)}")
+    except Exception as e:
+        logger.warning(f"Failed to send Telegram notifications: {str(e)}")
+
 # === List assignments for an agent (exclude filled jobs if still pending) ===
 @jobs_bp.route('/assignments/agent/<int:agent_id>', methods=['GET'])
 @jwt_required()
@@ -171,22 +216,19 @@ def respond_to_job(job_id):
             return jsonify({'error': 'Assignment not found'}), 404
 
         if response == 'decline':
-            assignment.status = 'declined'
-            assignment.response_time = datetime.utcnow()
+            decline_assignment(assignment)
             db.session.commit()
             return jsonify({'status': 'declined'}), 200
 
-        # accept
-        if _is_job_filled(job):
-            # Already filled, mark as expired/declined for this agent
-            assignment.status = 'declined'
-            assignment.response_time = datetime.utcnow()
-            db.session.commit()
-            return jsonify({'status': 'declined', 'message': 'Positions already filled'}), 409
-
-        assignment.status = 'accepted'
-        assignment.response_time = datetime.utcnow()
+        # accept: claim a slot atomically; the job flips to filled in the same transaction
+        if assignment.status == 'accepted':
+            return jsonify({'status': 'accepted'}), 200
+        outcome = accept_assignment(assignment, from_statuses=('pending', 'declined', 'expired'))
         db.session.commit()
+        if outcome == SLOT_NOT_PENDING:
+            return jsonify({'status': assignment.status, 'message': 'Assignment already responded to'}), 409
+        if outcome == SLOT_FULL:
+            return jsonify({'status': 'declined', 'message': 'Positions already filled'}), 409
 
         # Admin: notify acceptance
         try:
@@ -208,16 +250,8 @@ def respond_to_job(job_id):
         except Exception as _e:
             logger.warning(f"Admin acceptance notify failed: {_e}")
 
-        # If filled after this acceptance, mark others expired and job filled
-        if _is_job_filled(job):
-            job.status = 'filled'
-            JobAssignment.query.filter(
-                JobAssignment.job_id == job.id,
-                JobAssignment.status == 'pending',
-                JobAssignment.agent_id != agent.id
-            ).update({JobAssignment.status: 'expired'})
-            db.session.commit()
-
+        # If this acceptance took the last slot, others were already expired by the allocator
+        if outcome == SLOT_FILLED:
             # Admin: notify job filled with agent list
             try:
                 accepted = JobAssignment.query.filter_by(job_id=job.id, status='accepted').all()
@@ -276,13 +310,17 @@ def validate_json_fields(required_fields):
     return decorator
 
 def geocode_address(address):
-    """Convert address to coordinates using OpenStreetMap Nominatim."""
-    try:
+    """Convert address to coordinates using OpenStreetMap Nominatim (cached per address)."""
+    def fetch():
         headers = {'User-Agent': 'V3ServicesApp/1.0'}
         params = {'q': address, 'format': 'json', 'countrycodes': 'gb', 'limit': 1}
         response = requests.get(GEOCODING_URL, params=params, headers=headers, timeout=10)
         response.raise_for_status()
-        results = response.json()
+        return response.json()
+
+    try:
+        key = hashlib.sha1(' '.join(str(address).lower().split()).encode('utf-8')).hexdigest()
+        results = weather_service.cached_lookup('address', key, weather_service.GEOCODE_TTL, fetch)
         
         if results:
             location = results[0]
@@ -303,8 +341,8 @@ def get_weather_forecast(lat, lon, arrival_time):
         }
     
     # Check API key configuration
-    if not WEATHER_API_KEY or WEATHER_API_KEY == 'YOUR_API_KEY_HERE':
-        logger.warning(f"Weather API key not configured. Current value: {'NOT_SET' if not WEATHER_API_KEY else 'DEFAULT_PLACEHOLDER'}")
+    if not weather_service.api_key():
+        logger.warning("Weather API key not configured")
         # Provide location-based guidance instead of weather
         current_month = datetime.utcnow().month
         
@@ -323,67 +361,37 @@ def get_weather_forecast(lat, lon, arrival_time):
             'clothing': seasonal_clothing
         }
     
-    try:
-        # OpenWeatherMap API call
-        params = {
-            'lat': lat,
-            'lon': lon,
-            'appid': WEATHER_API_KEY,
-            'units': 'metric',  # For Celsius
-            'cnt': 40  # Get 5 days of forecast (8 forecasts per day)
+    # Jobs beyond the 5-day forecast window get seasonal guidance without an API call
+    arrival_date = arrival_time.date()
+    today = datetime.utcnow().date()
+    days_from_now = (arrival_date - today).days
+    if days_from_now > 5:
+        logger.warning(f"Job is {days_from_now} days away, beyond 5-day forecast limit")
+        job_month = arrival_date.month
+        job_day_name = calendar.day_name[arrival_date.weekday()]
+
+        # UK seasonal clothing recommendations
+        if job_month in [12, 1, 2]:  # Winter
+            seasonal_clothing = "Winter clothing likely needed: Heavy coat, gloves, and warm layers."
+        elif job_month in [3, 4, 5]:  # Spring  
+            seasonal_clothing = "Spring clothing likely needed: Light jacket or layers for variable weather."
+        elif job_month in [6, 7, 8]:  # Summer
+            seasonal_clothing = "Summer clothing likely needed: Light, breathable work clothes."
+        else:  # Autumn
+            seasonal_clothing = "Autumn clothing likely needed: Warm jacket and layers."
+
+        return {
+            'forecast': f'Weather forecast unavailable - Job is {days_from_now} days away ({job_day_name} {arrival_date.strftime("%d %b %Y")})',
+            'clothing': f'{seasonal_clothing} Check forecast closer to the job date.'
         }
-        
-        logger.info(f"Making weather API request to {WEATHER_API_URL} with params: lat={lat}, lon={lon}")
-        
-        response = requests.get(WEATHER_API_URL, params=params, timeout=10)
-        
-        # Log detailed response information
-        logger.info(f"Weather API response status: {response.status_code}")
-        
-        if response.status_code == 401:
-            logger.error("Weather API: Invalid API key (401 Unauthorized)")
-            return {
-                'forecast': 'Weather API error - Invalid API key',
-                'clothing': 'Please check weather forecast and dress appropriately for outdoor work.'
-            }
-        elif response.status_code == 429:
-            logger.error("Weather API: Rate limit exceeded (429 Too Many Requests)")
-            return {
-                'forecast': 'Weather API error - Rate limit exceeded',
-                'clothing': 'Please check weather forecast and dress appropriately for outdoor work.'
-            }
-        elif response.status_code == 404:
-            logger.error(f"Weather API: Location not found (404) for coordinates {lat}, {lon}")
-            return {
-                'forecast': f'Weather API error - Location not found for {lat:.3f}, {lon:.3f}',
-                'clothing': 'Please check weather forecast and dress appropriately for outdoor work.'
-            }
-        
-        response.raise_for_status()
-        
-        try:
-            data = response.json()
-        except ValueError as e:
-            logger.error(f"Weather API: Invalid JSON response: {str(e)}")
-            logger.error(f"Response content: {response.text[:500]}...")
-            return {
-                'forecast': 'Weather API error - Invalid response format',
-                'clothing': 'Please check weather forecast and dress appropriately for outdoor work.'
-            }
-        
-        # Check if API returned an error in the JSON
-        if 'cod' in data and str(data['cod']) != '200':
-            error_msg = data.get('message', 'Unknown API error')
-            logger.error(f"Weather API error in response: {data['cod']} - {error_msg}")
-            return {
-                'forecast': f'Weather API error - {error_msg}',
-                'clothing': 'Please check weather forecast and dress appropriately for outdoor work.'
-            }
-        
+
+    try:
+        # Cached per ~2km grid cell by the shared weather service
+        data = weather_service.forecast(lat, lon)
+
         # Check if we have forecast data
-        if 'list' not in data or not data['list']:
+        if not data.get('list'):
             logger.error("Weather API: No forecast data in response")
-            logger.error(f"Response data keys: {list(data.keys())}")
             return {
                 'forecast': 'Weather API error - No forecast data available',
                 'clothing': 'Please check weather forecast and dress appropriately for outdoor work.'
@@ -403,34 +411,6 @@ def get_weather_forecast(lat, lon, arrival_time):
             logger.info(f"Available forecast range: {first_forecast} to {last_forecast}")
             logger.info(f"Total forecast entries: {len(data['list'])}")
         
-        # Check if arrival time is within forecast range
-        arrival_date = arrival_time.date()
-        today = datetime.utcnow().date()
-        days_from_now = (arrival_date - today).days
-        
-        logger.info(f"Job date: {arrival_date}, Today: {today}, Days from now: {days_from_now}")
-        
-        if days_from_now > 5:
-            logger.warning(f"Job is {days_from_now} days away, beyond 5-day forecast limit")
-            # Provide seasonal guidance for future jobs
-            job_month = arrival_date.month
-            job_day_name = calendar.day_name[arrival_date.weekday()]
-            
-            # UK seasonal clothing recommendations
-            if job_month in [12, 1, 2]:  # Winter
-                seasonal_clothing = "Winter clothing likely needed: Heavy coat, gloves, and warm layers."
-            elif job_month in [3, 4, 5]:  # Spring  
-                seasonal_clothing = "Spring clothing likely needed: Light jacket or layers for variable weather."
-            elif job_month in [6, 7, 8]:  # Summer
-                seasonal_clothing = "Summer clothing likely needed: Light, breathable work clothes."
-            else:  # Autumn
-                seasonal_clothing = "Autumn clothing likely needed: Warm jacket and layers."
-            
-            return {
-                'forecast': f'Weather forecast unavailable - Job is {days_from_now} days away ({job_day_name} {arrival_date.strftime("%d %b %Y")})',
-                'clothing': f'{seasonal_clothing} Check forecast closer to the job date.'
-            }
-        
         for i, forecast in enumerate(data['list']):
             forecast_timestamp = forecast['dt']
             forecast_datetime = datetime.fromtimestamp(forecast_timestamp)
@@ -497,7 +477,26 @@ def get_weather_forecast(lat, lon, arrival_time):
             'clothing': 'Please check weather forecast and dress appropriately for outdoor work.'
         }
     except requests.exceptions.HTTPError as e:
-        logger.error(f"Weather API HTTP error: {str(e)} - Response: {e.response.text if e.response else 'No response'}")
+        status_code = e.response.status_code if e.response is not None else None
+        if status_code == 401:
+            logger.error("Weather API: Invalid API key (401 Unauthorized)")
+            return {
+                'forecast': 'Weather API error - Invalid API key',
+                'clothing': 'Please check weather forecast and dress appropriately for outdoor work.'
+            }
+        elif status_code == 429:
+            logger.error("Weather API: Rate limit exceeded (429 Too Many Requests)")
+            return {
+                'forecast': 'Weather API error - Rate limit exceeded',
+                'clothing': 'Please check weather forecast and dress appropriately for outdoor work.'
+            }
+        elif status_code == 404:
+            logger.error(f"Weather API: Location not found (404) for coordinates {lat}, {lon}")
+            return {
+                'forecast': f'Weather API error - Location not found for {lat:.3f}, {lon:.3f}',
+                'clothing': 'Please check weather forecast and dress appropriately for outdoor work.'
+            }
+        logger.error(f"Weather API HTTP error: {str(e)} - Response: {e.response.text if e.response is not None else 'No response'}")
         return {
             'forecast': f'Weather API HTTP error - {e.response.status_code if e.response else "Unknown"}',
             'clothing': 'Please check weather forecast and dress appropriately for outdoor work.'
@@ -662,6 +661,101 @@ def convert_address_to_coords():
         logger.error(f"Geocoding error: {str(e)}")
         return jsonify({'error': 'An unexpected error occurred during geocoding.'}), 500
 
+@jobs_bp.route('/jobs/nearby', methods=['GET'])
+@jwt_required()
+def get_nearby_jobs():
+    """Jobs near a point (lat, lng, radius_km or k) or inside a map bbox (admin only).
+
+    Optional `status` filters by job status (comma separated).
+    """
+    current_user = require_admin()
+    if not current_user:
+        return jsonify({'error': 'Access denied. Admin role required.'}), 403
+
+    query = Job.query
+    statuses = [s.strip() for s in (request.args.get('status') or '').split(',') if s.strip()]
+    if statuses:
+        query = query.filter(Job.status.in_(statuses))
+    try:
+        hits = geo_query(Job, request.args, query=query)
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    results = []
+    for job, distance in hits:
+        results.append({
+            'id': job.id,
+            'title': job.title,
+            'job_type': job.job_type,
+            'address': job.address,
+            'postcode': job.postcode,
+            'arrival_time': job.arrival_time.isoformat() if job.arrival_time else None,
+            'status': job.status,
+            'agents_required': job.agents_required,
+            'latitude': job.latitude,
+            'longitude': job.longitude,
+            'distance_km': round(distance, 3) if distance is not None else None,
+        })
+    return jsonify({'jobs': results, 'count': len(results)}), 200
+
+@jobs_bp.route('/jobs/dispatch', methods=['POST'])
+@jwt_required()
+def batch_dispatch_jobs():
+    """Assign agents to several open jobs at once (admin only).
+
+    Body: job_ids (defaults to upcoming open jobs with no offers yet), dry_run,
+    time_budget_ms and optional scoring weights. Offers go only to the chosen agents.
+    """
+    current_user = require_admin()
+    if not current_user:
+        return jsonify({'error': 'Access denied. Admin role required.'}), 403
+
+    data = request.get_json(silent=True) or {}
+    try:
+        job_ids = [int(j) for j in (data.get('job_ids') or [])]
+        time_budget_ms = int(data.get('time_budget_ms', DEFAULT_TIME_BUDGET_MS))
+        weights = {k: float(v) for k, v in (data.get('weights') or {}).items()}
+    except (TypeError, ValueError, AttributeError):
+        return jsonify({'error': 'Invalid dispatch payload'}), 400
+    dry_run = bool(data.get('dry_run', False))
+
+    if job_ids:
+        jobs = Job.query.filter(Job.id.in_(job_ids), Job.status == 'open').all()
+    else:
+        offered = db.session.query(JobAssignment.job_id)
+        jobs = Job.query.filter(
+            Job.status == 'open',
+            Job.arrival_time >= datetime.utcnow(),
+            ~Job.id.in_(offered),
+        ).all()
+    if not jobs:
+        return jsonify({'error': 'No open jobs to dispatch'}), 404
+
+    try:
+        plan = dispatch_jobs(jobs, dry_run=dry_run, time_budget_ms=time_budget_ms, weights=weights)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Batch dispatch failed: {str(e)}")
+        return jsonify({'error': 'Failed to dispatch jobs'}), 500
+
+    if not dry_run and plan['assignments']:
+        jobs_by_id = {j.id: j for j in jobs}
+        agents_by_job = {}
+        for a in plan['assignments']:
+            agents_by_job.setdefault(a['job_id'], []).append(a['agent_id'])
+        for job_id, agent_ids in agents_by_job.items():
+            _notify_job_offer(jobs_by_id[job_id], agent_ids)
+        # Persist push bookkeeping (expired subscriptions, dead FCM tokens)
+        db.session.commit()
+
+    for a in plan['assignments']:
+        a['cost'] = round(a['cost'], 4)
+        if a['distance_km'] is not None:
+            a['distance_km'] = round(a['distance_km'], 2)
+    plan['total_cost'] = round(plan['total_cost'], 4)
+    plan['dry_run'] = dry_run
+    return jsonify(plan), 200 if dry_run else 201
+
 @jobs_bp.route('/jobs/<int:job_id>', methods=['PUT'])
 @jwt_required()
 def update_job(job_id):
@@ -809,14 +903,13 @@ def delete_job(job_id):
         # Delete related assignments first
         assignments_count = JobAssignment.query.filter_by(job_id=job_id).count()
         logger.info(f"Deleting {assignments_count} job assignments for job {job_id}")
-        JobAssignment.query.filter_by(job_id=job_id).delete()
+        delete_assignments(JobAssignment.job_id == job_id)
         
-        # Delete related notifications
-        from src.models.user import Notification
-        notifications_count = Notification.query.filter_by(job_id=job_id).count()
+        # Delete related notifications (unread ones come off the agents' badge counters)
+        from src.models.user import Notification, delete_notifications
+        notifications_count = delete_notifications(Notification.job_id == job_id)
         if notifications_count > 0:
-            logger.info(f"Deleting {notifications_count} notifications for job {job_id}")
-            Notification.query.filter_by(job_id=job_id).delete()
+            logger.info(f"Deleted {notifications_count} notifications for job {job_id}")
         
         # Delete related invoice jobs
         from src.models.user import InvoiceJob
@@ -907,11 +1000,13 @@ def create_job():
             logger.warning(f"Admin broadcast (job created) failed: {_e}")
 
         # Optional targeting controls (admin-only). Default notify_all=True.
+        # hold_for_dispatch leaves the job without offers for POST /jobs/dispatch.
         notify_all = True
         target_agent_ids = []
+        hold_for_dispatch = bool(data.get('hold_for_dispatch', False))
         try:
             notify_all = bool(data.get('notify_all', True))
-            if not notify_all:
+            if not notify_all and not hold_for_dispatch:
                 target_agent_ids = [int(a) for a in (data.get('notify_agents') or []) if str(a).isdigit()]
                 if len(target_agent_ids) == 0:
                     return jsonify({'error': 'notify_agents is required when notify_all is false'}), 400
@@ -925,7 +1020,9 @@ def create_job():
         print(f"[DEBUG] Looking for available agents for job date: {job_date} (day_of_week: {day_of_week})")
         logger.error(f"[DEBUG] Looking for available agents for job date: {job_date} (day_of_week: {day_of_week})")
 
-        if notify_all:
+        if hold_for_dispatch:
+            available_agents = []
+        elif notify_all:
             # Broadcast mode: respect availability window as before
             available_agents = db.session.query(User) \
                 .outerjoin(AgentAvailability, and_(AgentAvailability.agent_id == User.id, AgentAvailability.date == job_date)) \
@@ -985,7 +1082,7 @@ def create_job():
         print(f"[DEBUG] Found {len(available_agents)} available agents: {[agent.id for agent in available_agents]}")
         logger.error(f"[DEBUG] Found {len(available_agents)} available agents: {[agent.id for agent in available_agents]}")
 
-        if not available_agents:
+        if not available_agents and not hold_for_dispatch:
             print("[DEBUG] No available agents found for the job date - returning early without creating notifications")
             logger.error("[DEBUG] No available agents found for the job date - returning early without creating notifications")
             db.session.commit()
@@ -1042,11 +1139,7 @@ def create_job():
             print(f"[DEBUG] Creating notifications for {len(assigned_agent_ids)} assigned agents: {assigned_agent_ids}")
             logger.error(f"[DEBUG] Creating notifications for {len(assigned_agent_ids)} assigned agents: {assigned_agent_ids}")
             notification_title = "New Job Available"
-            notification_message = f"A new job at '{new_job.address}' is available for your response."
-            
-            # Include Google Maps link in notification if available
-            if new_job.maps_link:
-                notification_message += f"\n\nNavigation: {new_job.maps_link}"
+            notification_message = offer_message(new_job)
             
             # Create database notification records for each assigned agent
             notifications_created = 0
@@ -1072,42 +1165,6 @@ def create_job():
             print(f"[DEBUG] Created {notifications_created} notifications, about to commit to database")
             logger.error(f"[DEBUG] Created {notifications_created} notifications, about to commit to database")
             
-            # Send push notifications
-            try:
-                # Only push to assigned (targeted) agent IDs
-                trigger_push_notification_for_users(assigned_agent_ids, notification_title, notification_message)
-            except Exception as e:
-                logger.warning(f"Failed to send push notifications: {str(e)}")
-            
-            # Send Telegram notifications to all assigned agents
-            try:
-                from src.services.notifications import notify_job_assignment
-                # Prepare comprehensive job data for notification
-                job_notification_data = {
-                    'title': new_job.title,
-                    'job_type': new_job.job_type,
-                    'address': new_job.address,
-                    'postcode': new_job.postcode,
-                    'arrival_time': new_job.arrival_time.strftime('%Y-%m-%d %H:%M'),
-                    'agents_required': new_job.agents_required,
-                    'hourly_rate': float(new_job.hourly_rate) if new_job.hourly_rate else None,
-                    'instructions': new_job.instructions,
-                    'urgency_level': new_job.urgency_level,
-                    'lead_agent_name': new_job.lead_agent_name,
-                    'number_of_dwellings': new_job.number_of_dwellings,
-                    'police_liaison_required': new_job.police_liaison_required,
-                    'what3words_address': new_job.what3words_address,
-                    'location_lat': new_job.location_lat,
-                    'location_lng': new_job.location_lng,
-                    'maps_link': new_job.maps_link
-                }
-                
-                for agent_id in assigned_agent_ids:
-                    notify_job_assignment(agent_id=agent_id, job_data=job_notification_data)
-                    
-                logger.info(f"Comprehensive Telegram notifications sent to {len(assigned_agent_ids)} agents for new job")
-            except Exception as e:
-                logger.warning(f"Failed to send Telegram notifications: {str(e)}")
         else:
             logger.warning("No assigned agent IDs found, skipping notification creation")
 
@@ -1162,39 +1219,22 @@ def create_job():
             db.session.rollback()
             raise
 
-        # Send Telegram notifications to all assigned agents
-        try:
-            from src.services.notifications import notify_job_assignment
-            # Prepare comprehensive job data for notification
-            job_notification_data = {
-                'title': new_job.title,
-                'job_type': new_job.job_type,
-                'job_type_label': get_job_type_label(new_job.job_type),
-                'address': new_job.address,
-                'postcode': new_job.postcode,
-                'arrival_time': new_job.arrival_time.strftime('%Y-%m-%d %H:%M'),
-                'agents_required': new_job.agents_required,
-                'hourly_rate': float(new_job.hourly_rate) if new_job.hourly_rate else None,
-                'instructions': new_job.instructions,
-                'urgency_level': new_job.urgency_level,
-                'lead_agent_name': new_job.lead_agent_name,
-                'police_liaison_required': new_job.police_liaison_required,
-                'maps_link': new_job.maps_link,
-                'location_lat': new_job.location_lat,
-                'location_lng': new_job.location_lng
-            }
-            
-            for agent_id in assigned_agent_ids:
-                try:
-                    notify_job_assignment(agent_id, job_notification_data)
-                except Exception as e:
-                    logger.warning(f"Failed to send Telegram notification to agent {agent_id}: {str(e)}")
-        except Exception as e:
-            logger.warning(f"Failed to send Telegram notifications: {str(e)}")
+        # Push and Telegram the offer to the assigned agents, then persist push bookkeeping
+        if assigned_agent_ids:
+            _notify_job_offer(new_job, assigned_agent_ids)
+            db.session.commit()
 
         # Log successful job creation
         logger.info(f"Job at '{new_job.address}' created by admin {current_user.id} and assigned to {len(assigned_agent_ids)} agents")
 
+        if hold_for_dispatch:
+            return jsonify({
+                'message': 'Job created and held for batch dispatch.',
+                'job': new_job.to_dict(),
+                'assigned_agents': 0,
+                'available_agents': 0
+            }), 201
+
         return jsonify({
             'message': f'Job created successfully and assigned to {len(assigned_agent_ids)} available agents.',
             'job': new_job.to_dict(),
@@ -1241,10 +1281,12 @@ def respond_to_assignment(assignment_id):
         if assignment.status != 'pending':
             return jsonify({'error': 'This assignment has already been responded to.'}), 409
         
-        # Update assignment status
-        assignment.status = 'accepted' if response in ['accept', 'accepted'] else 'declined'
-        assignment.response_time = datetime.utcnow()
-        
+        # Decline: conditional update so a concurrent response can't be overwritten
+        if response not in ['accept', 'accepted']:
+            if not decline_assignment(assignment):
+                db.session.rollback()
+                return jsonify({'error': 'This assignment has already been responded to.'}), 409
+
         # If accepted, supplier validation and metadata
         if response in ['accept', 'accepted']:
             job = assignment.job
@@ -1268,11 +1310,16 @@ def respond_to_assignment(assignment_id):
                         return jsonify({'error': 'Not authorized to set supplier for this assignment'}), 403
             except Exception:
                 pass
-            accepted_count = JobAssignment.query.filter_by(
-                job_id=job.id, 
-                status='accepted'
-            ).count()
-            
+
+            # Claim a slot atomically; the job flips to filled in the same transaction
+            outcome = accept_assignment(assignment)
+            if outcome == SLOT_NOT_PENDING:
+                db.session.rollback()
+                return jsonify({'error': 'This assignment has already been responded to.'}), 409
+            if outcome == SLOT_FULL:
+                db.session.commit()
+                return jsonify({'error': 'Positions already filled', 'assignment': assignment.to_dict()}), 409
+
             # Admin: notify acceptance
             try:
                 agent_name = f"{current_user.first_name} {current_user.last_name}".strip()
@@ -1293,8 +1340,7 @@ def respond_to_assignment(assignment_id):
             except Exception as _e:
                 logger.warning(f"Admin acceptance notify failed: {_e}")
 
-            if accepted_count >= job.agents_required:
-                job.status = 'filled'
+            if outcome == SLOT_FILLED:
                 # Admin: notify job filled with agent list
                 try:
                     accepted = JobAssignment.query.filter_by(job_id=job.id, status='accepted').all()
@@ -1593,31 +1639,24 @@ def search_jobs():
         limit = min(int(request.args.get('limit', 20)), 100)  # Max 100 results
         page = max(int(request.args.get('page', 1)), 1)
 
-        # Build search query
-        search_filter = None
-        if query:
-            search_terms = [f"%{term}%" for term in query.split() if term]
-            if search_terms:
-                search_conditions = []
-                # Search in reference, address, site_name, town, city, postcode
-                for field in ['reference', 'address', 'site_name', 'town', 'city', 'postcode']:
-                    for term in search_terms:
-                        search_conditions.append(getattr(Job, field).ilike(term))
-                search_filter = or_(*search_conditions)
-
         # Base query
         q = Job.query
         # Show all jobs that aren't completed (open, filled, allocated, etc.)
         q = q.filter(Job.status.in_(['open', 'filled', 'allocated']))
-        if search_filter is not None:
-            q = q.filter(search_filter)
+        ordering = [Job.created_at.desc()]
+
+        # Full-text match on title, address, postcode and job number, best matches first
+        hits = search.hits('job', query)
+        if hits is not None:
+            q = q.join(hits, hits.c.entity_id == Job.id)
+            ordering.insert(0, hits.c.rank)
 
         # Get total count for pagination
         total = q.count()
 
         # Apply pagination and ordering
         jobs = (
-            q.order_by(Job.created_at.desc())
+            q.order_by(*ordering)
             .offset((page - 1) * limit)
             .limit(limit)
             .all()
@@ -1628,10 +1667,9 @@ def search_jobs():
         logger.info(f"DEBUG: Found {len(jobs)} jobs matching search criteria")
         for job in jobs:
             try:
-                logger.info(f"DEBUG: Job {job.id} - status: {job.status} - address: {getattr(job, 'address', 'N/A')}")
                 items.append({
                     'id': job.id,
-                    'reference': job.reference,
+                    'reference': getattr(job, 'reference', None) or f"Job {job.id}",
                     'address': _admin_location(job),
                     'site_name': getattr(job, 'site_name', None),
                     'town': getattr(job, 'town', None),
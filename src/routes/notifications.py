@@ -1,9 +1,10 @@
 import os
 import json
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, Response, jsonify, request, current_app, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.models.user import User, Notification, PushSubscription, db
-from pywebpush import webpush, WebPushException
+from src.services import notification_stream
+from src.services.web_push import send_web_push
 
 notifications_bp = Blueprint('notifications', __name__)
 
@@ -73,37 +74,18 @@ def trigger_push_notification_for_users(user_ids, title, message):
 
 def _send_legacy_web_push(user_ids, title, message):
     """Legacy Web Push implementation"""
-    subscriptions = PushSubscription.query.filter(PushSubscription.user_id.in_(user_ids)).all()
-    
-    # Prepare data payload
-    notification_payload = json.dumps({
-        'title': title,
-        'body': message
-    })
-
     # Get VAPID keys from app config
     vapid_private_key = current_app.config.get('VAPID_PRIVATE_KEY')
-    vapid_claims = {"sub": "mailto:your_email@example.com"} # Change this to your admin email
+    vapid_subject = current_app.config.get('VAPID_CLAIM_SUB', 'mailto:your_email@example.com')
 
     if not vapid_private_key:
         print("Warning: VAPID_PRIVATE_KEY is not set. Cannot send legacy web push notifications.")
         return
 
-    for sub in subscriptions:
-        try:
-            webpush(
-                subscription_info=json.loads(sub.subscription_json),
-                data=notification_payload,
-                vapid_private_key=vapid_private_key,
-                vapid_claims=vapid_claims
-            )
-        except WebPushException as ex:
-            # This can happen if a subscription is expired or invalid
-            print(f"Web Push Failed for sub ID {sub.id}: {ex}")
-            # Optional: Delete the invalid subscription
-            if ex.response and ex.response.status_code == 410:
-                 db.session.delete(sub)
-                 db.session.commit()
+    result = send_web_push(user_ids, title, message, vapid_private_key, vapid_subject)
+    if result['subscriptions']:
+        current_app.logger.info("Web Push notifications sent", extra={"event": "web_push", **result})
+    return result
 
 def _send_fcm_notifications(user_ids, title, message):
     """Send FCM push notifications"""
@@ -129,12 +111,51 @@ def _send_fcm_notifications(user_ids, title, message):
 @notifications_bp.route('/notifications', methods=['GET'])
 @jwt_required()
 def get_notifications():
-    """Get user notifications."""
+    """Get user notifications; `since_id` returns only rows newer than that id."""
     current_user_id = get_jwt_identity()
-    notifications = Notification.query.filter_by(user_id=current_user_id).order_by(Notification.sent_at.desc()).limit(50).all()
+    query = Notification.query.filter_by(user_id=current_user_id)
+    since_id = request.args.get('since_id', type=int)
+    if since_id is not None:
+        query = query.filter(Notification.id > since_id)
+    notifications = query.order_by(Notification.sent_at.desc()).limit(50).all()
     return jsonify([n.to_dict() for n in notifications])
 
 
+@notifications_bp.route('/notifications/unread-count', methods=['GET'])
+@jwt_required()
+def get_unread_count():
+    """Unread badge count from the maintained counter."""
+    current_user_id = get_jwt_identity()
+    unread = db.session.query(User.unread_notifications).filter(User.id == current_user_id).scalar()
+    return jsonify({'unread': unread or 0})
+
+
+@notifications_bp.route('/notifications/stream', methods=['GET'])
+@jwt_required()
+def stream_notifications():
+    """Server-Sent Events stream of new notifications and unread counts.
+
+    Resumes after the `Last-Event-ID` header (or `last_event_id` query
+    parameter) when given.
+    """
+    current_user_id = int(get_jwt_identity())
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({'error': 'Invalid Last-Event-ID'}), 400
+
+    subscription = notification_stream.broker.subscribe(current_user_id)
+    if subscription is None:
+        return (jsonify({'error': 'Too many open notification streams, retry shortly'}), 503,
+                {'Retry-After': str(notification_stream.BUSY_RETRY_SECONDS)})
+    response = Response(stream_with_context(notification_stream.event_stream(subscription, last_event_id)),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @notifications_bp.route('/notifications/<int:notification_id>/read', methods=['PUT'])
 @jwt_required()
 def mark_notification_read(notification_id):
@@ -151,9 +172,9 @@ def mark_notification_read(notification_id):
 def mark_all_notifications_read():
     """Mark all notifications for the current user as read."""
     current_user_id = get_jwt_identity()
-    updated = Notification.query.filter_by(user_id=current_user_id, is_read=False).update({Notification.is_read: True})
+    updated = notification_stream.mark_all_read(current_user_id)
     db.session.commit()
-    return jsonify({'message': 'All notifications marked as read', 'updated': int(updated or 0)}), 200
+    return jsonify({'message': 'All notifications marked as read', 'updated': updated}), 200
 
 @notifications_bp.route('/notifications/<int:notification_id>', methods=['DELETE'])
 @jwt_required()
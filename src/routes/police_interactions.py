@@ -6,6 +6,7 @@ from datetime import datetime
 from src.extensions import db
 from src.models.user import User, Job, JobAssignment
 from src.models.police_interaction import PoliceInteraction
+from src.services import search
 
 bp = Blueprint('police_interactions', __name__)
 
@@ -39,8 +40,12 @@ def list_interactions():
         q = q.filter(PoliceInteraction.force.ilike(f"%{force}%"))
     if outcome:
         q = q.filter(PoliceInteraction.outcome.ilike(f"%{outcome}%"))
-    if job_address:
-        q = q.filter(PoliceInteraction.job_address.ilike(f"%{job_address}%"))
+    # Address and free-text search go through the full-text index, best matches first
+    ordering = [PoliceInteraction.created_at.desc()]
+    hits = search.hits('police_interaction', ' '.join(filter(None, [job_address, request.args.get('q')])))
+    if hits is not None:
+        q = q.join(hits, hits.c.entity_id == PoliceInteraction.id)
+        ordering.insert(0, hits.c.rank)
     if helpfulness:
         try:
             q = q.filter(PoliceInteraction.helpfulness == int(helpfulness))
@@ -72,7 +77,7 @@ def list_interactions():
 
     page = max(int(request.args.get('page', 1)), 1)
     per_page = min(max(int(request.args.get('per_page', 20)), 1), 100)
-    items = q.order_by(PoliceInteraction.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
+    items = q.order_by(*ordering).paginate(page=page, per_page=per_page, error_out=False)
     return jsonify({
         'items': [i.to_dict() for i in items.items],
         'page': items.page,
@@ -0,0 +1,52 @@
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import get_jwt, get_jwt_identity, jwt_required
+
+from src.models.crm_user import CRMUser
+from src.models.user import User
+from src.services import search
+
+search_bp = Blueprint('search', __name__)
+
+
+def _allowed_entities():
+    """Which indexes the caller may search, and the CRM owner to scope contacts to."""
+    identity = get_jwt_identity()
+    if get_jwt().get('crm_user'):
+        crm_user = CRMUser.query.get(int(identity))
+        if not crm_user:
+            return None, None
+        return ['crm_contact'], (None if crm_user.is_super_admin else crm_user.id)
+    user = User.query.get(int(identity))
+    if not user:
+        return None, None
+    if user.role in ('admin', 'manager'):
+        return ['job', 'police_interaction'], None
+    return ['police_interaction'], None
+
+
+@search_bp.route('/search', methods=['GET'])
+@jwt_required()
+def unified_search():
+    """
+    Ranked search across the indexes the caller can see.
+    Query params:
+    - q: search text; every word is matched as a prefix
+    - types: comma-separated subset of job, police_interaction, crm_contact
+    - limit: results per type (default 10, max 50)
+    """
+    allowed, owner_id = _allowed_entities()
+    if allowed is None:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    query = request.args.get('q', '').strip()
+    requested = [t for t in request.args.get('types', '').split(',') if t]
+    entities = [e for e in allowed if e in requested] if requested else allowed
+    try:
+        limit = min(max(int(request.args.get('limit', 10)), 1), 50)
+    except ValueError:
+        return jsonify({'error': 'limit must be a number'}), 400
+
+    return jsonify({
+        'query': query,
+        'results': search.search(query, entities, owner_id=owner_id, limit=limit),
+    })
@@ -1,7 +1,8 @@
 from flask import Blueprint, request, current_app, jsonify
 from flask_jwt_extended import jwt_required, get_current_user
-from src.models.user import User, db
-from src.integrations.telegram_client import send_message, get_bot_info
+from src.models.user import db
+from src.integrations.telegram_client import get_bot_info
+from src.services import telegram_updates
 import logging
 import string
 import random
@@ -13,7 +14,10 @@ agent_telegram_bp = Blueprint("agent_telegram", __name__, url_prefix="/api/agent
 @telegram_bp.route("/<secret>", methods=["POST"])
 def webhook(secret):
     """
-    Handle Telegram webhook updates
+    Receive Telegram webhook updates
+    
+    Updates are stored keyed by update_id and handled in the background by
+    src/services/telegram_updates.py; a redelivered update is a no-op.
     
     Args:
         secret: URL path secret for basic webhook validation
@@ -26,171 +30,24 @@ def webhook(secret):
         current_app.logger.warning(f"Invalid webhook secret attempt: {secret}")
         return jsonify({"error": "forbidden"}), 403
     
-    # Parse update data
+    # Store the raw update and answer at once; handling happens off the request
     update = request.get_json(silent=True) or {}
-    message = update.get("message") or {}
-    chat = message.get("chat") or {}
-    text = (message.get("text") or "").strip()
-    
-    chat_id = str(chat.get("id", "")) if chat.get("id") else None
-    username = chat.get("username")
-    
+    chat_id = telegram_updates.chat_of(update)
     if not chat_id:
         current_app.logger.warning("Webhook received without chat_id")
         return jsonify({"ok": True})
-    
-    current_app.logger.info(f"Telegram webhook: chat_id={chat_id}, username={username}, text='{text}'")
-    
-    # Handle /start command with linking token
-    if text.startswith("/start"):
-        parts = text.split()
-        token = parts[1] if len(parts) > 1 else None
-
-        if token:
-            # Try to find agent first, then CRM user
-            agent = User.query.filter_by(telegram_link_code=token).first()
-
-            if not agent:
-                # Check if it's a CRM user
-                from src.models.crm_user import CRMUser
-                crm_user = CRMUser.query.filter_by(telegram_link_code=token).first()
 
-                if crm_user:
-                    # Link the CRM user's Telegram account
-                    crm_user.telegram_chat_id = chat_id
-                    crm_user.telegram_username = username
-                    crm_user.telegram_link_code = None  # Clear the token
-                    crm_user.telegram_opt_in = True
-
-                    try:
-                        db.session.commit()
-                        current_app.logger.info(f"Telegram linked for CRM user {crm_user.id}: {username}")
-
-                        # Send confirmation message
-                        welcome_msg = "✅ Telegram successfully linked to your CRM account! You will now receive task reminders here."
-                        send_message(chat_id, welcome_msg)
-
-                    except Exception as e:
-                        db.session.rollback()
-                        current_app.logger.error(f"Database error linking Telegram for CRM user {crm_user.id}: {str(e)}")
-                        send_message(chat_id, "❌ Sorry, there was an error linking your account. Please try again.")
-                    return jsonify({"ok": True})
-
-            if agent:
-                # Link the agent's Telegram account
-                agent.telegram_chat_id = chat_id
-                agent.telegram_username = username
-                agent.telegram_link_code = None  # Clear the token
-                agent.telegram_opt_in = True
-                
-                try:
-                    db.session.commit()
-                    current_app.logger.info(f"Telegram linked for agent {agent.id}: {username}")
-                    
-                    # Send confirmation message
-                    welcome_msg = "✅ Telegram successfully linked! You will now receive job notifications here."
-                    send_message(chat_id, welcome_msg)
-                    
-                except Exception as e:
-                    db.session.rollback()
-                    current_app.logger.error(f"Database error linking Telegram for agent {agent.id}: {str(e)}")
-                    send_message(chat_id, "❌ Sorry, there was an error linking your account. Please try again.")
-            else:
-                current_app.logger.warning(f"Invalid or expired link token: {token}")
-                send_message(chat_id, "⚠️ Link token is invalid or expired. Please get a new link from the app.")
+    try:
+        if telegram_updates.ingest(update):
+            telegram_updates.enqueue(chat_id)
         else:
-            # /start without token - check if already linked
-            existing_agent = User.query.filter_by(telegram_chat_id=chat_id).first()
-            if existing_agent:
-                send_message(chat_id, "✅ Your Telegram is already linked to your V3 Services account.")
-            else:
-                # Provide clear instructions and bot username for deep-linking
-                bot_username = "V3JobsBot"
-                try:
-                    bot_info = get_bot_info()
-                    if bot_info.get("ok") and "result" in bot_info:
-                        bot_username = bot_info["result"].get("username", bot_username)
-                except Exception as e:
-                    current_app.logger.warning(f"Could not get bot username for /start instructions: {str(e)}")
-
-                send_message(
-                    chat_id,
-                    (
-                        "👋 Welcome! To link your Telegram account, go back to the V3 Services app and tap “Link Telegram”.\n\n"
-                        "It will show a button that opens this chat with your one-time code.\n\n"
-                        f"If needed, you can also send: /start <your_code> to @{bot_username}"
-                    )
-                )
-    
-    # Handle /link command
-    elif text.startswith("/link"):
-        parts = text.split()
-        token = parts[1] if len(parts) > 1 else None
-
-        if token:
-            # Try to find agent first, then CRM user
-            agent = User.query.filter_by(telegram_link_code=token).first()
-
-            if not agent:
-                # Check if it's a CRM user
-                from src.models.crm_user import CRMUser
-                crm_user = CRMUser.query.filter_by(telegram_link_code=token).first()
-
-                if crm_user:
-                    # Link the CRM user's Telegram account
-                    crm_user.telegram_chat_id = chat_id
-                    crm_user.telegram_username = username
-                    crm_user.telegram_link_code = None  # Clear the token
-                    crm_user.telegram_opt_in = True
-
-                    try:
-                        db.session.commit()
-                        current_app.logger.info(f"Telegram linked via /link for CRM user {crm_user.id}: {username}")
-
-                        # Send confirmation message
-                        welcome_msg = "✅ Linked to your CRM account! You will now receive task reminders here."
-                        send_message(chat_id, welcome_msg)
-
-                    except Exception as e:
-                        db.session.rollback()
-                        current_app.logger.error(f"Database error linking Telegram via /link for CRM user {crm_user.id}: {str(e)}")
-                        send_message(chat_id, "❌ Sorry, there was an error linking your account. Please try again.")
-                    return jsonify({"ok": True})
+            current_app.logger.info(f"Telegram update {update.get('update_id')} already received - skipping")
+    except Exception as e:
+        db.session.rollback()
+        # A non-200 makes Telegram redeliver, which is what we want if the update was not stored
+        current_app.logger.error(f"Failed to store Telegram update {update.get('update_id')}: {str(e)}")
+        return jsonify({"error": "unavailable"}), 503
 
-            if agent:
-                # Link the agent's Telegram account
-                agent.telegram_chat_id = chat_id
-                agent.telegram_username = username
-                agent.telegram_link_code = None  # Clear the token
-                agent.telegram_opt_in = True
-                
-                try:
-                    db.session.commit()
-                    current_app.logger.info(f"Telegram linked via /link for agent {agent.id}: {username}")
-                    
-                    # Send confirmation message
-                    welcome_msg = "✅ Linked! You will now receive job notifications here."
-                    send_message(chat_id, welcome_msg)
-                    
-                except Exception as e:
-                    db.session.rollback()
-                    current_app.logger.error(f"Database error linking Telegram via /link for agent {agent.id}: {str(e)}")
-                    send_message(chat_id, "❌ Sorry, there was an error linking your account. Please try again.")
-            else:
-                current_app.logger.warning(f"Invalid or expired link token via /link: {token}")
-                send_message(chat_id, "⚠️ Link code is invalid or expired. Please get a new code from the app.")
-        else:
-            send_message(chat_id, "⚠️ Please provide a link code: /link YOUR_CODE")
-    
-    # Handle other messages
-    elif text:
-        # Check if user is linked
-        existing_agent = User.query.filter_by(telegram_chat_id=chat_id).first()
-        if existing_agent:
-            send_message(chat_id, "📱 Your Telegram is linked to V3 Services. Job notifications will appear here automatically.")
-        else:
-            send_message(chat_id, "🔗 To receive job notifications, please link your Telegram account through the V3 Services app.")
-    
     return jsonify({"ok": True})
 
 # Public webhook under /api namespace to match external configuration
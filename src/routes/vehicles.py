@@ -9,6 +9,8 @@ import requests
 import os
 import json
 from datetime import datetime, timedelta
+from src.services.geo_index import geo_query
+from src.utils.geo import parse_lat_lng
 
 vehicles_bp = Blueprint('vehicles', __name__)
 
@@ -35,24 +37,43 @@ def add_sighting():
     if not data['address_seen'].strip():
          return jsonify({'error': 'Address or area seen cannot be empty.'}), 400
 
-    # TODO: Add coordinate handling back after proper database migration
-    # coordinates = data.get('coordinates')
-    # latitude = coordinates.get('lat') if coordinates else None
-    # longitude = coordinates.get('lng') if coordinates else None
+    coordinates = data.get('coordinates') or {}
+    latitude, longitude = parse_lat_lng(coordinates.get('lat'), coordinates.get('lng'))
 
     new_sighting = VehicleSighting(
         registration_plate=data['registration_plate'].upper().strip(),
         notes=data['notes'],
         is_dangerous=data['is_dangerous'],
         address_seen=data['address_seen'],
-        # latitude=latitude,  # TODO: Add back after migration
-        # longitude=longitude,  # TODO: Add back after migration
+        latitude=latitude,
+        longitude=longitude,
         agent_id=current_user_id
     )
     db.session.add(new_sighting)
     db.session.commit()
     return jsonify(new_sighting.to_dict()), 201
 
+@vehicles_bp.route('/vehicles/sightings/nearby', methods=['GET'])
+@jwt_required()
+def get_nearby_sightings():
+    """Sightings near a point (lat, lng, radius_km or k) or inside a map bbox."""
+    query = VehicleSighting.query
+    plate = request.args.get('registration_plate')
+    if plate:
+        query = query.filter(VehicleSighting.registration_plate == plate.upper().strip())
+    try:
+        hits = geo_query(VehicleSighting, request.args, query=query)
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    results = []
+    for sighting, distance in hits:
+        item = sighting.to_dict()
+        if distance is not None:
+            item['distance_km'] = round(distance, 3)
+        results.append(item)
+    return jsonify({'sightings': results, 'count': len(results)}), 200
+
 @vehicles_bp.route('/vehicles/<registration_plate>/details', methods=['GET'])
 @jwt_required()
 def get_vehicle_details(registration_plate):
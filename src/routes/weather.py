@@ -1,15 +1,11 @@
 from flask import Blueprint, jsonify, request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from src.models.user import User
+from src.services import weather as weather_service
 import requests
-import os
 
 weather_bp = Blueprint('weather', __name__)
 
-# OpenWeatherMap API configuration
-OPENWEATHER_API_KEY = os.environ.get('OPENWEATHER_API_KEY')
-OPENWEATHER_BASE_URL = "http://api.openweathermap.org/data/2.5"
-
 def require_agent_or_admin():
     """Ensure user is an agent or admin."""
     current_user_id = get_jwt_identity()
@@ -25,7 +21,7 @@ def get_weather_by_postcode(postcode):
         if not current_user:
             return jsonify({'error': 'User not found'}), 404
         
-        if not OPENWEATHER_API_KEY:
+        if not weather_service.api_key():
             return jsonify({
                 'error': 'Weather service not configured',
                 'weather': {
@@ -35,60 +31,23 @@ def get_weather_by_postcode(postcode):
                 }
             }), 200
         
-        # First, get coordinates from postcode using geocoding API
-        geocoding_url = f"{OPENWEATHER_BASE_URL}/geo/1.0/zip"
-        geocoding_params = {
-            'zip': f"{postcode},GB",
-            'appid': OPENWEATHER_API_KEY
-        }
-        
-        geocoding_response = requests.get(geocoding_url, params=geocoding_params)
-        
-        if geocoding_response.status_code != 200:
-            # Fallback: try direct weather lookup with postcode
+        # Coordinates for the postcode (cached), then current + forecast in parallel
+        geocoding_data = weather_service.geocode_postcode(postcode)
+        if not geocoding_data:
             return get_weather_fallback(postcode)
+        lat = geocoding_data['lat']
+        lon = geocoding_data['lon']
         
-        geocoding_data = geocoding_response.json()
-        lat = geocoding_data.get('lat')
-        lon = geocoding_data.get('lon')
-        
-        if not lat or not lon:
+        try:
+            current_data, forecast_data = weather_service.current_and_forecast(lat, lon)
+        except requests.HTTPError:
             return get_weather_fallback(postcode)
         
-        # Get current weather
-        current_weather_url = f"{OPENWEATHER_BASE_URL}/weather"
-        current_params = {
-            'lat': lat,
-            'lon': lon,
-            'appid': OPENWEATHER_API_KEY,
-            'units': 'metric'
-        }
-        
-        current_response = requests.get(current_weather_url, params=current_params)
-        
-        if current_response.status_code != 200:
-            return get_weather_fallback(postcode)
-        
-        current_data = current_response.json()
-        
-        # Get forecast
-        forecast_url = f"{OPENWEATHER_BASE_URL}/forecast"
-        forecast_params = {
-            'lat': lat,
-            'lon': lon,
-            'appid': OPENWEATHER_API_KEY,
-            'units': 'metric',
-            'cnt': 8  # Next 24 hours (3-hour intervals)
-        }
-        
-        forecast_response = requests.get(forecast_url, params=forecast_params)
-        forecast_data = forecast_response.json() if forecast_response.status_code == 200 else None
-        
         # Format response
         weather_info = {
             'location': {
                 'postcode': postcode,
-                'name': geocoding_data.get('name', postcode),
+                'name': geocoding_data.get('name') or postcode,
                 'lat': lat,
                 'lon': lon
             },
@@ -193,7 +152,7 @@ def get_weather_by_coordinates():
         if not lat or not lon:
             return jsonify({'error': 'Latitude and longitude are required'}), 400
         
-        if not OPENWEATHER_API_KEY:
+        if not weather_service.api_key():
             return jsonify({
                 'error': 'Weather service not configured',
                 'weather': {
@@ -203,18 +162,9 @@ def get_weather_by_coordinates():
                 }
             }), 200
         
-        # Get current weather
-        current_weather_url = f"{OPENWEATHER_BASE_URL}/weather"
-        params = {
-            'lat': lat,
-            'lon': lon,
-            'appid': OPENWEATHER_API_KEY,
-            'units': 'metric'
-        }
-        
-        response = requests.get(current_weather_url, params=params)
-        
-        if response.status_code != 200:
+        try:
+            data = weather_service.current_weather(lat, lon)
+        except requests.HTTPError:
             return jsonify({
                 'error': 'Weather data unavailable',
                 'weather': {
@@ -224,8 +174,6 @@ def get_weather_by_coordinates():
                 }
             }), 200
         
-        data = response.json()
-        
         weather_info = {
             'location': {
                 'lat': lat,
@@ -1,15 +1,12 @@
 from flask_apscheduler import APScheduler
-from datetime import datetime, date, timedelta
+from datetime import datetime, date, timedelta, timezone
 from src.models.user import db, User, AgentAvailability, AgentWeeklyAvailability, Notification
-from src.models.crm_task import CRMTask
-from src.models.crm_user import CRMUser
-from src.models.crm_contact import CRMContact
-import requests
-import os
 
 # Initialize scheduler
 scheduler = APScheduler()
 
+CRM_TASK_REMINDER_TICK_MINUTES = 1
+
 def set_daily_availability():
     """
     A scheduled job to run daily.
@@ -77,81 +74,105 @@ def send_weekly_reminders():
 
 def check_crm_task_reminders():
     """
-    A scheduled job that runs every 10 minutes to check for upcoming CRM tasks.
-    Sends Telegram notifications to users who have opted in.
+    A scheduled job that runs every minute (and at the exact time of the next
+    reminder, via a one-off timer it re-arms itself) to send CRM task reminders
+    through Telegram. See src/services/crm_task_notifications.py.
+    """
+    from src.services import crm_task_notifications
+    with scheduler.app.app_context():
+        result = crm_task_notifications.check_and_notify_due_tasks()
+        if result.get('tasks_checked'):
+            print(f"SCHEDULER: Sent {result['notifications_sent']} of {result['tasks_checked']} CRM task reminders")
+
+        # Fire the next reminder on time rather than at the following tick
+        next_at = crm_task_notifications.next_reminder_at()
+        if next_at is not None and next_at - datetime.utcnow() < timedelta(minutes=CRM_TASK_REMINDER_TICK_MINUTES):
+            scheduler.add_job(
+                id='crm_task_reminder_timer',
+                func=check_crm_task_reminders,
+                trigger='date',
+                run_date=max(next_at, datetime.utcnow()).replace(tzinfo=timezone.utc),
+                replace_existing=True
+            )
+
+def process_contact_form_pipeline():
+    """
+    A scheduled job that runs every 10 seconds to push contact-form submissions
+    whose next stage is due (delayed customer emails, retries, restarts).
+    """
+    from src.services import contact_intake
+    with scheduler.app.app_context():
+        queued = contact_intake.process_due()
+        if queued:
+            print(f"SCHEDULER: Queued {queued} contact form submissions")
+
+def process_invoice_finalisation():
+    """
+    A scheduled job that runs every 30 seconds to resume invoice finalisation
+    (PDF, S3 upload, email, notifications) for retries and restarts.
+    """
+    from src.services import invoice_finalisation
+    with scheduler.app.app_context():
+        queued = invoice_finalisation.process_due()
+        if queued:
+            print(f"SCHEDULER: Queued {queued} invoices for finalisation")
+
+def process_report_photo_thumbnails():
+    """
+    A scheduled job that runs every minute to queue report photo thumbnails
+    that are due for a retry or were interrupted by a restart.
+    """
+    from src.services import report_photos
+    with scheduler.app.app_context():
+        queued = report_photos.process_due()
+        if queued:
+            print(f"SCHEDULER: Queued {queued} report photos for thumbnails")
+
+def flush_email_outbox():
+    """
+    A scheduled job that runs every minute to wake the email outbox drainer
+    for retries and emails queued before a restart.
+    """
+    from src.services import mailer
+    mailer.wake(scheduler.app)
+
+def process_telegram_updates():
+    """
+    A scheduled job that runs every 10 seconds to handle Telegram updates
+    that are due for a retry or were received before a restart.
+    """
+    from src.services import telegram_updates
+    with scheduler.app.app_context():
+        queued = telegram_updates.process_due()
+        if queued:
+            print(f"SCHEDULER: Queued {queued} Telegram chats")
+
+def archive_expired_rows():
+    """
+    A scheduled job that runs nightly to move rows past their retention
+    period into the archive (see src/services/retention.py), and to drop
+    handled Telegram updates that are past any redelivery.
+    """
+    from src.services import retention, telegram_updates
+    with scheduler.app.app_context():
+        summary = retention.run()
+        if any(summary['archived'].values()):
+            print(f"SCHEDULER: Archived {summary['archived']} (complete={summary['complete']})")
+        pruned = telegram_updates.prune()
+        if pruned:
+            print(f"SCHEDULER: Pruned {pruned} handled Telegram updates")
+
+def geocode_agent_locations():
+    """
+    A scheduled job that runs every 5 minutes to geocode agent postcodes that
+    are new or have changed, so the ranked agent picker and batch dispatch
+    only ever read cached locations.
     """
+    from src.services import agent_ranking
     with scheduler.app.app_context():
-        print(f"SCHEDULER: Checking CRM task reminders at {datetime.now()}...")
-
-        # Get the Telegram bot token
-        bot_token = os.environ.get('TELEGRAM_BOT_TOKEN')
-        if not bot_token:
-            print("SCHEDULER: No Telegram bot token configured, skipping notifications")
-            return
-
-        # Get current time and time window (next 15 minutes)
-        now = datetime.now()
-        time_window_start = now
-        time_window_end = now + timedelta(minutes=15)
-
-        # Find all pending tasks due within the next 15 minutes
-        upcoming_tasks = CRMTask.query.filter(
-            CRMTask.status == 'pending',
-            CRMTask.due_date >= time_window_start,
-            CRMTask.due_date <= time_window_end
-        ).all()
-
-        print(f"SCHEDULER: Found {len(upcoming_tasks)} upcoming tasks")
-
-        notifications_sent = 0
-        for task in upcoming_tasks:
-            # Get the CRM user who owns this task
-            crm_user = CRMUser.query.get(task.crm_user_id)
-
-            if not crm_user:
-                continue
-
-            # Check if user has Telegram enabled and has a chat ID
-            if not crm_user.telegram_opt_in or not crm_user.telegram_chat_id:
-                print(f"SCHEDULER: User {crm_user.name} hasn't opted in to Telegram or no chat ID")
-                continue
-
-            # Get contact info if task is linked to a contact
-            contact_info = ""
-            if task.contact_id:
-                contact = CRMContact.query.get(task.contact_id)
-                if contact:
-                    contact_info = f"\n📋 Contact: {contact.name}"
-
-            # Format the due time
-            due_time = task.due_date.strftime("%H:%M")
-
-            # Create notification message
-            message = f"🔔 Task Reminder\n\n"
-            message += f"📝 {task.title}\n"
-            message += f"⏰ Due: {due_time}"
-            message += contact_info
-            if task.notes:
-                message += f"\n\n📄 Notes: {task.notes}"
-
-            # Send Telegram notification
-            try:
-                telegram_url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-                response = requests.post(telegram_url, json={
-                    'chat_id': crm_user.telegram_chat_id,
-                    'text': message,
-                    'parse_mode': 'HTML'
-                })
-
-                if response.status_code == 200:
-                    notifications_sent += 1
-                    print(f"SCHEDULER: Sent notification to {crm_user.name} for task: {task.title}")
-                else:
-                    print(f"SCHEDULER: Failed to send notification to {crm_user.name}: {response.text}")
-            except Exception as e:
-                print(f"SCHEDULER: Error sending Telegram notification: {str(e)}")
-
-        print(f"SCHEDULER: Sent {notifications_sent} Telegram notifications")
+        geocoded = agent_ranking.backfill_agent_locations()
+        if geocoded:
+            print(f"SCHEDULER: Geocoded {geocoded} agent postcodes")
 
 def init_scheduler(app):
     """Initializes and starts the scheduler, adding the jobs."""
@@ -182,7 +203,71 @@ def init_scheduler(app):
             id='crm_task_reminder_checker',
             func=check_crm_task_reminders,
             trigger='interval',
-            minutes=10 # Runs every 10 minutes to check for upcoming tasks
+            minutes=CRM_TASK_REMINDER_TICK_MINUTES, # Picks up new tasks; armed reminders fire on their own timer
+            max_instances=1
+        )
+
+    if not scheduler.get_job('contact_intake_sweeper'):
+        scheduler.add_job(
+            id='contact_intake_sweeper',
+            func=process_contact_form_pipeline,
+            trigger='interval',
+            seconds=10, # Due stages are picked up within 10 seconds
+            max_instances=1
+        )
+
+    if not scheduler.get_job('invoice_finalisation_sweeper'):
+        scheduler.add_job(
+            id='invoice_finalisation_sweeper',
+            func=process_invoice_finalisation,
+            trigger='interval',
+            seconds=30,
+            max_instances=1
+        )
+
+    if not scheduler.get_job('email_outbox_sweeper'):
+        scheduler.add_job(
+            id='email_outbox_sweeper',
+            func=flush_email_outbox,
+            trigger='interval',
+            minutes=1 # Retries are due in whole minutes
+        )
+
+    if not scheduler.get_job('report_photo_thumbnail_sweeper'):
+        scheduler.add_job(
+            id='report_photo_thumbnail_sweeper',
+            func=process_report_photo_thumbnails,
+            trigger='interval',
+            minutes=1,
+            max_instances=1
+        )
+
+    if not scheduler.get_job('telegram_update_sweeper'):
+        scheduler.add_job(
+            id='telegram_update_sweeper',
+            func=process_telegram_updates,
+            trigger='interval',
+            seconds=10,
+            max_instances=1
+        )
+
+    if not scheduler.get_job('agent_location_geocoder'):
+        scheduler.add_job(
+            id='agent_location_geocoder',
+            func=geocode_agent_locations,
+            trigger='interval',
+            minutes=5, # A changed postcode ranks by distance again within 5 minutes
+            max_instances=1
+        )
+
+    if not scheduler.get_job('retention_archiver'):
+        scheduler.add_job(
+            id='retention_archiver',
+            func=archive_expired_rows,
+            trigger='cron',
+            hour=3,
+            minute=30, # Quiet hours; a run stops after RETENTION_MAX_SECONDS and resumes the next night
+            max_instances=1
         )
 
     scheduler.start()
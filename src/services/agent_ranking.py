@@ -0,0 +1,448 @@
+"""
+Agent ranking service: incremental reliability stats and proximity-aware top-k picking.
+
+Per-agent counters live in `agent_stats` and are updated in the same flush as the
+JobAssignment insert/status change/delete that caused them, so ranking a roster never
+has to re-aggregate the assignments table; bulk deletes go through
+`delete_assignments()`. Agent postcodes are geocoded by a scheduled backfill (bulk
+postcodes.io lookup) and cached on the stats row, so ranking only reads.
+"""
+import heapq
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import requests
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from src.extensions import db
+from src.models.agent_stats import AgentStats
+from src.models.user import User, Job, JobAssignment, AgentAvailability, AgentWeeklyAvailability
+from src.utils.geo import haversine_km, parse_lat_lng
+
+logger = logging.getLogger(__name__)
+
+HALF_LIFE_DAYS = 30.0
+PRIOR_RATE = 0.5      # acceptance rate assumed for agents with no history
+PRIOR_WEIGHT = 3.0    # how many pseudo-offers the prior is worth
+DISTANCE_SCALE_KM = 15.0
+UNKNOWN_DISTANCE_SCORE = 0.25
+DEFAULT_WEIGHTS = {'distance': 0.45, 'reliability': 0.35, 'availability': 0.20}
+AVAILABILITY_SCORES = {'available': 1.0, 'weekly': 0.8, 'unknown': 0.5}
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+POSTCODES_BULK_URL = "https://api.postcodes.io/postcodes"
+GEOCODE_BATCH_SIZE = 100  # postcodes.io bulk limit
+
+
+# --- Incremental stats ---
+
+def _decay_factor(since: Optional[datetime], now: datetime) -> float:
+    if since is None or now <= since:
+        return 1.0
+    days = (now - since).total_seconds() / 86400.0
+    return 0.5 ** (days / HALF_LIFE_DAYS)
+
+
+def _apply_decay(stats: AgentStats, now: datetime) -> None:
+    factor = _decay_factor(stats.decayed_at, now)
+    stats.decayed_offered = (stats.decayed_offered or 0.0) * factor
+    stats.decayed_accepted = (stats.decayed_accepted or 0.0) * factor
+    stats.decayed_at = now
+
+
+def _new_stats(agent_id: int) -> AgentStats:
+    return AgentStats(
+        agent_id=agent_id,
+        offered_count=0, accepted_count=0, declined_count=0,
+        decayed_offered=0.0, decayed_accepted=0.0,
+    )
+
+
+def reliability_score(stats: Optional[AgentStats], now: Optional[datetime] = None) -> float:
+    """Smoothed, time-decayed acceptance rate in [0, 1]."""
+    if stats is None:
+        return PRIOR_RATE
+    factor = _decay_factor(stats.decayed_at, now or datetime.utcnow())
+    offered = (stats.decayed_offered or 0.0) * factor
+    accepted = (stats.decayed_accepted or 0.0) * factor
+    return (accepted + PRIOR_RATE * PRIOR_WEIGHT) / (offered + PRIOR_WEIGHT)
+
+
+def _empty_delta() -> Dict[str, float]:
+    return {'offered': 0, 'accepted': 0, 'declined': 0, 'decayed_offered': 0.0, 'decayed_accepted': 0.0}
+
+
+def _removal_deltas(rows: Iterable, now: datetime) -> Dict[int, Dict[str, float]]:
+    """Deltas that take (agent_id, status, created_at) assignments back out of the stats."""
+    deltas: Dict[int, Dict[str, float]] = {}
+    for agent_id, status, created_at in rows:
+        if agent_id is None:
+            continue
+        d = deltas.setdefault(agent_id, _empty_delta())
+        weight = _decay_factor(created_at, now) if created_at else 1.0
+        d['offered'] -= 1
+        d['decayed_offered'] -= weight
+        if status == 'accepted':
+            d['accepted'] -= 1
+            d['decayed_accepted'] -= weight
+        elif status == 'declined':
+            d['declined'] -= 1
+    return deltas
+
+
+def _assignment_deltas(session) -> Dict[int, Dict[str, float]]:
+    deltas: Dict[int, Dict[str, float]] = {}
+
+    def bump(agent_id, key, n=1):
+        if agent_id is None:
+            return
+        d = deltas.setdefault(agent_id, _empty_delta())
+        d[key] += n
+        if key in ('offered', 'accepted'):
+            d[f'decayed_{key}'] += n
+
+    for obj in session.new:
+        if isinstance(obj, JobAssignment):
+            bump(obj.agent_id, 'offered')
+            if obj.status == 'accepted':
+                bump(obj.agent_id, 'accepted')
+            elif obj.status == 'declined':
+                bump(obj.agent_id, 'declined')
+
+    for obj in session.dirty:
+        if not isinstance(obj, JobAssignment):
+            continue
+        hist = inspect(obj).attrs.status.history
+        if not hist.added:
+            continue
+        new = hist.added[0]
+        old = hist.deleted[0] if hist.deleted else None
+        if new == old:
+            continue
+        if old == 'accepted':
+            bump(obj.agent_id, 'accepted', -1)
+        elif old == 'declined':
+            bump(obj.agent_id, 'declined', -1)
+        if new == 'accepted':
+            bump(obj.agent_id, 'accepted')
+        elif new == 'declined':
+            bump(obj.agent_id, 'declined')
+
+    # Deleted rows leave with the status they were last flushed with
+    removed = [(obj.agent_id, inspect(obj).committed_state.get('status', obj.status), obj.created_at)
+               for obj in session.deleted if isinstance(obj, JobAssignment)]
+    for agent_id, d in _removal_deltas(removed, datetime.utcnow()).items():
+        total = deltas.setdefault(agent_id, _empty_delta())
+        for key, value in d.items():
+            total[key] += value
+    return deltas
+
+
+@event.listens_for(Session, 'before_flush')
+def _track_assignment_changes(session, flush_context, instances):
+    """Fold JobAssignment inserts/status changes/deletes into agent_stats within the same flush."""
+    apply_assignment_deltas(session, _assignment_deltas(session))
+
+
+def record_status_change(session, agent_id: int, old: Optional[str], new: str) -> None:
+    """Stats hook for status changes made with bulk/Core UPDATEs the flush listener can't see."""
+    delta = _empty_delta()
+    if old in ('accepted', 'declined'):
+        delta[old] -= 1
+    if new in ('accepted', 'declined'):
+        delta[new] += 1
+    delta['decayed_accepted'] = delta['accepted']
+    apply_assignment_deltas(session, {agent_id: delta})
+
+
+def delete_assignments(*criteria) -> int:
+    """Bulk-delete the job assignments matching `criteria`, taking them back out of agent_stats."""
+    rows = (db.session.query(JobAssignment.agent_id, JobAssignment.status, JobAssignment.created_at)
+            .filter(*criteria).all())
+    apply_assignment_deltas(db.session, _removal_deltas(rows, datetime.utcnow()))
+    return JobAssignment.query.filter(*criteria).delete(synchronize_session=False)
+
+
+def apply_assignment_deltas(session, deltas: Dict[int, Dict[str, float]]) -> None:
+    deltas = {a: d for a, d in deltas.items() if any(d.values())}
+    if not deltas:
+        return
+    now = datetime.utcnow()
+    with session.no_autoflush:
+        existing = {
+            s.agent_id: s for s in
+            session.query(AgentStats).filter(AgentStats.agent_id.in_(list(deltas.keys()))).all()
+        }
+        for agent_id, d in deltas.items():
+            stats = existing.get(agent_id)
+            if stats is None:
+                stats = _new_stats(agent_id)
+                session.add(stats)
+            _apply_decay(stats, now)
+            stats.offered_count = max(0, (stats.offered_count or 0) + d['offered'])
+            stats.accepted_count = max(0, (stats.accepted_count or 0) + d['accepted'])
+            stats.declined_count = max(0, (stats.declined_count or 0) + d['declined'])
+            stats.decayed_offered = max(0.0, stats.decayed_offered + d['decayed_offered'])
+            stats.decayed_accepted = max(0.0, stats.decayed_accepted + d['decayed_accepted'])
+            if d['offered'] > 0:
+                stats.last_offered_at = now
+            if d['accepted'] > 0:
+                stats.last_accepted_at = now
+
+
+def rebuild_agent_stats() -> int:
+    """Recompute every agent's counters from job_assignments (one streaming pass).
+
+    Used for the initial backfill and as a repair tool; normal operation is incremental.
+    """
+    now = datetime.utcnow()
+    acc: Dict[int, AgentStats] = {
+        s.agent_id: s for s in AgentStats.query.all()
+    }
+    for s in acc.values():
+        s.offered_count = s.accepted_count = s.declined_count = 0
+        s.decayed_offered = s.decayed_accepted = 0.0
+        s.last_offered_at = s.last_accepted_at = None
+
+    rows = (
+        db.session.query(JobAssignment.agent_id, JobAssignment.status,
+                         JobAssignment.created_at, JobAssignment.response_time)
+        .yield_per(5000)
+    )
+    for agent_id, status, created_at, response_time in rows:
+        stats = acc.get(agent_id)
+        if stats is None:
+            stats = acc[agent_id] = _new_stats(agent_id)
+        created_at = created_at or now
+        weight = _decay_factor(created_at, now)
+        stats.offered_count += 1
+        stats.decayed_offered += weight
+        if stats.last_offered_at is None or created_at > stats.last_offered_at:
+            stats.last_offered_at = created_at
+        if status == 'accepted':
+            stats.accepted_count += 1
+            stats.decayed_accepted += weight
+            accepted_at = response_time or created_at
+            if stats.last_accepted_at is None or accepted_at > stats.last_accepted_at:
+                stats.last_accepted_at = accepted_at
+        elif status == 'declined':
+            stats.declined_count += 1
+
+    for stats in acc.values():
+        stats.decayed_at = now
+        db.session.add(stats)
+    db.session.commit()
+    return len(acc)
+
+
+# --- Geocoding (once per postcode, off the request path) ---
+
+def _normalise_postcode(postcode: Optional[str]) -> Optional[str]:
+    if not postcode:
+        return None
+    pc = ''.join(str(postcode).split()).upper()
+    return pc or None
+
+
+def geocode_postcodes(postcodes: Iterable[str]) -> Dict[str, tuple]:
+    """Bulk-geocode UK postcodes; returns {normalised_postcode: (lat, lng)} for hits."""
+    unique = sorted({pc for pc in (_normalise_postcode(p) for p in postcodes) if pc})
+    found: Dict[str, tuple] = {}
+    for i in range(0, len(unique), GEOCODE_BATCH_SIZE):
+        batch = unique[i:i + GEOCODE_BATCH_SIZE]
+        try:
+            resp = requests.post(POSTCODES_BULK_URL, json={'postcodes': batch}, timeout=10)
+            resp.raise_for_status()
+            for item in resp.json().get('result') or []:
+                res = item.get('result') or {}
+                lat, lng = parse_lat_lng(res.get('latitude'), res.get('longitude'))
+                if lat is not None:
+                    found[_normalise_postcode(item.get('query'))] = (lat, lng)
+        except Exception as e:
+            logger.warning(f"Postcode geocoding failed for batch of {len(batch)}: {e}")
+    return found
+
+
+def refresh_agent_locations(agents: List[User], stats_by_agent: Dict[int, AgentStats],
+                            max_lookups: int = GEOCODE_BATCH_SIZE) -> int:
+    """Geocode agents whose postcode changed since their last lookup (bounded per call)."""
+    stale = []
+    for agent in agents:
+        pc = _normalise_postcode(agent.postcode)
+        stats = stats_by_agent.get(agent.id)
+        if pc and (stats is None or stats.geocoded_postcode != pc):
+            stale.append((agent, pc))
+        if len(stale) >= max_lookups:
+            break
+    if not stale:
+        return 0
+
+    coords = geocode_postcodes(pc for _, pc in stale)
+    now = datetime.utcnow()
+    for agent, pc in stale:
+        stats = stats_by_agent.get(agent.id)
+        if stats is None:
+            stats = stats_by_agent[agent.id] = _new_stats(agent.id)
+            db.session.add(stats)
+        lat, lng = coords.get(pc, (None, None))
+        stats.home_latitude, stats.home_longitude = lat, lng
+        # Record misses too so an invalid postcode isn't retried on every pick
+        stats.geocoded_postcode = pc
+        stats.geocoded_at = now
+    db.session.commit()
+    return len(stale)
+
+
+def backfill_agent_locations(limit: int = GEOCODE_BATCH_SIZE) -> int:
+    """Scheduled: geocode up to `limit` agents whose postcode is new or changed."""
+    rows = (db.session.query(User, AgentStats)
+            .outerjoin(AgentStats, AgentStats.agent_id == User.id)
+            .filter(User.role == 'agent', User.postcode.isnot(None))
+            .all())
+    stats_by_agent = {agent.id: stats for agent, stats in rows if stats is not None}
+    return refresh_agent_locations([agent for agent, _ in rows], stats_by_agent, max_lookups=limit)
+
+
+# --- Ranking ---
+
+def _availability_for_date(agent_ids: List[int], job_date) -> Dict[int, str]:
+    """Classify agents as available/weekly/unknown/unavailable for a date (2 queries)."""
+    daily = {
+        a.agent_id: a for a in AgentAvailability.query.filter(
+            AgentAvailability.date == job_date,
+            AgentAvailability.agent_id.in_(agent_ids),
+        ).all()
+    }
+    day_col = WEEKDAYS[job_date.weekday()]
+    weekly = {
+        w.agent_id: bool(getattr(w, day_col)) for w in AgentWeeklyAvailability.query.filter(
+            AgentWeeklyAvailability.agent_id.in_(agent_ids)
+        ).all()
+    }
+    result = {}
+    for agent_id in agent_ids:
+        d = daily.get(agent_id)
+        if d is not None:
+            result[agent_id] = 'available' if (d.is_available and not d.is_away) else 'unavailable'
+        elif agent_id in weekly:
+            result[agent_id] = 'weekly' if weekly[agent_id] else 'unavailable'
+        else:
+            result[agent_id] = 'unknown'
+    return result
+
+
+def _busy_agent_ids(job: Job) -> set:
+    """Agents already accepted on another job the same day (double-booking guard)."""
+    day = job.arrival_time.date()
+    rows = (
+        db.session.query(JobAssignment.agent_id)
+        .join(Job, JobAssignment.job_id == Job.id)
+        .filter(
+            JobAssignment.status == 'accepted',
+            Job.id != job.id,
+            db.func.date(Job.arrival_time) == day,
+        )
+        .distinct()
+        .all()
+    )
+    return {r[0] for r in rows}
+
+
+def _job_coordinates(job: Job):
+    lat, lng = parse_lat_lng(getattr(job, 'latitude', None), getattr(job, 'longitude', None))
+    if lat is None:
+        lat, lng = parse_lat_lng(job.location_lat, job.location_lng)
+    return lat, lng
+
+
+def _home_coordinates(agent: User, stats: Optional[AgentStats]):
+    """The agent's cached home location; unknown until the backfill has geocoded their current postcode."""
+    if stats is None or stats.home_latitude is None or stats.geocoded_postcode != _normalise_postcode(agent.postcode):
+        return None, None
+    return stats.home_latitude, stats.home_longitude
+
+
+def rank_agents_for_job(job: Job, k: int = 20, weights: Optional[Dict[str, float]] = None,
+                        include_unavailable: bool = False) -> List[dict]:
+    """Return the top-k agents for a job scored on distance, availability and reliability."""
+    w = dict(DEFAULT_WEIGHTS)
+    w.update(weights or {})
+    now = datetime.utcnow()
+
+    agents = User.query.filter(User.role == 'agent').all()
+    agent_ids = [a.id for a in agents]
+    if not agent_ids:
+        return []
+    stats_by_agent = {
+        s.agent_id: s for s in AgentStats.query.filter(AgentStats.agent_id.in_(agent_ids)).all()
+    }
+
+    availability = _availability_for_date(agent_ids, job.arrival_time.date())
+    busy = _busy_agent_ids(job)
+    already = {
+        r[0] for r in db.session.query(JobAssignment.agent_id)
+        .filter(JobAssignment.job_id == job.id, JobAssignment.status == 'accepted').all()
+    }
+    job_lat, job_lng = _job_coordinates(job)
+
+    def candidates():
+        for agent in agents:
+            if agent.id in already:
+                continue
+            status = availability.get(agent.id, 'unknown')
+            if not include_unavailable and (status == 'unavailable' or agent.id in busy):
+                continue
+            stats = stats_by_agent.get(agent.id)
+            distance = None
+            home_lat, home_lng = _home_coordinates(agent, stats)
+            if job_lat is not None and home_lat is not None:
+                distance = haversine_km(job_lat, job_lng, home_lat, home_lng)
+            dist_score = UNKNOWN_DISTANCE_SCORE if distance is None else 1.0 / (1.0 + distance / DISTANCE_SCALE_KM)
+            rel = reliability_score(stats, now)
+            avail = 0.0 if agent.id in busy else AVAILABILITY_SCORES.get(status, 0.0)
+            score = w['distance'] * dist_score + w['reliability'] * rel + w['availability'] * avail
+            yield score, agent, stats, distance, rel, status
+
+    top = heapq.nlargest(max(1, int(k)), candidates(), key=lambda c: (c[0], -c[1].id))
+    return [{
+        'id': agent.id,
+        'display_name': f"{agent.first_name or ''} {agent.last_name or ''}".strip() or agent.email,
+        'score': round(score, 4),
+        'distance_km': round(distance, 2) if distance is not None else None,
+        'reliability': round(rel, 4),
+        'availability': 'busy' if agent.id in busy else status,
+        'accepted': stats.accepted_count if stats else 0,
+        'offered': stats.offered_count if stats else 0,
+    } for score, agent, stats, distance, rel, status in top]
+
+
+def top_reliable_agents(limit: Optional[int] = None) -> List[dict]:
+    """Agents ordered by decayed acceptance rate, read from precomputed stats (one query)."""
+    now = datetime.utcnow()
+    rows = (
+        db.session.query(User.id, User.first_name, User.last_name, User.email, AgentStats)
+        .outerjoin(AgentStats, AgentStats.agent_id == User.id)
+        .filter(User.role == 'agent')
+        .all()
+    )
+
+    def entries():
+        for id_, first_name, last_name, email, stats in rows:
+            offered = stats.offered_count if stats else 0
+            accepted = stats.accepted_count if stats else 0
+            yield {
+                'id': id_,
+                'display_name': f"{first_name or ''} {last_name or ''}".strip() or email,
+                'email': email,
+                'accepted': accepted,
+                'offered': offered,
+                'accept_rate': float(accepted) / offered if offered > 0 else 0.0,
+                'reliability': round(reliability_score(stats, now), 4),
+            }
+
+    key = lambda r: (r['reliability'], r['accepted'])
+    if limit is not None:
+        return heapq.nlargest(limit, entries(), key=key)
+    return sorted(entries(), key=key, reverse=True)
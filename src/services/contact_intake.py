@@ -0,0 +1,411 @@
+"""
+Contact-form intake pipeline.
+
+The public endpoint only saves a ContactFormSubmission; everything slow happens
+here, one persisted stage at a time:
+
+    saved -> reply_generated -> telegram_sent -> email_scheduled -> email_sent
+
+Each stage's side effect is guarded by a flag on the row (gpt_reply,
+telegram_sent, team_email_sent, email_sent) so a retried stage never repeats
+completed work. Failed stages are retried with exponential backoff via
+`due_at`; the customer email delay is a `due_at` in the future rather than a
+sleeping thread. Claiming, retries and the worker pool come from
+`leased_queue`: work is fed directly by the endpoint and by a scheduler sweep
+that also picks up rows after a restart.
+"""
+import logging
+import os
+import random
+from datetime import datetime, timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+import requests
+from flask import current_app
+
+from src.models.contact_form import ContactFormSubmission
+from src.services import mailer
+from src.services.leased_queue import LeasedQueue, PermanentFailure
+
+logger = logging.getLogger(__name__)
+
+STAGE_SAVED = 'saved'
+STAGE_REPLY_GENERATED = 'reply_generated'
+STAGE_TELEGRAM_SENT = 'telegram_sent'
+STAGE_EMAIL_SCHEDULED = 'email_scheduled'
+STAGE_EMAIL_SENT = 'email_sent'
+STAGE_FAILED = 'failed'
+ACTIVE_STAGES = (STAGE_SAVED, STAGE_REPLY_GENERATED, STAGE_TELEGRAM_SENT, STAGE_EMAIL_SCHEDULED)
+
+MAX_WORKERS = int(os.environ.get('CONTACT_INTAKE_WORKERS', 4))
+MAX_ATTEMPTS = 6
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+LEASE_SECONDS = 300
+EMAIL_DELAY_SECONDS = (30, 60)
+SWEEP_BATCH = 50
+
+TEAM_EMAILS = ['info@v3-services.com', 'Tom@v3-services.com', 'lance@v3-Services.com']
+
+
+# --- Stage side effects ---
+
+def generate_gpt_reply(fields, request_id):
+    """
+    Generate personalized GPT reply using OpenAI API.
+    Returns fallback message if OpenAI fails.
+    """
+    try:
+        import openai
+
+        openai_api_key = os.environ.get('OPENAI_API_KEY')
+        if not openai_api_key:
+            logger.warning(f"[Contact Form {request_id}] OPENAI_API_KEY not set, using fallback")
+            return generate_fallback_reply(fields)
+
+        # Set API key
+        openai.api_key = openai_api_key
+
+        # Prepare callback instruction
+        if fields['callback_requested'] == "Yes":
+            callback_instruction = """
+CALLBACK REQUESTED: The person has requested a callback.
+- For Eviction/Trespass matters: Say the "Eviction Team" will call within 2 hours.
+- For Security/Prevention matters: Say a "Security Specialist" will call within 2 hours.
+- For General inquiries: Say "The Team" will call within 2 hours."""
+        else:
+            callback_instruction = """
+NO CALLBACK REQUESTED: The person has NOT requested a callback.
+- For Eviction/Trespass matters: Say the "Eviction Team" will be in touch within 2 hours.
+- For Security/Prevention matters: Say a "Security Specialist" will be in touch within 2 hours.
+- For General inquiries: Say "The Team" will be in touch within 2 hours."""
+
+        # System prompt
+        system_prompt = f"""You are a senior dispatcher at V3 Services. You are efficient, calm, and empathetic.
+
+Your goal is to confirm receipt of a message and confirm the next step.
+
+STRICT RULES:
+1. START with "Hi" and their first name if provided (e.g., "Hi John,").
+2. SECOND SENTENCE: Briefly acknowledge the specific issue the user mentioned (e.g., "I understand the urgency regarding the caravans," or "I've noted your request for the CCTV towers").
+3. THIRD SENTENCE: State the action taken and the time promise.
+4. You MUST include the specific time promise: "within 2 hours".
+5. Sign off with: "- Admin Team"
+
+ROUTING:
+- Eviction/Trespass -> "Eviction Team"
+- Security/Prevention -> "Security Specialist"
+- General -> "The Team"
+
+{callback_instruction}"""
+
+        # User message
+        user_message = f"Name: {fields['name']}\nComments: {fields['comments']}\nCallback Requested: {fields['callback_requested']}"
+
+        # Call OpenAI API
+        response = openai.ChatCompletion.create(
+            model="gpt-4",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_message}
+            ],
+            temperature=0.7,
+            max_tokens=200
+        )
+
+        gpt_reply = response.choices[0].message.content.strip()
+        logger.info(f"[Contact Form {request_id}] GPT reply generated successfully")
+        return gpt_reply
+
+    except Exception as e:
+        logger.error(f"[Contact Form {request_id}] OpenAI error: {str(e)}, using fallback")
+        return generate_fallback_reply(fields)
+
+
+def generate_fallback_reply(fields):
+    """
+    Generate intelligent fallback reply based on keywords and callback status.
+    """
+    comments_lower = fields['comments'].lower()
+    callback_requested = fields['callback_requested'] == "Yes"
+    name_part = fields['name'].split()[0] if fields['name'] != "Not provided" else ""
+
+    # Detect keywords
+    is_eviction = any(word in comments_lower for word in ['traveller', 'trespasser', 'squatter', 'eviction', 'unauthorised'])
+    is_security = any(word in comments_lower for word in ['security', 'cctv', 'vacant', 'barrier', 'protection', 'surveillance'])
+
+    # Generate response based on context
+    if callback_requested:
+        if is_eviction:
+            reply = f"Someone from our eviction team will call you within 2 hours during working hours to discuss your situation."
+        elif is_security:
+            reply = f"A security specialist will call you within 2 hours during working hours to discuss your requirements."
+        else:
+            reply = f"Someone from our team will call you to discuss your requirements."
+    else:
+        if is_eviction:
+            reply = f"Someone from our eviction team will be in touch within 2 hours during working hours."
+        elif is_security:
+            reply = f"A security specialist will get back to you within 2 hours during working hours."
+        else:
+            reply = f"Someone from our team will be in touch shortly."
+
+    return f"{reply}\n\n- Admin Team"
+
+
+def send_telegram_notification(fields, gpt_reply, request_id):
+    """
+    Send Telegram notification to admin group.
+    Returns False when Telegram isn't configured; raises on delivery errors so the stage retries.
+    """
+    bot_token = os.environ.get('TELEGRAM_BOT_TOKEN')
+    chat_id = os.environ.get('TELEGRAM_ADMIN_CHAT_ID')
+
+    if not bot_token or not chat_id:
+        logger.warning(f"[Contact Form {request_id}] Telegram credentials not set")
+        return False
+
+    # Format message
+    message = f"""📬 New Contact Form Submission
+
+👤 Name: {fields['name']}
+📧 Email: {fields['email']}
+📱 Phone: {fields['phone']}
+🏢 Company: {fields['company_name']}
+📞 Callback: {fields['callback_requested']}
+
+💬 Comments:
+{fields['comments']}
+
+🤖 GPT Reply:
+{gpt_reply}
+
+🆔 Request ID: {request_id}"""
+
+    # Send to Telegram
+    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
+    payload = {
+        'chat_id': chat_id,
+        'text': message,
+        'parse_mode': 'HTML'
+    }
+
+    response = requests.post(url, json=payload, timeout=10)
+
+    if response.status_code != 200:
+        raise RuntimeError(f"Telegram API error: {response.status_code}")
+    logger.info(f"[Contact Form {request_id}] Telegram notification sent successfully")
+    return True
+
+
+def get_time_based_greeting():
+    """
+    Get appropriate greeting based on UK time (morning/afternoon/evening).
+    """
+    from zoneinfo import ZoneInfo
+
+    # Get current time in UK timezone
+    uk_time = datetime.now(ZoneInfo('Europe/London'))
+    hour = uk_time.hour
+
+    if 5 <= hour < 12:
+        return "Good morning"
+    elif 12 <= hour < 17:
+        return "Good afternoon"
+    else:
+        return "Good evening"
+
+
+def _mail_username():
+    """The account contact-form emails are sent from; PermanentFailure if mail isn't configured."""
+    if not mailer.is_configured():
+        raise PermanentFailure("Email credentials not set")
+    return current_app.config['MAIL_USERNAME']
+
+
+def send_customer_email(fields, gpt_reply, request_id):
+    """
+    Send customer auto-reply email. The 30-60 second delay is applied by the
+    pipeline (email_scheduled stage), not here. Raises on failure.
+    """
+    logger.info(f"[Contact Form {request_id}] Sending customer email...")
+    mail_username = _mail_username()
+
+    # Get first name from the full name
+    first_name = fields['name'].split()[0] if fields['name'] and fields['name'] != "Not provided" else ""
+
+    # Get time-appropriate greeting
+    greeting = get_time_based_greeting()
+
+    # Create personalized greeting
+    if first_name:
+        personal_greeting = f"{greeting} {first_name},"
+    else:
+        personal_greeting = f"{greeting},"
+
+    # Replace newlines with <br> for HTML
+    gpt_reply_html = gpt_reply.replace('\n', '<br>')
+
+    # Email body
+    email_body = f"""<p>{personal_greeting}</p>
+<p>Thank you for getting in touch with V3 Services.</p>
+<p>{gpt_reply_html}</p>
+<p>&nbsp;</p>
+<table style="color: #242424; font-size: small; font-family: Arial, Helvetica, sans-serif; background-color: white;" cellspacing="0" cellpadding="0">
+<tbody>
+<tr>
+<td colspan="2">
+<p style="margin: 0; padding: 0;"><span style="color: #ff753d; font-size: 18pt; font-family: Arial, sans-serif;"><strong>V3 Services Ltd</strong></span></p>
+<p style="margin: 0 0 10px 0; padding: 0;"><span style="color: #f8723a; font-size: 10pt; font-family: Arial, sans-serif;"><strong><a style="color: #f8723a;" title="http://www.v3-services.com/" href="http://www.v3-services.com/" rel="noopener">www.V3-Services.com</a></strong></span></p>
+</td>
+</tr>
+<tr>
+<td style="padding-bottom: 10px;" colspan="2">
+<div style="height: 1px; background-color: #ff753d; width: 498px;">&nbsp;</div>
+</td>
+</tr>
+<tr>
+<td style="padding-right: 10px; vertical-align: top;"><img style="display: block; border: 0;" src="https://v3-app-49c3d1eff914.herokuapp.com/static/v3-logo.png" alt="V3 Services Logo" width="88" /></td>
+<td style="vertical-align: top;">
+<p style="margin: 0; padding: 0; line-height: 1.5;"><span style="color: black; font-size: 9pt; font-family: Arial, sans-serif;"><strong>T:&nbsp;</strong>0203 576 1343<br /><strong>E:&nbsp;</strong><a style="color: black;" title="mailto:info@v3-services.com" href="mailto:info@v3-services.com" rel="noopener">info@v3-services.com</a><br /><strong>W:&nbsp;</strong><a style="color: black;" title="http://www.v3-services.com/" href="http://www.v3-services.com/" rel="noopener">www.v3-services.com</a><br /><strong>A:&nbsp;</strong>V3 Services Ltd, 117 Dartford Road, Dartford, DA1 3EN</span></p>
+</td>
+</tr>
+<tr>
+<td style="padding-top: 10px;" colspan="2"><img style="display: block; border: 0;" src="https://files.manuscdn.com/user_upload_by_module/session_file/310419663031516064/uXbfYfMdRRQBFEzF.png" alt="signature_banner" width="498" height="128" /></td>
+</tr>
+<tr>
+<td style="padding-top: 10px;" colspan="2" width="498px">
+<p style="margin: 0px 0px 10px; padding: 0px; text-align: left;"><span style="color: #ff753d; font-size: 8pt; font-family: Helvetica; text-align: center;"><strong><span style="color: #ff753d;"><a style="color: #ff753d;" href="https://www.v3-services.com/services/trace-locate/" rel="noopener">INVESTIGATION&nbsp;</a></span>|<span>&nbsp;</span><span style="color: #ff753d;"><a style="color: #ff753d;" href="https://www.v3-services.com/services/surveillance/">SURVEILLANCE&nbsp;</a></span>|<span>&nbsp;</span><a style="color: #ff753d;" title="https://www.v3-services.com/services/traveller-evictions/" href="https://www.v3-services.com/services/traveller-evictions/">TRAVELLER EVICTIONS</a>&nbsp;|<span>&nbsp;</span><a style="color: #ff753d;" title="https://www.v3-services.com/services/squatter-evictions/" href="https://www.v3-services.com/services/squatter-evictions/" rel="noopener">SQUATTER EVICTIONS</a>&nbsp;|<span>&nbsp;</span><a style="color: #ff753d;" title="https://www.v3-services.com/services/site-security-access-prevention/" href="https://www.v3-services.com/services/site-security-access-prevention/" rel="noopener">SECURITY</a></strong></span></p>
+<p style="margin: 0px; padding: 0px; text-align: justify;"><span style="color: #959595; font-size: 7pt; font-family: Arial, sans-serif;"><strong>The principal is a Member of the United Kingdom Professional Investigators Network</strong>&nbsp;(UKPIN) V3 Services Limited Registered in England No.10653477 Registered Office: 117 Dartford Road, Dartford DA1 3EN VAT No.269383460 ICO: ZA458365 This email and any files transmitted with it are confidential and are intended for the addressee(s) only. If you have received this email in error or there are any problems, please notify the originator immediately. The unauthorised use, disclosure, copying or alteration of this email is strictly forbidden.</span></p>
+</td>
+</tr>
+</tbody>
+</table>"""
+
+    # Create message
+    msg = MIMEMultipart('alternative')
+    msg['From'] = mail_username
+    msg['To'] = fields['email']
+    msg['Bcc'] = mail_username
+    msg['Subject'] = "Thanks for contacting V3 Services"
+    msg.attach(MIMEText(email_body, 'html'))
+
+    mailer.send_message(msg)
+    logger.info(f"[Contact Form {request_id}] Customer email sent successfully to {fields['email']}")
+
+
+def send_team_notification(fields, gpt_reply, request_id):
+    """
+    Send team notification email when callback is requested. Raises on failure.
+    """
+    logger.info(f"[Contact Form {request_id}] Sending team notification email...")
+    mail_username = _mail_username()
+
+    # Email body
+    email_body = f"""<h2>🔔 CALLBACK REQUESTED</h2>
+<p><strong>A customer has requested a callback. Please contact them as soon as possible.</strong></p>
+
+<h3>Contact Details:</h3>
+<ul>
+<li><strong>Name:</strong> {fields['name']}</li>
+<li><strong>Email:</strong> {fields['email']}</li>
+<li><strong>Phone:</strong> {fields['phone']}</li>
+<li><strong>Company:</strong> {fields['company_name']}</li>
+</ul>
+
+<h3>Comments:</h3>
+<p>{fields['comments']}</p>
+
+<h3>GPT Auto-Reply Sent:</h3>
+<p>{gpt_reply.replace(chr(10), '<br>')}</p>
+
+<hr>
+<p><small>Request ID: {request_id}<br>
+Submitted: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</small></p>"""
+
+    # Create message
+    msg = MIMEMultipart('alternative')
+    msg['From'] = mail_username
+    msg['To'] = ', '.join(TEAM_EMAILS)
+    msg['Subject'] = f"🔔 CALLBACK REQUESTED - {fields['name']}"
+    msg.attach(MIMEText(email_body, 'html'))
+
+    mailer.send_message(msg)
+    logger.info(f"[Contact Form {request_id}] Team notification sent successfully")
+
+
+# --- Pipeline ---
+
+def fields_for(submission):
+    """The display fields the senders expect, rebuilt from a saved submission."""
+    return {
+        "name": f"{submission.first_name} {submission.last_name}".strip() or "Not provided",
+        "email": submission.email,
+        "phone": submission.phone or "Not provided",
+        "company_name": submission.company_name or "Not provided",
+        "site_postcode": submission.site_postcode or "Not provided",
+        "callback_requested": "Yes" if submission.callback_requested else "No",
+        "comments": submission.comments or "",
+    }
+
+
+def _run_stage(submission, now):
+    """Perform the side effect for the submission's current stage and move it on."""
+    fields = fields_for(submission)
+    request_id = submission.request_id
+
+    if submission.stage == STAGE_SAVED:
+        if not submission.gpt_reply:
+            submission.gpt_reply = generate_gpt_reply(fields, request_id)
+        submission.stage = STAGE_REPLY_GENERATED
+
+    elif submission.stage == STAGE_REPLY_GENERATED:
+        if not submission.telegram_sent:
+            submission.telegram_sent = send_telegram_notification(fields, submission.gpt_reply, request_id)
+        submission.stage = STAGE_TELEGRAM_SENT
+
+    elif submission.stage == STAGE_TELEGRAM_SENT:
+        if submission.callback_requested and not submission.team_email_sent:
+            send_team_notification(fields, submission.gpt_reply, request_id)
+            submission.team_email_sent = True
+        delay = random.randint(*EMAIL_DELAY_SECONDS)
+        logger.info(f"[Contact Form {request_id}] Customer email scheduled in {delay} seconds")
+        submission.stage = STAGE_EMAIL_SCHEDULED
+        submission.due_at = now + timedelta(seconds=delay)
+
+    elif submission.stage == STAGE_EMAIL_SCHEDULED:
+        if not submission.email_sent:
+            send_customer_email(fields, submission.gpt_reply, request_id)
+            submission.email_sent = True
+        submission.stage = STAGE_EMAIL_SENT
+        submission.due_at = None
+
+    submission.attempts = 0
+
+
+def process_submission(submission_id):
+    """Run every stage of a submission that is due now. Needs an app context.
+
+    Returns the stage the submission was left in, or None if it couldn't be claimed.
+    """
+    return _queue.run(submission_id, _run_stage)
+
+
+_queue = LeasedQueue(
+    ContactFormSubmission, process_submission,
+    name='contact-intake', active=ACTIVE_STAGES, failed=STAGE_FAILED, status='stage',
+    describe=lambda submission, stage: f"[Contact Form {submission.request_id}] Stage {stage}",
+    lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS, max_workers=MAX_WORKERS,
+    backoff_base=BACKOFF_BASE_SECONDS, backoff_max=BACKOFF_MAX_SECONDS, sweep_order=['due_at'],
+)
+
+
+def enqueue(submission_id, app=None):
+    """Hand a submission to the worker pool; duplicates already queued are ignored."""
+    return _queue.enqueue(submission_id, app)
+
+
+def process_due(limit=SWEEP_BATCH):
+    """Queue submissions whose next stage is due (scheduled emails, retries, restarts)."""
+    return _queue.process_due(limit, enqueue)
@@ -0,0 +1,127 @@
+"""
+CRM home-screen figures.
+
+The dashboard tiles and the priority widget are all counts and sums over one
+user's (or, for the team view, everyone's) contacts, so they come from a
+single conditional-aggregation query. Results are kept in-process for
+CACHE_SECONDS per (owner, day): the home screen asks for the dashboard and
+the priority counts together, and the second request is answered from the
+first. Contact writes committed through the ORM drop the affected entries
+straight away; other workers see them after at most CACHE_SECONDS. Expired
+entries are pruned whenever a new one is stored, so the cache only ever
+holds the owners seen in the last CACHE_SECONDS.
+"""
+import logging
+import threading
+import time
+from datetime import date
+from typing import Dict, Optional
+
+from sqlalchemy import case, event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from src.extensions import db
+from src.models.crm_contact import CRMContact
+
+logger = logging.getLogger(__name__)
+
+CACHE_SECONDS = 5
+PRIORITIES = ('urgent', 'hot', 'nurture', 'routine')
+
+_cache: Dict[tuple, tuple] = {}
+_cache_lock = threading.Lock()
+
+
+def _count(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def _aggregate(owner_id: Optional[int], today: date) -> Dict:
+    c = CRMContact.__table__.c
+    active = c.status == 'active'
+    columns = {
+        'followups_today': _count(active & (c.next_followup_date == today)),
+        'overdue_followups': _count(active & (c.next_followup_date < today)),
+        'quotes_pending': _count(active & c.current_stage.in_(['quote_sent', 'thinking_about_it'])),
+        'jobs_in_progress': _count(c.current_stage.in_(['job_booked', 'job_in_progress'])
+                                   & (c.contact_type == 'eviction_client')),
+        'potential_revenue': func.coalesce(func.sum(case((active, c.potential_value), else_=None)), 0),
+        'active_contacts': _count(active),
+        'eviction_clients': _count(active & (c.contact_type == 'eviction_client')),
+        'prevention_prospects': _count(active & (c.contact_type == 'prevention_prospect')),
+        'referral_partners': _count(active & (c.contact_type == 'referral_partner')),
+    }
+    for priority in PRIORITIES:
+        columns[f"priority_{priority}"] = _count(active & (c.priority == priority))
+
+    query = select(*[expr.label(name) for name, expr in columns.items()]).select_from(CRMContact.__table__)
+    if owner_id is not None:
+        query = query.where(c.owner_id == owner_id)
+    row = db.session.execute(query).mappings().one()
+
+    return {
+        'followups_today': int(row['followups_today']),
+        'overdue_followups': int(row['overdue_followups']),
+        'quotes_pending': int(row['quotes_pending']),
+        'jobs_in_progress': int(row['jobs_in_progress']),
+        'potential_revenue': float(row['potential_revenue']),
+        'active_contacts': int(row['active_contacts']),
+        'breakdown': {
+            'eviction_clients': int(row['eviction_clients']),
+            'prevention_prospects': int(row['prevention_prospects']),
+            'referral_partners': int(row['referral_partners']),
+        },
+        'priority': {priority: int(row[f"priority_{priority}"]) for priority in PRIORITIES},
+    }
+
+
+def summary(owner_id: Optional[int], today: Optional[date] = None) -> Dict:
+    """Figures for one owner's contacts, or every contact when owner_id is None."""
+    today = today or date.today()
+    key = (owner_id, today)
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+    figures = _aggregate(owner_id, today)
+    with _cache_lock:
+        # Expired entries (including previous days') go as soon as anything is stored
+        for stale in [k for k, (expires, _) in _cache.items() if expires <= now]:
+            del _cache[stale]
+        _cache[key] = (now + CACHE_SECONDS, figures)
+    return figures
+
+
+def invalidate(owner_ids=None) -> None:
+    """Forget cached figures for these owners (and the team view); everything when None."""
+    with _cache_lock:
+        if owner_ids is None:
+            _cache.clear()
+            return
+        affected = set(owner_ids) | {None}
+        for key in [k for k in _cache if k[0] in affected]:
+            del _cache[key]
+
+
+# --- Invalidation on commit ---
+
+@event.listens_for(Session, 'after_flush')
+def _collect_owners(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, CRMContact):
+            owners = session.info.setdefault('crm_dashboard', set())
+            owners.add(obj.owner_id)
+            owners.update(inspect(obj).attrs.owner_id.history.deleted or ())
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_owners(session):
+    owners = session.info.pop('crm_dashboard', None)
+    if owners:
+        invalidate(owners)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_owners(session):
+    session.info.pop('crm_dashboard', None)
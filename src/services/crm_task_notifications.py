@@ -1,79 +1,109 @@
 """
 CRM Task Notification Service
-Checks for due tasks and sends Telegram notifications
+Sends Telegram reminders for tasks coming due, and the overdue summary.
+
+Each open task carries `remind_at` (due date minus REMINDER_LEAD, kept by the
+model). A tick claims every reminder whose time has come in one conditional
+UPDATE, so each fires exactly once however many workers tick, then loads the
+claimed tasks with their user and contact in one query. Ticks cost the same
+few statements however many tasks exist; the scheduler arms a one-off timer
+for `next_reminder_at()` so reminders fire on time between ticks.
 """
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import joinedload
 from src.extensions import db
 from src.models.crm_task import CRMTask
-from src.models.crm_user import CRMUser
-from src.models.crm_contact import CRMContact
+from src.services import telegram_notifications
 from src.services.telegram_notifications import send_crm_task_notification
-from flask import current_app
 
 logger = logging.getLogger(__name__)
 
+BATCH_SIZE = 100
 
-def check_and_notify_due_tasks():
+
+def _claim_due(now):
+    """Disarm up to BATCH_SIZE due reminders and return their task ids (only to the worker that won them)."""
+    tasks = CRMTask.__table__
+    due = select(tasks.c.id).where(tasks.c.remind_at <= now).order_by(tasks.c.remind_at).limit(BATCH_SIZE)
+    claimed = db.session.execute(
+        update(tasks)
+        .where(tasks.c.id.in_(due), tasks.c.remind_at <= now)
+        .values(remind_at=None, reminded_at=now, updated_at=tasks.c.updated_at)
+        .returning(tasks.c.id)
+    ).scalars().all()
+    db.session.commit()
+    return claimed
+
+
+def next_reminder_at():
+    """When the earliest armed reminder is due (UTC), or None."""
+    return db.session.query(func.min(CRMTask.remind_at)).scalar()
+
+
+def check_and_notify_due_tasks(now=None):
     """
-    Check for tasks that are due soon and send Telegram notifications.
-    This function should be called periodically (e.g., every 15 minutes).
+    Send every reminder that is due and not yet sent.
+    Called by the scheduler's tick and timer (and the manual check endpoint).
 
     Returns:
         dict: Statistics about notifications sent
     """
     try:
-        # Get current time and time window for "due soon" tasks
-        now = datetime.utcnow()
-        notification_window = now + timedelta(minutes=30)  # Notify 30 minutes before due
-
-        # Find tasks that:
-        # 1. Are pending
-        # 2. Are due within the next 30 minutes
-        # 3. Haven't been notified yet (we'll track this via a flag we'll add later)
-        due_tasks = CRMTask.query.filter(
-            CRMTask.status == 'pending',
-            CRMTask.due_date <= notification_window,
-            CRMTask.due_date >= now
-        ).all()
-
+        now = now or datetime.utcnow()
         notifications_sent = 0
         notifications_failed = 0
-
-        for task in due_tasks:
-            try:
-                # Get CRM user and contact
-                crm_user = CRMUser.query.get(task.crm_user_id)
-                contact = CRMContact.query.get(task.contact_id)
-
-                if not crm_user or not contact:
-                    logger.warning(f"Task {task.id}: Missing user or contact")
-                    continue
-
-                # Send notification
-                success = send_crm_task_notification(crm_user, task, contact)
-
-                if success:
-                    notifications_sent += 1
-                    logger.info(f"Sent notification for task {task.id} to user {crm_user.id}")
-                else:
+        tasks_checked = 0
+
+        while True:
+            claimed = _claim_due(now)
+            if not claimed:
+                break
+            tasks_checked += len(claimed)
+
+            # Reminders are sent once or not at all: a muted or disabled channel drops them
+            if not telegram_notifications.is_enabled():
+                logger.info(f"Telegram disabled or muted, dropped {len(claimed)} task reminders")
+                continue
+
+            due_tasks = CRMTask.query.options(
+                joinedload(CRMTask.crm_user), joinedload(CRMTask.contact)
+            ).filter(CRMTask.id.in_(claimed)).all()
+
+            for task in due_tasks:
+                try:
+                    if not task.crm_user or not task.contact:
+                        logger.warning(f"Task {task.id}: Missing user or contact")
+                        continue
+                    if not task.crm_user.telegram_chat_id or not task.crm_user.telegram_opt_in:
+                        continue
+
+                    if send_crm_task_notification(task.crm_user, task, task.contact, check_muted=False):
+                        notifications_sent += 1
+                    else:
+                        notifications_failed += 1
+                        logger.warning(f"Failed to send notification for task {task.id}")
+
+                except Exception as e:
                     notifications_failed += 1
-                    logger.warning(f"Failed to send notification for task {task.id}")
+                    logger.error(f"Error processing task {task.id}: {str(e)}")
 
-            except Exception as e:
-                notifications_failed += 1
-                logger.error(f"Error processing task {task.id}: {str(e)}")
+            if len(claimed) < BATCH_SIZE:
+                break
 
-        logger.info(f"Task notification check complete: {notifications_sent} sent, {notifications_failed} failed")
+        if tasks_checked:
+            logger.info(f"Task reminders: {notifications_sent} sent, {notifications_failed} failed")
 
         return {
             'success': True,
             'notifications_sent': notifications_sent,
             'notifications_failed': notifications_failed,
-            'tasks_checked': len(due_tasks)
+            'tasks_checked': tasks_checked
         }
 
     except Exception as e:
+        db.session.rollback()
         logger.error(f"Error in check_and_notify_due_tasks: {str(e)}")
         return {
             'success': False,
@@ -93,10 +123,12 @@ def check_overdue_tasks():
         now = datetime.utcnow()
 
         # Find overdue pending tasks
-        overdue_tasks = CRMTask.query.filter(
+        overdue_tasks = CRMTask.query.options(
+            joinedload(CRMTask.crm_user), joinedload(CRMTask.contact)
+        ).filter(
             CRMTask.status == 'pending',
             CRMTask.due_date < now
-        ).all()
+        ).order_by(CRMTask.due_date).all()
 
         # Group tasks by user
         tasks_by_user = {}
@@ -110,7 +142,7 @@ def check_overdue_tasks():
         # Send summary notification to each user
         for user_id, user_tasks in tasks_by_user.items():
             try:
-                crm_user = CRMUser.query.get(user_id)
+                crm_user = user_tasks[0].crm_user
                 if not crm_user or not crm_user.telegram_chat_id or not crm_user.telegram_opt_in:
                     continue
 
@@ -121,8 +153,7 @@ def check_overdue_tasks():
                 message += f"You have <b>{len(user_tasks)}</b> overdue task(s):\n\n"
 
                 for task in user_tasks[:5]:  # Show first 5 tasks
-                    contact = CRMContact.query.get(task.contact_id)
-                    contact_name = contact.name if contact else "Unknown"
+                    contact_name = task.contact.name if task.contact else "Unknown"
                     message += f"• {task.title} - {contact_name}\n"
 
                 if len(user_tasks) > 5:
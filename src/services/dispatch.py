@@ -0,0 +1,351 @@
+"""
+Batch dispatch: assign agents to many open jobs at once as a min-cost flow problem.
+
+Graph: source -> job (capacity = open slots) -> agent/day (capacity 1) -> sink.
+An agent can therefore fill at most one slot per calendar day, matching the
+double-booking rule used elsewhere. Edge costs combine travel distance,
+reliability and availability using the same scoring inputs as the ranked agent
+picker (src/services/agent_ranking.py).
+
+Each job only gets edges to its cheapest candidates (a few per open slot); the
+flow is optimal over that sparse graph and any slot it cannot fill is topped up
+greedily from the full roster. The solver works on plain dicts so it can be
+benchmarked without a database.
+"""
+import heapq
+import logging
+import math
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from src.extensions import db
+from src.models.agent_stats import AgentStats
+from src.models.user import User, Job, JobAssignment, Notification
+from src.services.agent_ranking import (
+    AVAILABILITY_SCORES,
+    DEFAULT_WEIGHTS,
+    DISTANCE_SCALE_KM,
+    UNKNOWN_DISTANCE_SCORE,
+    _availability_for_date,
+    _home_coordinates,
+    _job_coordinates,
+    reliability_score,
+)
+from src.utils.geo import EARTH_RADIUS_KM
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIME_BUDGET_MS = 800
+CANDIDATES_PER_SLOT = 4
+MIN_CANDIDATES = 12
+UNKNOWN_AVAILABILITY = AVAILABILITY_SCORES['unknown']
+
+_SOURCE, _SINK = 0, 1
+
+
+# --- Solver ---
+
+class _FlowGraph:
+    """Residual graph in flat arrays (edge i and i ^ 1 are a forward/backward pair)."""
+
+    def __init__(self):
+        self.adj: List[List[int]] = [[], []]
+        self.to: List[int] = []
+        self.cap: List[int] = []
+        self.cost: List[float] = []
+
+    def add_node(self) -> int:
+        self.adj.append([])
+        return len(self.adj) - 1
+
+    def add_edge(self, u: int, v: int, cap: int, cost: float) -> int:
+        e = len(self.to)
+        self.to += [v, u]
+        self.cap += [cap, 0]
+        self.cost += [cost, -cost]
+        self.adj[u].append(e)
+        self.adj[v].append(e + 1)
+        return e
+
+
+def _min_cost_flow(g: _FlowGraph, deadline: float) -> bool:
+    """Successive shortest paths with Dijkstra + potentials. Returns False if out of time."""
+    n = len(g.adj)
+    potential = [0.0] * n
+    adj, to, cap, cost = g.adj, g.to, g.cap, g.cost
+    inf = float('inf')
+
+    while True:
+        if time.perf_counter() > deadline:
+            return False
+        dist = [inf] * n
+        prev_edge = [-1] * n
+        done = [False] * n
+        dist[_SOURCE] = 0.0
+        heap = [(0.0, _SOURCE)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if done[u]:
+                continue
+            done[u] = True
+            if u == _SINK:
+                break  # every node still unsettled is at least this far away
+            pu = potential[u]
+            for e in adj[u]:
+                if cap[e] <= 0:
+                    continue
+                v = to[e]
+                if done[v]:
+                    continue
+                nd = d + cost[e] + pu - potential[v]
+                if nd < dist[v]:
+                    dist[v] = nd
+                    prev_edge[v] = e
+                    heapq.heappush(heap, (nd, v))
+        if not done[_SINK]:
+            return True
+
+        limit = dist[_SINK]
+        for v in range(n):
+            potential[v] += dist[v] if done[v] else limit
+
+        # Agent -> sink edges have capacity 1, so every augmenting path carries one unit
+        v = _SINK
+        while v != _SOURCE:
+            e = prev_edge[v]
+            cap[e] -= 1
+            cap[e ^ 1] += 1
+            v = to[e ^ 1]
+
+
+def solve_dispatch(jobs: List[dict], agents: List[dict], weights: Optional[Dict[str, float]] = None,
+                   time_budget_ms: int = DEFAULT_TIME_BUDGET_MS) -> dict:
+    """Assign agents to job slots at minimum total cost.
+
+    jobs:   [{'id', 'slots', 'day', 'lat', 'lng', 'exclude': set of agent ids}]
+    agents: [{'id', 'lat', 'lng', 'reliability', 'availability': {day: score}, 'busy_days': set}]
+
+    An availability score of 0 (or a day in busy_days) makes the agent ineligible that
+    day; days missing from the map score as 'unknown'. Returns the chosen pairs,
+    unfilled slot counts, total cost and timing.
+    """
+    started = time.perf_counter()
+    deadline = started + max(0, time_budget_ms) / 1000.0
+    w = dict(DEFAULT_WEIGHTS)
+    w.update(weights or {})
+    w_dist, w_rel, w_avail = w['distance'], w['reliability'], w['availability']
+    unknown_dist_cost = w_dist * (1.0 - UNKNOWN_DISTANCE_SCORE)
+
+    # Per-agent terms that don't depend on the job
+    prepared = []
+    for a in agents:
+        lat, lng = a.get('lat'), a.get('lng')
+        has_loc = lat is not None and lng is not None
+        prepared.append((
+            a['id'],
+            math.radians(lat) if has_loc else 0.0,
+            math.radians(lng) if has_loc else 0.0,
+            math.cos(math.radians(lat)) if has_loc else 0.0,
+            has_loc,
+            w_rel * (1.0 - a.get('reliability', 0.5)),
+            a.get('availability') or {},
+            a.get('busy_days') or (),
+        ))
+
+    def candidates(job):
+        """Yield (cost, agent_id, distance_km) for every agent eligible for this job."""
+        day = job['day']
+        exclude = job.get('exclude') or ()
+        has_job_loc = job.get('lat') is not None and job.get('lng') is not None
+        if has_job_loc:
+            jlat, jlng = math.radians(job['lat']), math.radians(job['lng'])
+            jcos = math.cos(jlat)
+        for agent_id, alat, alng, acos, has_loc, rel_cost, availability, busy_days in prepared:
+            if agent_id in exclude or day in busy_days:
+                continue
+            avail = availability.get(day, UNKNOWN_AVAILABILITY)
+            if avail <= 0:
+                continue
+            if has_job_loc and has_loc:
+                # Haversine inlined: this loop runs jobs x agents times
+                h = math.sin((alat - jlat) / 2) ** 2 + jcos * acos * math.sin((alng - jlng) / 2) ** 2
+                distance = 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(h)))
+                dist_cost = w_dist * distance / (distance + DISTANCE_SCALE_KM)
+            else:
+                distance = None
+                dist_cost = unknown_dist_cost
+            yield dist_cost + rel_cost + w_avail * (1.0 - avail), agent_id, distance
+
+    g = _FlowGraph()
+    agent_day_node: Dict[tuple, int] = {}
+    pair_edges = []  # (edge index, job, agent_id, cost, distance)
+    pools = {}
+    for job in jobs:
+        slots = int(job.get('slots') or 0)
+        if slots <= 0:
+            continue
+        pool = sorted(candidates(job))
+        pools[job['id']] = pool
+        job_node = g.add_node()
+        g.add_edge(_SOURCE, job_node, slots, 0.0)
+        for c, agent_id, distance in pool[:max(MIN_CANDIDATES, CANDIDATES_PER_SLOT * slots)]:
+            key = (agent_id, job['day'])
+            node = agent_day_node.get(key)
+            if node is None:
+                node = agent_day_node[key] = g.add_node()
+                g.add_edge(node, _SINK, 1, 0.0)
+            pair_edges.append((g.add_edge(job_node, node, 1, c), job, agent_id, c, distance))
+
+    completed = _min_cost_flow(g, deadline)
+
+    assignments = []
+    used = set()
+    filled: Dict[int, int] = {}
+    for e, job, agent_id, c, distance in pair_edges:
+        if g.cap[e] == 0:
+            assignments.append({'job_id': job['id'], 'agent_id': agent_id,
+                                'cost': c, 'distance_km': distance})
+            used.add((agent_id, job['day']))
+            filled[job['id']] = filled.get(job['id'], 0) + 1
+
+    # Top up anything the sparse graph (or the time budget) left short, cheapest first
+    unfilled = {}
+    for job in jobs:
+        short = int(job.get('slots') or 0) - filled.get(job['id'], 0)
+        for c, agent_id, distance in pools.get(job['id'], ()):
+            if short <= 0:
+                break
+            if (agent_id, job['day']) in used:
+                continue
+            used.add((agent_id, job['day']))
+            assignments.append({'job_id': job['id'], 'agent_id': agent_id,
+                                'cost': c, 'distance_km': distance})
+            short -= 1
+        if short > 0:
+            unfilled[job['id']] = short
+
+    return {
+        'assignments': assignments,
+        'unfilled': unfilled,
+        'total_cost': sum(a['cost'] for a in assignments),
+        'timed_out': not completed,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000.0, 2),
+    }
+
+
+# --- Database glue ---
+
+def _open_slots(jobs: List[Job]) -> Dict[int, int]:
+    return {j.id: max(0, int(j.agents_required or 1) - int(j.slots_filled or 0)) for j in jobs}
+
+
+def _busy_days(days: Iterable) -> Dict[int, set]:
+    """Map agent_id -> days on which they already hold an accepted assignment."""
+    days = set(days)
+    if not days:
+        return {}
+    rows = (
+        db.session.query(JobAssignment.agent_id, Job.arrival_time)
+        .join(Job, JobAssignment.job_id == Job.id)
+        .filter(
+            JobAssignment.status == 'accepted',
+            Job.arrival_time >= datetime.combine(min(days), datetime.min.time()),
+            Job.arrival_time <= datetime.combine(max(days), datetime.max.time()),
+        )
+        .all()
+    )
+    busy: Dict[int, set] = {}
+    for agent_id, arrival in rows:
+        if arrival and arrival.date() in days:
+            busy.setdefault(agent_id, set()).add(arrival.date())
+    return busy
+
+
+def build_dispatch_inputs(jobs: List[Job]):
+    """Load the roster, stats, availability and existing offers for a set of jobs."""
+    agents = User.query.filter(User.role == 'agent').all()
+    agent_ids = [a.id for a in agents]
+    stats_by_agent = {
+        s.agent_id: s for s in AgentStats.query.filter(AgentStats.agent_id.in_(agent_ids)).all()
+    } if agent_ids else {}
+
+    days = {j.arrival_time.date() for j in jobs}
+    availability: Dict[int, dict] = {a: {} for a in agent_ids}
+    for day in days:
+        for agent_id, status in _availability_for_date(agent_ids, day).items():
+            availability[agent_id][day] = 0.0 if status == 'unavailable' else AVAILABILITY_SCORES[status]
+    busy = _busy_days(days)
+
+    # Agents already offered (or who declined / accepted) a job aren't offered it again
+    offered: Dict[int, set] = {}
+    if jobs:
+        for job_id, agent_id in db.session.query(JobAssignment.job_id, JobAssignment.agent_id).filter(
+            JobAssignment.job_id.in_([j.id for j in jobs])
+        ).all():
+            offered.setdefault(job_id, set()).add(agent_id)
+
+    slots = _open_slots(jobs)
+    job_inputs = []
+    for job in jobs:
+        lat, lng = _job_coordinates(job)
+        job_inputs.append({
+            'id': job.id, 'slots': slots.get(job.id, 0), 'day': job.arrival_time.date(),
+            'lat': lat, 'lng': lng, 'exclude': offered.get(job.id, set()),
+        })
+
+    now = datetime.utcnow()
+    agent_inputs = []
+    for agent in agents:
+        stats = stats_by_agent.get(agent.id)
+        lat, lng = _home_coordinates(agent, stats)
+        agent_inputs.append({
+            'id': agent.id,
+            'lat': lat,
+            'lng': lng,
+            'reliability': reliability_score(stats, now),
+            'availability': availability.get(agent.id, {}),
+            'busy_days': busy.get(agent.id, set()),
+        })
+    return job_inputs, agent_inputs
+
+
+def offer_message(job: Job) -> str:
+    """Body of the 'New Job Available' notification sent with an offer."""
+    message = f"A new job at '{job.address}' is available for your response."
+    if job.maps_link:
+        message += f"\n\nNavigation: {job.maps_link}"
+    return message
+
+
+def dispatch_jobs(jobs: List[Job], dry_run: bool = False, time_budget_ms: int = DEFAULT_TIME_BUDGET_MS,
+                  weights: Optional[Dict[str, float]] = None) -> dict:
+    """Solve a batch dispatch and (unless dry_run) create targeted pending offers.
+
+    The caller is responsible for push/Telegram delivery after the commit.
+    """
+    jobs = [j for j in jobs if j.status == 'open' and j.arrival_time]
+    job_inputs, agent_inputs = build_dispatch_inputs(jobs)
+    plan = solve_dispatch(job_inputs, agent_inputs, weights=weights, time_budget_ms=time_budget_ms)
+    plan['jobs'] = len(job_inputs)
+    plan['agents'] = len(agent_inputs)
+    if dry_run or not plan['assignments']:
+        return plan
+
+    jobs_by_id = {j.id: j for j in jobs}
+    for a in plan['assignments']:
+        job = jobs_by_id[a['job_id']]
+        db.session.add(JobAssignment(job_id=job.id, agent_id=a['agent_id'], status='pending'))
+        db.session.add(Notification(
+            user_id=a['agent_id'],
+            title="New Job Available",
+            message=offer_message(job),
+            type='job_assignment',
+            job_id=job.id,
+        ))
+    db.session.commit()
+    logger.info(
+        f"Dispatched {len(plan['assignments'])} offers across {len(jobs)} jobs "
+        f"in {plan['elapsed_ms']}ms (unfilled: {plan['unfilled']})"
+    )
+    return plan
@@ -8,6 +8,7 @@ from email.header import decode_header
 from datetime import datetime
 from src.models.crm_email import CRMEmail
 from src.extensions import db
+from src.services import retention
 import logging
 
 logger = logging.getLogger(__name__)
@@ -102,6 +103,8 @@ class EmailSyncService:
                     subject = EmailSyncService._decode_header(email_message.get('Subject', ''))
                     date_str = email_message.get('Date', '')
                     email_date = EmailSyncService._parse_date(date_str)
+                    if retention.is_expired('crm_emails', email_date):
+                        continue  # Already past retention; don't re-import archived mail
 
                     # Get email body
                     body_text, body_html = EmailSyncService._get_email_body(email_message)
@@ -181,6 +184,8 @@ class EmailSyncService:
                                             subject = EmailSyncService._decode_header(email_message.get('Subject', ''))
                                             date_str = email_message.get('Date', '')
                                             email_date = EmailSyncService._parse_date(date_str)
+                                            if retention.is_expired('crm_emails', email_date):
+                                                continue
                                             body_text, body_html = EmailSyncService._get_email_body(email_message)
 
                                             # Check if exists
@@ -1,18 +1,78 @@
 """
 Firebase Cloud Messaging (FCM) Configuration and Service
 Handles server-side push notifications using Firebase Admin SDK
+
+Tokens are sent as multicast messages of up to 500 tokens (the FCM limit),
+with the chunks dispatched concurrently. Each per-token response is mapped
+back to its FCMToken row: tokens FCM reports as unregistered or invalid are
+deactivated, and delivered tokens get `last_used` bumped, each in one bulk
+UPDATE. Dead devices therefore drop out of every later fan-out.
+
+The transport is pluggable; `LocalTransport` answers in-process for tests and
+local runs without Firebase credentials.
 """
 
 import os
 import json
 import logging
-from typing import List, Dict, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
 import firebase_admin
-from firebase_admin import credentials, messaging
+from firebase_admin import credentials, exceptions, messaging
 from flask import current_app
 
 logger = logging.getLogger(__name__)
 
+MULTICAST_LIMIT = 500  # tokens per send_each_for_multicast call
+MAX_WORKERS = int(os.environ.get('FCM_SEND_WORKERS', 4))
+UPDATE_CHUNK = 500  # tokens per IN (...) in the bookkeeping updates
+
+# Errors meaning the token will never work again
+_DEAD_TOKEN_ERRORS = (messaging.UnregisteredError, messaging.SenderIdMismatchError)
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='fcm-send')
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class LocalTransport:
+    """In-process stand-in for `messaging.send_each_for_multicast`.
+
+    Tokens in `unregistered` / `invalid` fail the way FCM reports dead and
+    malformed tokens; everything else is delivered. Calls are recorded.
+    """
+
+    def __init__(self, unregistered: Iterable[str] = (), invalid: Iterable[str] = (), error: Optional[Exception] = None):
+        self.unregistered = set(unregistered)
+        self.invalid = set(invalid)
+        self.error = error
+        self.calls = []
+        self._lock = threading.Lock()
+        self._sent = 0
+
+    def __call__(self, multicast: messaging.MulticastMessage) -> messaging.BatchResponse:
+        with self._lock:
+            self.calls.append(list(multicast.tokens))
+        if self.error is not None:
+            raise self.error
+        responses = []
+        for token in multicast.tokens:
+            if token in self.unregistered:
+                responses.append(messaging.SendResponse(None, messaging.UnregisteredError('Requested entity was not found.')))
+            elif token in self.invalid:
+                responses.append(messaging.SendResponse(None, exceptions.InvalidArgumentError('The registration token is not a valid FCM registration token')))
+            else:
+                with self._lock:
+                    self._sent += 1
+                    message_id = f"projects/local/messages/{self._sent}"
+                responses.append(messaging.SendResponse({'name': message_id}, None))
+        return messaging.BatchResponse(responses)
+
 class FCMService:
     _instance = None
     _initialized = False
@@ -25,6 +85,7 @@ class FCMService:
     def __init__(self):
         if not self._initialized:
             self.app = None
+            self.transport = None  # e.g. LocalTransport(); None means the Firebase Admin SDK
             self._initialized = True
     
     def initialize_firebase(self):
@@ -64,35 +125,21 @@ class FCMService:
             logger.error(f"Failed to initialize Firebase: {e}")
             return False
     
-    def send_push_notification(self, fcm_tokens: List[str], title: str, body: str, data: Optional[Dict] = None) -> Dict:
-        """
-        Send push notification to multiple FCM tokens
-        
-        Args:
-            fcm_tokens: List of FCM registration tokens
-            title: Notification title
-            body: Notification body
-            data: Optional additional data payload
-            
-        Returns:
-            Dict with success/failure counts and details
-        """
-        if not fcm_tokens:
-            return {"success_count": 0, "failure_count": 0, "errors": ["No FCM tokens provided"]}
-        
-        if not firebase_admin._apps:
-            if not self.initialize_firebase():
-                return {"success_count": 0, "failure_count": len(fcm_tokens), "errors": ["Firebase not initialized"]}
-        
-        try:
-            # Create the notification payload
-            notification = messaging.Notification(
-                title=title,
-                body=body
-            )
-            
-            # Create Android-specific configuration
-            android_config = messaging.AndroidConfig(
+    def _transport(self):
+        """The callable that sends one MulticastMessage, or None if Firebase is unavailable."""
+        if self.transport is not None:
+            return self.transport
+        if not firebase_admin._apps and not self.initialize_firebase():
+            return None
+        return lambda multicast: messaging.send_each_for_multicast(multicast, app=self.app)
+
+    def _build_multicast(self, tokens: List[str], title: str, body: str, data: Dict[str, str]) -> messaging.MulticastMessage:
+        return messaging.MulticastMessage(
+            tokens=tokens,
+            notification=messaging.Notification(title=title, body=body),
+            data=data,
+            # Android-specific configuration
+            android=messaging.AndroidConfig(
                 notification=messaging.AndroidNotification(
                     title=title,
                     body=body,
@@ -101,85 +148,139 @@ class FCMService:
                     click_action="FLUTTER_NOTIFICATION_CLICK"
                 ),
                 priority="high"
-            )
-            
-            # Create APNs (iOS) configuration
-            apns_config = messaging.APNSConfig(
+            ),
+            # APNs (iOS) configuration
+            apns=messaging.APNSConfig(
                 payload=messaging.APNSPayload(
                     aps=messaging.Aps(
-                        alert=messaging.ApsAlert(
-                            title=title,
-                            body=body
-                        ),
+                        alert=messaging.ApsAlert(title=title, body=body),
                         sound="default",
                         badge=1
                     )
                 )
-            )
-            
-            # Create web push configuration
-            webpush_config = messaging.WebpushConfig(
+            ),
+            # Web push configuration
+            webpush=messaging.WebpushConfig(
                 notification=messaging.WebpushNotification(
                     title=title,
                     body=body,
-                    icon="/logo-512x512.png",  # Adjust path as needed
+                    icon="/logo-512x512.png",
                     badge="/logo-512x512.png"
                 )
             )
+        )
+
+    def _send_chunk(self, transport, tokens, title, body, data):
+        """Send one chunk; returns [(token, exception-or-None)]."""
+        try:
+            response = transport(self._build_multicast(tokens, title, body, data))
+        except Exception as e:
+            # The whole request failed (auth, network): nothing is known about the tokens
+            logger.error(f"FCM multicast of {len(tokens)} tokens failed: {e}")
+            return [(token, e) for token in tokens], True
+        return [(token, resp.exception if not resp.success else None)
+                for token, resp in zip(tokens, response.responses)], False
+
+    @staticmethod
+    def _is_dead(exception, chunk_results):
+        if isinstance(exception, _DEAD_TOKEN_ERRORS):
+            return True
+        # Invalid argument is per-token only if some of the chunk went through;
+        # if every token failed with it, the payload is what was rejected.
+        if isinstance(exception, exceptions.InvalidArgumentError):
+            return any(error is None for _, error in chunk_results)
+        return False
+
+    def _record_results(self, delivered: List[str], dead: List[str]) -> None:
+        """Bulk-update the FCMToken rows behind the tokens just sent to.
+
+        Runs in the caller's session and transaction, so a request that goes on
+        to commit persists the bookkeeping with the rest of its work.
+        """
+        from src.models.user import FCMToken
+        now = datetime.utcnow()
+        for chunk in _chunks(dead, UPDATE_CHUNK):
+            FCMToken.query.filter(FCMToken.token.in_(chunk)).update(
+                {FCMToken.is_active: False}, synchronize_session=False)
+        for chunk in _chunks(delivered, UPDATE_CHUNK):
+            FCMToken.query.filter(FCMToken.token.in_(chunk)).update(
+                {FCMToken.last_used: now}, synchronize_session=False)
+        if dead:
+            logger.info(f"Deactivated {len(dead)} dead FCM tokens")
+
+    def send_push_notification(self, fcm_tokens: List[str], title: str, body: str, data: Optional[Dict] = None) -> Dict:
+        """
+        Send push notification to multiple FCM tokens
+        
+        Args:
+            fcm_tokens: List of FCM registration tokens
+            title: Notification title
+            body: Notification body
+            data: Optional additional data payload
             
-            # Prepare data payload
-            data_payload = data or {}
-            data_payload.update({
-                "click_action": "FLUTTER_NOTIFICATION_CLICK",
-                "notification_type": "job_assignment"
-            })
-            
-            # Create messages for each token
-            messages = []
-            for token in fcm_tokens:
-                message = messaging.Message(
-                    notification=notification,
-                    data=data_payload,
-                    token=token,
-                    android=android_config,
-                    apns=apns_config,
-                    webpush=webpush_config
-                )
-                messages.append(message)
-            
-            # Send batch notification
-            response = messaging.send_all(messages)
-            
-            # Process results
-            success_count = response.success_count
-            failure_count = response.failure_count
-            errors = []
-            
-            # Log failed tokens for cleanup
-            if response.responses:
-                for idx, resp in enumerate(response.responses):
-                    if not resp.success:
-                        error_msg = f"Token {idx}: {resp.exception}"
-                        errors.append(error_msg)
-                        logger.warning(f"FCM send failed for token {idx}: {resp.exception}")
-            
-            logger.info(f"FCM batch send completed: {success_count} success, {failure_count} failures")
-            
-            return {
-                "success_count": success_count,
-                "failure_count": failure_count,
-                "errors": errors,
-                "total_tokens": len(fcm_tokens)
-            }
-            
+        Returns:
+            Dict with success/failure counts and details
+        """
+        tokens = list(dict.fromkeys(t for t in (fcm_tokens or []) if t))
+        if not tokens:
+            return {"success_count": 0, "failure_count": 0, "errors": ["No FCM tokens provided"]}
+
+        transport = self._transport()
+        if transport is None:
+            return {"success_count": 0, "failure_count": len(tokens), "errors": ["Firebase not initialized"],
+                    "total_tokens": len(tokens)}
+
+        # FCM data values must be strings
+        data_payload = {str(k): str(v) for k, v in (data or {}).items() if v is not None}
+        data_payload.update({
+            "click_action": "FLUTTER_NOTIFICATION_CLICK",
+            "notification_type": data_payload.get("notification_type", "job_assignment")
+        })
+
+        chunks = list(_chunks(tokens, MULTICAST_LIMIT))
+        if len(chunks) == 1:
+            outcomes = [self._send_chunk(transport, chunks[0], title, body, data_payload)]
+        else:
+            outcomes = list(_executor.map(lambda chunk: self._send_chunk(transport, chunk, title, body, data_payload), chunks))
+
+        delivered, dead, errors = [], [], []
+        for chunk_results, request_failed in outcomes:
+            if request_failed:
+                errors.append(f"FCM send error: {chunk_results[0][1]}")
+            for token, error in chunk_results:
+                if error is None:
+                    delivered.append(token)
+                    continue
+                if not request_failed:
+                    errors.append(f"Token {token[:12]}...: {error}")
+                if self._is_dead(error, chunk_results):
+                    dead.append(token)
+
+        try:
+            self._record_results(delivered, dead)
         except Exception as e:
-            logger.error(f"Error sending FCM notifications: {e}")
-            return {
-                "success_count": 0,
-                "failure_count": len(fcm_tokens),
-                "errors": [f"FCM send error: {str(e)}"],
-                "total_tokens": len(fcm_tokens)
-            }
+            logger.error(f"Failed to record FCM token results: {e}")
+
+        failure_count = len(tokens) - len(delivered)
+        logger.info(f"FCM send completed: {len(delivered)} success, {failure_count} failures, "
+                    f"{len(dead)} tokens deactivated ({len(chunks)} multicast requests)")
+        return {
+            "success_count": len(delivered),
+            "failure_count": failure_count,
+            "errors": errors[:50],
+            "total_tokens": len(tokens),
+            "deactivated_tokens": len(dead)
+        }
+
+    def send_to_users(self, user_ids: List[int], title: str, body: str, data: Optional[Dict] = None) -> Dict:
+        """Send to every active device of `user_ids`; returns send_push_notification's result."""
+        from src.models.user import FCMToken, db
+        user_ids = list(user_ids or [])
+        tokens = [token for (token,) in db.session.query(FCMToken.token).filter(
+            FCMToken.user_id.in_(user_ids), FCMToken.is_active == True).all()] if user_ids else []
+        if not tokens:
+            return {"success_count": 0, "failure_count": 0, "errors": ["No active FCM tokens found"], "total_tokens": 0}
+        return self.send_push_notification(tokens, title, body, data)
     
     def send_to_user_tokens(self, user_tokens: Dict[int, List[str]], title: str, body: str, data: Optional[Dict] = None) -> Dict:
         """
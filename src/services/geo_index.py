@@ -0,0 +1,126 @@
+"""
+Proximity queries over models that carry `latitude`, `longitude` and `geohash` columns.
+
+Candidates are fetched with geohash prefix range scans (B-tree friendly on SQLite and
+Postgres) and then refined in Python with the haversine distance, so only rows in the
+neighbourhood of the query point are ever loaded.
+"""
+import heapq
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+
+from src.utils.geo import (
+    bounding_box,
+    compact_prefixes,
+    geohash_cover,
+    geohash_encode,
+    geohash_neighbours,
+    haversine_km,
+    precision_for_radius,
+    prefix_upper_bound,
+)
+
+MAX_RADIUS_KM = 500.0
+
+
+def _prefix_filter(column, prefixes):
+    clauses = []
+    for prefix in compact_prefixes(prefixes):
+        if not prefix:
+            return None  # whole world; no geohash restriction
+        upper = prefix_upper_bound(prefix)
+        if upper is None:
+            clauses.append(column >= prefix)
+        else:
+            clauses.append(and_(column >= prefix, column < upper))
+    return or_(*clauses)
+
+
+def _candidates_query(model, query, prefixes, box):
+    q = query if query is not None else model.query
+    geo_filter = _prefix_filter(model.geohash, prefixes)
+    if geo_filter is not None:
+        q = q.filter(geo_filter)
+    min_lat, min_lng, max_lat, max_lng = box
+    return q.filter(
+        model.latitude.between(min_lat, max_lat),
+        model.longitude.between(min_lng, max_lng),
+    )
+
+
+def radius_search(model, lat: float, lng: float, radius_km: float,
+                  query=None, limit: Optional[int] = None) -> List[Tuple[object, float]]:
+    """Return [(row, distance_km)] within radius_km of (lat, lng), nearest first.
+
+    `query` may be a pre-filtered query on `model` (e.g. only open jobs).
+    """
+    radius_km = max(0.0, min(float(radius_km), MAX_RADIUS_KM))
+    precision = precision_for_radius(lat, radius_km)
+    prefixes = geohash_neighbours(geohash_encode(lat, lng, precision))
+    box = bounding_box(lat, lng, radius_km)
+
+    hits = []
+    for row in _candidates_query(model, query, prefixes, box).all():
+        d = haversine_km(lat, lng, row.latitude, row.longitude)
+        if d <= radius_km:
+            hits.append((d, row.id, row))
+
+    if limit is not None:
+        hits = heapq.nsmallest(limit, hits, key=lambda h: (h[0], h[1]))
+    else:
+        hits.sort(key=lambda h: (h[0], h[1]))
+    return [(row, d) for d, _, row in hits]
+
+
+def nearest(model, lat: float, lng: float, k: int = 10, query=None,
+            start_radius_km: float = 2.0, max_radius_km: float = MAX_RADIUS_KM) -> List[Tuple[object, float]]:
+    """Return the k nearest rows as [(row, distance_km)], searching outward in doubling rings."""
+    k = max(1, int(k))
+    radius = max(0.1, float(start_radius_km))
+    max_radius_km = min(float(max_radius_km), MAX_RADIUS_KM)
+    while True:
+        radius = min(radius, max_radius_km)
+        hits = radius_search(model, lat, lng, radius, query=query, limit=k)
+        # Everything inside `radius` has been seen, so k hits inside it are the true k nearest
+        if len(hits) >= k or radius >= max_radius_km:
+            return hits
+        radius *= 2
+
+
+def bbox_search(model, min_lat: float, min_lng: float, max_lat: float, max_lng: float,
+                query=None, limit: Optional[int] = None) -> list:
+    """Return rows inside a bounding box (map viewport)."""
+    if min_lat > max_lat:
+        min_lat, max_lat = max_lat, min_lat
+    if min_lng > max_lng:
+        min_lng, max_lng = max_lng, min_lng
+    prefixes = geohash_cover(min_lat, min_lng, max_lat, max_lng)
+    q = _candidates_query(model, query, prefixes, (min_lat, min_lng, max_lat, max_lng))
+    if limit is not None:
+        q = q.limit(limit)
+    return q.all()
+
+
+def geo_query(model, args, query=None, default_radius_km: float = 5.0, max_results: int = 500):
+    """Run the proximity query described by request args.
+
+    Supports `bbox=min_lat,min_lng,max_lat,max_lng`, or `lat`/`lng` with `k` (nearest)
+    or `radius_km`. Returns [(row, distance_km or None)]; raises ValueError on bad input.
+    """
+    limit = min(int(args.get('limit', max_results)), max_results)
+    bbox = args.get('bbox')
+    if bbox:
+        parts = [float(p) for p in str(bbox).split(',')]
+        if len(parts) != 4:
+            raise ValueError('bbox must be min_lat,min_lng,max_lat,max_lng')
+        return [(row, None) for row in bbox_search(model, *parts, query=query, limit=limit)]
+
+    lat = float(args['lat']) if args.get('lat') not in (None, '') else None
+    lng = float(args['lng']) if args.get('lng') not in (None, '') else None
+    if lat is None or lng is None or not (-90 <= lat <= 90) or not (-180 <= lng <= 180):
+        raise ValueError('lat and lng are required')
+    if args.get('k'):
+        return nearest(model, lat, lng, k=min(int(args['k']), max_results), query=query)
+    radius_km = float(args.get('radius_km', default_radius_km))
+    return radius_search(model, lat, lng, radius_km, query=query, limit=limit)
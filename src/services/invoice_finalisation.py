@@ -0,0 +1,299 @@
+"""
+Invoice finalisation pipeline.
+
+`POST /agent/invoice` validates and persists the invoice in one transaction and
+stores the PDF line items in `Invoice.finalisation_payload`. Everything that
+talks to ReportLab, S3, SMTP or Telegram happens here, one persisted stage at
+a time:
+
+    pending -> uploaded -> emailed -> complete   (or failed)
+
+- pending:  render the PDF and upload it to S3
+- uploaded: queue the PDF email (only when INVOICE_EMAIL_TO is configured)
+- emailed:  agent notification, admin Telegram, job hours roll-up and the
+            "all invoices submitted" reminder
+
+Failed stages retry with exponential backoff via `finalisation_due_at`; the
+app polls `GET /agent/invoices/<id>/status`. Claiming (on
+`finalisation_locked_until`), retries and the worker pool come from
+`leased_queue`, fed by the endpoint and by a scheduler sweep.
+"""
+import json
+import logging
+import os
+from datetime import date, datetime
+from decimal import Decimal
+from email.mime.application import MIMEApplication
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from flask import current_app
+
+from src.extensions import db
+from src.models.user import Invoice, InvoiceJob, Job, JobAssignment, Notification, User
+from src.services import mailer
+from src.services.leased_queue import LeasedQueue
+from src.utils.s3_client import s3_client
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = 'pending'
+STATUS_UPLOADED = 'uploaded'
+STATUS_EMAILED = 'emailed'
+STATUS_COMPLETE = 'complete'
+STATUS_FAILED = 'failed'
+ACTIVE_STATUSES = (STATUS_PENDING, STATUS_UPLOADED, STATUS_EMAILED)
+
+MAX_WORKERS = int(os.environ.get('INVOICE_FINALISATION_WORKERS', 2))
+MAX_ATTEMPTS = 6
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+LEASE_SECONDS = 600
+SWEEP_BATCH = 20
+
+_DATE_KEYS = ('date', 'work_date')
+
+
+# --- PDF payload ---
+
+def encode_pdf_items(items):
+    """JSON for the PDF line items built by create_invoice (Job objects become job_id)."""
+    encoded = []
+    for item in items:
+        row = {}
+        for key, value in item.items():
+            if key == 'job':
+                row['job_id'] = value.id if value is not None else None
+            elif isinstance(value, Decimal):
+                row[key] = float(value)
+            elif isinstance(value, (date, datetime)):
+                row[key] = value.isoformat()
+            else:
+                row[key] = value
+        encoded.append(row)
+    return json.dumps(encoded)
+
+
+def decode_pdf_items(payload):
+    """Inverse of encode_pdf_items; loads every referenced job in one query."""
+    rows = json.loads(payload or '[]')
+    job_ids = {row.get('job_id') for row in rows if row.get('job_id')}
+    jobs = {job.id: job for job in Job.query.filter(Job.id.in_(job_ids))} if job_ids else {}
+    items = []
+    for row in rows:
+        item = dict(row)
+        item['job'] = jobs.get(item.pop('job_id', None))
+        for key in _DATE_KEYS:
+            if isinstance(item.get(key), str):
+                try:
+                    item[key] = date.fromisoformat(item[key][:10])
+                except ValueError:
+                    pass
+        items.append(item)
+    return items
+
+
+# --- Stage side effects ---
+
+def _pdf(invoice, rendered):
+    """Path of the invoice PDF, rendered at most once per finalisation run."""
+    if 'path' not in rendered:
+        # generate_invoice_pdf lives with the invoice routes; imported here to avoid a cycle
+        from src.routes.agent import generate_invoice_pdf
+
+        agent = db.session.get(User, invoice.agent_id)
+        pdf_path = generate_invoice_pdf(agent, decode_pdf_items(invoice.finalisation_payload), invoice.total_amount,
+                                        invoice.invoice_number, upload_to_s3=False,
+                                        agent_invoice_number=invoice.agent_invoice_number)
+        if not pdf_path:
+            raise RuntimeError("PDF generation failed")
+        rendered['path'] = pdf_path
+    return rendered['path']
+
+
+def _discard_pdf(rendered):
+    if 'path' in rendered:
+        try:
+            os.remove(rendered.pop('path'))
+        except OSError:
+            pass
+
+
+def _render_and_upload(invoice, rendered):
+    """Render the PDF and upload it; the S3 key is deterministic so re-running overwrites."""
+    pdf_path = _pdf(invoice, rendered)
+    if not s3_client.is_configured():
+        logger.warning(f"Invoice {invoice.invoice_number}: S3 not configured, PDF will be generated on download")
+        return None
+    result = s3_client.upload_invoice_pdf(agent_id=invoice.agent_id, invoice_number=invoice.invoice_number,
+                                          pdf_data=pdf_path, filename=f"{invoice.invoice_number}.pdf",
+                                          issue_date=invoice.issue_date)
+    if not result.get('success'):
+        raise RuntimeError(f"S3 upload failed: {result.get('error')}")
+    return result.get('file_key')
+
+
+def _queue_email(invoice, rendered):
+    """Queue the PDF for INVOICE_EMAIL_TO via the outbox; returns False when not configured."""
+    recipient = current_app.config.get('INVOICE_EMAIL_TO')
+    if not recipient:
+        return False
+
+    agent = db.session.get(User, invoice.agent_id)
+    agent_name = f"{agent.first_name} {agent.last_name}".strip()
+    msg = MIMEMultipart()
+    msg['To'] = recipient
+    msg['Subject'] = f"New Invoice Submitted: {invoice.invoice_number} from {agent_name}"
+    body = f"Hello,\n\nPlease find attached the invoice {invoice.invoice_number} from {agent_name}.\n\nThank you,\nV3 Services"
+    msg.attach(MIMEText(body, 'plain'))
+    with open(_pdf(invoice, rendered), 'rb') as f:
+        attach = MIMEApplication(f.read(), _subtype="pdf")
+    attach.add_header('Content-Disposition', 'attachment', filename=f"{invoice.invoice_number}.pdf")
+    msg.attach(attach)
+    mailer.queue_email(msg, category='invoice')
+    return True
+
+
+def _notify(invoice):
+    """Agent notification, admin Telegram, hours roll-up and the all-invoiced reminder."""
+    from src.routes.agent import _admin_location_from_job
+    from src.services.telegram_notifications import _send_admin_group
+    from src.utils.finance import update_job_hours
+
+    agent = db.session.get(User, invoice.agent_id)
+    title = f"Invoice {invoice.invoice_number} Generated"
+    # A retried stage may already have delivered it; it commits with the stage otherwise
+    if not db.session.query(Notification.query.filter_by(
+            user_id=agent.id, type="invoice_generated", title=title).exists()).scalar():
+        db.session.add(Notification(
+            user_id=agent.id,
+            title=title,
+            message=f"Your invoice {invoice.invoice_number} for £{invoice.total_amount:.2f} has been generated and is ready for download.",
+            type="invoice_generated"
+        ))
+
+    try:
+        agent_name = f"{agent.first_name} {agent.last_name}".strip()
+        _send_admin_group(
+            (
+                "📄 <b>Invoice Submitted</b>\n\n"
+                f"<b>Agent:</b> {agent_name}\n"
+                f"<b>Invoice #:</b> {invoice.agent_invoice_number or invoice.invoice_number}"
+            )
+        )
+    except Exception as e:
+        logger.warning(f"Admin invoice notify failed: {e}")
+
+    job_ids = [row.job_id for row in InvoiceJob.query.filter_by(invoice_id=invoice.id)]
+    for job_id in job_ids:
+        try:
+            update_job_hours(job_id)
+        except Exception as e:
+            logger.warning(f"Failed to update hours for job {job_id}: {e}")
+
+    try:
+        _notify_fully_invoiced_jobs(job_ids, _send_admin_group, _admin_location_from_job)
+    except Exception as e:
+        logger.warning(f"Admin all-invoiced notify failed: {e}")
+
+
+def _notify_fully_invoiced_jobs(job_ids, send, location_for):
+    """Remind admins to complete jobs once every accepted agent has invoiced."""
+    if not job_ids:
+        return
+    jobs = {job.id: job for job in Job.query.filter(Job.id.in_(job_ids))}
+    accepted = {}
+    for job_id, agent_id in (db.session.query(JobAssignment.job_id, JobAssignment.agent_id)
+                             .filter(JobAssignment.job_id.in_(job_ids), JobAssignment.status == 'accepted')):
+        accepted.setdefault(job_id, set()).add(agent_id)
+    invoiced = {}
+    for job_id, agent_id in (db.session.query(InvoiceJob.job_id, Invoice.agent_id)
+                             .join(Invoice, Invoice.id == InvoiceJob.invoice_id)
+                             .filter(InvoiceJob.job_id.in_(job_ids)).distinct()):
+        if agent_id is not None:
+            invoiced.setdefault(job_id, []).append(agent_id)
+    all_agent_ids = {a for ids in invoiced.values() for a in ids}
+    names = {u.id: f"{u.first_name} {u.last_name}".strip()
+             for u in User.query.filter(User.id.in_(all_agent_ids))} if all_agent_ids else {}
+
+    for job_id in job_ids:
+        job = jobs.get(job_id)
+        agent_ids = invoiced.get(job_id, [])
+        if job is None or not agent_ids:
+            continue
+        required = int(job.agents_required or 1)
+        if len(agent_ids) < min(required, len(accepted.get(job_id, ()))):
+            continue
+        job_names = [names[a] for a in agent_ids if a in names]
+        agents_list = "\n".join([f"• {n}" for n in job_names]) if job_names else "(names unavailable)"
+        send(
+            (
+                "🧾 <b>All Invoices Submitted</b>\n\n"
+                f"<b>Job:</b> #{job.id} — {job.title or job.job_type}\n"
+                f"<b>Location:</b> {location_for(job)}\n"
+                f"<b>Agents ({len(job_names)}):</b>\n{agents_list}\n\n"
+                "Please review and mark the job as complete."
+            )
+        )
+
+
+# --- Pipeline ---
+
+def _run_stage(invoice, rendered):
+    if invoice.finalisation_status == STATUS_PENDING:
+        invoice.pdf_file_key = _render_and_upload(invoice, rendered)
+        invoice.finalisation_status = STATUS_UPLOADED
+    elif invoice.finalisation_status == STATUS_UPLOADED:
+        _queue_email(invoice, rendered)
+        invoice.finalisation_status = STATUS_EMAILED
+    elif invoice.finalisation_status == STATUS_EMAILED:
+        _notify(invoice)
+        invoice.finalisation_status = STATUS_COMPLETE
+        invoice.finalisation_due_at = None
+    invoice.finalisation_attempts = 0
+
+
+def finalise_invoice(invoice_id):
+    """Run every due finalisation stage for an invoice. Needs an app context.
+
+    Returns the status the invoice was left in, or None if it couldn't be claimed.
+    """
+    rendered = {}  # the upload and email stages share one PDF
+    try:
+        return _queue.run(invoice_id, lambda invoice, now: _run_stage(invoice, rendered))
+    finally:
+        _discard_pdf(rendered)
+
+
+def status_for(invoice):
+    """What the app shows while polling."""
+    return {
+        'invoice_id': invoice.id,
+        'invoice_number': invoice.invoice_number,
+        'finalisation_status': invoice.finalisation_status or STATUS_COMPLETE,
+        'pdf_ready': invoice.finalisation_status in (None, STATUS_UPLOADED, STATUS_EMAILED, STATUS_COMPLETE),
+        'attempts': invoice.finalisation_attempts or 0,
+        'error': invoice.finalisation_error,
+        'retry_at': invoice.finalisation_due_at.isoformat() if invoice.finalisation_due_at else None,
+    }
+
+
+_queue = LeasedQueue(
+    Invoice, finalise_invoice,
+    name='invoice-finalise', active=ACTIVE_STATUSES, failed=STATUS_FAILED,
+    status='finalisation_status', due='finalisation_due_at', lock='finalisation_locked_until',
+    attempts='finalisation_attempts', error='finalisation_error',
+    describe=lambda invoice, stage: f"Invoice {invoice.invoice_number} finalisation at {stage}",
+    lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS, max_workers=MAX_WORKERS,
+    backoff_base=BACKOFF_BASE_SECONDS, backoff_max=BACKOFF_MAX_SECONDS, sweep_order=['finalisation_due_at'],
+)
+
+
+def enqueue(invoice_id, app=None):
+    """Hand an invoice to the worker pool; duplicates already queued are ignored."""
+    return _queue.enqueue(invoice_id, app)
+
+
+def process_due(limit=SWEEP_BATCH):
+    """Queue invoices whose next finalisation stage is due (retries, restarts)."""
+    return _queue.process_due(limit, enqueue)
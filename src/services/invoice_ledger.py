@@ -0,0 +1,189 @@
+"""
+Uninvoiced-work ledger: `job_assignments.invoice_state`.
+
+Every accepted assignment is either 'uninvoiced' or 'invoiced'; assignments
+that were never accepted (and aren't covered by an invoice) are NULL. The
+agent invoice picker and the supplier pending list read the state straight
+off the (agent_id | supplied_by_email, invoice_state) indexes instead of
+re-deriving it from the whole invoice history on every request.
+
+An assignment counts as invoiced when
+- an invoice line references it (supplier invoices), or
+- one of its agent's invoices links its job through invoice_jobs, or
+- for agent (not supplier-supplied) work only: one of its agent's invoice
+  lines has a work_date on the job's arrival date, the rule that catches old
+  time-entry invoices written before invoice_jobs existed.
+
+The state is recomputed from those rules, never flipped blindly, so
+re-running it is always safe. ORM changes to assignments (new, status or
+supplier changed) and to a job's arrival time are picked up in the flush.
+Invoice writes mostly go through Core inserts and bulk deletes the flush
+can't see, so those call `refresh()` / `updating()` themselves; slot
+allocation's compare-and-swap status updates set the state in the same
+statement.
+"""
+import logging
+from contextlib import contextmanager
+from typing import Iterable, Optional, Set
+
+from sqlalchemy import and_, case, event, exists, func, inspect, select, union
+from sqlalchemy.orm import Session
+
+from src.extensions import db
+from src.models.user import Invoice, InvoiceJob, InvoiceLine, Job, JobAssignment
+
+logger = logging.getLogger(__name__)
+
+UNINVOICED = 'uninvoiced'
+INVOICED = 'invoiced'
+BATCH_SIZE = 1000
+
+_assignments = JobAssignment.__table__
+_jobs = Job.__table__
+_invoices = Invoice.__table__
+_invoice_jobs = InvoiceJob.__table__
+_invoice_lines = InvoiceLine.__table__
+
+
+def _covered():
+    """Correlated condition: the job_assignments row is covered by some invoice."""
+    ja = _assignments
+    by_line = exists().where(_invoice_lines.c.job_assignment_id == ja.c.id)
+    by_job = exists().where(
+        _invoice_jobs.c.job_id == ja.c.job_id,
+        _invoices.c.id == _invoice_jobs.c.invoice_id,
+        _invoices.c.agent_id == ja.c.agent_id,
+    )
+    by_date = and_(
+        func.coalesce(ja.c.supplied_by_email, '') == '',
+        exists().where(
+            _jobs.c.id == ja.c.job_id,
+            _invoices.c.agent_id == ja.c.agent_id,
+            _invoice_lines.c.invoice_id == _invoices.c.id,
+            _invoice_lines.c.work_date == func.date(_jobs.c.arrival_time),
+        ),
+    )
+    return by_line | by_job | by_date
+
+
+def state_expression(status_column):
+    """invoice_state for a row given its (new) status."""
+    return case((_covered(), INVOICED), (status_column == 'accepted', UNINVOICED), else_=None)
+
+
+def swap_state(to_status: str):
+    """invoice_state for a status-only UPDATE to `to_status`; coverage can't change with status."""
+    if to_status == 'accepted':
+        return case((_assignments.c.invoice_state == INVOICED, INVOICED), else_=UNINVOICED)
+    return case((_assignments.c.invoice_state == INVOICED, INVOICED), else_=None)
+
+
+def _recompute(connection, where) -> int:
+    stmt = _assignments.update().where(where).values(invoice_state=state_expression(_assignments.c.status))
+    return connection.execute(stmt).rowcount
+
+
+def recompute(assignment_ids: Optional[Iterable[int]] = None, connection=None) -> int:
+    """Re-derive invoice_state for `assignment_ids` (default: every assignment, in id batches)."""
+    conn = connection if connection is not None else db.session.connection()
+    if assignment_ids is not None:
+        ids = sorted(set(assignment_ids))
+        return sum(_recompute(conn, _assignments.c.id.in_(ids[n:n + BATCH_SIZE]))
+                   for n in range(0, len(ids), BATCH_SIZE))
+    updated, last_id = 0, 0
+    top = conn.execute(select(func.max(_assignments.c.id))).scalar() or 0
+    while last_id < top:
+        updated += _recompute(conn, and_(_assignments.c.id > last_id, _assignments.c.id <= last_id + BATCH_SIZE))
+        last_id += BATCH_SIZE
+    return updated
+
+
+def _affected(ids):
+    ja = _assignments
+    via_line = select(_invoice_lines.c.job_assignment_id).where(
+        _invoice_lines.c.invoice_id.in_(ids), _invoice_lines.c.job_assignment_id.isnot(None))
+    via_job = (
+        select(ja.c.id)
+        .join(_invoice_jobs, _invoice_jobs.c.job_id == ja.c.job_id)
+        .join(_invoices, and_(_invoices.c.id == _invoice_jobs.c.invoice_id, _invoices.c.agent_id == ja.c.agent_id))
+        .where(_invoices.c.id.in_(ids))
+    )
+    via_date = (
+        select(ja.c.id)
+        .join(_jobs, _jobs.c.id == ja.c.job_id)
+        .join(_invoices, _invoices.c.agent_id == ja.c.agent_id)
+        .join(_invoice_lines, and_(_invoice_lines.c.invoice_id == _invoices.c.id,
+                                   _invoice_lines.c.work_date == func.date(_jobs.c.arrival_time)))
+        .where(_invoices.c.id.in_(ids))
+    )
+    return union(via_line, via_job, via_date)
+
+
+def affected_by(invoice_ids: Iterable[int]) -> Set[int]:
+    """Assignment ids whose state depends on the given invoices' current lines and job links."""
+    ids = list(invoice_ids)
+    if not ids:
+        return set()
+    return {row[0] for row in db.session.execute(_affected(ids)).all()}
+
+
+def refresh(invoice_ids: Iterable[int]) -> int:
+    """After creating or linking invoices: mark the work they now cover (one UPDATE)."""
+    ids = list(invoice_ids)
+    if not ids:
+        return 0
+    db.session.flush()
+    return _recompute(db.session.connection(), _assignments.c.id.in_(_affected(ids)))
+
+
+@contextmanager
+def updating(invoice_ids: Iterable[int]):
+    """Wrap edits/deletes of invoices, their lines or job links.
+
+    Work the invoices covered beforehand is re-derived afterwards together
+    with whatever they cover now, so deleted invoices free their work again.
+    """
+    ids = list(invoice_ids)
+    before = affected_by(ids)
+    yield
+    db.session.flush()
+    recompute(before | affected_by(ids))
+
+
+def _changed(obj, *attrs) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[attr].history.has_changes() for attr in attrs)
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_assignment_changes(session, flush_context):
+    """Re-derive the state of assignments/jobs whose own columns feed the rules."""
+    assignment_ids, job_ids = set(), set()
+    for obj in session.new:
+        if isinstance(obj, JobAssignment):
+            assignment_ids.add(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, JobAssignment) and _changed(obj, 'status', 'supplied_by_email', 'agent_id', 'job_id'):
+            assignment_ids.add(obj.id)
+        elif isinstance(obj, Job) and _changed(obj, 'arrival_time'):
+            job_ids.add(obj.id)
+    if not (assignment_ids or job_ids):
+        return
+    conn = session.connection()
+    if assignment_ids:
+        recompute(assignment_ids, connection=conn)
+    if job_ids:
+        _recompute(conn, _assignments.c.job_id.in_(list(job_ids)))
+    session.info['invoice_ledger_stale'] = (assignment_ids, job_ids)
+
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _expire_recomputed(session, flush_context):
+    assignment_ids, job_ids = session.info.pop('invoice_ledger_stale', (None, None))
+    if assignment_ids is None:
+        return
+    for obj in list(session.identity_map.values()):
+        if isinstance(obj, JobAssignment):
+            loaded = inspect(obj).dict
+            if loaded.get('id') in assignment_ids or loaded.get('job_id') in job_ids:
+                session.expire(obj, ['invoice_state'])
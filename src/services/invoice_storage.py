@@ -0,0 +1,80 @@
+"""
+Invoice PDF storage layout migration.
+
+Invoice PDFs used to be stored as `invoices/{agent_id}/{invoice_number}.pdf`,
+which forces period reports to list every invoice ever uploaded. New uploads
+go to `invoices/YYYY/MM/{agent_id}/{invoice_number}.pdf` (issue month) and the
+key is recorded in `Invoice.pdf_file_key`.
+
+`migrate_invoice_keys` moves existing objects into the partitioned layout with
+server-side copies. Each legacy agent folder is listed once (paginated), so
+the run never issues a HEAD per object. Dry run is the default.
+"""
+import logging
+import re
+
+from src.extensions import db
+from src.models.user import Invoice
+from src.utils.s3_client import s3_client, invoice_key, legacy_invoice_key
+
+logger = logging.getLogger(__name__)
+
+COMMIT_EVERY = 200
+_PARTITIONED = re.compile(r'^invoices/\d{4}/\d{2}/')
+
+
+def is_partitioned(file_key):
+    return bool(file_key) and bool(_PARTITIONED.match(file_key))
+
+
+def migrate_invoice_keys(apply=False, delete_old=False, client=None):
+    """Copy legacy invoice PDFs to their date-partitioned keys.
+
+    Returns a summary dict with the planned/performed moves. With
+    `apply=False` nothing is written to S3 or the database. `delete_old`
+    removes the legacy object once the copy and the DB update succeeded.
+    """
+    client = client or s3_client
+    summary = {'moved': [], 'missing': [], 'errors': [], 'orphans': 0, 'applied': bool(apply)}
+    if not client.is_configured():
+        summary['errors'].append('S3 not configured')
+        return summary
+
+    pending = [inv for inv in Invoice.query.order_by(Invoice.agent_id, Invoice.id).all()
+               if not is_partitioned(inv.pdf_file_key)]
+    by_agent = {}
+    for inv in pending:
+        by_agent.setdefault(inv.agent_id, []).append(inv)
+
+    changed = 0
+    for agent_id, invoices in by_agent.items():
+        stored = {obj['Key'] for obj in client.iter_objects(legacy_invoice_key(agent_id, ''))}
+        for inv in invoices:
+            source = inv.pdf_file_key or legacy_invoice_key(agent_id, f"{inv.invoice_number}.pdf")
+            if source not in stored:
+                summary['missing'].append(source)
+                continue
+            stored.discard(source)
+            target = invoice_key(agent_id, source.rsplit('/', 1)[-1], inv.issue_date)
+            summary['moved'].append({'invoice_id': inv.id, 'from': source, 'to': target})
+            if not apply:
+                continue
+            if not client.copy_object(source, target):
+                summary['errors'].append(source)
+                summary['moved'].pop()
+                continue
+            inv.pdf_file_key = target
+            changed += 1
+            if changed % COMMIT_EVERY == 0:
+                db.session.commit()
+            if delete_old:
+                # Delete only after the new key is committed so a crash never loses the PDF
+                db.session.commit()
+                client.delete_file(source)
+        summary['orphans'] += len(stored)
+
+    if apply:
+        db.session.commit()
+    logger.info(f"Invoice key migration ({'apply' if apply else 'dry run'}): {len(summary['moved'])} moved, "
+                f"{len(summary['missing'])} missing, {len(summary['errors'])} errors, {summary['orphans']} orphans")
+    return summary
@@ -8,6 +8,7 @@ from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from src.models.user import db, Invoice, InvoiceLine, JobAssignment, SupplierProfile, InvoiceSequence
+from src.services import invoice_ledger
 
 
 def _quantize_money(value: Decimal) -> Decimal:
@@ -132,6 +133,7 @@ def build_supplier_invoice(
             conflicts = [row[0] for row in existing]
             raise ie
 
+        invoice_ledger.refresh([inv.id])
         return inv, conflicts
 
 
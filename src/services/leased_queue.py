@@ -0,0 +1,191 @@
+"""
+Leased work queues over ordinary tables.
+
+Contact-form intake, invoice finalisation, report photo thumbnails, Telegram
+updates and the email outbox all keep their pending work in rows and share
+the same mechanics, which live here:
+
+- a row is due when it is in one of the queue's active states, its due
+  column is empty or in the past, and no worker holds its lease;
+- a worker claims a row with a conditional update of the lease column, so
+  several gunicorn workers can share a table without doing work twice;
+- a failure bumps the attempt count and retries with exponential backoff
+  until MAX_ATTEMPTS, or straight away marks the row failed for a
+  `PermanentFailure`;
+- rows are handed to a small bounded thread pool per queue, fed by the code
+  that created them and by a scheduler sweep (`process_due`) that picks up
+  retries and rows left behind by a restart.
+
+Each pipeline keeps its own stages and side effects and builds one
+`LeasedQueue` with its model, column names and settings.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, List, Optional, Sequence
+
+from flask import current_app
+
+from src.extensions import db
+
+logger = logging.getLogger(__name__)
+
+
+class PermanentFailure(Exception):
+    """Work that cannot succeed by retrying (e.g. credentials not configured, a missing file)."""
+
+
+def backoff_seconds(attempts: int, base: int, cap: int) -> int:
+    return min(base * 2 ** max(attempts - 1, 0), cap)
+
+
+class LeasedQueue:
+    """Claiming, retry bookkeeping and the worker pool for one table.
+
+    `handler(key)` runs on the pool inside an app context for every enqueued
+    key; `describe(row, stage)` names a row in failure logs.
+    """
+
+    def __init__(self, model, handler: Optional[Callable] = None, *, name: str, active: Sequence[str],
+                 failed: str, describe: Callable, lease_seconds: int, max_attempts: int,
+                 backoff_base: int, backoff_max: int, max_workers: int = 1,
+                 status: str = 'status', due: str = 'due_at', lock: str = 'locked_until',
+                 attempts: str = 'attempts', error: str = 'last_error', key: str = 'id',
+                 sweep_key: Optional[str] = None, sweep_order: Optional[Sequence[str]] = None,
+                 is_permanent: Optional[Callable] = None):
+        self.model = model
+        self.table = model.__table__
+        self.handler = handler
+        self.name = name
+        self.active = tuple(active)
+        self.failed = failed
+        self.describe = describe
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.status, self.due_column, self.lock = status, due, lock
+        self.attempts, self.error, self.key = attempts, error, key
+        self.sweep_key = sweep_key or key
+        self.sweep_order = list(sweep_order or [])
+        self.is_permanent = is_permanent
+        self._executor = (ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+                          if handler is not None else None)
+        self._queued = set()
+        self._queued_lock = threading.Lock()
+
+    def _column(self, name):
+        return self.table.c[name]
+
+    def due(self, now: datetime):
+        """Condition for rows that are active, due and not leased."""
+        due, lock = self._column(self.due_column), self._column(self.lock)
+        return db.and_(self._column(self.status).in_(self.active),
+                       db.or_(due.is_(None), due <= now),
+                       db.or_(lock.is_(None), lock < now))
+
+    def backoff_seconds(self, attempts: int) -> int:
+        return backoff_seconds(attempts, self.backoff_base, self.backoff_max)
+
+    # --- Leases ---
+
+    def claim_many(self, keys: Iterable, now: datetime) -> List:
+        """Lease the given rows to this worker (one commit); returns the keys actually claimed."""
+        key = self._column(self.key)
+        claimed = [k for k in keys if db.session.execute(
+            self.table.update()
+            .where(key == k, self.due(now))
+            .values({self.lock: now + timedelta(seconds=self.lease_seconds)})
+        ).rowcount == 1]
+        db.session.commit()
+        return claimed
+
+    def claim(self, key, now: datetime) -> bool:
+        """Lease one due row; False if it's locked, not due or finished."""
+        return bool(self.claim_many([key], now))
+
+    def record_failure(self, row, error: Exception, now: datetime, stage: Optional[str] = None):
+        """Count a failed attempt: schedule the retry, or mark the row failed for good."""
+        attempts = (getattr(row, self.attempts) or 0) + 1
+        setattr(row, self.attempts, attempts)
+        setattr(row, self.error, (f"{stage}: {error}" if stage else str(error))[:2000])
+        what = self.describe(row, stage)
+        permanent = isinstance(error, PermanentFailure) or (self.is_permanent is not None and self.is_permanent(error))
+        if permanent or attempts >= self.max_attempts:
+            logger.error(f"{what} failed permanently: {error}")
+            setattr(row, self.status, self.failed)
+            if self._column(self.due_column).nullable:
+                setattr(row, self.due_column, None)
+        else:
+            delay = self.backoff_seconds(attempts)
+            logger.warning(f"{what} failed (attempt {attempts}), retrying in {delay}s: {error}")
+            setattr(row, self.due_column, now + timedelta(seconds=delay))
+
+    def run(self, key, step: Callable):
+        """Claim row `key` and apply `step(row, now)` for as long as it stays active and due.
+
+        A failing step is rolled back and recorded. Needs an app context.
+        Returns the row's status, or None if it couldn't be claimed.
+        """
+        if not self.claim(key, datetime.utcnow()):
+            return None
+
+        row = db.session.get(self.model, key)
+        try:
+            while getattr(row, self.status) in self.active:
+                now = datetime.utcnow()
+                due_at = getattr(row, self.due_column)
+                if due_at and due_at > now:
+                    break
+                stage = getattr(row, self.status)
+                try:
+                    step(row, now)
+                    setattr(row, self.error, None)
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    self.record_failure(row, e, now, stage)
+                    db.session.commit()
+                    break
+            return getattr(row, self.status)
+        finally:
+            setattr(row, self.lock, None)
+            db.session.commit()
+
+    # --- Worker pool ---
+
+    def _work(self, app, key):
+        try:
+            with app.app_context():
+                try:
+                    self.handler(key)
+                except Exception:
+                    db.session.rollback()
+                    logger.exception(f"{self.name} worker crashed for {key}")
+        finally:
+            with self._queued_lock:
+                self._queued.discard(key)
+
+    def enqueue(self, key, app=None) -> bool:
+        """Hand `key` to the worker pool; a key already queued is ignored."""
+        app = app or current_app._get_current_object()
+        with self._queued_lock:
+            if key in self._queued:
+                return False
+            self._queued.add(key)
+        self._executor.submit(self._work, app, key)
+        return True
+
+    def due_keys(self, limit: int) -> List:
+        now = datetime.utcnow()
+        query = db.select(self._column(self.sweep_key)).where(self.due(now))
+        if self.sweep_key != self.key:
+            query = query.distinct()
+        query = query.order_by(*[self._column(name) for name in self.sweep_order]).limit(limit)
+        return [row[0] for row in db.session.execute(query)]
+
+    def process_due(self, limit: int, enqueue: Optional[Callable] = None) -> int:
+        """Queue up to `limit` keys with due work (retries, restarts, missed wake-ups)."""
+        enqueue = enqueue or self.enqueue
+        return sum(1 for key in self.due_keys(limit) if enqueue(key))
@@ -0,0 +1,392 @@
+"""
+Outbound mail: a persistent outbox drained over reused SMTP connections.
+
+`queue_email()` stores a rendered message in the `email_outbox` table and wakes
+this process's drainer, so request threads never wait on SMTP. The drainer
+claims due rows, sends them over one pooled session (one TLS handshake and
+login per MAIL_MAX_PER_CONNECTION messages, reconnecting if the server drops
+the link), paces itself with a token bucket and retries transient failures
+with exponential backoff. A scheduler sweep re-wakes it for retries and rows
+left behind by a restart; rows are claimed with a conditional `locked_until`
+update so several workers can drain the same table.
+
+`send_message()` delivers synchronously over the same pooled connections for
+callers that need the SMTP result straight away.
+
+Settings come from app.config: MAIL_SERVER, MAIL_PORT, MAIL_USE_TLS,
+MAIL_USE_SSL, MAIL_USERNAME, MAIL_PASSWORD, MAIL_DEFAULT_SENDER and optionally
+MAIL_RATE_PER_SECOND, MAIL_MAX_PER_CONNECTION, MAIL_TIMEOUT.
+"""
+import json
+import logging
+import queue
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from email.utils import formataddr, getaddresses, parseaddr
+
+from flask import current_app
+
+from src.extensions import db
+from src.models.email_outbox import OutboxEmail
+from src.services.leased_queue import LeasedQueue
+
+logger = logging.getLogger(__name__)
+
+STATUS_QUEUED = 'queued'
+STATUS_SENT = 'sent'
+STATUS_FAILED = 'failed'
+
+DEFAULT_RATE_PER_SECOND = 10
+DEFAULT_MAX_PER_CONNECTION = 100
+DEFAULT_TIMEOUT = 30
+POOL_SIZE = 2
+IDLE_SECONDS = 60
+BATCH_SIZE = 50
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 8
+BACKOFF_BASE_SECONDS = 60
+BACKOFF_MAX_SECONDS = 6 * 3600
+
+
+class MailNotConfigured(Exception):
+    """MAIL_SERVER is not set."""
+
+
+def _flag(value):
+    return value if isinstance(value, bool) else str(value or '').lower() == 'true'
+
+
+def _settings():
+    config = current_app.config
+    if not config.get('MAIL_SERVER'):
+        raise MailNotConfigured("MAIL_SERVER is not set")
+    return (
+        config['MAIL_SERVER'],
+        int(config.get('MAIL_PORT') or 587),
+        _flag(config.get('MAIL_USE_SSL')),
+        _flag(config.get('MAIL_USE_TLS')),
+        config.get('MAIL_USERNAME'),
+        config.get('MAIL_PASSWORD'),
+    )
+
+
+def is_configured():
+    """True when a server and login credentials are set."""
+    config = current_app.config
+    return bool(config.get('MAIL_SERVER') and config.get('MAIL_USERNAME') and config.get('MAIL_PASSWORD'))
+
+
+def default_sender():
+    sender = current_app.config.get('MAIL_DEFAULT_SENDER')
+    return formataddr(sender) if isinstance(sender, tuple) else sender
+
+
+# --- Connections ---
+
+class _SMTPSession:
+    """One SMTP connection that is reused across messages and reopened when stale."""
+
+    def __init__(self, settings, max_per_connection, timeout):
+        self.settings = settings
+        self.max_per_connection = max_per_connection
+        self.timeout = timeout
+        self.smtp = None
+        self.sent_on_connection = 0
+        self.connections = 0
+        self.last_used = 0.0
+
+    def _connect(self):
+        server, port, use_ssl, use_tls, username, password = self.settings
+        if use_ssl:
+            smtp = smtplib.SMTP_SSL(server, port, timeout=self.timeout)
+        else:
+            smtp = smtplib.SMTP(server, port, timeout=self.timeout)
+            if use_tls:
+                smtp.starttls()
+        try:
+            if username:
+                smtp.login(username, password)
+        except Exception:
+            smtp.close()
+            raise
+        self.smtp = smtp
+        self.sent_on_connection = 0
+        self.connections += 1
+
+    def close(self):
+        if self.smtp is not None:
+            try:
+                self.smtp.quit()
+            except Exception:
+                self.smtp.close()
+        self.smtp = None
+
+    def _stale(self):
+        return (self.smtp is None
+                or self.sent_on_connection >= self.max_per_connection
+                or time.monotonic() - self.last_used > IDLE_SECONDS)
+
+    def send(self, sender, recipients, text):
+        """Send one message, reconnecting once if the server dropped the connection."""
+        for attempt in (1, 2):
+            if self._stale():
+                self.close()
+                self._connect()
+            try:
+                refused = self.smtp.sendmail(sender, recipients, text.encode('utf-8'))
+                self.sent_on_connection += 1
+                self.last_used = time.monotonic()
+                return refused
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                self.smtp = None
+                if attempt == 2:
+                    raise
+
+
+class _RateLimiter:
+    """Token bucket: at most `rate` sends per second on average, bursts up to `rate`."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+
+    def acquire(self, rate):
+        if not rate or rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(float(rate), self._tokens + (now - self._updated) * rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_rate_limiter = _RateLimiter()
+_stats = {'sent': 0, 'failed': 0, 'connections': 0}
+
+
+def mail_stats():
+    return dict(_stats)
+
+
+def _pool_for(settings):
+    with _pools_lock:
+        pool = _pools.get(settings)
+        if pool is None:
+            pool = _pools[settings] = queue.LifoQueue()
+            for _ in range(POOL_SIZE):
+                pool.put(None)
+        return pool
+
+
+@contextmanager
+def _session(settings):
+    """Borrow a pooled session (blocks while POOL_SIZE sessions are in use)."""
+    config = current_app.config
+    pool = _pool_for(settings)
+    session = pool.get()
+    if session is None:
+        session = _SMTPSession(settings,
+                               int(config.get('MAIL_MAX_PER_CONNECTION') or DEFAULT_MAX_PER_CONNECTION),
+                               int(config.get('MAIL_TIMEOUT') or DEFAULT_TIMEOUT))
+    connections_before = session.connections
+    try:
+        yield session
+    except Exception:
+        session.close()
+        raise
+    finally:
+        _stats['connections'] += session.connections - connections_before
+        pool.put(session)
+
+
+def close_connections():
+    """Close every pooled connection (tests, shutdown)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        while not pool.empty():
+            session = pool.get_nowait()
+            if session is not None:
+                session.close()
+
+
+def _envelope(msg):
+    """(sender, recipients, text) for a Message; Bcc is removed from the headers."""
+    sender = parseaddr(msg['From'] or default_sender() or '')[1]
+    recipients = [addr for _, addr in getaddresses(
+        msg.get_all('To', []) + msg.get_all('Cc', []) + msg.get_all('Bcc', [])) if addr]
+    if not recipients:
+        raise ValueError("Message has no recipients")
+    del msg['Bcc']
+    return sender, recipients, msg.as_string()
+
+
+def send_message(msg):
+    """Deliver a message now over a pooled connection; raises smtplib errors."""
+    if msg['From'] is None:
+        msg['From'] = default_sender()
+    sender, recipients, text = _envelope(msg)
+    settings = _settings()
+    _rate_limiter.acquire(current_app.config.get('MAIL_RATE_PER_SECOND', DEFAULT_RATE_PER_SECOND))
+    with _session(settings) as session:
+        session.send(sender, recipients, text)
+    _stats['sent'] += 1
+
+
+# --- Outbox ---
+
+def queue_email(msg, category=None, wake_worker=True):
+    """Store a message in the outbox and commit; delivery happens in the background."""
+    if msg['From'] is None:
+        msg['From'] = default_sender()
+    subject = msg['Subject']
+    sender, recipients, text = _envelope(msg)
+    email = OutboxEmail(
+        category=category,
+        sender=sender,
+        recipients=json.dumps(recipients),
+        subject=str(subject)[:255] if subject else None,
+        message=text,
+        status=STATUS_QUEUED,
+        next_attempt_at=datetime.utcnow(),
+    )
+    db.session.add(email)
+    db.session.commit()
+    if wake_worker:
+        wake()
+    return email
+
+
+def _is_permanent(error):
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return False  # config problem; retry once credentials are fixed
+    return isinstance(error, smtplib.SMTPResponseException) and 500 <= error.smtp_code < 600
+
+
+def _is_message_error(error):
+    """The server rejected this message; the connection is still usable for the next one."""
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return False
+    return isinstance(error, (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException))
+
+
+# Claims and retries only; the outbox is drained by the coalesced `wake()` below, not a keyed pool
+_queue = LeasedQueue(
+    OutboxEmail, name='mail-outbox', active=(STATUS_QUEUED,), failed=STATUS_FAILED, due='next_attempt_at',
+    describe=lambda email, stage: f"Outbox email {email.id}", is_permanent=_is_permanent,
+    lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS,
+    backoff_base=BACKOFF_BASE_SECONDS, backoff_max=BACKOFF_MAX_SECONDS,
+)
+
+
+def backoff_seconds(attempts):
+    return _queue.backoff_seconds(attempts)
+
+
+def _claim_batch(limit, now):
+    table = OutboxEmail.__table__
+    ids = [row[0] for row in db.session.execute(
+        db.select(table.c.id)
+        .where(_queue.due(now))
+        .order_by(table.c.next_attempt_at, table.c.id)
+        .limit(limit)
+    )]
+    claimed = _queue.claim_many(ids, now)
+    if not claimed:
+        return []
+    return OutboxEmail.query.filter(OutboxEmail.id.in_(claimed)).order_by(OutboxEmail.id).all()
+
+
+def _record_failure(email, error, now):
+    email.locked_until = None
+    _queue.record_failure(email, error, now)
+    if email.status == STATUS_FAILED:
+        _stats['failed'] += 1
+
+
+def flush_outbox(limit=BATCH_SIZE):
+    """Send every due outbox email, reusing one connection per batch. Needs an app context.
+
+    Returns the number of emails sent.
+    """
+    try:
+        settings = _settings()
+    except MailNotConfigured:
+        logger.warning("Email outbox not flushed: MAIL_SERVER is not set")
+        return 0
+
+    config = current_app.config
+    rate = config.get('MAIL_RATE_PER_SECOND', DEFAULT_RATE_PER_SECOND)
+    sent = 0
+    while True:
+        batch = _claim_batch(limit, datetime.utcnow())
+        if not batch:
+            break
+        with _session(settings) as session:
+            for index, email in enumerate(batch):
+                _rate_limiter.acquire(rate)
+                try:
+                    session.send(email.sender, json.loads(email.recipients), email.message)
+                except Exception as e:
+                    _record_failure(email, e, datetime.utcnow())
+                    db.session.commit()
+                    if not _is_message_error(e):
+                        # The connection itself is broken: hand the rest back for a later pass
+                        session.close()
+                        for rest in batch[index + 1:]:
+                            rest.locked_until = None
+                        db.session.commit()
+                        return sent
+                    continue
+                email.status = STATUS_SENT
+                email.sent_at = datetime.utcnow()
+                email.locked_until = None
+                email.last_error = None
+                db.session.commit()
+                sent += 1
+                _stats['sent'] += 1
+        if len(batch) < limit:
+            break
+    return sent
+
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='mail-outbox')
+_wake_lock = threading.Lock()
+_wake_pending = False
+
+
+def _drain(app):
+    global _wake_pending
+    with _wake_lock:
+        _wake_pending = False
+    with app.app_context():
+        try:
+            flush_outbox()
+        except Exception:
+            db.session.rollback()
+            logger.exception("Email outbox drain crashed")
+
+
+def wake(app=None):
+    """Schedule a drain on this process's mail thread (coalesced with one already waiting)."""
+    global _wake_pending
+    app = app or current_app._get_current_object()
+    with _wake_lock:
+        if _wake_pending:
+            return False
+        _wake_pending = True
+    _executor.submit(_drain, app)
+    return True
@@ -0,0 +1,222 @@
+"""
+Real-time in-app notifications over Server-Sent Events.
+
+Every committed change to a user's notifications is published to an
+in-process broker: new `Notification` rows as `notification` events and the
+user's maintained unread counter (`users.unread_notifications`) as `unread`
+events. Publishing hangs off the session's commit, so `notify_agent`,
+`create_job`, `bulk_notify_agents` and every other writer feed the stream
+without calling it, and nothing is published for rolled-back work.
+
+The broker is per process. A client connected to another worker still
+catches up: each stream replays rows after its `Last-Event-ID` from the
+database on connect, and streams end after `STREAM_LIFETIME` so clients
+reconnect (and resume) regularly. A subscriber that falls behind is resynced
+from the database rather than blocking publishers.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from src.models.user import Notification, User, db
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_SECONDS = 15        # comment lines keep proxies (and Heroku's 55s idle cut-off) from closing the stream
+STREAM_LIFETIME = int(os.environ.get('NOTIFICATION_STREAM_LIFETIME', 300))
+# Each open stream pins one gunicorn gthread thread (Procfile --threads), so the
+# cap is a share of the worker's threads; the rest stay free for API requests.
+WORKER_THREADS = int(os.environ.get('WEB_THREADS', 32))
+REQUEST_THREADS = max(1, WORKER_THREADS // 2)
+MAX_STREAMS = max(0, min(int(os.environ.get('NOTIFICATION_STREAM_MAX', WORKER_THREADS)),
+                         WORKER_THREADS - REQUEST_THREADS))  # per process
+BUSY_RETRY_SECONDS = 30       # Retry-After sent when the process is at MAX_STREAMS
+QUEUE_SIZE = 100              # events buffered per subscriber before it is resynced
+RESUME_LIMIT = 100            # rows replayed per resync
+RETRY_MS = 3000               # client reconnect delay advertised to EventSource
+
+
+class Subscription:
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self.overflowed = False
+
+
+class NotificationBroker:
+    """Fan-out of notification events to the streams open in this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+
+    def subscribe(self, user_id: int) -> Optional[Subscription]:
+        """Register a stream; None when the process is at MAX_STREAMS."""
+        with self._lock:
+            if sum(len(subs) for subs in self._subscribers.values()) >= MAX_STREAMS:
+                return None
+            subscription = Subscription(user_id)
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subs = self._subscribers.get(subscription.user_id)
+            if subs is not None:
+                subs.discard(subscription)
+                if not subs:
+                    del self._subscribers[subscription.user_id]
+
+    def listening(self, user_ids: Iterable[int]) -> Set[int]:
+        """The subset of `user_ids` with at least one open stream."""
+        with self._lock:
+            return {user_id for user_id in user_ids if user_id in self._subscribers}
+
+    def publish(self, user_id: int, kind: str, payload: dict):
+        with self._lock:
+            subs = list(self._subscribers.get(user_id, ()))
+        for subscription in subs:
+            try:
+                subscription.queue.put_nowait((kind, payload))
+            except queue.Full:
+                subscription.overflowed = True
+
+
+broker = NotificationBroker()
+
+
+# --- Publishing on commit ---
+
+def _pending(session) -> dict:
+    return session.info.setdefault('notification_stream', {'created': [], 'users': set()})
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changes(session, flush_context):
+    changed = [obj for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+               if isinstance(obj, Notification)]
+    if not changed:
+        return
+    pending = _pending(session)
+    for obj in changed:
+        pending['users'].add(int(obj.user_id))
+        if obj in session.new:
+            item = obj.to_dict()
+            item['user_id'] = int(obj.user_id)
+            pending['created'].append(item)
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_changes(session):
+    pending = session.info.pop('notification_stream', None)
+    if not pending:
+        return
+    try:
+        listening = broker.listening(pending['users'])
+        if not listening:
+            return
+        for item in pending['created']:
+            if item['user_id'] in listening:
+                broker.publish(item['user_id'], 'notification', item)
+        for user_id, unread in unread_counts(listening).items():
+            broker.publish(user_id, 'unread', {'unread': unread})
+    except Exception as e:
+        logger.warning(f"Failed to publish notification events: {str(e)}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop('notification_stream', None)
+
+
+def unread_counts(user_ids: Iterable[int]) -> Dict[int, int]:
+    """Current counters, read on a connection of their own (safe after commit)."""
+    users = User.__table__
+    with db.engine.connect() as conn:
+        rows = conn.execute(users.select().with_only_columns(users.c.id, users.c.unread_notifications)
+                            .where(users.c.id.in_(list(user_ids)))).all()
+    return {user_id: unread or 0 for user_id, unread in rows}
+
+
+def mark_all_read(user_id: int) -> int:
+    """Bulk-mark a user's notifications read and zero the counter (caller commits)."""
+    updated = Notification.query.filter(Notification.user_id == user_id, Notification.is_read.isnot(True)).update(
+        {Notification.is_read: True}, synchronize_session=False)
+    User.query.filter_by(id=user_id).update({User.unread_notifications: 0}, synchronize_session=False)
+    _pending(db.session)['users'].add(int(user_id))
+    return int(updated or 0)
+
+
+# --- The stream ---
+
+def _format(kind: str, payload: dict, event_id: Optional[int] = None) -> str:
+    lines = f"id: {event_id}\n" if event_id is not None else ''
+    return f"{lines}event: {kind}\ndata: {json.dumps(payload)}\n\n"
+
+
+def _catch_up(user_id: int, last_id: int) -> List[Notification]:
+    return (Notification.query.filter(Notification.user_id == user_id, Notification.id > last_id)
+            .order_by(Notification.id).limit(RESUME_LIMIT).all())
+
+
+def event_stream(subscription: Subscription, last_event_id: Optional[int]) -> Iterator[str]:
+    """
+    Yield SSE frames for one user until STREAM_LIFETIME elapses.
+
+    Without a Last-Event-ID the stream starts after the user's newest row (the
+    client has just loaded the list). The DB session is released once the
+    initial catch-up is done and only touched again on a resync.
+    """
+    user_id = subscription.user_id
+    deadline = time.monotonic() + STREAM_LIFETIME
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        if last_event_id is None:
+            newest = db.session.query(db.func.max(Notification.id)).filter(Notification.user_id == user_id).scalar()
+            last_id = newest or 0
+        else:
+            last_id = last_event_id
+        subscription.overflowed = True  # the first pass through the loop catches up from the DB
+
+        while time.monotonic() < deadline:
+            if subscription.overflowed:
+                subscription.overflowed = False
+                while True:
+                    try:
+                        subscription.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                rows = _catch_up(user_id, last_id)
+                for row in rows:
+                    last_id = row.id
+                    yield _format('notification', row.to_dict(), row.id)
+                if len(rows) == RESUME_LIMIT:
+                    subscription.overflowed = True
+                    continue
+                unread = db.session.query(User.unread_notifications).filter(User.id == user_id).scalar()
+                yield _format('unread', {'unread': unread or 0})
+                db.session.remove()
+                continue
+            try:
+                kind, payload = subscription.queue.get(timeout=min(HEARTBEAT_SECONDS, max(deadline - time.monotonic(), 0.01)))
+            except queue.Empty:
+                yield ": keepalive\n\n"
+                continue
+            if kind == 'notification':
+                if payload['id'] <= last_id:
+                    continue
+                last_id = payload['id']
+                yield _format(kind, payload, payload['id'])
+            else:
+                yield _format(kind, payload)
+    finally:
+        broker.unsubscribe(subscription)
+        db.session.remove()
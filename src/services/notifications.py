@@ -127,36 +127,25 @@ def notify_job_assignment(agent_id: int, job_data: dict):
     # Get weather information (simplified)
     weather_info = ""
     try:
-        if job_data.get('postcode'):
-            import requests
-            import os
-            
-            api_key = os.environ.get('OPENWEATHER_API_KEY')
-            if api_key:
-                geocoding_url = f"http://api.openweathermap.org/data/2.5/geo/1.0/zip"
-                geocoding_params = {'zip': f"{job_data['postcode']},GB", 'appid': api_key}
-                geocoding_response = requests.get(geocoding_url, params=geocoding_params, timeout=5)
-                
-                if geocoding_response.status_code == 200:
-                    geocoding_data = geocoding_response.json()
-                    lat, lon = geocoding_data.get('lat'), geocoding_data.get('lon')
-                    
-                    if lat and lon:
-                        current_weather_url = f"http://api.openweathermap.org/data/2.5/weather"
-                        current_params = {'lat': lat, 'lon': lon, 'appid': api_key, 'units': 'metric'}
-                        current_response = requests.get(current_weather_url, params=current_params, timeout=5)
-                        
-                        if current_response.status_code == 200:
-                            current_data = current_response.json()
-                            temp = round(current_data['main']['temp'])
-                            desc = current_data['weather'][0]['description'].title()
-                            icon_map = {
-                                '01d': '☀️', '01n': '🌙', '02d': '⛅', '02n': '☁️', '03d': '☁️', '03n': '☁️', 
-                                '04d': '☁️', '04n': '☁️', '09d': '🌦️', '09n': '🌦️', '10d': '🌧️', '10n': '🌧️',
-                                '11d': '⛈️', '11n': '⛈️', '13d': '🌨️', '13n': '🌨️', '50d': '🌫️', '50n': '🌫️'
-                            }
-                            icon = icon_map.get(current_data['weather'][0]['icon'], '🌤️')
-                            weather_info = f"\n<b>🌤️ Weather:</b> {icon} {desc}, {temp}°C"
+        from src.services import weather as weather_service
+        if weather_service.api_key():
+            # Cached per grid cell, so a blast to many agents costs one upstream call
+            lat, lon = job_data.get('location_lat'), job_data.get('location_lng')
+            if not (lat and lon) and job_data.get('postcode'):
+                location = weather_service.geocode_postcode(job_data['postcode'])
+                if location:
+                    lat, lon = location['lat'], location['lon']
+            if lat and lon:
+                current_data = weather_service.current_weather(lat, lon)
+                temp = round(current_data['main']['temp'])
+                desc = current_data['weather'][0]['description'].title()
+                icon_map = {
+                    '01d': '☀️', '01n': '🌙', '02d': '⛅', '02n': '☁️', '03d': '☁️', '03n': '☁️', 
+                    '04d': '☁️', '04n': '☁️', '09d': '🌦️', '09n': '🌦️', '10d': '🌧️', '10n': '🌧️',
+                    '11d': '⛈️', '11n': '⛈️', '13d': '🌨️', '13n': '🌨️', '50d': '🌫️', '50n': '🌫️'
+                }
+                icon = icon_map.get(current_data['weather'][0]['icon'], '🌤️')
+                weather_info = f"\n<b>🌤️ Weather:</b> {icon} {desc}, {temp}°C"
     except:
         pass
     
@@ -0,0 +1,225 @@
+"""
+Direct-to-S3 uploads and thumbnails for V3 report photos.
+
+Photos no longer pass through the Flask workers:
+
+1. `POST /agent/v3-reports/photo-uploads` creates a `ReportPhoto` row per file
+   and returns a presigned POST for each, so the app uploads straight to S3.
+2. `POST /agent/v3-reports/photo-uploads/complete` confirms the objects exist
+   and returns entries ready for `photo_urls` on report submission.
+3. A small worker pool downloads each original, records its dimensions and
+   stores a web-sized JPEG under `thumbnails/`. Report views and PDFs use the
+   thumbnail when it is ready and fall back to the original.
+
+Thumbnail failures retry with exponential backoff via `due_at`; claiming,
+retries and the worker pool come from `leased_queue`, and a scheduler sweep
+picks up retries and restarts. The admin endpoints share the same flow.
+
+The browser POSTs to the bucket itself, so the bucket's CORS configuration
+must allow POST from the app's origins (the Heroku app and, for local
+development, http://localhost:5173).
+"""
+import io
+import logging
+import os
+import uuid
+from datetime import datetime
+
+from botocore.exceptions import ClientError
+from PIL import Image, ImageOps, UnidentifiedImageError
+from werkzeug.utils import secure_filename
+
+from src.extensions import db
+from src.models.report_photo import ReportPhoto
+from src.services.leased_queue import LeasedQueue, PermanentFailure
+from src.utils.s3_client import s3_client
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = 'pending'
+STATUS_UPLOADED = 'uploaded'
+STATUS_READY = 'ready'
+STATUS_FAILED = 'failed'
+
+ALLOWED_TYPES = {'jpg': 'image/jpeg', 'jpeg': 'image/jpeg', 'png': 'image/png'}
+MAX_PHOTO_BYTES = int(os.environ.get('REPORT_PHOTO_MAX_BYTES', 25 * 1024 * 1024))
+MAX_FILES_PER_REQUEST = 50
+UPLOAD_URL_SECONDS = 900
+THUMBNAIL_MAX_PX = int(os.environ.get('REPORT_THUMBNAIL_MAX_PX', 1280))
+THUMBNAIL_QUALITY = 80
+
+MAX_WORKERS = int(os.environ.get('REPORT_PHOTO_WORKERS', 2))
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+LEASE_SECONDS = 300
+SWEEP_BATCH = 50
+
+
+# --- Keys ---
+
+def photo_key(owner_id, filename):
+    """Same layout the multipart upload used: agents/{id}/documents/v3_report_photo_<uuid>.<ext>."""
+    extension = filename.rsplit('.', 1)[1].lower()
+    return f"agents/{owner_id}/documents/v3_report_photo_{uuid.uuid4().hex}.{extension}"
+
+
+def thumbnail_key_for(file_key):
+    return f"thumbnails/{file_key.rsplit('.', 1)[0]}_w{THUMBNAIL_MAX_PX}.jpg"
+
+
+def thumbnail_keys(file_keys):
+    """{original key: thumbnail key} for photos whose thumbnail is ready, in one query."""
+    keys = [k for k in dict.fromkeys(file_keys) if k]
+    if not keys:
+        return {}
+    rows = db.session.query(ReportPhoto.file_key, ReportPhoto.thumbnail_key).filter(
+        ReportPhoto.file_key.in_(keys), ReportPhoto.status == STATUS_READY).all()
+    return {file_key: thumb for file_key, thumb in rows if thumb}
+
+
+# --- Upload flow ---
+
+def create_uploads(owner_id, files):
+    """Register photos and presign one direct upload per file.
+
+    `files` is a list of {'filename', 'content_type', 'size'}. Returns
+    (uploads, errors); each upload carries the `index` of its file in
+    `files`. Nothing is committed for rejected files.
+    """
+    uploads, errors, photos = [], [], []
+    for index, item in enumerate(files[:MAX_FILES_PER_REQUEST]):
+        filename = secure_filename((item or {}).get('filename') or '')
+        extension = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+        if extension not in ALLOWED_TYPES:
+            errors.append(f"{filename or 'file'}: Invalid file type")
+            continue
+        size = item.get('size')
+        if size is not None and (not isinstance(size, int) or size <= 0 or size > MAX_PHOTO_BYTES):
+            errors.append(f"{filename}: File must be between 1 byte and {MAX_PHOTO_BYTES // (1024 * 1024)}MB")
+            continue
+        photos.append((index, ReportPhoto(owner_id=owner_id, file_key=photo_key(owner_id, filename),
+                                          original_filename=filename, content_type=ALLOWED_TYPES[extension],
+                                          status=STATUS_PENDING)))
+    if len(files) > MAX_FILES_PER_REQUEST:
+        errors.append(f"Only {MAX_FILES_PER_REQUEST} photos can be uploaded per request")
+
+    for index, photo in photos:
+        upload = s3_client.generate_presigned_upload(photo.file_key, photo.content_type,
+                                                     MAX_PHOTO_BYTES, UPLOAD_URL_SECONDS)
+        if not upload:
+            errors.append(f"{photo.original_filename}: Could not create upload URL")
+            continue
+        db.session.add(photo)
+        uploads.append((index, photo, upload))
+    db.session.commit()
+    return [{'index': index, 'photo_id': photo.id, 'file_key': photo.file_key, 'filename': photo.original_filename,
+             'upload': upload} for index, photo, upload in uploads], errors
+
+
+def complete_uploads(owner_id, photo_ids, app=None):
+    """Confirm uploaded objects and queue their thumbnails.
+
+    Returns (photos, errors) where photos are `photo_urls` entries.
+    """
+    ids = [pid for pid in dict.fromkeys(photo_ids or []) if isinstance(pid, int)]
+    found = {p.id: p for p in ReportPhoto.query.filter(ReportPhoto.id.in_(ids),
+                                                       ReportPhoto.owner_id == owner_id).all()} if ids else {}
+    confirmed, errors = [], []
+    for pid in ids:
+        photo = found.get(pid)
+        if not photo:
+            errors.append(f"Photo {pid}: not found")
+            continue
+        if photo.status == STATUS_PENDING:
+            info = s3_client.get_object_info(photo.file_key)
+            if not info:
+                errors.append(f"{photo.original_filename}: Upload not received")
+                continue
+            photo.size = info.get('size')
+            photo.status = STATUS_UPLOADED
+            photo.uploaded_at = datetime.utcnow()
+        confirmed.append(photo)
+    db.session.commit()
+    for photo in confirmed:
+        if photo.status == STATUS_UPLOADED:
+            enqueue(photo.id, app)
+    return [photo.to_photo_entry() for photo in confirmed], errors
+
+
+def register_uploaded(owner_id, upload_result, app=None):
+    """Track a photo uploaded through the multipart endpoint so it gets a thumbnail too."""
+    filename = upload_result.get('original_filename') or ''
+    extension = filename.rsplit('.', 1)[-1].lower()
+    if extension not in ALLOWED_TYPES:
+        return None
+    photo = ReportPhoto(owner_id=owner_id, file_key=upload_result['file_key'], original_filename=filename,
+                        content_type=ALLOWED_TYPES[extension], size=upload_result.get('file_size'),
+                        status=STATUS_UPLOADED, uploaded_at=datetime.utcnow())
+    db.session.add(photo)
+    db.session.commit()
+    enqueue(photo.id, app)
+    return photo
+
+
+# --- Thumbnails ---
+
+def make_thumbnail(data):
+    """Return (jpeg bytes, width, height) of the original, honouring EXIF rotation."""
+    try:
+        image = Image.open(io.BytesIO(data))
+        image = ImageOps.exif_transpose(image)
+    except (UnidentifiedImageError, OSError) as e:
+        raise PermanentFailure(f"Not a readable image: {e}")
+    width, height = image.size
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    image.thumbnail((THUMBNAIL_MAX_PX, THUMBNAIL_MAX_PX))
+    out = io.BytesIO()
+    image.save(out, 'JPEG', quality=THUMBNAIL_QUALITY, optimize=True, progressive=True)
+    return out.getvalue(), width, height
+
+
+def _make_thumbnail(photo, now):
+    try:
+        original = s3_client.download_bytes(photo.file_key)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+            raise PermanentFailure(f"Original missing: {photo.file_key}")
+        raise
+    thumbnail, width, height = make_thumbnail(original)
+    key = thumbnail_key_for(photo.file_key)
+    s3_client.upload_bytes(key, thumbnail, 'image/jpeg')
+    photo.thumbnail_key = key
+    photo.width, photo.height = width, height
+    photo.status = STATUS_READY
+    photo.due_at = None
+    logger.info(f"Report photo {photo.id}: {width}x{height}, thumbnail {len(thumbnail)} bytes "
+                f"(original {len(original)} bytes)")
+
+
+def process_photo(photo_id):
+    """Generate and store the thumbnail for one photo. Needs an app context.
+
+    Returns the photo's status, or None if it couldn't be claimed.
+    """
+    return _queue.run(photo_id, _make_thumbnail)
+
+
+_queue = LeasedQueue(
+    ReportPhoto, process_photo,
+    name='report-photos', active=(STATUS_UPLOADED,), failed=STATUS_FAILED,
+    describe=lambda photo, stage: f"Report photo {photo.id}: thumbnail",
+    lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS, max_workers=MAX_WORKERS,
+    backoff_base=BACKOFF_BASE_SECONDS, backoff_max=BACKOFF_MAX_SECONDS, sweep_order=['id'],
+)
+
+
+def enqueue(photo_id, app=None):
+    """Hand a photo to the thumbnail pool; duplicates already queued are ignored."""
+    return _queue.enqueue(photo_id, app)
+
+
+def process_due(limit=SWEEP_BATCH):
+    """Queue uploaded photos still waiting for a thumbnail (retries, restarts)."""
+    return _queue.process_due(limit, enqueue)
@@ -0,0 +1,230 @@
+"""
+Retention for the tables that otherwise grow without bound.
+
+Each policy names a hot table, the timestamp that ages its rows and how
+many days they stay hot. `run()` moves rows past that age into
+`archived_records` (one row each, the original as compressed JSON) and
+deletes them from the hot table:
+
+- in batches of BATCH_SIZE, each batch archived and deleted in one
+  transaction, so a run interrupted anywhere simply resumes on the next one;
+- with BATCH_PAUSE seconds between batches and at most MAX_SECONDS per run,
+  so the nightly job never monopolises the database;
+- with the unique (source_table, source_id) key as the backstop if two
+  workers ever pick the same batch.
+
+Archived rows stay queryable through the admin archive API. The archive is a
+table rather than files on local disk because dyno filesystems are
+ephemeral.
+"""
+
+import base64
+import json
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import select
+
+from src.models.admin_message import AdminMessageDelivery
+from src.models.archive import ArchivedRecord
+from src.models.contact_form import ContactFormSubmission
+from src.models.crm_email import CRMEmail, CRMEmailBody
+from src.models.user import Notification, Setting, adjust_unread_counters, db
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = int(os.environ.get('RETENTION_BATCH_SIZE', 1000))
+BATCH_PAUSE = float(os.environ.get('RETENTION_BATCH_PAUSE', 0.5))   # seconds between batches
+MAX_SECONDS = float(os.environ.get('RETENTION_MAX_SECONDS', 300))   # per run
+LAST_RUN_SETTING = 'retention_last_run'
+
+
+class RetentionPolicy:
+    def __init__(self, model, timestamp: str, owner: Optional[str], days: int,
+                 eligible: Optional[Callable] = None):
+        self.model = model
+        self.table = model.__table__
+        self.name = self.table.name
+        self.timestamp = self.table.c[timestamp]
+        self.owner = self.table.c[owner] if owner else None
+        self.days = days
+        self.eligible = eligible
+
+    def cutoff(self, now: Optional[datetime] = None) -> datetime:
+        return (now or datetime.utcnow()) - timedelta(days=self.days)
+
+    def expired(self, now: Optional[datetime] = None):
+        """WHERE clause for rows due to move to the archive."""
+        clause = self.timestamp < self.cutoff(now)
+        if self.eligible is not None:
+            clause = clause & self.eligible(self.table)
+        return clause
+
+    def to_dict(self):
+        return {'table': self.name, 'timestamp': self.timestamp.name, 'days': self.days}
+
+
+def _days(name: str, default: int) -> int:
+    return int(os.environ.get(f"RETENTION_{name.upper()}_DAYS", default))
+
+
+POLICIES: Dict[str, RetentionPolicy] = {policy.name: policy for policy in (
+    RetentionPolicy(Notification, 'sent_at', 'user_id', _days('notifications', 90)),
+    RetentionPolicy(AdminMessageDelivery, 'created_at', 'agent_id', _days('admin_message_deliveries', 180)),
+    RetentionPolicy(CRMEmail, 'date', 'contact_id', _days('crm_emails', 730)),
+    # Only submissions that are closed and no longer in the intake pipeline
+    RetentionPolicy(ContactFormSubmission, 'created_at', None, _days('contact_form_submissions', 365),
+                    eligible=lambda t: t.c.status.in_(('resolved', 'spam')) & t.c.due_at.is_(None)),
+)}
+
+
+def is_expired(table: str, when: Optional[datetime]) -> bool:
+    """True if a row of `table` dated `when` would already be archived (sync guards)."""
+    policy = POLICIES.get(table)
+    if policy is None or when is None:
+        return False
+    if when.tzinfo is not None:
+        when = when.astimezone(timezone.utc).replace(tzinfo=None)
+    return when < policy.cutoff()
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(bytes(value)).decode('ascii')
+    return str(value)
+
+
+def _archive_batch(policy: RetentionPolicy, now: datetime) -> int:
+    """Move one batch to the archive; returns how many rows moved."""
+    table = policy.table
+    pk = table.primary_key.columns.values()[0]
+    rows = db.session.execute(
+        select(table).where(policy.expired(now)).order_by(pk)
+        .limit(BATCH_SIZE).with_for_update(skip_locked=True)
+    ).mappings().all()
+    if not rows:
+        return 0
+
+    ids = [row[pk.name] for row in rows]
+    extra = {}
+    if policy.model is CRMEmail:
+        # Bodies live in their own table; archive them inside the email's record
+        bodies = CRMEmailBody.__table__
+        extra = {body.email_id: {'body_text': body.text, 'body_html': body.html}
+                 for body in db.session.execute(select(bodies).where(bodies.c.email_id.in_(ids)))}
+        db.session.execute(bodies.delete().where(bodies.c.email_id.in_(ids)))
+
+    archived = []
+    for row in rows:
+        record = dict(row)
+        if policy.model is CRMEmail:
+            record.update(extra.get(row[pk.name], {'body_text': None, 'body_html': None}))
+        data = json.loads(json.dumps(record, default=_json_default))
+        archived.append({
+            'source_table': policy.name,
+            'source_id': row[pk.name],
+            'owner_id': row[policy.owner.name] if policy.owner is not None else None,
+            'recorded_at': row[policy.timestamp.name],
+            'archived_at': now,
+            'payload': ArchivedRecord.compress(data),
+        })
+    db.session.execute(ArchivedRecord.__table__.insert(), archived)
+
+    if policy.model is Notification:
+        unread = {}
+        for row in rows:
+            if not row['is_read']:
+                unread[row['user_id']] = unread.get(row['user_id'], 0) - 1
+        adjust_unread_counters(db.session.connection(), unread)
+
+    db.session.execute(table.delete().where(pk.in_(ids)))
+    db.session.commit()
+    return len(rows)
+
+
+def run(tables: Optional[List[str]] = None, max_seconds: Optional[float] = None,
+        now: Optional[datetime] = None) -> Dict:
+    """Archive expired rows table by table until done or out of time."""
+    started = time.monotonic()
+    budget = MAX_SECONDS if max_seconds is None else max_seconds
+    now = now or datetime.utcnow()
+    moved = {}
+    complete = True
+    for name in tables or list(POLICIES):
+        policy = POLICIES[name]
+        moved[name] = 0
+        while True:
+            if time.monotonic() - started >= budget:
+                complete = False
+                break
+            try:
+                count = _archive_batch(policy, now)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Retention batch failed for {name}: {str(e)}")
+                complete = False
+                break
+            moved[name] += count
+            if count < BATCH_SIZE:
+                break
+            if BATCH_PAUSE:
+                time.sleep(BATCH_PAUSE)
+        if time.monotonic() - started >= budget:
+            break
+
+    summary = {
+        'archived': moved,
+        'complete': complete,
+        'started_at': now.isoformat(),
+        'seconds': round(time.monotonic() - started, 3),
+    }
+    try:
+        Setting.set(LAST_RUN_SETTING, json.dumps(summary))
+    except Exception as e:
+        logger.warning(f"Could not record retention run: {str(e)}")
+    if any(moved.values()):
+        logger.info(f"Retention archived {moved} (complete={complete})")
+    return summary
+
+
+def status() -> Dict:
+    last_run = Setting.get(LAST_RUN_SETTING)
+    return {
+        'policies': [policy.to_dict() for policy in POLICIES.values()],
+        'batch_size': BATCH_SIZE,
+        'batch_pause': BATCH_PAUSE,
+        'max_seconds': MAX_SECONDS,
+        'last_run': json.loads(last_run) if last_run else None,
+    }
+
+
+def search_archive(table: str, owner_id: Optional[int] = None, source_id: Optional[int] = None,
+                   since: Optional[datetime] = None, until: Optional[datetime] = None,
+                   page: int = 1, per_page: int = 50) -> Dict:
+    """Page through archived rows of one table, newest first."""
+    query = ArchivedRecord.query.filter(ArchivedRecord.source_table == table)
+    if owner_id is not None:
+        query = query.filter(ArchivedRecord.owner_id == owner_id)
+    if source_id is not None:
+        query = query.filter(ArchivedRecord.source_id == source_id)
+    if since is not None:
+        query = query.filter(ArchivedRecord.recorded_at >= since)
+    if until is not None:
+        query = query.filter(ArchivedRecord.recorded_at < until)
+    records = (query.order_by(ArchivedRecord.recorded_at.desc(), ArchivedRecord.id.desc())
+               .offset((page - 1) * per_page).limit(per_page + 1).all())
+    return {
+        'table': table,
+        'page': page,
+        'per_page': per_page,
+        'has_more': len(records) > per_page,
+        'records': [record.to_dict() for record in records[:per_page]],
+    }
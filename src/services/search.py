@@ -0,0 +1,237 @@
+"""
+Full-text search over jobs, police interactions and CRM contacts.
+
+Each searchable model gets one row in `search_documents` (free text plus
+compacted identifiers such as postcodes and references), written in the
+same flush as the change that caused it, so the index never lags a commit.
+Matching runs on the database's own full-text index:
+
+- SQLite: FTS5, ranked with bm25();
+- Postgres: a generated tsvector ranked with ts_rank(), plus pg_trgm on the
+  identifiers;
+- anything else: ILIKE over the document, unranked.
+
+Every term is matched as a prefix, so "sw1" finds SW1A postcodes and "smi"
+finds Smith (one-letter terms match whole words only). The unified search
+ranks only the newest MAX_CANDIDATES matches of a query, which keeps
+one-letter searches over 100k+ rows as cheap as specific ones; list
+endpoints that count and page their results match every row. Rows written
+with bulk/Core statements bypass the flush
+listener; `reindex()` rebuilds the index for those (the benchmark seed and
+the migration use it), and callers that join back to the source table never
+show a document whose row has gone.
+"""
+import logging
+import re
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import Float, Integer, and_, event, func, literal, literal_column, or_, select, text
+from sqlalchemy.orm import Session
+
+from src.extensions import db
+from src.models.crm_contact import CRMContact
+from src.models.police_interaction import PoliceInteraction
+from src.models.search_document import SearchDocument
+from src.models.user import Job
+
+logger = logging.getLogger(__name__)
+
+MAX_TERMS = 8
+MAX_CANDIDATES = 1000   # newest matches ranked per query; a broader search is refined, not paged
+REINDEX_BATCH = 1000
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def terms(query: Optional[str]) -> List[str]:
+    return _WORD.findall((query or '').lower())[:MAX_TERMS]
+
+
+def compact(value) -> str:
+    """'SW1A 1AA' -> 'sw1a1aa': identifiers as typed with or without spaces/dashes."""
+    return re.sub(r'\W+', '', str(value or '')).lower()
+
+
+def _join(values: Iterable) -> str:
+    return ' '.join(str(v) for v in values if v not in (None, ''))
+
+
+class Searchable:
+    def __init__(self, entity: str, model, body: Callable, keys: Callable, title: Callable,
+                 subtitle: Optional[Callable] = None, owner: Optional[str] = None, status: Optional[str] = None):
+        self.entity = entity
+        self.model = model
+        self.body = body
+        self.keys = keys
+        self.title = title
+        self.subtitle = subtitle
+        self.owner = owner
+        self.status = status
+
+    def document(self, row) -> Dict:
+        """Works on ORM instances and Core rows alike (attribute access by column name)."""
+        return {
+            'entity': self.entity,
+            'entity_id': row.id,
+            'owner_id': getattr(row, self.owner) if self.owner else None,
+            'status': getattr(row, self.status) if self.status else None,
+            'title': (self.title(row) or '')[:255] or None,
+            'subtitle': ((self.subtitle(row) if self.subtitle else None) or '')[:255] or None,
+            'body': _join(self.body(row)),
+            'keys': _join(compact(v) for v in self.keys(row))[:255],
+            'updated_at': datetime.utcnow(),
+        }
+
+
+def _officers(row):
+    return [value for officer in (row.officers or []) if isinstance(officer, dict)
+            for value in (officer.get('shoulder_number'), officer.get('name'))]
+
+
+SEARCHABLES: Dict[str, Searchable] = {s.entity: s for s in (
+    Searchable(
+        'job', Job,
+        body=lambda r: (r.title, r.job_type, r.address, r.postcode, r.what3words_address, r.lead_agent_name),
+        keys=lambda r: (r.postcode, r.id),
+        title=lambda r: r.title or r.address,
+        subtitle=lambda r: _join((r.address if r.title else None, r.postcode)),
+        status='status',
+    ),
+    Searchable(
+        'police_interaction', PoliceInteraction,
+        body=lambda r: (r.job_address, r.force, r.reason, r.outcome, r.notes, *_officers(r)),
+        keys=lambda r: [o.get('shoulder_number') for o in (r.officers or []) if isinstance(o, dict)],
+        title=lambda r: r.job_address,
+        subtitle=lambda r: _join((r.force, r.outcome)),
+    ),
+    Searchable(
+        'crm_contact', CRMContact,
+        body=lambda r: (r.name, r.email, r.company_name, r.phone, r.property_address),
+        keys=lambda r: (r.phone, r.email),
+        title=lambda r: r.name,
+        subtitle=lambda r: r.company_name or r.email,
+        owner='owner_id',
+        status='status',
+    ),
+)}
+_BY_MODEL = {s.model: s for s in SEARCHABLES.values()}
+
+
+# --- Index maintenance ---
+
+def _write(connection, documents: List[Dict], removed: Dict[str, set]):
+    table = SearchDocument.__table__
+    stale = dict(removed)
+    for doc in documents:
+        stale.setdefault(doc['entity'], set()).add(doc['entity_id'])
+    for entity, ids in stale.items():
+        connection.execute(table.delete().where(table.c.entity == entity, table.c.entity_id.in_(ids)))
+    if documents:
+        connection.execute(table.insert(), documents)
+
+
+@event.listens_for(Session, 'after_flush')
+def _index_changes(session, flush_context):
+    documents, removed = [], {}
+    for obj in list(session.new) + [o for o in session.dirty if session.is_modified(o, include_collections=False)]:
+        searchable = _BY_MODEL.get(type(obj))
+        if searchable is not None:
+            documents.append(searchable.document(obj))
+    for obj in session.deleted:
+        searchable = _BY_MODEL.get(type(obj))
+        if searchable is not None:
+            removed.setdefault(searchable.entity, set()).add(obj.id)
+    if documents or removed:
+        _write(session.connection(), documents, removed)
+
+
+def reindex(entities: Optional[List[str]] = None, connection=None) -> Dict[str, int]:
+    """Rebuild the documents of `entities` (default all) from their tables."""
+    conn = connection if connection is not None else db.session.connection()
+    counts = {}
+    for entity in entities or list(SEARCHABLES):
+        searchable = SEARCHABLES[entity]
+        source = searchable.model.__table__
+        conn.execute(SearchDocument.__table__.delete().where(SearchDocument.__table__.c.entity == entity))
+        counts[entity] = 0
+        last_id = 0
+        while True:
+            rows = conn.execute(select(source).where(source.c.id > last_id)
+                                .order_by(source.c.id).limit(REINDEX_BATCH)).all()
+            if not rows:
+                break
+            _write(conn, [searchable.document(row) for row in rows], {})
+            counts[entity] += len(rows)
+            last_id = rows[-1].id
+    if connection is None:
+        db.session.commit()
+    logger.info(f"Search index rebuilt: {counts}")
+    return counts
+
+
+# --- Matching ---
+
+def hits(entity: str, query: Optional[str], owner_id: Optional[int] = None, candidates: Optional[int] = None):
+    """Subquery of (id, entity_id, rank) for the documents matching every term; lower rank is better.
+
+    With `candidates`, only that many of the newest matches (after the owner
+    filter) are kept. None when the query has no searchable terms, so callers
+    can skip the filter.
+    """
+    words = terms(query)
+    if not words:
+        return None
+    table = SearchDocument.__table__
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect == 'sqlite':
+        fts = f"search_fts_{SEARCHABLES[entity].entity}"
+        # One-letter prefixes expand to half the vocabulary; match those as whole words
+        match = ' AND '.join(f'"{word}"*' if len(word) > 1 else f'"{word}"' for word in words)
+        if len(words) > 1:
+            match = f'({match}) OR keys : "{"".join(words)}"*'
+        # Matches come straight off the index in rowid order, so with a LIMIT bm25() only
+        # runs on the rows kept. CROSS JOIN pins the FTS scan first, and the LIMIT (-1 is
+        # none) keeps SQLite from flattening this into the caller's join, which would
+        # re-run MATCH once per joined row.
+        sql = (f"SELECT d.id AS id, d.entity_id AS entity_id, bm25({fts}, 1.0, 4.0) AS rank "
+               f"FROM {fts} CROSS JOIN search_documents d ON d.id = {fts}.rowid WHERE {fts} MATCH :match")
+        params = {'match': match, 'candidates': candidates if candidates is not None else -1}
+        if owner_id is not None:
+            sql += " AND d.owner_id = :owner_id"
+            params['owner_id'] = owner_id
+        sql += f" ORDER BY {fts}.rowid DESC LIMIT :candidates"
+        return (text(sql).bindparams(**params)
+                .columns(id=Integer, entity_id=Integer, rank=Float).subquery('search_hits'))
+
+    if dialect == 'postgresql':
+        tsquery = func.to_tsquery('simple', ' & '.join(f"{word}:*" if len(word) > 1 else word for word in words))
+        vector = literal_column('search_documents.search_vector')
+        condition = or_(vector.op('@@')(tsquery), table.c.keys.ilike(f"%{''.join(words)}%"))
+        rank = -func.ts_rank(vector, tsquery)
+    else:
+        condition = and_(*[table.c.body.ilike(f"%{word}%") for word in words])
+        rank = literal(0.0)
+
+    query = select(table.c.id, table.c.entity_id, rank.label('rank')).where(table.c.entity == entity, condition)
+    if owner_id is not None:
+        query = query.where(table.c.owner_id == owner_id)
+    if candidates is not None:
+        query = query.order_by(table.c.id.desc()).limit(candidates)
+    return query.subquery('search_hits')
+
+
+def search(query: str, entities: List[str], owner_id: Optional[int] = None, limit: int = 10) -> Dict[str, List[Dict]]:
+    """Best `limit` documents per entity, ranked, for the unified search endpoint."""
+    results = {}
+    for entity in entities:
+        matched = hits(entity, query, owner_id=owner_id if SEARCHABLES[entity].owner else None,
+                       candidates=MAX_CANDIDATES)
+        if matched is None:
+            results[entity] = []
+            continue
+        documents = (SearchDocument.query.join(matched, matched.c.id == SearchDocument.id)
+                     .order_by(matched.c.rank, SearchDocument.entity_id.desc()).limit(limit).all())
+        results[entity] = [doc.to_dict() for doc in documents]
+    return results
@@ -0,0 +1,149 @@
+"""
+Atomic job slot allocation.
+
+`jobs.slots_filled` counts accepted assignments. Accepting claims a slot with one
+conditional UPDATE (`slots_filled < agents_required`), so concurrent accepts can
+never over-fill a job: the database serialises writers on the job row and
+re-checks the condition. The same statement flips the job to 'filled' when the
+last slot goes. Assignment status changes are compare-and-swap updates as well,
+so a double-tapped accept can't claim two slots.
+
+Nothing here commits; callers commit once so the whole response is one transaction.
+"""
+import logging
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import case, func
+
+from src.extensions import db
+from src.models.user import Job, JobAssignment
+from src.services.agent_ranking import record_status_change
+from src.services.invoice_ledger import swap_state
+
+logger = logging.getLogger(__name__)
+
+ACCEPTED = 'accepted'        # slot claimed, job still has room
+FILLED = 'filled'            # slot claimed and it was the last one
+FULL = 'full'                # no slot left; assignment declined
+NOT_PENDING = 'not_pending'  # assignment was not in an acceptable state
+
+_jobs = Job.__table__
+_assignments = JobAssignment.__table__
+
+
+def claim_slot(job_id: int) -> Optional[bool]:
+    """Take one slot on a job in a single statement.
+
+    Returns None when the job is full, otherwise whether this claim filled it.
+    """
+    required = func.coalesce(_jobs.c.agents_required, 1)
+    filled = _jobs.c.slots_filled + 1
+    stmt = (
+        _jobs.update()
+        .where(_jobs.c.id == job_id, _jobs.c.slots_filled < required)
+        .values(
+            slots_filled=filled,
+            status=case((filled >= required, 'filled'), else_=_jobs.c.status),
+        )
+        .returning(_jobs.c.slots_filled, required)
+    )
+    row = db.session.execute(stmt).first()
+    if row is None:
+        return None
+    return row[0] >= row[1]
+
+
+def release_slot(job_id: int) -> None:
+    """Give a slot back (accepted assignment withdrawn); a filled job reopens."""
+    db.session.execute(
+        _jobs.update()
+        .where(_jobs.c.id == job_id, _jobs.c.slots_filled > 0)
+        .values(
+            slots_filled=_jobs.c.slots_filled - 1,
+            status=case((_jobs.c.status == 'filled', 'open'), else_=_jobs.c.status),
+        )
+    )
+
+
+def _swap_status(assignment_id: int, from_statuses: Iterable[str], to_status: str, now: datetime) -> bool:
+    result = db.session.execute(
+        _assignments.update()
+        .where(_assignments.c.id == assignment_id, _assignments.c.status.in_(list(from_statuses)))
+        .values(status=to_status, response_time=now, invoice_state=swap_state(to_status))
+    )
+    return result.rowcount == 1
+
+
+def _refresh(*objs) -> None:
+    for obj in objs:
+        if obj is not None:
+            db.session.expire(obj, ['status', 'response_time', 'invoice_state'] if isinstance(obj, JobAssignment)
+                              else ['status', 'slots_filled'])
+
+
+def accept_assignment(assignment: JobAssignment, from_statuses: Iterable[str] = ('pending',)) -> str:
+    """Accept an assignment if a slot is free; otherwise decline it. Returns an outcome code."""
+    now = datetime.utcnow()
+    from_statuses = [s for s in from_statuses if s != 'accepted']
+    job_id, agent_id = assignment.job_id, assignment.agent_id
+    previous = assignment.status
+    job = db.session.get(Job, job_id)
+
+    if not _swap_status(assignment.id, from_statuses, 'accepted', now):
+        _refresh(assignment)
+        return NOT_PENDING
+
+    outcome = claim_slot(job_id)
+    if outcome is None:
+        _swap_status(assignment.id, ['accepted'], 'declined', now)
+        record_status_change(db.session, agent_id, previous, 'declined')
+        _refresh(assignment, job)
+        return FULL
+
+    record_status_change(db.session, agent_id, previous, 'accepted')
+    if outcome:
+        # Last slot gone: withdraw everyone else's outstanding offer
+        db.session.execute(
+            _assignments.update()
+            .where(
+                _assignments.c.job_id == job_id,
+                _assignments.c.status == 'pending',
+                _assignments.c.agent_id != agent_id,
+            )
+            .values(status='expired')
+        )
+    _refresh(assignment, job)
+    return FILLED if outcome else ACCEPTED
+
+
+def decline_assignment(assignment: JobAssignment) -> bool:
+    """Decline an assignment, releasing its slot if it had been accepted."""
+    now = datetime.utcnow()
+    agent_id, job_id = assignment.agent_id, assignment.job_id
+    if _swap_status(assignment.id, ['accepted'], 'declined', now):
+        release_slot(job_id)
+        record_status_change(db.session, agent_id, 'accepted', 'declined')
+        _refresh(assignment, db.session.get(Job, job_id))
+        return True
+    previous = assignment.status
+    changed = _swap_status(assignment.id, ['pending', 'expired'], 'declined', now)
+    if changed:
+        record_status_change(db.session, agent_id, previous, 'declined')
+    _refresh(assignment)
+    return changed
+
+
+def sync_slots_filled(job_ids: Optional[Iterable[int]] = None) -> int:
+    """Recompute slots_filled from accepted assignments (repair/backfill)."""
+    accepted = (
+        db.session.query(func.count(JobAssignment.id))
+        .filter(JobAssignment.job_id == Job.id, JobAssignment.status == 'accepted')
+        .scalar_subquery()
+    )
+    query = Job.query
+    if job_ids is not None:
+        query = query.filter(Job.id.in_(list(job_ids)))
+    updated = query.update({Job.slots_filled: accepted}, synchronize_session=False)
+    db.session.commit()
+    return updated
@@ -2,8 +2,6 @@
 Telegram notification service for sending job notifications to agents
 """
 import logging
-import os
-import requests
 from flask import current_app
 from src.integrations.telegram_client import send_message
 from src.models.user import Setting
@@ -11,25 +9,20 @@ from urllib.parse import quote_plus
 from datetime import datetime
 from flask import current_app
 from src.integrations.telegram_client import send_message as _send
+from src.services import weather as weather_service
 
 
 def fetch_weather(latitude: float, longitude: float) -> dict:
     """Return simple weather summary for a coordinate.
 
-    Uses OpenWeather current weather API when OPENWEATHER_API_KEY is set.
+    Uses the shared (grid-cell cached) weather service when OPENWEATHER_API_KEY is set.
     Returns a minimal, robust structure used by Telegram messages.
     """
-    api_key = os.environ.get("OPENWEATHER_API_KEY")
-    if not api_key:
+    if not weather_service.api_key():
         return {"summary": "Unavailable", "temp_c": None, "wind_mph": None, "precip_prob": None}
 
     try:
-        url = "https://api.openweathermap.org/data/2.5/weather"
-        params = {"lat": latitude, "lon": longitude, "appid": api_key, "units": "metric"}
-        resp = requests.get(url, params=params, timeout=10)
-        if resp.status_code != 200:
-            return {"summary": "Unavailable", "temp_c": None, "wind_mph": None, "precip_prob": None}
-        data = resp.json() or {}
+        data = weather_service.current_weather(latitude, longitude) or {}
 
         weather_list = data.get("weather") or []
         description = (weather_list[0].get("description") if weather_list else "Weather") or "Weather"
@@ -312,7 +305,7 @@ def send_generic_notification(agent, title, message):
         return False
 
 
-def send_crm_task_notification(crm_user, task, contact):
+def send_crm_task_notification(crm_user, task, contact, check_muted: bool = True):
     """
     Send CRM task notification to CRM user via Telegram
 
@@ -320,11 +313,12 @@ def send_crm_task_notification(crm_user, task, contact):
         crm_user: CRMUser object with telegram_chat_id
         task: CRMTask object with task details
         contact: CRMContact object with contact details
+        check_muted: False when the caller already checked the global mute for a whole batch
 
     Returns:
         bool: True if sent successfully, False otherwise
     """
-    if _skip_if_muted("telegram_crm_task", {"crm_user_id": getattr(crm_user, 'id', None), "task_id": getattr(task, 'id', None)}):
+    if check_muted and _skip_if_muted("telegram_crm_task", {"crm_user_id": getattr(crm_user, 'id', None), "task_id": getattr(task, 'id', None)}):
         return False
 
     if not crm_user.telegram_chat_id or not crm_user.telegram_opt_in:
@@ -0,0 +1,252 @@
+"""
+Telegram webhook ingestion.
+
+The webhook only stores the raw update, keyed by Telegram's `update_id`, and
+answers 200 straight away; Telegram retries anything slower, and a retried
+(or replayed) update hits the primary key and is dropped. Handling - linking
+accounts, looking up users, replying - happens here on a small bounded
+thread pool, fed by the webhook and by a scheduler sweep that picks up
+retries and updates received before a restart.
+
+Updates from one chat are handled strictly in `update_id` order: a worker
+only ever claims the oldest unfinished update of a chat, under a
+`locked_until` lease, so several gunicorn workers can share the queue
+without reordering a conversation. A failing update is retried with backoff
+and, after MAX_ATTEMPTS, marked failed so the chat moves on.
+"""
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from src.extensions import db
+from src.integrations.telegram_client import get_bot_info, send_message
+from src.models.crm_user import CRMUser
+from src.models.telegram_update import TelegramUpdate
+from src.models.user import User
+from src.services.leased_queue import LeasedQueue
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = 'pending'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+MAX_WORKERS = int(os.environ.get('TELEGRAM_UPDATE_WORKERS', 4))
+MAX_ATTEMPTS = 3
+BACKOFF_BASE_SECONDS = 5
+BACKOFF_MAX_SECONDS = 300
+LEASE_SECONDS = 60
+SWEEP_BATCH = 50
+KEEP_DAYS = 7          # Telegram stops redelivering an update after 24h
+
+
+def chat_of(update: dict) -> Optional[str]:
+    chat = (update.get('message') or {}).get('chat') or {}
+    return str(chat['id']) if chat.get('id') else None
+
+
+def ingest(update: dict) -> bool:
+    """Persist a webhook update; False if it has no chat or was already received."""
+    update_id = update.get('update_id')
+    chat_id = chat_of(update)
+    if update_id is None or chat_id is None:
+        return False
+    table = TelegramUpdate.__table__
+    values = {
+        'update_id': int(update_id),
+        'chat_id': chat_id,
+        'payload': json.dumps(update),
+        'status': STATUS_PENDING,
+        'attempts': 0,
+        'received_at': datetime.utcnow(),
+    }
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        result = db.session.execute(insert(table).values(**values).on_conflict_do_nothing(index_elements=['update_id']))
+        db.session.commit()
+        return result.rowcount == 1
+    try:
+        db.session.execute(table.insert().values(**values))
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+        return False
+
+
+# --- Handling ---
+
+_LINKED = {
+    ('start', 'agent'): "✅ Telegram successfully linked! You will now receive job notifications here.",
+    ('start', 'crm'): "✅ Telegram successfully linked to your CRM account! You will now receive task reminders here.",
+    ('link', 'agent'): "✅ Linked! You will now receive job notifications here.",
+    ('link', 'crm'): "✅ Linked to your CRM account! You will now receive task reminders here.",
+}
+_INVALID_TOKEN = {
+    'start': "⚠️ Link token is invalid or expired. Please get a new link from the app.",
+    'link': "⚠️ Link code is invalid or expired. Please get a new code from the app.",
+}
+_LINK_ERROR = "❌ Sorry, there was an error linking your account. Please try again."
+
+
+def _link(command: str, token: str, chat_id: str, username: Optional[str]):
+    """Link the agent, else the CRM user, holding this one-time code to the chat."""
+    account = User.query.filter_by(telegram_link_code=token).first()
+    kind = 'agent'
+    if account is None:
+        account = CRMUser.query.filter_by(telegram_link_code=token).first()
+        kind = 'crm'
+    if account is None:
+        logger.warning(f"Invalid or expired link token via /{command}: {token}")
+        send_message(chat_id, _INVALID_TOKEN[command])
+        return
+
+    account.telegram_chat_id = chat_id
+    account.telegram_username = username
+    account.telegram_link_code = None  # Clear the token
+    account.telegram_opt_in = True
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Database error linking Telegram via /{command} for {kind} {account.id}: {str(e)}")
+        send_message(chat_id, _LINK_ERROR)
+        return
+    logger.info(f"Telegram linked via /{command} for {kind} {account.id}: {username}")
+    send_message(chat_id, _LINKED[(command, kind)])
+
+
+def handle_update(update: dict):
+    """Act on one update: /start and /link link accounts, anything else gets a hint."""
+    message = update.get('message') or {}
+    chat = message.get('chat') or {}
+    text = (message.get('text') or '').strip()
+    chat_id = chat_of(update)
+    username = chat.get('username')
+    if not chat_id:
+        return
+
+    if text.startswith('/start'):
+        parts = text.split()
+        if len(parts) > 1:
+            _link('start', parts[1], chat_id, username)
+        elif User.query.filter_by(telegram_chat_id=chat_id).first():
+            send_message(chat_id, "✅ Your Telegram is already linked to your V3 Services account.")
+        else:
+            # Provide clear instructions and bot username for deep-linking
+            bot_username = current_app.config.get('TELEGRAM_BOT_USERNAME', 'V3JobsBot')
+            try:
+                bot_info = get_bot_info()
+                if bot_info.get("ok") and "result" in bot_info:
+                    bot_username = bot_info["result"].get("username", bot_username)
+            except Exception as e:
+                logger.warning(f"Could not get bot username for /start instructions: {str(e)}")
+            send_message(
+                chat_id,
+                (
+                    "👋 Welcome! To link your Telegram account, go back to the V3 Services app and tap “Link Telegram”.\n\n"
+                    "It will show a button that opens this chat with your one-time code.\n\n"
+                    f"If needed, you can also send: /start <your_code> to @{bot_username}"
+                )
+            )
+
+    elif text.startswith('/link'):
+        parts = text.split()
+        if len(parts) > 1:
+            _link('link', parts[1], chat_id, username)
+        else:
+            send_message(chat_id, "⚠️ Please provide a link code: /link YOUR_CODE")
+
+    elif text:
+        if User.query.filter_by(telegram_chat_id=chat_id).first():
+            send_message(chat_id, "📱 Your Telegram is linked to V3 Services. Job notifications will appear here automatically.")
+        else:
+            send_message(chat_id, "🔗 To receive job notifications, please link your Telegram account through the V3 Services app.")
+
+
+# --- Queue ---
+
+def _claim_next(chat_id: str, now: datetime) -> Optional[int]:
+    """Lease the chat's oldest unfinished update, if it is due and not held elsewhere."""
+    head = db.session.query(TelegramUpdate.update_id).filter(
+        TelegramUpdate.chat_id == chat_id, TelegramUpdate.status == STATUS_PENDING,
+    ).order_by(TelegramUpdate.update_id).first()
+    if head is None:
+        db.session.rollback()
+        return None
+    return head.update_id if _queue.claim(head.update_id, now) else None
+
+
+def _finish(update_id: int, error: Optional[Exception], now: datetime):
+    row = db.session.get(TelegramUpdate, update_id)
+    row.locked_until = None
+    if error is None:
+        row.status = STATUS_DONE
+        row.processed_at = now
+        row.last_error = None
+    else:
+        _queue.record_failure(row, error, now)
+        if row.status == STATUS_FAILED:
+            row.processed_at = now
+    db.session.commit()
+
+
+def process_chat(chat_id: str) -> int:
+    """Handle a chat's due updates in order. Needs an app context. Returns how many were handled."""
+    handled = 0
+    while True:
+        update_id = _claim_next(chat_id, datetime.utcnow())
+        if update_id is None:
+            return handled
+        payload = json.loads(db.session.get(TelegramUpdate, update_id).payload)
+        error = None
+        try:
+            handle_update(payload)
+        except Exception as e:
+            db.session.rollback()
+            error = e
+        _finish(update_id, error, datetime.utcnow())
+        if error is not None:
+            return handled
+        handled += 1
+
+
+# One pool task per chat (sweep_key), claiming that chat's updates one at a time by update_id
+_queue = LeasedQueue(
+    TelegramUpdate, process_chat,
+    name='telegram-updates', active=(STATUS_PENDING,), failed=STATUS_FAILED,
+    key='update_id', sweep_key='chat_id',
+    describe=lambda row, stage: f"Telegram update {row.update_id}",
+    lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS, max_workers=MAX_WORKERS,
+    backoff_base=BACKOFF_BASE_SECONDS, backoff_max=BACKOFF_MAX_SECONDS,
+)
+
+
+def enqueue(chat_id: str, app=None) -> bool:
+    """Hand a chat to the worker pool; a chat already queued is drained by that run."""
+    return _queue.enqueue(chat_id, app)
+
+
+def process_due(limit: int = SWEEP_BATCH) -> int:
+    """Queue chats with updates that are due (retries, restarts, missed wake-ups)."""
+    return _queue.process_due(limit, enqueue)
+
+
+def prune(keep_days: int = KEEP_DAYS) -> int:
+    """Delete handled updates older than `keep_days`; they only exist to dedupe redeliveries."""
+    cutoff = datetime.utcnow() - timedelta(days=keep_days)
+    deleted = TelegramUpdate.query.filter(
+        TelegramUpdate.status.in_((STATUS_DONE, STATUS_FAILED)),
+        TelegramUpdate.received_at < cutoff,
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
@@ -0,0 +1,306 @@
+"""
+Weather service: one OpenWeatherMap client shared by jobs, the weather routes and
+Telegram notifications.
+
+Coordinates are snapped to a ~2 km grid cell and responses are cached per cell:
+an in-process LRU answers repeat lookups without I/O, and a `weather_cache`
+table lets other workers (and restarts) reuse recent responses. Concurrent
+misses for the same cell share one upstream request, and current conditions
+and the forecast are fetched in parallel.
+
+Upstream failures surface as `requests` exceptions so callers keep their own
+fallback messages; a missing API key raises WeatherNotConfigured.
+"""
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Optional, Tuple
+
+import requests
+from flask import has_app_context
+
+from src.extensions import db
+from src.models.weather_cache import WeatherCacheEntry
+from src.utils.geo import KM_PER_DEG_LAT, parse_lat_lng
+
+logger = logging.getLogger(__name__)
+
+OPENWEATHER_BASE_URL = "https://api.openweathermap.org"
+CELL_KM = 2.0
+CURRENT_TTL = timedelta(minutes=10)
+FORECAST_TTL = timedelta(hours=1)
+GEOCODE_TTL = timedelta(days=30)
+REQUEST_TIMEOUT = (3.05, 10)
+LRU_SIZE = 4096
+MAX_WORKERS = 8
+
+_PLACEHOLDER_KEYS = ('', 'YOUR_API_KEY_HERE')
+
+
+class WeatherNotConfigured(Exception):
+    """OPENWEATHER_API_KEY is not set."""
+
+
+def api_key() -> Optional[str]:
+    key = os.environ.get('OPENWEATHER_API_KEY')
+    return None if key in _PLACEHOLDER_KEYS or key is None else key
+
+
+def grid_cell(lat: float, lng: float) -> Tuple[str, float, float]:
+    """Snap a coordinate to its ~CELL_KM square cell; returns (key, centre_lat, centre_lng)."""
+    step_lat = CELL_KM / KM_PER_DEG_LAT
+    row = int(math.floor((lat + 90.0) / step_lat))
+    centre_lat = -90.0 + (row + 0.5) * step_lat
+    step_lng = CELL_KM / (KM_PER_DEG_LAT * max(math.cos(math.radians(centre_lat)), 0.01))
+    col = int(math.floor((lng + 180.0) / step_lng))
+    centre_lng = -180.0 + (col + 0.5) * step_lng
+    return f"{row}:{col}", round(centre_lat, 5), round(centre_lng, 5)
+
+
+# --- Caching ---
+
+class _LRUCache:
+    """Thread-safe LRU of (expires_at_epoch, value)."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[0] <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return item[1]
+
+    def set(self, key, value, expires_at: float) -> None:
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+_memory = _LRUCache(LRU_SIZE)
+_inflight = {}
+_inflight_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='weather')
+_http = requests.Session()
+_stats = {'memory_hits': 0, 'db_hits': 0, 'upstream_calls': 0}
+_stats_lock = threading.Lock()  # the counters are bumped from the fetch threads too
+
+
+def _count(stat: str) -> None:
+    with _stats_lock:
+        _stats[stat] += 1
+
+
+def cache_stats() -> dict:
+    with _stats_lock:
+        return dict(_stats)
+
+
+def clear_cache() -> None:
+    """Drop the in-process cache (the persisted table is left alone)."""
+    _memory.clear()
+    with _stats_lock:
+        for k in _stats:
+            _stats[k] = 0
+
+
+def _load_persisted(kind: str, key: str):
+    if not has_app_context():
+        return None
+    try:
+        table = WeatherCacheEntry.__table__
+        with db.engine.connect() as conn:
+            row = conn.execute(
+                table.select()
+                .with_only_columns(table.c.payload, table.c.expires_at)
+                .where(table.c.kind == kind, table.c.cell_key == key,
+                       table.c.expires_at > datetime.utcnow())
+            ).first()
+        if row is None:
+            return None
+        _memory.set((kind, key), json.loads(row[0]),
+                    time.time() + (row[1] - datetime.utcnow()).total_seconds())
+        _count('db_hits')
+        return json.loads(row[0])
+    except Exception as e:
+        logger.debug(f"Weather cache read failed for {kind}/{key}: {e}")
+        return None
+
+
+def _store_persisted(kind: str, key: str, data, ttl: timedelta) -> None:
+    """Upsert on a separate connection so the caller's session/transaction is untouched."""
+    if not has_app_context():
+        return
+    try:
+        table = WeatherCacheEntry.__table__
+        now = datetime.utcnow()
+        with db.engine.begin() as conn:
+            conn.execute(table.delete().where(
+                db.or_(table.c.expires_at <= now,
+                       db.and_(table.c.kind == kind, table.c.cell_key == key))
+            ))
+            conn.execute(table.insert().values(
+                kind=kind, cell_key=key, payload=json.dumps(data),
+                fetched_at=now, expires_at=now + ttl,
+            ))
+    except Exception as e:
+        logger.debug(f"Weather cache write failed for {kind}/{key}: {e}")
+
+
+def _fetch_shared(kind: str, key: str, ttl: timedelta, fetch: Callable[[], object]):
+    """Run fetch() once per (kind, key) no matter how many callers miss at the same time.
+
+    Returns (data, fetched) where fetched is False for callers that waited on another's call.
+    """
+    cache_key = (kind, key)
+    with _inflight_lock:
+        future = _inflight.get(cache_key)
+        owner = future is None
+        if owner:
+            future = _inflight[cache_key] = Future()
+    if not owner:
+        return future.result(), False
+    try:
+        data = fetch()
+        _count('upstream_calls')
+        _memory.set(cache_key, data, time.time() + ttl.total_seconds())
+        future.set_result(data)
+        return data, True
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(cache_key, None)
+
+
+def cached_lookup(kind: str, key: str, ttl: timedelta, fetch: Callable[[], object]):
+    """Memory -> weather_cache table -> fetch(); results are cached for ttl."""
+    data = _memory.get((kind, key))
+    if data is not None:
+        _count('memory_hits')
+        return data
+    data = _load_persisted(kind, key)
+    if data is not None:
+        return data
+    data, fetched = _fetch_shared(kind, key, ttl, fetch)
+    if fetched:
+        _store_persisted(kind, key, data, ttl)
+    return data
+
+
+# --- Upstream calls ---
+
+def _get(path: str, params: dict) -> dict:
+    key = api_key()
+    if not key:
+        raise WeatherNotConfigured("OPENWEATHER_API_KEY is not set")
+    response = _http.get(f"{OPENWEATHER_BASE_URL}{path}", params={**params, 'appid': key},
+                         timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+
+def _current_fetcher(lat: float, lng: float):
+    return lambda: _get('/data/2.5/weather', {'lat': lat, 'lon': lng, 'units': 'metric'})
+
+
+def _forecast_fetcher(lat: float, lng: float):
+    return lambda: _get('/data/2.5/forecast', {'lat': lat, 'lon': lng, 'units': 'metric'})
+
+
+def _cell(lat, lng):
+    plat, plng = parse_lat_lng(lat, lng)
+    if plat is None:
+        raise ValueError(f"Invalid coordinates: {lat}, {lng}")
+    return grid_cell(plat, plng)
+
+
+def current_weather(lat, lng) -> dict:
+    """Current conditions for the grid cell containing (lat, lng)."""
+    key, clat, clng = _cell(lat, lng)
+    return cached_lookup('current', key, CURRENT_TTL, _current_fetcher(clat, clng))
+
+
+def forecast(lat, lng) -> dict:
+    """5-day / 3-hour forecast for the grid cell containing (lat, lng)."""
+    key, clat, clng = _cell(lat, lng)
+    return cached_lookup('forecast', key, FORECAST_TTL, _forecast_fetcher(clat, clng))
+
+
+def current_and_forecast(lat, lng) -> Tuple[dict, Optional[dict]]:
+    """Both payloads, fetching any cache misses in parallel.
+
+    The forecast is best-effort (None on failure); current conditions errors propagate.
+    """
+    if not api_key():
+        raise WeatherNotConfigured("OPENWEATHER_API_KEY is not set")
+    key, clat, clng = _cell(lat, lng)
+    results = {}
+    pending = {}
+    for kind, ttl, fetcher in (('current', CURRENT_TTL, _current_fetcher(clat, clng)),
+                               ('forecast', FORECAST_TTL, _forecast_fetcher(clat, clng))):
+        data = _memory.get((kind, key))
+        if data is not None:
+            _count('memory_hits')
+        else:
+            data = _load_persisted(kind, key)
+        if data is not None:
+            results[kind] = data
+        else:
+            pending[kind] = (ttl, _executor.submit(_fetch_shared, kind, key, ttl, fetcher))
+
+    for kind, (ttl, future) in pending.items():
+        try:
+            results[kind], fetched = future.result()
+        except Exception:
+            if kind == 'current':
+                raise
+            logger.warning(f"Forecast fetch failed for cell {key}", exc_info=True)
+            continue
+        if fetched:
+            _store_persisted(kind, key, results[kind], ttl)
+    return results['current'], results.get('forecast')
+
+
+def _normalise_postcode(postcode: str) -> str:
+    return ''.join(str(postcode).split()).upper()
+
+
+def geocode_postcode(postcode: str) -> Optional[dict]:
+    """Resolve a UK postcode to {'lat', 'lon', 'name'} via OpenWeather's zip geocoder."""
+    pc = _normalise_postcode(postcode or '')
+    if not pc:
+        return None
+
+    def fetch():
+        try:
+            return _get('/geo/1.0/zip', {'zip': f"{pc},GB"})
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return {}  # cache misses too so unknown postcodes aren't re-queried
+            raise
+
+    data = cached_lookup('geocode', pc, GEOCODE_TTL, fetch)
+    if not data or data.get('lat') is None or data.get('lon') is None:
+        return None
+    return {'lat': data['lat'], 'lon': data['lon'], 'name': data.get('name')}
@@ -0,0 +1,179 @@
+"""
+Web Push (VAPID) dispatcher for the legacy browser subscriptions.
+
+A broadcast parses each stored subscription once, then sends them all through
+a bounded thread pool sharing one pooled `requests.Session`. The parsed VAPID
+key is cached per private key, and the signed Authorization header is cached
+per push-service origin (the JWT `aud`) until shortly before it expires, so
+a broadcast to a thousand browsers on the same push service signs once.
+
+Subscriptions the push service reports as gone (404/410), or that no longer
+parse, are removed with one bulk DELETE in the caller's session at the end;
+the caller owns the commit, as with the FCM token bookkeeping.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from py_vapid import Vapid
+from pywebpush import WebPusher
+from requests.adapters import HTTPAdapter
+
+from src.models.user import PushSubscription, db
+
+logger = logging.getLogger(__name__)
+
+MAX_WORKERS = int(os.environ.get('WEB_PUSH_WORKERS', 16))
+TTL_SECONDS = 24 * 60 * 60      # how long the push service may hold an undelivered message
+REQUEST_TIMEOUT = 10            # seconds per push service request
+JWT_LIFETIME = 12 * 60 * 60     # the longest exp push services accept is 24h
+JWT_REFRESH_MARGIN = 10 * 60    # re-sign this long before exp
+DELETE_CHUNK = 500              # ids per IN (...) in the cleanup delete
+
+# Push services answer these for subscriptions that will never work again
+_GONE_STATUSES = (404, 410)
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='web-push')
+
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(pool_connections=8, pool_maxsize=MAX_WORKERS))
+_session.mount('http://', HTTPAdapter(pool_connections=8, pool_maxsize=MAX_WORKERS))
+
+_lock = threading.Lock()
+_keys: Dict[str, Optional[Vapid]] = {}
+_headers: Dict[Tuple[str, str, str], Tuple[float, Dict[str, str]]] = {}
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _vapid_key(private_key: str) -> Optional[Vapid]:
+    """Parse the configured private key once; None (logged once) if it is unusable."""
+    with _lock:
+        if private_key in _keys:
+            return _keys[private_key]
+    try:
+        key = Vapid.from_string(private_key=private_key)
+    except Exception as e:
+        logger.error(f"Invalid VAPID_PRIVATE_KEY, legacy web push disabled: {str(e)}")
+        key = None
+    with _lock:
+        _keys[private_key] = key
+    return key
+
+
+def _audience(endpoint: str) -> str:
+    url = urlparse(endpoint)
+    return f"{url.scheme}://{url.netloc}"
+
+
+def vapid_headers(private_key: str, subject: str, audience: str) -> Optional[Dict[str, str]]:
+    """Signed VAPID headers for one push-service origin, reused until near expiry."""
+    cache_key = (private_key, subject, audience)
+    now = time.time()
+    with _lock:
+        cached = _headers.get(cache_key)
+    if cached and cached[0] - JWT_REFRESH_MARGIN > now:
+        return cached[1]
+
+    key = _vapid_key(private_key)
+    if key is None:
+        return None
+    expires = int(now) + JWT_LIFETIME
+    signed = key.sign({'sub': subject, 'aud': audience, 'exp': expires})
+    with _lock:
+        _headers[cache_key] = (expires, signed)
+    return signed
+
+
+def clear_caches():
+    """Forget parsed keys and signed headers (key rotation, tests)."""
+    with _lock:
+        _keys.clear()
+        _headers.clear()
+
+
+def _parse(rows: Iterable[Tuple[int, str]]) -> Tuple[List[Tuple[int, dict]], List[int]]:
+    """Split (id, subscription_json) rows into sendable subscriptions and malformed ids."""
+    parsed, malformed = [], []
+    for sub_id, raw in rows:
+        try:
+            info = json.loads(raw)
+            keys = info['keys']
+            if not info['endpoint'] or not keys['p256dh'] or not keys['auth']:
+                raise ValueError('empty endpoint or keys')
+        except (TypeError, ValueError, KeyError) as e:
+            logger.warning(f"Discarding malformed push subscription {sub_id}: {str(e)}")
+            malformed.append(sub_id)
+            continue
+        parsed.append((sub_id, info))
+    return parsed, malformed
+
+
+def _send_one(sub_id: int, info: dict, payload: str, headers: Dict[str, str]) -> Tuple[int, Optional[int], Optional[str]]:
+    """Send to one subscription; returns (id, HTTP status or None, error)."""
+    try:
+        response = WebPusher(info, requests_session=_session).send(
+            payload, headers=dict(headers), ttl=TTL_SECONDS,
+            content_encoding='aes128gcm', timeout=REQUEST_TIMEOUT)
+    except Exception as e:
+        return sub_id, None, str(e)
+    if response.status_code > 202:
+        return sub_id, response.status_code, f"{response.status_code} {response.reason or ''}".strip()
+    return sub_id, response.status_code, None
+
+
+def send_web_push(user_ids: Iterable[int], title: str, body: str, private_key: str,
+                  subject: str) -> Dict[str, int]:
+    """
+    Push a notification to every stored browser subscription of `user_ids`.
+
+    Returns counts of sent, failed and expired (removed) subscriptions.
+    Removals are flushed into the current session and committed by the caller.
+    """
+    result = {'subscriptions': 0, 'sent': 0, 'failed': 0, 'expired': 0}
+    user_ids = list(user_ids)
+    if not user_ids:
+        return result
+    rows = db.session.query(PushSubscription.id, PushSubscription.subscription_json).filter(
+        PushSubscription.user_id.in_(user_ids)).all()
+    result['subscriptions'] = len(rows)
+    if not rows:
+        return result
+    if _vapid_key(private_key) is None:
+        result['failed'] = len(rows)
+        return result
+
+    subscriptions, gone = _parse(rows)
+    result['failed'] = len(gone)
+    payload = json.dumps({'title': title, 'body': body})
+
+    futures = []
+    for sub_id, info in subscriptions:
+        headers = vapid_headers(private_key, subject, _audience(info['endpoint']))
+        futures.append(_executor.submit(_send_one, sub_id, info, payload, headers))
+
+    for future in futures:
+        sub_id, status, error = future.result()
+        if error is None:
+            result['sent'] += 1
+            continue
+        result['failed'] += 1
+        if status in _GONE_STATUSES:
+            gone.append(sub_id)
+        else:
+            logger.warning(f"Web Push failed for subscription {sub_id}: {error}")
+
+    for chunk in _chunks(gone, DELETE_CHUNK):
+        PushSubscription.query.filter(PushSubscription.id.in_(chunk)).delete(synchronize_session=False)
+    result['expired'] = len(gone)
+    return result
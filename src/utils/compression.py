@@ -0,0 +1,77 @@
+"""
+Response compression for large JSON and text bodies.
+
+Responses of a compressible type and at least COMPRESS_MIN_BYTES are
+compressed with brotli (when the package is installed and the client accepts
+`br`) or gzip. `Vary: Accept-Encoding` is set on every compressible response,
+compressed or not, so shared caches keep the variants apart. Streamed bodies
+(SSE, zip downloads) and files are left alone.
+"""
+import gzip
+import logging
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_TYPES = frozenset({
+    'application/json', 'application/javascript', 'application/xml', 'image/svg+xml',
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript', 'text/xml',
+})
+DEFAULT_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4  # Fast levels: smaller than gzip -6 at a similar cost
+
+
+def choose_encoding(accept_encodings):
+    """The coding to use for a request's parsed Accept-Encoding, or None."""
+    if brotli is not None and accept_encodings['br'] > 0:
+        return 'br'
+    if accept_encodings['gzip'] > 0:
+        return 'gzip'
+    return None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _after_request(response):
+    if response.mimetype not in COMPRESSIBLE_TYPES:
+        return response
+    response.vary.add('Accept-Encoding')
+    if (response.direct_passthrough or response.is_streamed or response.status_code < 200
+            or response.status_code in (204, 206, 304) or 'Content-Encoding' in response.headers):
+        return response
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    data = response.get_data()
+    if len(data) < current_app.config.get('COMPRESS_MIN_BYTES', DEFAULT_MIN_BYTES):
+        return response
+    try:
+        compressed = compress(data, encoding)
+    except Exception as e:
+        logger.warning(f"Response compression failed: {str(e)}")
+        return response
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    if response.headers.get('ETag') and not response.headers['ETag'].startswith('W/'):
+        response.headers['ETag'] = f"W/{response.headers['ETag']}"
+    return response
+
+
+def init_compression(app):
+    """Compress responses on `app` (off with RESPONSE_COMPRESSION=false)."""
+    if not app.config.get('RESPONSE_COMPRESSION', True):
+        return
+    app.after_request(_after_request)
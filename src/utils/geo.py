@@ -0,0 +1,215 @@
+"""
+Geospatial helpers: haversine distance, geohash encoding and cell coverage.
+
+Geohashes are stored alongside numeric coordinates so that proximity queries can
+use an ordinary B-tree index (prefix range scans) on both SQLite and Postgres.
+"""
+import math
+from typing import Iterable, List, Optional, Tuple
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEG_LAT = math.pi * EARTH_RADIUS_KM / 180.0
+
+GEOHASH_PRECISION = 9  # ~4.8m x 4.8m cells; plenty for site-level accuracy
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+_BASE32_INDEX = {c: i for i, c in enumerate(_BASE32)}
+
+
+def parse_coord(value, lo: float, hi: float) -> Optional[float]:
+    """Parse a latitude/longitude from str/Decimal/float; None if missing or out of range."""
+    if value is None:
+        return None
+    try:
+        f = float(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+    if math.isnan(f) or f < lo or f > hi:
+        return None
+    return f
+
+
+def parse_lat_lng(lat, lng) -> Tuple[Optional[float], Optional[float]]:
+    """Parse a coordinate pair; both come back None unless both are valid."""
+    plat = parse_coord(lat, -90.0, 90.0)
+    plng = parse_coord(lng, -180.0, 180.0)
+    if plat is None or plng is None:
+        return None, None
+    return plat, plng
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance between two points in kilometres."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat: float, lng: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """Return (min_lat, min_lng, max_lat, max_lng) enclosing a circle of radius_km."""
+    angular = radius_km / EARTH_RADIUS_KM
+    dlat = math.degrees(angular)
+    cos_lat = math.cos(math.radians(lat))
+    if lat + dlat >= 90.0 or lat - dlat <= -90.0 or cos_lat <= 0:
+        dlng = 180.0
+    else:
+        dlng = math.degrees(math.asin(min(1.0, math.sin(angular) / cos_lat)))
+    return (
+        max(-90.0, lat - dlat),
+        max(-180.0, lng - dlng),
+        min(90.0, lat + dlat),
+        min(180.0, lng + dlng),
+    )
+
+
+# --- Geohash ---
+
+def geohash_encode(lat: float, lng: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Encode a coordinate as a base32 geohash string."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    chars = []
+    bit = 0
+    ch = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if lng >= mid:
+                ch = (ch << 1) | 1
+                lng_lo = mid
+            else:
+                ch <<= 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                ch = (ch << 1) | 1
+                lat_lo = mid
+            else:
+                ch <<= 1
+                lat_hi = mid
+        even = not even
+        bit += 1
+        if bit == 5:
+            chars.append(_BASE32[ch])
+            bit = 0
+            ch = 0
+    return ''.join(chars)
+
+
+def geohash_bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """Return (min_lat, min_lng, max_lat, max_lng) of a geohash cell."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    even = True
+    for c in geohash:
+        cd = _BASE32_INDEX[c]
+        for mask in (16, 8, 4, 2, 1):
+            if even:
+                mid = (lng_lo + lng_hi) / 2
+                if cd & mask:
+                    lng_lo = mid
+                else:
+                    lng_hi = mid
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                if cd & mask:
+                    lat_lo = mid
+                else:
+                    lat_hi = mid
+            even = not even
+    return lat_lo, lng_lo, lat_hi, lng_hi
+
+
+def cell_size_deg(precision: int) -> Tuple[float, float]:
+    """Return (lat_degrees, lng_degrees) spanned by a geohash cell of this precision."""
+    bits = 5 * precision
+    lng_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lng_bits)
+
+
+def precision_for_radius(lat: float, radius_km: float) -> int:
+    """Finest precision whose cells are at least radius_km tall and wide at this latitude.
+
+    With cells that size, a point's own cell plus its 8 neighbours always cover the circle.
+    """
+    # Cells narrow towards the poles, so size them at the poleward edge of the circle
+    edge_lat = min(89.9, abs(lat) + math.degrees(radius_km / EARTH_RADIUS_KM))
+    cos_lat = max(math.cos(math.radians(edge_lat)), 1e-6)
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        dlat, dlng = cell_size_deg(precision)
+        if dlat * KM_PER_DEG_LAT >= radius_km and dlng * KM_PER_DEG_LAT * cos_lat >= radius_km:
+            return precision
+    return 1
+
+
+def geohash_neighbours(geohash: str) -> List[str]:
+    """Return the cell itself and its 8 neighbours (fewer at the poles)."""
+    min_lat, min_lng, max_lat, max_lng = geohash_bounds(geohash)
+    dlat = max_lat - min_lat
+    dlng = max_lng - min_lng
+    clat = (min_lat + max_lat) / 2
+    clng = (min_lng + max_lng) / 2
+    cells = []
+    for dy in (-1, 0, 1):
+        nlat = clat + dy * dlat
+        if nlat < -90.0 or nlat > 90.0:
+            continue
+        for dx in (-1, 0, 1):
+            nlng = clng + dx * dlng
+            if nlng < -180.0:
+                nlng += 360.0
+            elif nlng > 180.0:
+                nlng -= 360.0
+            cell = geohash_encode(nlat, nlng, len(geohash))
+            if cell not in cells:
+                cells.append(cell)
+    return cells
+
+
+def geohash_cover(min_lat: float, min_lng: float, max_lat: float, max_lng: float,
+                  max_cells: int = 32) -> List[str]:
+    """Return geohash prefixes covering a bounding box using at most max_cells cells."""
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        dlat, dlng = cell_size_deg(precision)
+        rows = int(math.floor((max_lat + 90.0) / dlat) - math.floor((min_lat + 90.0) / dlat)) + 1
+        cols = int(math.floor((max_lng + 180.0) / dlng) - math.floor((min_lng + 180.0) / dlng)) + 1
+        if rows * cols > max_cells:
+            continue
+        cells = []
+        for r in range(rows):
+            lat = min(max_lat, min_lat + r * dlat)
+            for c in range(cols):
+                lng = min(max_lng, min_lng + c * dlng)
+                cell = geohash_encode(lat, lng, precision)
+                if cell not in cells:
+                    cells.append(cell)
+        return cells
+    return ['']
+
+
+def prefix_upper_bound(prefix: str) -> Optional[str]:
+    """Smallest string greater than every geohash starting with prefix (None if unbounded).
+
+    Used to turn a prefix match into an index-friendly `>= prefix AND < upper` range.
+    """
+    chars = list(prefix)
+    while chars:
+        idx = _BASE32_INDEX[chars[-1]]
+        if idx < len(_BASE32) - 1:
+            chars[-1] = _BASE32[idx + 1]
+            return ''.join(chars)
+        chars.pop()
+    return None
+
+
+def compact_prefixes(prefixes: Iterable[str]) -> List[str]:
+    """Drop duplicate prefixes and any prefix already covered by a shorter one."""
+    result: List[str] = []
+    for p in sorted(set(prefixes), key=len):
+        if not any(p.startswith(q) for q in result):
+            result.append(p)
+    return result
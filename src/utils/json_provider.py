@@ -0,0 +1,76 @@
+"""
+JSON provider for the app: orjson when it is installed, the stdlib otherwise.
+
+Both paths write Decimal as a number and date/datetime as ISO 8601, the same
+as the `as_float`/`as_iso` helpers the models already use, so a `to_dict()`
+can hand over raw column values instead of converting each one. orjson also
+serialises dates, datetimes, UUIDs and dataclasses natively and returns bytes,
+which the response is built from directly; on a multi-MB admin list that is
+most of the time spent after the queries.
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+
+from src.utils.serialize import as_float, as_iso
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return as_float(value)
+    if isinstance(value, (date, datetime)):
+        return as_iso(value)
+    # uuid, dataclasses, __html__ (Flask's own fallbacks)
+    return DefaultJSONProvider.default(value)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider with Decimal/date/datetime fast paths; see the module docstring."""
+
+    default = staticmethod(_default)
+
+    # Anything beyond these (cls=..., ensure_ascii=...) goes to the stdlib encoder
+    _ORJSON_KWARGS = frozenset({'indent', 'separators', 'sort_keys', 'default'})
+
+    def _orjson_option(self, kwargs):
+        option = orjson.OPT_NON_STR_KEYS
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dump_bytes(self, obj, **kwargs) -> bytes:
+        if orjson is not None and kwargs.keys() <= self._ORJSON_KWARGS:
+            try:
+                return orjson.dumps(obj, default=_default, option=self._orjson_option(kwargs))
+            except TypeError:
+                pass  # e.g. integers beyond 64 bits; the stdlib encoder copes
+        kwargs.setdefault('default', _default)
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        return json.dumps(obj, **kwargs).encode('utf-8')
+
+    def dumps(self, obj, **kwargs) -> str:
+        return self.dump_bytes(obj, **kwargs).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        dump_args = {}
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            dump_args['indent'] = 2
+        else:
+            dump_args['separators'] = (',', ':')
+        return self._app.response_class(self.dump_bytes(obj, **dump_args) + b'\n', mimetype=self.mimetype)
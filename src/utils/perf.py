@@ -0,0 +1,268 @@
+"""
+Per-request performance instrumentation.
+
+`init_perf(app)` hooks SQLAlchemy cursor events, Flask request hooks and
+`requests.Session.send` to record, for every request:
+
+- number of SQL statements and total SQL time
+- number of outbound HTTP calls and their total time
+- statements repeated within the request (same normalised SQL), the usual
+  signature of an N+1 loop
+
+Each response gets a `Server-Timing` header and the figures are aggregated per
+endpoint (`METHOD /url/rule`) in process memory for `GET /api/admin/perf`.
+Aggregates are per worker process and reset on restart.
+
+`count_queries()` counts statements issued by the current thread and backs the
+`query_budget` pytest marker in tests/conftest.py.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import requests
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+N_PLUS_ONE_THRESHOLD = 5     # same statement this many times in one request
+SLOW_REQUEST_MS = 1000
+TOP_FINGERPRINTS = 5
+
+_local = threading.local()
+_installed = False
+_install_lock = threading.Lock()
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*(?:\?|%\(\w+\)s|:\w+|%s)(?:\s*,\s*(?:\?|%\(\w+\)s|:\w+|%s))*\s*\)")
+_PARAM = re.compile(r"%\(\w+\)s|:\w+|%s")
+_SPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement):
+    """Normalise SQL so the same query with different parameters compares equal."""
+    sql = _STRING.sub('?', statement)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PARAM.sub('?', sql)
+    sql = _IN_LIST.sub('(?)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+class RequestStats:
+    """Counters for one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_ms = 0.0
+        self.http_calls = 0
+        self.http_ms = 0.0
+        self.statements = Counter()
+
+    def repeated(self, threshold=N_PLUS_ONE_THRESHOLD):
+        return {sql: n for sql, n in self.statements.most_common() if n >= threshold}
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+
+class EndpointStats:
+    """Running totals for one endpoint."""
+
+    def __init__(self):
+        self.requests = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.queries = 0
+        self.max_queries = 0
+        self.sql_ms = 0.0
+        self.http_calls = 0
+        self.http_ms = 0.0
+        self.n_plus_one_requests = 0
+        self.repeated = Counter()
+
+    def add(self, stats, total_ms):
+        self.requests += 1
+        self.total_ms += total_ms
+        self.max_ms = max(self.max_ms, total_ms)
+        self.queries += stats.queries
+        self.max_queries = max(self.max_queries, stats.queries)
+        self.sql_ms += stats.sql_ms
+        self.http_calls += stats.http_calls
+        self.http_ms += stats.http_ms
+        repeated = stats.repeated()
+        if repeated:
+            self.n_plus_one_requests += 1
+            self.repeated.update(repeated)
+
+    def to_dict(self, endpoint):
+        n = self.requests or 1
+        return {
+            'endpoint': endpoint,
+            'requests': self.requests,
+            'avg_ms': round(self.total_ms / n, 2),
+            'max_ms': round(self.max_ms, 2),
+            'avg_queries': round(self.queries / n, 2),
+            'max_queries': self.max_queries,
+            'avg_sql_ms': round(self.sql_ms / n, 2),
+            'avg_http_calls': round(self.http_calls / n, 2),
+            'avg_http_ms': round(self.http_ms / n, 2),
+            'n_plus_one_requests': self.n_plus_one_requests,
+            'repeated_statements': [{'sql': sql, 'count': count}
+                                    for sql, count in self.repeated.most_common(TOP_FINGERPRINTS)],
+        }
+
+
+class PerfRegistry:
+    """Thread-safe per-endpoint aggregates."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self.since = time.time()
+
+    def record(self, endpoint, stats, total_ms):
+        with self._lock:
+            self._endpoints.setdefault(endpoint, EndpointStats()).add(stats, total_ms)
+
+    def snapshot(self, sort='total_ms'):
+        with self._lock:
+            items = [(endpoint, s, s.to_dict(endpoint)) for endpoint, s in self._endpoints.items()]
+        key = {
+            'total_ms': lambda item: item[1].total_ms,
+            'queries': lambda item: item[1].queries,
+            'n_plus_one': lambda item: item[1].n_plus_one_requests,
+        }.get(sort, lambda item: item[1].total_ms)
+        return [data for _, _, data in sorted(items, key=key, reverse=True)]
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self.since = time.time()
+
+
+registry = PerfRegistry()
+
+
+def current_stats():
+    """The RequestStats of the request being handled on this thread, if any."""
+    if has_request_context():
+        return g.get('perf_stats')
+    return None
+
+
+# --- SQL ---
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('perf_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('perf_started')
+    elapsed_ms = (time.perf_counter() - started.pop()) * 1000 if started else 0.0
+    for counter in getattr(_local, 'counters', ()):
+        counter.append(statement)
+    stats = current_stats()
+    if stats is not None:
+        stats.queries += 1
+        stats.sql_ms += elapsed_ms
+        stats.statements[fingerprint(statement)] += 1
+
+
+@contextmanager
+def count_queries():
+    """Collect the SQL statements this thread executes inside the block."""
+    install()
+    statements = []
+    counters = getattr(_local, 'counters', None)
+    if counters is None:
+        counters = _local.counters = []
+    counters.append(statements)
+    try:
+        yield statements
+    finally:
+        counters.remove(statements)
+
+
+# --- Outbound HTTP ---
+
+def _instrument_requests():
+    original_send = requests.Session.send
+    if getattr(original_send, '_perf_wrapped', False):
+        return
+
+    def send(self, *args, **kwargs):
+        stats = current_stats()
+        if stats is None:
+            return original_send(self, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return original_send(self, *args, **kwargs)
+        finally:
+            stats.http_calls += 1
+            stats.http_ms += (time.perf_counter() - started) * 1000
+
+    send._perf_wrapped = True
+    requests.Session.send = send
+
+
+# --- Flask ---
+
+def _endpoint_name():
+    rule = request.url_rule.rule if request.url_rule else '<unmatched>'
+    return f"{request.method} {rule}"
+
+
+def _before_request():
+    g.perf_stats = RequestStats()
+
+
+def _after_request(response):
+    stats = g.pop('perf_stats', None)
+    if stats is None:
+        return response
+    total_ms = stats.elapsed_ms()
+    endpoint = _endpoint_name()
+    registry.record(endpoint, stats, total_ms)
+
+    response.headers.add('Server-Timing', ', '.join([
+        f'db;dur={stats.sql_ms:.1f};desc="{stats.queries} queries"',
+        f'http;dur={stats.http_ms:.1f};desc="{stats.http_calls} calls"',
+        f'app;dur={total_ms:.1f}',
+    ]))
+
+    repeated = stats.repeated()
+    if repeated:
+        sql, count = next(iter(repeated.items()))
+        logger.warning(f"PERF: possible N+1 on {endpoint}: {count}x {sql[:200]}")
+    if total_ms > SLOW_REQUEST_MS:
+        logger.warning(f"PERF: slow request {endpoint}: {total_ms:.0f}ms, "
+                       f"{stats.queries} queries ({stats.sql_ms:.0f}ms), "
+                       f"{stats.http_calls} HTTP calls ({stats.http_ms:.0f}ms)")
+    return response
+
+
+def install():
+    """Install the SQL and outbound HTTP hooks; idempotent, process-wide."""
+    global _installed
+    with _install_lock:
+        if not _installed:
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            _instrument_requests()
+            _installed = True
+
+
+def init_perf(app):
+    """Install the process-wide hooks and the request hooks on `app`."""
+    if not app.config.get('PERF_INSTRUMENTATION', True):
+        return
+    install()
+    app.before_request(_before_request)
+    app.after_request(_after_request)
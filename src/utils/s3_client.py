@@ -1,13 +1,116 @@
 import boto3
 import os
 import logging
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from botocore.config import Config
 from botocore.exceptions import ClientError, NoCredentialsError
 from werkzeug.utils import secure_filename
 import uuid
 
 logger = logging.getLogger(__name__)
 
+# One boto3 client per process (boto3 clients are thread-safe); pool sized for
+# request threads plus the background workers that upload PDFs.
+S3_CLIENT_CONFIG = Config(
+    max_pool_connections=int(os.getenv('S3_MAX_POOL_CONNECTIONS', 32)),
+    retries={'max_attempts': 5, 'mode': 'adaptive'},
+    connect_timeout=5,
+    read_timeout=60,
+    signature_version='s3v4',
+)
+
+# Presigned URLs are reused until shortly before they expire
+PRESIGN_CACHE_SIZE = 10000
+PRESIGN_MIN_REMAINING = 300
+
+# Invoice PDFs are partitioned by issue month so period queries list one prefix
+INVOICE_PREFIX = 'invoices/'
+LIST_PAGE_SIZE = 1000
+
+_CONTENT_TYPES = {
+    'pdf': 'application/pdf',
+    'png': 'image/png',
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'gif': 'image/gif',
+    'webp': 'image/webp'
+}
+
+
+def invoice_key(agent_id, filename, issue_date=None):
+    """Date-partitioned invoice key: invoices/YYYY/MM/{agent_id}/{filename}."""
+    issue_date = issue_date or datetime.utcnow().date()
+    return f"{INVOICE_PREFIX}{issue_date.year:04d}/{issue_date.month:02d}/{agent_id}/{filename}"
+
+
+def legacy_invoice_key(agent_id, filename):
+    """Key used before partitioning: invoices/{agent_id}/{filename}."""
+    return f"{INVOICE_PREFIX}{agent_id}/{filename}"
+
+
+def invoice_file_key(invoice):
+    """Stored key for an Invoice row, falling back to the legacy layout."""
+    return getattr(invoice, 'pdf_file_key', None) or legacy_invoice_key(invoice.agent_id, f"{invoice.invoice_number}.pdf")
+
+
+def _period_prefixes(year=None, month=None):
+    if year and month:
+        return [f"{INVOICE_PREFIX}{year:04d}/{month:02d}/"]
+    if year:
+        return [f"{INVOICE_PREFIX}{year:04d}/"]
+    return [INVOICE_PREFIX]
+
+
+def _period_bounds(year=None, month=None):
+    """[start, end) issue-date bounds for a year/month filter, or (None, None)."""
+    if not year:
+        return None, None
+    if month:
+        start = datetime(year, month, 1).date()
+        end = datetime(year + (month == 12), month % 12 + 1, 1).date()
+    else:
+        start, end = datetime(year, 1, 1).date(), datetime(year + 1, 1, 1).date()
+    return start, end
+
+
+class PresignedURLCache:
+    """Thread-safe LRU of presigned GET URLs keyed by (key, disposition)."""
+
+    def __init__(self, maxsize=PRESIGN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, cache_key, expiration):
+        """A cached URL that outlives min(PRESIGN_MIN_REMAINING, expiration/2) but not `expiration`."""
+        with self._lock:
+            item = self._data.get(cache_key)
+            if item is not None:
+                remaining = item[0] - time.time()
+                if min(PRESIGN_MIN_REMAINING, expiration / 2) <= remaining <= expiration:
+                    self._data.move_to_end(cache_key)
+                    self.hits += 1
+                    return item[1]
+            self.misses += 1
+            return None
+
+    def set(self, cache_key, url, expiration):
+        with self._lock:
+            self._data[cache_key] = (time.time() + expiration, url)
+            self._data.move_to_end(cache_key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
 class S3Client:
     def __init__(self):
         # Validate AWS environment variables first
@@ -36,12 +139,15 @@ class S3Client:
             return
         
         try:
-            self.s3_client = boto3.client(
+            self.s3_client = boto3.session.Session().client(
                 's3',
                 aws_access_key_id=self.aws_access_key_id,
                 aws_secret_access_key=self.aws_secret_access_key,
-                region_name=self.aws_region
+                region_name=self.aws_region,
+                endpoint_url=os.getenv('AWS_S3_ENDPOINT_URL') or None,  # S3-compatible stores such as MinIO
+                config=S3_CLIENT_CONFIG
             )
+            self.presign_cache = PresignedURLCache()
             self.configured = True
             self.error_message = None
             logger.info(f"S3 client initialized successfully for bucket: {self.bucket_name}")
@@ -160,7 +266,7 @@ class S3Client:
             logger.error(f"Error uploading agent document: {str(e)}")
             return {'success': False, 'error': str(e)}
 
-    def upload_invoice_pdf(self, agent_id, invoice_number, pdf_data, filename=None):
+    def upload_invoice_pdf(self, agent_id, invoice_number, pdf_data, filename=None, issue_date=None):
         """
         Upload invoice PDF to S3 with organized structure
         
@@ -169,6 +275,7 @@ class S3Client:
             invoice_number (str): Invoice number
             pdf_data: PDF file data or file object
             filename (str): Optional custom filename
+            issue_date (date): Invoice issue date used for the key partition (defaults to today)
             
         Returns:
             dict: Upload result with file URL and metadata
@@ -190,8 +297,8 @@ class S3Client:
             else:
                 filename = secure_filename(filename)
             
-            # Create organized S3 key: /invoices/{agent_id}/{invoice_number}.pdf
-            s3_key = f"invoices/{agent_id}/{filename}"
+            # Create organized S3 key: /invoices/{YYYY}/{MM}/{agent_id}/{invoice_number}.pdf
+            s3_key = invoice_key(agent_id, filename, issue_date)
             logger.info(f"S3 UPLOAD: Target S3 key: {s3_key}")
             
             # Prepare metadata
@@ -290,13 +397,14 @@ class S3Client:
             logger.error(f"S3 UPLOAD FAILED: Traceback: {traceback.format_exc()}")
             return {'success': False, 'error': f"Upload failed: {str(e)}"}
 
-    def generate_presigned_url(self, file_key, expiration=3600):
+    def generate_presigned_url(self, file_key, expiration=3600, disposition=None):
         """
         Generate a temporary signed URL for secure file access
         
         Args:
             file_key (str): S3 object key
             expiration (int): URL expiration time in seconds (default: 1 hour)
+            disposition (str): 'inline' or 'attachment'; defaults to inline for images and PDFs
             
         Returns:
             str: Presigned URL or None if error
@@ -306,79 +414,117 @@ class S3Client:
             return None
         
         try:
-            logger.info(f"PRESIGNED URL START: Generating signed URL for {file_key}")
-            logger.info(f"PRESIGNED URL: Using bucket {self.bucket_name}, expiration {expiration}s")
-            
-            # Create a fresh S3 client to ensure credentials are current
-            fresh_s3_client = boto3.client(
-                's3',
-                aws_access_key_id=self.aws_access_key_id,
-                aws_secret_access_key=self.aws_secret_access_key,
-                region_name=self.aws_region
-            )
-            
             # Determine content type based on file extension
             file_extension = file_key.lower().split('.')[-1]
-            content_type_map = {
-                'pdf': 'application/pdf',
-                'png': 'image/png',
-                'jpg': 'image/jpeg',
-                'jpeg': 'image/jpeg',
-                'gif': 'image/gif',
-                'webp': 'image/webp'
-            }
-            content_type = content_type_map.get(file_extension, 'application/octet-stream')
+            content_type = _CONTENT_TYPES.get(file_extension, 'application/octet-stream')
 
             # For images and PDFs, use inline display instead of attachment
-            is_inline = content_type.startswith('image/') or content_type == 'application/pdf'
-            content_disposition = f'inline; filename="{file_key.split("/")[-1]}"' if is_inline else f'attachment; filename="{file_key.split("/")[-1]}"'
+            if disposition is None:
+                is_inline = content_type.startswith('image/') or content_type == 'application/pdf'
+                disposition = 'inline' if is_inline else 'attachment'
 
-            # Generate the presigned URL
-            response = fresh_s3_client.generate_presigned_url(
+            cache_key = (file_key, disposition)
+            url = self.presign_cache.get(cache_key, expiration)
+            if url:
+                return url
+
+            # Signing is local (no request to S3); the shared client keeps it cheap
+            url = self.s3_client.generate_presigned_url(
                 'get_object',
                 Params={
                     'Bucket': self.bucket_name,
                     'Key': file_key,
                     'ResponseContentType': content_type,
-                    'ResponseContentDisposition': content_disposition
+                    'ResponseContentDisposition': f'{disposition}; filename="{file_key.split("/")[-1]}"'
                 },
                 ExpiresIn=expiration
             )
-            
-            logger.info(f"PRESIGNED URL SUCCESS: Generated signed URL for {file_key}")
-            # Log first 100 chars of URL for debugging (don't log full URL for security)
-            logger.info(f"PRESIGNED URL: Generated URL starts with: {response[:100]}...")
-            
-            return response
+            self.presign_cache.set(cache_key, url, expiration)
+            logger.debug(f"PRESIGNED URL: signed {file_key} for {expiration}s")
+            return url
             
         except ClientError as e:
             error_code = e.response.get('Error', {}).get('Code', 'Unknown')
             error_message = e.response.get('Error', {}).get('Message', str(e))
-            
             logger.error(f"PRESIGNED URL FAILED: AWS ClientError - {error_code}: {error_message}")
-            logger.error(f"PRESIGNED URL FAILED: Full error response: {e.response}")
-            
-            # Provide specific error handling
-            if error_code == 'AccessDenied':
-                logger.error(f"PRESIGNED URL FAILED: Access denied - check AWS credentials and bucket permissions")
-            elif error_code == 'NoSuchBucket':
-                logger.error(f"PRESIGNED URL FAILED: Bucket {self.bucket_name} does not exist")
-            elif error_code == 'InvalidAccessKeyId':
-                logger.error(f"PRESIGNED URL FAILED: Invalid AWS access key ID")
-            elif error_code == 'SignatureDoesNotMatch':
-                logger.error(f"PRESIGNED URL FAILED: Invalid AWS secret access key")
-            
             return None
             
         except NoCredentialsError:
             logger.error(f"PRESIGNED URL FAILED: AWS credentials not found or invalid")
             return None
         except Exception as e:
-            logger.error(f"PRESIGNED URL FAILED: Unexpected error generating signed URL: {str(e)}")
-            import traceback
-            logger.error(f"PRESIGNED URL FAILED: Traceback: {traceback.format_exc()}")
+            logger.error(f"PRESIGNED URL FAILED: Unexpected error generating signed URL for {file_key}: {str(e)}")
+            return None
+
+    def presign_many(self, file_keys, expiration=3600, disposition=None):
+        """
+        Presign a batch of keys (e.g. every photo in a report) in one call.
+
+        Returns:
+            dict: {file_key: url or None}; empty keys are skipped
+        """
+        return {key: self.generate_presigned_url(key, expiration, disposition)
+                for key in dict.fromkeys(k for k in file_keys if k)}
+
+    def generate_presigned_upload(self, file_key, content_type, max_size, expiration=900):
+        """
+        Presigned POST so a client can upload one object straight to S3
+        
+        The policy pins the key, the Content-Type and server-side encryption and
+        caps the body at `max_size` bytes.
+        
+        Returns:
+            dict: {'method', 'url', 'fields', 'expires_in'} or None if error
+        """
+        if not self.configured:
+            logger.error(f"PRESIGNED UPLOAD FAILED: S3 not configured - {self.error_message}")
+            return None
+        
+        try:
+            post = self.s3_client.generate_presigned_post(
+                Bucket=self.bucket_name,
+                Key=file_key,
+                Fields={'Content-Type': content_type, 'x-amz-server-side-encryption': 'AES256'},
+                Conditions=[
+                    {'Content-Type': content_type},
+                    {'x-amz-server-side-encryption': 'AES256'},
+                    ['content-length-range', 1, max_size],
+                ],
+                ExpiresIn=expiration
+            )
+            return {'method': 'POST', 'url': post['url'], 'fields': post['fields'], 'expires_in': expiration}
+        except Exception as e:
+            logger.error(f"PRESIGNED UPLOAD FAILED: Could not sign upload for {file_key}: {str(e)}")
             return None
 
+    def get_object_info(self, file_key):
+        """
+        Size and content type of an object, or None if it does not exist
+        """
+        try:
+            response = self.s3_client.head_object(Bucket=self.bucket_name, Key=file_key)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        return {'size': response.get('ContentLength'), 'content_type': response.get('ContentType')}
+
+    def download_bytes(self, file_key):
+        """Read a whole object into memory."""
+        response = self.s3_client.get_object(Bucket=self.bucket_name, Key=file_key)
+        return response['Body'].read()
+
+    def upload_bytes(self, file_key, data, content_type):
+        """Store an in-memory object (e.g. a generated thumbnail)."""
+        self.s3_client.put_object(
+            Bucket=self.bucket_name,
+            Key=file_key,
+            Body=data,
+            ContentType=content_type,
+            ServerSideEncryption='AES256'
+        )
+        return file_key
+
     def get_secure_document_url(self, file_key, expiration=3600):
         """
         Generate a secure URL for document viewing with proper error handling
@@ -548,6 +694,97 @@ class S3Client:
             logger.error(f"Error deleting file {file_key}: {str(e)}")
             return False
 
+    def iter_objects(self, prefix, page_size=LIST_PAGE_SIZE):
+        """
+        Yield every object under a prefix, following continuation tokens
+        
+        Args:
+            prefix (str): Key prefix to list
+            page_size (int): Keys requested per ListObjectsV2 call
+            
+        Yields:
+            dict: ListObjectsV2 entries (Key, Size, LastModified, ...), folder markers skipped
+        """
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        pages = paginator.paginate(
+            Bucket=self.bucket_name,
+            Prefix=prefix,
+            PaginationConfig={'PageSize': page_size}
+        )
+        for page in pages:
+            for obj in page.get('Contents', []):
+                if not obj['Key'].endswith('/'):
+                    yield obj
+
+    def copy_object(self, source_key, dest_key):
+        """
+        Server-side copy of an object, keeping its metadata and encryption
+        
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        if not self.configured:
+            logger.error(f"Cannot copy file: {self.error_message}")
+            return False
+        
+        try:
+            self.s3_client.copy_object(
+                Bucket=self.bucket_name,
+                Key=dest_key,
+                CopySource={'Bucket': self.bucket_name, 'Key': source_key},
+                MetadataDirective='COPY',
+                ServerSideEncryption='AES256'
+            )
+            return True
+        except ClientError as e:
+            logger.error(f"Error copying {source_key} to {dest_key}: {str(e)}")
+            return False
+
+    def _invoice_listing(self, invoices, prefixes):
+        """
+        Join Invoice rows against a paginated listing of the given prefixes
+        
+        The Invoice table is the index: it supplies agent, number and dates, so no
+        per-object HEAD is needed. Rows whose PDF sits outside those prefixes
+        (e.g. the legacy invoices/{agent_id}/ layout) are resolved by listing
+        the folder their key points at.
+        """
+        objects = {}
+        for prefix in prefixes:
+            for obj in self.iter_objects(prefix):
+                objects[obj['Key']] = obj
+        
+        stragglers = sorted({
+            invoice_file_key(inv).rsplit('/', 1)[0] + '/' for inv in invoices
+            if not any(invoice_file_key(inv).startswith(p) for p in prefixes)
+        })
+        for prefix in stragglers:
+            for obj in self.iter_objects(prefix):
+                objects[obj['Key']] = obj
+        
+        listing = []
+        for inv in invoices:
+            file_key = invoice_file_key(inv)
+            obj = objects.get(file_key)
+            if obj is None:
+                continue
+            listing.append({
+                'file_key': file_key,
+                'filename': file_key.split('/')[-1],
+                'agent_id': inv.agent_id,
+                'size': obj['Size'],
+                'last_modified': obj['LastModified'].isoformat(),
+                'metadata': {
+                    'invoice_id': inv.id,
+                    'agent_id': str(inv.agent_id),
+                    'invoice_number': inv.invoice_number,
+                    'issue_date': inv.issue_date.isoformat() if inv.issue_date else None,
+                    'status': inv.status,
+                    'document_type': 'invoice'
+                }
+            })
+        return listing
+
     def list_agent_invoices(self, agent_id):
         """
         List all invoices for a specific agent
@@ -563,30 +800,11 @@ class S3Client:
             return []
         
         try:
-            prefix = f"invoices/{agent_id}/"
-            response = self.s3_client.list_objects_v2(
-                Bucket=self.bucket_name,
-                Prefix=prefix
-            )
-            
-            invoices = []
-            if 'Contents' in response:
-                for obj in response['Contents']:
-                    # Get object metadata
-                    metadata_response = self.s3_client.head_object(
-                        Bucket=self.bucket_name,
-                        Key=obj['Key']
-                    )
-                    
-                    invoices.append({
-                        'file_key': obj['Key'],
-                        'filename': obj['Key'].split('/')[-1],
-                        'size': obj['Size'],
-                        'last_modified': obj['LastModified'].isoformat(),
-                        'metadata': metadata_response.get('Metadata', {})
-                    })
-            
-            return invoices
+            from src.models.user import Invoice
+            invoices = Invoice.query.filter_by(agent_id=agent_id).order_by(Invoice.issue_date, Invoice.id).all()
+            months = sorted({(inv.issue_date.year, inv.issue_date.month) for inv in invoices if inv.issue_date})
+            prefixes = [invoice_key(agent_id, '', datetime(y, m, 1).date()) for y, m in months]
+            return self._invoice_listing(invoices, prefixes)
             
         except ClientError as e:
             logger.error(f"Error listing agent invoices: {str(e)}")
@@ -596,6 +814,10 @@ class S3Client:
         """
         Get all invoices for a specific time period
         
+        Filters on Invoice.issue_date and lists only the matching
+        invoices/YYYY/MM/ partitions, so cost grows with listing pages rather
+        than with a HEAD request per object.
+        
         Args:
             year (int): Year filter (optional)
             month (int): Month filter (optional)
@@ -608,61 +830,23 @@ class S3Client:
             return []
         
         try:
-            prefix = "invoices/"
-            response = self.s3_client.list_objects_v2(
-                Bucket=self.bucket_name,
-                Prefix=prefix
-            )
-            
-            invoices = []
-            if 'Contents' in response:
-                for obj in response['Contents']:
-                    # Skip folder entries
-                    if obj['Key'].endswith('/'):
-                        continue
-                    
-                    # Filter by date if specified
-                    if year or month:
-                        obj_date = obj['LastModified']
-                        if year and obj_date.year != year:
-                            continue
-                        if month and obj_date.month != month:
-                            continue
-                    
-                    # Get object metadata
-                    try:
-                        metadata_response = self.s3_client.head_object(
-                            Bucket=self.bucket_name,
-                            Key=obj['Key']
-                        )
-                        
-                        invoices.append({
-                            'file_key': obj['Key'],
-                            'filename': obj['Key'].split('/')[-1],
-                            'agent_id': obj['Key'].split('/')[1] if len(obj['Key'].split('/')) > 1 else None,
-                            'size': obj['Size'],
-                            'last_modified': obj['LastModified'].isoformat(),
-                            'metadata': metadata_response.get('Metadata', {})
-                        })
-                    except ClientError as meta_error:
-                        logger.warning(f"Could not get metadata for {obj['Key']}: {str(meta_error)}")
-                        # Include basic info even if metadata fails
-                        invoices.append({
-                            'file_key': obj['Key'],
-                            'filename': obj['Key'].split('/')[-1],
-                            'agent_id': obj['Key'].split('/')[1] if len(obj['Key'].split('/')) > 1 else None,
-                            'size': obj['Size'],
-                            'last_modified': obj['LastModified'].isoformat(),
-                            'metadata': {}
-                        })
-            
-            return invoices
+            from src.models.user import Invoice, db
+            query = Invoice.query
+            start, end = _period_bounds(year, month)
+            if start:
+                query = query.filter(Invoice.issue_date >= start, Invoice.issue_date < end)
+            elif month:
+                query = query.filter(db.extract('month', Invoice.issue_date) == month)
+            invoices = query.order_by(Invoice.issue_date, Invoice.id).all()
+            if not invoices:
+                return []
+            return self._invoice_listing(invoices, _period_prefixes(year, month))
             
         except ClientError as e:
             logger.error(f"Error listing invoices for period: {str(e)}")
             return []
 
-    def generate_invoice_download_url(self, agent_id, invoice_number, expiration=3600):
+    def generate_invoice_download_url(self, agent_id, invoice_number, expiration=3600, file_key=None):
         """
         Generate download URL for a specific invoice
         
@@ -670,6 +854,7 @@ class S3Client:
             agent_id (str): Agent's unique identifier
             invoice_number (str): Invoice number
             expiration (int): URL expiration time in seconds
+            file_key (str): Stored key (Invoice.pdf_file_key); defaults to the legacy layout
             
         Returns:
             dict: Result with success status and URL or error message
@@ -677,7 +862,7 @@ class S3Client:
         try:
             logger.info(f"INVOICE DOWNLOAD URL: Generating URL for agent {agent_id}, invoice {invoice_number}")
             
-            file_key = f"invoices/{agent_id}/{invoice_number}.pdf"
+            file_key = file_key or legacy_invoice_key(agent_id, f"{invoice_number}.pdf")
             logger.info(f"INVOICE DOWNLOAD URL: S3 file key: {file_key}")
             
             # Use the improved get_secure_document_url method
@@ -919,7 +1104,12 @@ except Exception as e:
         def upload_invoice_pdf(self, *args, **kwargs): 
             return {'success': False, 'error': f'S3 not configured: {self.error_message}'}
         def generate_presigned_url(self, *args, **kwargs): return None
+        def presign_many(self, file_keys, *args, **kwargs): return {k: None for k in file_keys if k}
+        def generate_presigned_upload(self, *args, **kwargs): return None
         def list_agent_documents(self, *args, **kwargs): return []
+        def list_agent_invoices(self, *args, **kwargs): return []
+        def get_all_invoices_for_period(self, *args, **kwargs): return []
+        def copy_object(self, *args, **kwargs): return False
         def delete_file(self, *args, **kwargs): return False
     
     s3_client = DummyS3Client(e)
\ No newline at end of file
@@ -0,0 +1,255 @@
+"""
+Streaming ZIP archives with byte-range support.
+
+Entries are written as ZIP_STORED (photos are already compressed) with data
+descriptors, so the layout of the whole archive follows from the entry names
+and sizes alone. That gives a Content-Length before any data is fetched and
+lets a resumed download (`Range: bytes=N-`) start mid-archive. Entry data is
+fetched through a shared bounded pool, a few entries ahead of the writer, so
+memory stays flat however many entries there are.
+
+CRC-32s are only known once an entry has been read. They are cached per key,
+so resuming after a completed or interrupted download rarely has to re-read
+entries that are skipped over.
+"""
+import logging
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Response
+
+logger = logging.getLogger(__name__)
+
+MAX_WORKERS = int(os.environ.get('ZIP_STREAM_WORKERS', 8))
+PREFETCH = 4
+CRC_CACHE_SIZE = 50000
+ZIP_MAX_SIZE = 0xFFFFFFFF  # no Zip64
+
+_LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+_DESCRIPTOR = struct.Struct('<IIII')
+_CENTRAL_HEADER = struct.Struct('<IHHHHHHIIIHHHHHII')
+_END_RECORD = struct.Struct('<IHHHHIIH')
+_FLAGS = 0x0008  # sizes/CRC follow the data in a descriptor
+_VERSION = 20
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='zip-stream')
+
+
+def parallel_map(func, items):
+    """Run `func` over `items` on the shared pool (e.g. sizing entries before building the archive)."""
+    return list(_executor.map(func, items))
+
+
+class ArchiveTooLarge(Exception):
+    """The archive would need Zip64."""
+
+
+class _CRCCache:
+    """Thread-safe LRU of CRC-32s keyed by (cache key, size)."""
+
+    def __init__(self, maxsize=CRC_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                return self._data[key]
+        return None
+
+    def set(self, key, crc):
+        with self._lock:
+            self._data[key] = crc
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+crc_cache = _CRCCache()
+
+
+class ZipEntry:
+    """One archive member: `fetch()` returns its bytes, which must be `size` long."""
+
+    def __init__(self, name, size, fetch, cache_key=None):
+        self.name = name
+        self.size = size
+        self.fetch = fetch
+        self.cache_key = (cache_key or name, size)
+
+
+def _dos_datetime(moment):
+    return (((moment.hour << 11) | (moment.minute << 5) | (moment.second // 2)),
+            (((max(moment.year, 1980) - 1980) << 9) | (moment.month << 5) | moment.day))
+
+
+class StreamingZip:
+    """A stored-only ZIP whose bytes can be generated for any range."""
+
+    def __init__(self, entries, modified):
+        self.entries = list(entries)
+        self._time, self._date = _dos_datetime(modified)
+        self._names = [entry.name.encode('utf-8') for entry in self.entries]
+
+        # Byte layout: [local header, data, descriptor] per entry, then the central directory
+        self._offsets = []
+        offset = 0
+        for entry, name in zip(self.entries, self._names):
+            self._offsets.append(offset)
+            offset += _LOCAL_HEADER.size + len(name) + entry.size + _DESCRIPTOR.size
+        self._central_offset = offset
+        self._central_size = sum(_CENTRAL_HEADER.size + len(name) for name in self._names)
+        self.size = offset + self._central_size + _END_RECORD.size
+        if self.size > ZIP_MAX_SIZE or len(self.entries) > 0xFFFF:
+            raise ArchiveTooLarge(f"Archive of {self.size} bytes / {len(self.entries)} entries needs Zip64")
+
+    # --- Record builders ---
+
+    def _local_header(self, i):
+        entry, name = self.entries[i], self._names[i]
+        flags = _FLAGS | (0x0800 if not name.isascii() else 0)
+        return _LOCAL_HEADER.pack(0x04034b50, _VERSION, flags, 0, self._time, self._date,
+                                  0, entry.size, entry.size, len(name), 0) + name
+
+    def _descriptor(self, i, crc):
+        size = self.entries[i].size
+        return _DESCRIPTOR.pack(0x08074b50, crc, size, size)
+
+    def _central_directory(self, crcs):
+        records = []
+        for i, (entry, name) in enumerate(zip(self.entries, self._names)):
+            flags = _FLAGS | (0x0800 if not name.isascii() else 0)
+            records.append(_CENTRAL_HEADER.pack(0x02014b50, _VERSION, _VERSION, flags, 0, self._time, self._date,
+                                                crcs[i], entry.size, entry.size, len(name), 0, 0, 0, 0, 0,
+                                                self._offsets[i]) + name)
+        records.append(_END_RECORD.pack(0x06054b50, 0, 0, len(self.entries), len(self.entries),
+                                        self._central_size, self._central_offset, 0))
+        return b''.join(records)
+
+    # --- Streaming ---
+
+    def _read(self, i):
+        entry = self.entries[i]
+        data = entry.fetch()
+        if len(data) != entry.size:
+            raise IOError(f"{entry.name}: expected {entry.size} bytes, got {len(data)}")
+        crc = zlib.crc32(data)
+        crc_cache.set(entry.cache_key, crc)
+        return data, crc
+
+    @staticmethod
+    def _slice(chunk, chunk_start, start, stop):
+        if chunk_start + len(chunk) > start and chunk_start < stop:
+            yield chunk[max(start - chunk_start, 0):stop - chunk_start]
+
+    def iter_range(self, start=0, stop=None):
+        """Yield the archive bytes in [start, stop)."""
+        stop = self.size if stop is None else min(stop, self.size)
+        if start >= stop:
+            return
+        needs_crcs = stop > self._central_offset
+        crcs = {}
+
+        # Entries whose data (or descriptor) falls in the range are read in order;
+        # entries before it are only read when their CRC is needed and not cached.
+        plan = []
+        for i, entry in enumerate(self.entries):
+            begin = self._offsets[i]
+            end = begin + _LOCAL_HEADER.size + len(self._names[i]) + entry.size + _DESCRIPTOR.size
+            if end <= start:
+                cached = crc_cache.get(entry.cache_key) if needs_crcs else None
+                if cached is not None:
+                    crcs[i] = cached
+                elif needs_crcs:
+                    plan.append((i, False))
+            elif begin < stop:
+                plan.append((i, True))
+
+        pending = deque()
+        todo = iter(plan)
+
+        def top_up():
+            while len(pending) < PREFETCH:
+                item = next(todo, None)
+                if item is None:
+                    return
+                pending.append((item, _executor.submit(self._read, item[0])))
+
+        top_up()
+        try:
+            while pending:
+                (i, emit), future = pending.popleft()
+                position = self._offsets[i]
+                if emit:
+                    # The local header doesn't depend on the data: send it before waiting
+                    header = self._local_header(i)
+                    yield from self._slice(header, position, start, stop)
+                    position += len(header)
+                data, crc = future.result()
+                crcs[i] = crc
+                top_up()
+                if emit:
+                    yield from self._slice(data, position, start, stop)
+                    yield from self._slice(self._descriptor(i, crc), position + len(data), start, stop)
+                del data
+
+            if needs_crcs:
+                tail = self._central_directory(crcs)
+                yield tail[max(start - self._central_offset, 0):stop - self._central_offset]
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+
+def parse_range(header, size):
+    """(start, stop) for a single `bytes=` range, None for no/unsupported range, False if unsatisfiable."""
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    first, _, last = header[len('bytes='):].strip().partition('-')
+    try:
+        if first:
+            start = int(first)
+            stop = int(last) + 1 if last else size
+        else:
+            start, stop = max(size - int(last), 0), size
+    except ValueError:
+        return None
+    if start >= size or stop <= start:
+        return False
+    return start, min(stop, size)
+
+
+def zip_response(archive, download_name, etag, request):
+    """A streamed 200/206 response for `archive`, honouring Range and If-Range."""
+    headers = {
+        'Content-Disposition': f'attachment; filename="{download_name}"',
+        'Accept-Ranges': 'bytes',
+        'ETag': f'"{etag}"',
+        'Cache-Control': 'private, no-transform',
+    }
+    byte_range = parse_range(request.headers.get('Range'), archive.size)
+    if_range = request.headers.get('If-Range')
+    if if_range and if_range.strip('"') != etag:
+        byte_range = None
+    if byte_range is False:
+        headers['Content-Range'] = f'bytes */{archive.size}'
+        return Response(status=416, headers=headers)
+    if byte_range:
+        start, stop = byte_range
+        headers['Content-Range'] = f'bytes {start}-{stop - 1}/{archive.size}'
+        headers['Content-Length'] = str(stop - start)
+        return Response(archive.iter_range(start, stop), status=206, mimetype='application/zip',
+                        headers=headers, direct_passthrough=True)
+    headers['Content-Length'] = str(archive.size)
+    return Response(archive.iter_range(), status=200, mimetype='application/zip',
+                    headers=headers, direct_passthrough=True)
@@ -0,0 +1,44 @@
+"""
+Query budget plugin.
+
+Mark a test with `@pytest.mark.query_budget(n)` to fail it when its body runs
+more than `n` SQL statements on the test thread (fixtures are not counted).
+Budgets are meant to be tight: raise them deliberately, alongside the change
+that needs the extra queries.
+"""
+import os
+import sys
+import tempfile
+from collections import Counter
+import pytest
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+# main binds its engine at import, before the fixtures set their URI, so point it
+# at a throwaway file (never database/app.db); a file keeps per-thread connections
+os.environ['DATABASE_URL'] = os.environ.get('TEST_DATABASE_URL') or \
+    f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='v3-tests-'), 'test.db')}"
+
+from src.utils import perf
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'query_budget(max_queries): fail if the test runs more SQL statements than this')
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_call(item):
+    marker = item.get_closest_marker('query_budget')
+    if marker is None:
+        return (yield)
+
+    budget = marker.args[0] if marker.args else marker.kwargs['max_queries']
+    with perf.count_queries() as statements:
+        result = yield
+    if len(statements) > budget:
+        worst = Counter(perf.fingerprint(s) for s in statements).most_common(3)
+        details = '\n'.join(f"  {count}x {sql[:160]}" for sql, count in worst)
+        pytest.fail(f"Query budget exceeded: {len(statements)} statements > {budget}\nMost repeated:\n{details}",
+                    pytrace=False)
+    return result
@@ -0,0 +1,131 @@
+import pytest
+from datetime import datetime, timedelta
+from src.models.user import User, Job, JobAssignment, AgentAvailability, db
+from src.models.agent_stats import AgentStats
+from src.services.agent_ranking import rank_agents_for_job, rebuild_agent_stats, top_reliable_agents
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+@pytest.fixture
+def app():
+    """Create a test Flask application."""
+    from main import app as flask_app
+    flask_app.config['TESTING'] = True
+    flask_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.drop_all()
+
+def create_user(email, role='agent'):
+    user = User(email=email, password_hash="x", role=role, first_name=email.split('@')[0], last_name="Test")
+    db.session.add(user)
+    db.session.flush()
+    return user
+
+def create_job(admin_id, lat=51.5, lng=-0.12, when=None):
+    job = Job(title="Site", job_type="Security", address="1 Test Road",
+              arrival_time=when or datetime.utcnow() + timedelta(days=1), agents_required=1,
+              status='open', created_by=admin_id, location_lat=str(lat), location_lng=str(lng))
+    db.session.add(job)
+    db.session.flush()
+    return job
+
+def test_stats_follow_assignment_status_changes(app):
+    with app.app_context():
+        admin = create_user("admin@test.com", role='admin')
+        agent = create_user("a1@test.com")
+        jobs = [create_job(admin.id) for _ in range(3)]
+        assignments = [JobAssignment(job_id=j.id, agent_id=agent.id, status='pending') for j in jobs]
+        db.session.add_all(assignments)
+        db.session.commit()
+
+        stats = AgentStats.query.get(agent.id)
+        assert stats.offered_count == 3 and stats.accepted_count == 0
+
+        assignments[0].status = 'accepted'
+        assignments[1].status = 'declined'
+        db.session.commit()
+        assert stats.accepted_count == 1 and stats.declined_count == 1
+
+        # Incremental counters agree with a full rebuild
+        rebuild_agent_stats()
+        stats = AgentStats.query.get(agent.id)
+        assert (stats.offered_count, stats.accepted_count, stats.declined_count) == (3, 1, 1)
+        top = top_reliable_agents(limit=5)
+        assert top[0]['id'] == agent.id and top[0]['accept_rate'] == pytest.approx(1 / 3)
+
+def test_ranking_prefers_near_reliable_and_skips_double_booked(app):
+    with app.app_context():
+        admin = create_user("admin@test.com", role='admin')
+        near = create_user("near@test.com")
+        far = create_user("far@test.com")
+        busy = create_user("busy@test.com")
+        away = create_user("away@test.com")
+        job = create_job(admin.id)
+
+        for agent, (lat, lng) in [(near, (51.51, -0.11)), (far, (53.48, -2.24)),
+                                  (busy, (51.50, -0.12)), (away, (51.50, -0.12))]:
+            db.session.add(AgentStats(agent_id=agent.id, offered_count=0, accepted_count=0,
+                                      declined_count=0, decayed_offered=0.0, decayed_accepted=0.0,
+                                      home_latitude=lat, home_longitude=lng))
+        other = create_job(admin.id, when=job.arrival_time)
+        db.session.add(JobAssignment(job_id=other.id, agent_id=busy.id, status='accepted'))
+        db.session.add(AgentAvailability(agent_id=away.id, date=job.arrival_time.date(),
+                                         is_available=False, is_away=True))
+        db.session.commit()
+
+        ranked = rank_agents_for_job(job, k=10)
+        ids = [r['id'] for r in ranked]
+        assert ids == [near.id, far.id]
+        assert ranked[0]['distance_km'] < 2
+
+def test_deleted_assignments_come_off_the_stats(app):
+    from src.services.agent_ranking import delete_assignments
+    with app.app_context():
+        admin = create_user("admin@test.com", role='admin')
+        agent = create_user("a1@test.com")
+        jobs = [create_job(admin.id) for _ in range(3)]
+        assignments = [JobAssignment(job_id=j.id, agent_id=agent.id, status=status)
+                       for j, status in zip(jobs, ['accepted', 'declined', 'accepted'])]
+        db.session.add_all(assignments)
+        db.session.commit()
+
+        db.session.delete(assignments[0])
+        db.session.commit()
+        delete_assignments(JobAssignment.job_id == jobs[1].id)
+        db.session.commit()
+
+        stats = AgentStats.query.get(agent.id)
+        assert (stats.offered_count, stats.accepted_count, stats.declined_count) == (1, 1, 0)
+        assert stats.decayed_offered == pytest.approx(1.0, abs=1e-3)
+        rebuild_agent_stats()
+        assert (stats.offered_count, stats.accepted_count, stats.declined_count) == (1, 1, 0)
+
+def test_ranking_reads_cached_locations_and_backfill_geocodes(app, monkeypatch):
+    from src.services import agent_ranking
+
+    def no_http(*args, **kwargs):
+        raise AssertionError("ranking must not call postcodes.io")
+    monkeypatch.setattr(agent_ranking.requests, 'post', no_http)
+    with app.app_context():
+        admin = create_user("admin@test.com", role='admin')
+        agent = create_user("a1@test.com")
+        agent.postcode = "SE1 7PB"
+        db.session.add(AgentStats(agent_id=agent.id, offered_count=0, accepted_count=0, declined_count=0,
+                                  decayed_offered=0.0, decayed_accepted=0.0, geocoded_postcode="M11AE",
+                                  home_latitude=53.48, home_longitude=-2.24))
+        job = create_job(admin.id)
+        db.session.commit()
+
+        # Moved since the last lookup: the old location isn't used, and nothing is looked up
+        assert rank_agents_for_job(job)[0]['distance_km'] is None
+
+        monkeypatch.setattr(agent_ranking, 'geocode_postcodes', lambda postcodes: {'SE17PB': (51.50, -0.11)})
+        assert agent_ranking.backfill_agent_locations() == 1
+        assert agent_ranking.backfill_agent_locations() == 0
+        assert rank_agents_for_job(job)[0]['distance_km'] < 2
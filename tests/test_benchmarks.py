@@ -0,0 +1,64 @@
+import pytest
+from benchmarks import run
+from benchmarks.fakes import stub_externals
+from benchmarks.seed import seed
+from src.models.user import Job, JobAssignment, User, db
+from src.utils.s3_client import s3_client
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+@pytest.fixture
+def app():
+    """Create a test Flask application."""
+    from main import app as flask_app
+    flask_app.config['TESTING'] = True
+    flask_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.drop_all()
+
+def test_seed_is_deterministic_and_wired(app):
+    ctx = seed(scale=0.002, log=lambda message: None)
+    assert ctx['volumes']['jobs'] == 200 and ctx['volumes']['assignments'] == 1000
+    assert User.query.filter_by(role='agent').count() == ctx['volumes']['agents']
+    assert JobAssignment.query.count() == 1000
+    assert db.session.query(JobAssignment).join(Job).filter(JobAssignment.agent_id == ctx['agent_id'],
+                                                            JobAssignment.status == 'accepted').count() > 0
+    with pytest.raises(RuntimeError):
+        seed(scale=0.002)
+
+def test_benchmarks_run_against_fakes(app, monkeypatch):
+    from main import limiter
+    monkeypatch.setattr(limiter, 'enabled', False)
+    for key, value in {'TELEGRAM_ENABLED': True, 'TELEGRAM_BOT_TOKEN': 'test', 'TELEGRAM_ADMIN_CHAT_ID': '-100'}.items():
+        monkeypatch.setitem(app.config, key, value)
+    ctx = seed(scale=0.002, log=lambda message: None)
+    configured = s3_client.is_configured()
+    with stub_externals(http_latency_ms=0) as (http, bucket):
+        assert s3_client.is_configured()
+        results = run.run_benchmarks(app, ctx, repeat=2, warmup=0, http=http, log=lambda message: None)
+    assert s3_client.is_configured() == configured
+
+    assert set(results) == {bench.name for bench in run.BENCHMARKS}
+    assert all(result['ok'] for result in results.values()), {n: r['statuses'] for n, r in results.items()}
+    assert all(result['queries'] > 0 for result in results.values())
+    assert results['create_job']['http_calls'] >= 1 and http.calls['api.telegram.org'] >= 1
+    assert results['agent_dashboard']['p50_ms'] <= results['agent_dashboard']['p95_ms']
+
+    baseline = {name: dict(result) for name, result in results.items()}
+    assert run.compare(results, baseline) == []
+    baseline['crm_contacts']['queries'] -= 1
+    baseline['finance_summary']['p95_ms'] = results['finance_summary']['p95_ms'] / 3 - run.DEFAULT_MIN_DELTA_MS
+    regressions = run.compare(results, baseline)
+    assert len(regressions) == 2
+    assert regressions[0].startswith('finance_summary: p95') and regressions[1].startswith('crm_contacts:')
+
+def test_percentile_nearest_rank():
+    assert run.percentile([5, 1, 3, 2, 4], 50) == 3
+    assert run.percentile([5, 1, 3, 2, 4], 95) == 5
+    assert run.percentile([7], 95) == 7
@@ -0,0 +1,147 @@
+import time
+import pytest
+from datetime import datetime, timedelta
+from src.models.user import db
+from src.models.contact_form import ContactFormSubmission
+from src.services import contact_intake
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+@pytest.fixture
+def app():
+    """Create a test Flask application."""
+    from main import app as flask_app
+    flask_app.config['TESTING'] = True
+    flask_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.drop_all()
+
+@pytest.fixture
+def senders(monkeypatch):
+    """Replace the slow side effects with recorders."""
+    calls = []
+
+    def record(name, result=None):
+        def fn(fields, *args):
+            calls.append(name)
+            return result
+        return fn
+
+    monkeypatch.setattr(contact_intake, 'generate_gpt_reply', record('gpt', 'Hi there\n\n- Admin Team'))
+    monkeypatch.setattr(contact_intake, 'send_telegram_notification', record('telegram', True))
+    monkeypatch.setattr(contact_intake, 'send_team_notification', record('team'))
+    monkeypatch.setattr(contact_intake, 'send_customer_email', record('customer'))
+    return calls
+
+def make_submission(callback=True):
+    submission = ContactFormSubmission(
+        first_name="Jane", last_name="Doe", email="jane@example.com", phone="0700",
+        callback_requested=callback, comments="Travellers on site", request_id=f"req_{time.time_ns()}",
+        stage=contact_intake.STAGE_SAVED, due_at=datetime.utcnow(),
+    )
+    db.session.add(submission)
+    db.session.commit()
+    return submission.id
+
+def make_due(submission_id):
+    submission = db.session.get(ContactFormSubmission, submission_id)
+    submission.due_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+def test_stages_progress_and_customer_email_waits_for_due_at(app, senders):
+    with app.app_context():
+        submission_id = make_submission()
+        assert contact_intake.process_submission(submission_id) == contact_intake.STAGE_EMAIL_SCHEDULED
+        assert senders == ['gpt', 'telegram', 'team']
+
+        submission = db.session.get(ContactFormSubmission, submission_id)
+        delay = (submission.due_at - datetime.utcnow()).total_seconds()
+        assert 25 < delay <= 60
+        assert submission.telegram_sent and submission.team_email_sent and not submission.email_sent
+        assert submission.locked_until is None
+
+        # Not due yet: nothing happens
+        assert contact_intake.process_submission(submission_id) is None
+        make_due(submission_id)
+        assert contact_intake.process_submission(submission_id) == contact_intake.STAGE_EMAIL_SENT
+        assert senders == ['gpt', 'telegram', 'team', 'customer']
+        assert submission.email_sent and submission.due_at is None
+
+        # Finished submissions are never reprocessed
+        assert contact_intake.process_submission(submission_id) is None
+        assert len(senders) == 4
+
+def test_failed_stage_backs_off_without_repeating_done_work(app, senders, monkeypatch):
+    with app.app_context():
+        submission_id = make_submission()
+
+        def flaky_team(fields, gpt_reply, request_id):
+            senders.append('team')
+            raise OSError("SMTP down")
+        monkeypatch.setattr(contact_intake, 'send_team_notification', flaky_team)
+
+        assert contact_intake.process_submission(submission_id) == contact_intake.STAGE_TELEGRAM_SENT
+        submission = db.session.get(ContactFormSubmission, submission_id)
+        assert submission.attempts == 1 and 'SMTP down' in submission.last_error
+        first_delay = (submission.due_at - datetime.utcnow()).total_seconds()
+        assert 25 < first_delay <= contact_intake.BACKOFF_BASE_SECONDS
+
+        make_due(submission_id)
+        contact_intake.process_submission(submission_id)
+        second_delay = (submission.due_at - datetime.utcnow()).total_seconds()
+        assert submission.attempts == 2 and second_delay > first_delay * 1.5
+        assert senders.count('gpt') == 1 and senders.count('telegram') == 1
+
+        # Missing credentials can't be fixed by retrying
+        def unconfigured(fields, gpt_reply, request_id):
+            raise contact_intake.PermanentFailure("Email credentials not set")
+        monkeypatch.setattr(contact_intake, 'send_team_notification', unconfigured)
+        make_due(submission_id)
+        assert contact_intake.process_submission(submission_id) == contact_intake.STAGE_FAILED
+
+def test_locked_submission_is_not_claimed_twice(app, senders):
+    with app.app_context():
+        submission_id = make_submission(callback=False)
+        submission = db.session.get(ContactFormSubmission, submission_id)
+        submission.locked_until = datetime.utcnow() + timedelta(minutes=5)
+        db.session.commit()
+        assert contact_intake.process_submission(submission_id) is None
+        assert senders == []
+
+def test_sweep_queues_only_due_unleased_submissions(app, monkeypatch):
+    queued = []
+    monkeypatch.setattr(contact_intake, 'enqueue', lambda submission_id, app=None: queued.append(submission_id) or True)
+    with app.app_context():
+        due, later, leased, done = (make_submission() for _ in range(4))
+        db.session.get(ContactFormSubmission, later).due_at = datetime.utcnow() + timedelta(minutes=1)
+        db.session.get(ContactFormSubmission, leased).locked_until = datetime.utcnow() + timedelta(minutes=5)
+        db.session.get(ContactFormSubmission, done).stage = contact_intake.STAGE_EMAIL_SENT
+        db.session.commit()
+        assert contact_intake.process_due() == 1 and queued == [due]
+
+def test_endpoint_returns_without_waiting_on_pipeline(app, senders, monkeypatch):
+    queued = []
+    monkeypatch.setattr(contact_intake, 'enqueue', lambda submission_id, app=None: queued.append(submission_id))
+    client = app.test_client()
+
+    response = client.post('/api/contact-form', json={
+        'firstName': 'Jane', 'lastName': 'Doe', 'email': 'jane@example.com',
+        'phone': '0700', 'requestCallback': True, 'comments': 'CCTV tower quote',
+    })
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['status'] == 'success' and body['data']['stage'] == 'saved'
+    assert senders == []  # the reply, Telegram and emails all run on the queue
+    with app.app_context():
+        submission = ContactFormSubmission.query.filter_by(request_id=body['request_id']).one()
+        assert queued == [submission.id]
+        assert submission.callback_requested and submission.gpt_reply is None
+
+    assert client.post('/api/contact-form', json={'email': 'x@example.com'}).status_code == 400
@@ -0,0 +1,111 @@
+import pytest
+from types import SimpleNamespace
+from datetime import date, timedelta
+from flask_jwt_extended import create_access_token
+from src.models.user import User, db
+from src.models.crm_contact import CRMContact
+from src.models.crm_user import CRMUser
+from src.services import crm_dashboard
+from src.utils import perf
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+@pytest.fixture
+def app():
+    """Create a test Flask application."""
+    from main import app as flask_app
+    flask_app.config['TESTING'] = True
+    flask_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    with flask_app.app_context():
+        db.create_all()
+        crm_dashboard.invalidate()
+        yield flask_app
+        crm_dashboard.invalidate()
+        db.drop_all()
+
+def contact(owner_id, n, **fields):
+    fields.setdefault('contact_type', 'eviction_client')
+    return CRMContact(name=f"Contact {n}", email=f"c{n}@test.com", owner_id=owner_id, **fields)
+
+def seed():
+    # The JWT user loader resolves every token against users, CRM ones included
+    db.session.add_all([User(email=f"user{n}@test.com", password_hash="x", role='admin',
+                             first_name="U", last_name=str(n)) for n in (1, 2)])
+    admin = CRMUser(username="boss", email="boss@test.com", password_hash="x", is_super_admin=True)
+    user = CRMUser(username="rep", email="rep@test.com", password_hash="x")
+    db.session.add_all([admin, user])
+    db.session.flush()
+    today = date.today()
+    db.session.add_all([
+        contact(user.id, 1, next_followup_date=today, priority='urgent', potential_value=1000),
+        contact(user.id, 2, next_followup_date=today - timedelta(days=3), priority='hot',
+                current_stage='quote_sent', contact_type='prevention_prospect', potential_value=250),
+        contact(user.id, 3, current_stage='job_booked', status='won', potential_value=9999),
+        contact(user.id, 4, contact_type='referral_partner', priority='urgent'),
+        contact(admin.id, 5, potential_value=500, priority='nurture'),
+    ])
+    db.session.commit()
+    return admin.id, user.id
+
+def headers(identity):
+    token = create_access_token(identity=str(identity), additional_claims={'crm_user': True})
+    return {'Authorization': f"Bearer {token}"}
+
+def test_home_screen_is_one_query(app):
+    admin, user = seed()
+    client = app.test_client()
+
+    with perf.count_queries() as statements:
+        dashboard = client.get("/api/crm/dashboard", headers=headers(user)).get_json()
+        priority = client.get("/api/crm/contacts/priority-counts", headers=headers(user)).get_json()
+    assert len([sql for sql in statements if 'crm_contacts' in sql]) == 1
+
+    assert dashboard == {
+        'followups_today': 1, 'overdue_followups': 1, 'quotes_pending': 1, 'jobs_in_progress': 1,
+        'potential_revenue': 1250.0, 'active_contacts': 3,
+        'breakdown': {'eviction_clients': 1, 'prevention_prospects': 1, 'referral_partners': 1},
+    }
+    assert priority == {'urgent': 2, 'hot': 1, 'nurture': 0, 'routine': 0}
+
+    # The team view covers every owner, revenue included
+    team = client.get("/api/crm/dashboard?view=team", headers=headers(admin)).get_json()
+    assert team['active_contacts'] == 4 and team['potential_revenue'] == 1750.0
+    assert client.get("/api/crm/dashboard?view=team", headers=headers(user)).status_code == 403
+
+def test_contact_writes_invalidate_the_cache(app):
+    admin, user = seed()
+    assert crm_dashboard.summary(user)['active_contacts'] == 3
+    assert crm_dashboard.summary(None)['active_contacts'] == 4
+
+    with perf.count_queries() as statements:
+        crm_dashboard.summary(user)
+    assert statements == []
+
+    # Moving a contact between owners refreshes both owners and the team view
+    moved = CRMContact.query.filter_by(name="Contact 1").one()
+    moved.owner_id = admin
+    db.session.commit()
+    assert crm_dashboard.summary(user)['active_contacts'] == 2
+    assert crm_dashboard.summary(admin)['active_contacts'] == 2
+
+    # A rolled back write leaves cached figures alone
+    crm_dashboard.summary(user)
+    db.session.add(contact(user, 9))
+    db.session.flush()
+    db.session.rollback()
+    with perf.count_queries() as statements:
+        assert crm_dashboard.summary(user)['active_contacts'] == 2
+    assert statements == []
+
+def test_expired_entries_are_pruned(app, monkeypatch):
+    admin, user = seed()
+    yesterday = date.today() - timedelta(days=1)
+    crm_dashboard.summary(user, today=yesterday)
+    clock = crm_dashboard.time.monotonic() + crm_dashboard.CACHE_SECONDS + 1
+    monkeypatch.setattr(crm_dashboard, 'time', SimpleNamespace(monotonic=lambda: clock))
+    crm_dashboard.summary(user)
+    assert list(crm_dashboard._cache) == [(user, date.today())]
@@ -0,0 +1,86 @@
+import pytest
+from datetime import datetime, timedelta
+from flask_jwt_extended import create_access_token
+from src.models.user import User, db
+from src.models.crm_contact import CRMContact
+from src.models.crm_email import CRMEmail, CRMEmailBody
+from src.models.crm_user import CRMUser
+from src.utils import perf
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+@pytest.fixture
+def app():
+    """Create a test Flask application."""
+    from main import app as flask_app
+    flask_app.config['TESTING'] = True
+    flask_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.drop_all()
+
+HTML = "<html><body>" + "<p>Quote for the site clearance attached.</p>" * 2000 + "</body></html>"
+
+def seed():
+    # The JWT user loader resolves every token against users, CRM ones included
+    db.session.add_all([User(email=f"user{n}@test.com", password_hash="x", role='admin',
+                             first_name="U", last_name=str(n)) for n in (1, 2)])
+    owner = CRMUser(username="owner", email="owner@test.com", password_hash="x")
+    other = CRMUser(username="other", email="other@test.com", password_hash="x")
+    db.session.add_all([owner, other])
+    db.session.flush()
+    contact = CRMContact(name="Jane Smith", email="jane@test.com", contact_type='eviction_client', owner_id=owner.id)
+    db.session.add(contact)
+    db.session.flush()
+    now = datetime.utcnow()
+    db.session.add_all([
+        CRMEmail(contact_id=contact.id, user_id=owner.id, email_uid=f"INBOX_{n}", subject=f"Email {n}",
+                 sender="jane@test.com", recipient="owner@test.com", date=now - timedelta(hours=n),
+                 body_text=f"Hello   number {n}\n\n" + "Body text. " * 100, body_html=HTML)
+        for n in range(30)
+    ] + [CRMEmail(contact_id=contact.id, user_id=owner.id, email_uid="INBOX_html", sender="jane@test.com",
+                  recipient="owner@test.com", date=now - timedelta(days=30), body_html="<p>Only <b>HTML</b></p>")])
+    db.session.commit()
+    return owner.id, other.id, contact.id
+
+def headers(identity):
+    token = create_access_token(identity=str(identity), additional_claims={'crm_user': True})
+    return {'Authorization': f"Bearer {token}"}
+
+def test_bodies_are_stored_compressed_with_a_precomputed_preview(app):
+    owner, other, contact = seed()
+
+    email = CRMEmail.query.filter_by(email_uid="INBOX_3").one()
+    assert email.preview.startswith("Hello number 3 Body text.") and len(email.preview) == 200
+    assert CRMEmail.query.filter_by(email_uid="INBOX_html").one().preview == "Only HTML"
+
+    raw = db.session.execute(db.text("SELECT html FROM crm_email_bodies WHERE email_id = :id"), {'id': email.id}).scalar()
+    assert isinstance(raw, bytes) and len(raw) < len(HTML) / 20
+    assert db.session.get(CRMEmailBody, email.id).html == HTML
+
+    # Replacing the body keeps the preview in step
+    email.body_text = "Updated"
+    db.session.commit()
+    assert CRMEmail.query.filter_by(email_uid="INBOX_3").one().preview == "Updated"
+
+def test_list_is_paginated_headers_and_bodies_load_on_demand(app):
+    owner, other, contact = seed()
+    client = app.test_client()
+
+    with perf.count_queries() as statements:
+        body = client.get(f"/api/crm/contacts/{contact}/emails?per_page=10&page=2", headers=headers(owner)).get_json()
+    assert not any('crm_email_bodies' in sql for sql in statements)
+    assert body['count'] == 31 and body['pages'] == 4 and body['page'] == 2
+    assert [e['subject'] for e in body['emails']] == [f"Email {n}" for n in range(10, 20)]
+    assert 'body_html' not in body['emails'][0] and body['emails'][0]['preview'].startswith("Hello number 10")
+
+    email_id = body['emails'][0]['id']
+    detail = client.get(f"/api/crm/emails/{email_id}", headers=headers(owner)).get_json()['email']
+    assert detail['body_html'] == HTML and detail['body_text'].startswith("Hello   number 10")
+    assert client.get(f"/api/crm/emails/{email_id}", headers=headers(other)).status_code == 403
+    assert client.get("/api/crm/emails/9999", headers=headers(owner)).status_code == 404
@@ -0,0 +1,95 @@
+import pytest
+from datetime import datetime, timedelta
+from src.models.user import db
+from src.models.crm_contact import CRMContact
+from src.models.crm_task import CRMTask, REMINDER_LEAD
+from src.models.crm_user import CRMUser
+from src.services import crm_task_notifications, telegram_notifications
+from src.utils import perf
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+@pytest.fixture
+def app():
+    """Create a test Flask application."""
+    from main import app as flask_app
+    flask_app.config['TESTING'] = True
+    flask_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.drop_all()
+
+@pytest.fixture
+def sent(app, monkeypatch):
+    messages = []
+    monkeypatch.setitem(app.config, 'TELEGRAM_ENABLED', True)
+    monkeypatch.setattr(telegram_notifications, 'send_message', lambda chat_id, text: messages.append((chat_id, text)) or {'ok': True})
+    return messages
+
+def seed(users=1):
+    crm_users = [CRMUser(username=f"rep{n}", email=f"rep{n}@test.com", password_hash="x",
+                         telegram_chat_id=str(1000 + n), telegram_opt_in=True) for n in range(users)]
+    db.session.add_all(crm_users)
+    db.session.flush()
+    contacts = [CRMContact(name=f"Contact {n}", email=f"c{n}@test.com", contact_type='eviction_client',
+                           owner_id=user.id) for n, user in enumerate(crm_users)]
+    db.session.add_all(contacts)
+    db.session.flush()
+    return crm_users, contacts
+
+def task(user, contact, title, due_in, **fields):
+    return CRMTask(crm_user_id=user.id, contact_id=contact.id, task_type='call', title=title,
+                   due_date=datetime.utcnow() + due_in, **fields)
+
+def test_reminders_fire_once_and_follow_reschedules(app, sent):
+    (user,), (contact,) = seed()
+    soon = task(user, contact, "Call back", timedelta(minutes=10))
+    later = task(user, contact, "Site visit", timedelta(hours=2))
+    done = task(user, contact, "Done already", timedelta(minutes=5), status='completed')
+    overdue = task(user, contact, "Missed", -timedelta(hours=1))
+    db.session.add_all([soon, later, done, overdue])
+    db.session.commit()
+    assert done.remind_at is None and overdue.remind_at is None
+    assert crm_task_notifications.next_reminder_at() == soon.remind_at
+
+    result = crm_task_notifications.check_and_notify_due_tasks()
+    assert result['notifications_sent'] == 1 and [chat for chat, _ in sent] == ['1000']
+    assert "Call back" in sent[0][1]
+    assert crm_task_notifications.check_and_notify_due_tasks()['tasks_checked'] == 0
+    assert crm_task_notifications.next_reminder_at() == later.remind_at
+
+    # Snoozing re-arms for the new due date; completing disarms
+    soon.due_date = datetime.utcnow() + timedelta(hours=1)
+    soon.status = 'snoozed'
+    later.status = 'completed'
+    db.session.commit()
+    assert later.remind_at is None and soon.reminded_at is None
+    assert crm_task_notifications.next_reminder_at() == soon.due_date - REMINDER_LEAD
+    result = crm_task_notifications.check_and_notify_due_tasks(now=soon.due_date - timedelta(minutes=1))
+    assert result['notifications_sent'] == 1 and len(sent) == 2
+
+def test_tick_cost_does_not_grow_with_due_tasks(app, sent):
+    users, contacts = seed(users=25)
+    db.session.add_all([task(user, contact, f"Task {user.id}", timedelta(minutes=5))
+                        for user, contact in zip(users, contacts)])
+    db.session.commit()
+    db.session.expire_all()
+
+    with perf.count_queries() as statements:
+        result = crm_task_notifications.check_and_notify_due_tasks()
+    assert result['notifications_sent'] == 25 and len(sent) == 25
+    assert len(statements) <= 4   # claim, mute setting, tasks with users and contacts
+
+def test_muted_reminders_are_dropped_not_delayed(app, sent, monkeypatch):
+    (user,), (contact,) = seed()
+    db.session.add(task(user, contact, "Call back", timedelta(minutes=10)))
+    db.session.commit()
+    monkeypatch.setattr(telegram_notifications, '_global_notifications_enabled', lambda: False)
+
+    assert crm_task_notifications.check_and_notify_due_tasks()['tasks_checked'] == 1
+    assert sent == [] and crm_task_notifications.next_reminder_at() is None
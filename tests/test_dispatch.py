@@ -0,0 +1,123 @@
+import itertools
+import random
+import pytest
+from datetime import date, datetime, timedelta
+from src.models.user import User, Job, JobAssignment, AgentAvailability, db
+from src.models.agent_stats import AgentStats
+from src.services import dispatch
+from src.services.dispatch import solve_dispatch, dispatch_jobs
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+@pytest.fixture
+def app():
+    """Create a test Flask application."""
+    from main import app as flask_app
+    flask_app.config['TESTING'] = True
+    flask_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.drop_all()
+
+def random_instance(rng, n_jobs, n_agents, days, max_slots=3):
+    jobs = [{'id': i, 'slots': rng.randint(1, max_slots), 'day': rng.choice(days),
+             'lat': 51.3 + rng.random() * 0.4, 'lng': -0.5 + rng.random() * 0.7}
+            for i in range(n_jobs)]
+    agents = [{'id': i, 'lat': 51.0 + rng.random(), 'lng': -1.0 + rng.random() * 1.5,
+               'reliability': rng.random(),
+               'availability': {d: rng.choice([0.0, 0.5, 0.8, 1.0]) for d in days},
+               'busy_days': set()}
+              for i in range(n_agents)]
+    return jobs, agents
+
+def brute_force(jobs, agents, result_cost_of):
+    """Best (max filled, min cost) by trying every slot -> agent mapping."""
+    slots = [(j, k) for j in jobs for k in range(j['slots'])]
+    best = (0, 0.0)
+    options = [None] + [a['id'] for a in agents]
+    for combo in itertools.product(options, repeat=len(slots)):
+        used, ok, cost, filled = set(), True, 0.0, 0
+        for (job, _), agent_id in zip(slots, combo):
+            if agent_id is None:
+                continue
+            c = result_cost_of(job['id'], agent_id)
+            if c is None or (agent_id, job['day']) in used:
+                ok = False
+                break
+            used.add((agent_id, job['day']))
+            cost += c
+            filled += 1
+        if ok and (filled > best[0] or (filled == best[0] and cost < best[1])):
+            best = (filled, cost)
+    return best
+
+def test_solver_matches_brute_force_on_small_instances():
+    rng = random.Random(7)
+    days = [date(2026, 10, 20), date(2026, 10, 21)]
+    for _ in range(15):
+        jobs, agents = random_instance(rng, 3, 4, days, max_slots=2)
+        # Cost of every single pair, taken from one-job/one-agent solves
+        pair_cost = {}
+        for job in jobs:
+            for agent in agents:
+                r = solve_dispatch([dict(job, slots=1)], [agent])
+                pair_cost[(job['id'], agent['id'])] = r['assignments'][0]['cost'] if r['assignments'] else None
+        result = solve_dispatch(jobs, agents)
+        filled, cost = brute_force(jobs, agents, lambda j, a: pair_cost[(j, a)])
+        assert len(result['assignments']) == filled
+        assert result['total_cost'] == pytest.approx(cost)
+
+def test_agent_takes_at_most_one_job_per_day():
+    day = date(2026, 10, 20)
+    jobs = [{'id': 1, 'slots': 1, 'day': day, 'lat': 51.5, 'lng': -0.1},
+            {'id': 2, 'slots': 1, 'day': day, 'lat': 51.5, 'lng': -0.1},
+            {'id': 3, 'slots': 1, 'day': day + timedelta(days=1), 'lat': 51.5, 'lng': -0.1}]
+    agents = [{'id': 10, 'lat': 51.5, 'lng': -0.1, 'reliability': 0.9, 'availability': {}}]
+    result = solve_dispatch(jobs, agents)
+    assert sorted(a['job_id'] for a in result['assignments']) in ([1, 3], [2, 3])
+    assert sum(result['unfilled'].values()) == 1
+
+def test_solver_benchmark_100_jobs_2000_agents(monkeypatch):
+    rng = random.Random(1)
+    days = [date(2026, 10, 20) + timedelta(days=i) for i in range(3)]
+    jobs, agents = random_instance(rng, 100, 2000, days, max_slots=6)
+    edges = []
+    add_edge = dispatch._FlowGraph.add_edge
+    monkeypatch.setattr(dispatch._FlowGraph, 'add_edge', lambda g, *args: edges.append(args) or add_edge(g, *args))
+    # The default budget is sub-second; the solve has to finish inside it
+    result = solve_dispatch(jobs, agents, time_budget_ms=dispatch.DEFAULT_TIME_BUDGET_MS)
+    assert not result['timed_out']
+    assert len(result['assignments']) == sum(j['slots'] for j in jobs)
+    # The flow graph only gets each job's shortlist, never every job x agent pair
+    shortlist = sum(max(dispatch.MIN_CANDIDATES, dispatch.CANDIDATES_PER_SLOT * j['slots']) for j in jobs)
+    assert len(edges) <= len(jobs) + 2 * shortlist
+
+def test_dispatch_jobs_creates_targeted_offers(app):
+    with app.app_context():
+        admin = User(email="admin@test.com", password_hash="x", role='admin', first_name="Admin", last_name="Test")
+        db.session.add(admin)
+        agents = [User(email=f"a{i}@test.com", password_hash="x", role='agent', first_name=f"A{i}", last_name="Test") for i in range(4)]
+        db.session.add_all(agents)
+        db.session.flush()
+        when = datetime.utcnow() + timedelta(days=2)
+        job = Job(title="Site", job_type="Security", address="1 Test Road", arrival_time=when,
+                  agents_required=2, status='open', created_by=admin.id,
+                  location_lat="51.5", location_lng="-0.12")
+        db.session.add(job)
+        for agent, lat in zip(agents, [51.51, 51.52, 53.4, 51.50]):
+            db.session.add(AgentStats(agent_id=agent.id, offered_count=0, accepted_count=0,
+                                      declined_count=0, decayed_offered=0.0, decayed_accepted=0.0,
+                                      home_latitude=lat, home_longitude=-0.12))
+        db.session.add(AgentAvailability(agent_id=agents[3].id, date=when.date(),
+                                         is_available=False, is_away=True))
+        db.session.commit()
+
+        plan = dispatch_jobs([job])
+        offered = {a.agent_id for a in JobAssignment.query.filter_by(job_id=job.id).all()}
+        assert offered == {agents[0].id, agents[1].id}
+        assert plan['unfilled'] == {}
@@ -0,0 +1,109 @@
+import pytest
+from datetime import datetime, timedelta
+from firebase_admin import exceptions
+from src.models.user import User, FCMToken, db
+from src.services import firebaseConfig
+from src.services.firebaseConfig import LocalTransport, fcm_service
+from src.utils import perf
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+@pytest.fixture
+def app():
+    """Create a test Flask application."""
+    from main import app as flask_app
+    flask_app.config['TESTING'] = True
+    flask_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.drop_all()
+
+@pytest.fixture
+def transport():
+    local = LocalTransport()
+    fcm_service.transport = local
+    yield local
+    fcm_service.transport = None
+
+def make_devices(agents=60, per_agent=20):
+    """agents x per_agent active tokens, plus one long-dead device per agent."""
+    long_ago = datetime.utcnow() - timedelta(days=90)
+    ids = []
+    for a in range(agents):
+        agent = User(email=f"agent{a}@test.com", password_hash="x", role='agent', first_name="A", last_name=str(a))
+        db.session.add(agent)
+        db.session.flush()
+        ids.append(agent.id)
+        db.session.add_all([FCMToken(user_id=agent.id, token=f"tok-{a}-{d}", device_type='android', last_used=long_ago)
+                            for d in range(per_agent)])
+        db.session.add(FCMToken(user_id=agent.id, token=f"old-{a}", device_type='web', is_active=False, last_used=long_ago))
+    db.session.commit()
+    return ids
+
+def test_multicast_chunks_and_prunes_dead_tokens(app, transport):
+    agent_ids = make_devices()
+    transport.unregistered = {'tok-0-0', 'tok-7-3', 'tok-59-19'}
+    transport.invalid = {'tok-12-5'}
+
+    with perf.count_queries() as statements:
+        result = fcm_service.send_to_users(agent_ids, "New Job Available", "A job is available", {'job_id': 5})
+        db.session.commit()
+
+    assert result['total_tokens'] == 1200
+    assert result['success_count'] == 1196 and result['failure_count'] == 4
+    assert result['deactivated_tokens'] == 4
+    assert sorted(len(call) for call in transport.calls) == [200, 500, 500]
+    assert not any(token.startswith('old-') for call in transport.calls for token in call)
+    # One token lookup plus one UPDATE per 500 tokens, however many devices there are
+    assert len(statements) <= 1 + 1 + 3 + 1
+
+    dead = FCMToken.query.filter_by(is_active=False).filter(FCMToken.token.like('tok-%')).all()
+    assert {t.token for t in dead} == {'tok-0-0', 'tok-7-3', 'tok-59-19', 'tok-12-5'}
+    fresh = FCMToken.query.filter(FCMToken.last_used > datetime.utcnow() - timedelta(minutes=5)).count()
+    assert fresh == 1196
+
+    # Dead devices are no longer targeted
+    transport.calls.clear()
+    again = fcm_service.send_to_users(agent_ids, "Second", "Job", None)
+    db.session.commit()
+    assert again['total_tokens'] == 1196 and again['failure_count'] == 0
+    assert sum(len(call) for call in transport.calls) == 1196
+
+def test_payload_rejection_and_outages_do_not_prune(app, transport):
+    agent_ids = make_devices(agents=2, per_agent=3)
+    tokens = [t.token for t in FCMToken.query.filter_by(is_active=True)]
+
+    # Every token "invalid" in the same chunk means the message itself was rejected
+    transport.invalid = set(tokens)
+    result = fcm_service.send_to_users(agent_ids, "Title", "Body")
+    db.session.commit()
+    assert result['failure_count'] == 6 and result['deactivated_tokens'] == 0
+
+    transport.invalid = set()
+    transport.error = exceptions.UnavailableError('FCM is down')
+    result = fcm_service.send_to_users(agent_ids, "Title", "Body")
+    db.session.commit()
+    assert result['failure_count'] == 6 and result['deactivated_tokens'] == 0
+    assert result['errors'] == ['FCM send error: FCM is down']
+    assert FCMToken.query.filter_by(is_active=True).count() == 6
+
+def test_job_notification_uses_live_devices(app, transport, monkeypatch):
+    from src.routes.fcm_notifications import send_job_notification_to_agents
+    agent_ids = make_devices(agents=3, per_agent=2)
+    transport.unregistered = {'tok-1-1'}
+    outcome = send_job_notification_to_agents(agent_ids, "New Job Available", "Job at 1 High Street", {'job_id': 9})
+    db.session.commit()
+    assert outcome['success'] and outcome['tokens_sent'] == 6
+    assert outcome['fcm_result']['deactivated_tokens'] == 1
+    assert FCMToken.query.filter_by(token='tok-1-1').one().is_active is False
+
+    monkeypatch.setattr(firebaseConfig, 'MULTICAST_LIMIT', 2)
+    transport.calls.clear()
+    send_job_notification_to_agents(agent_ids, "Again", "Job", None)
+    db.session.commit()
+    assert sorted(len(call) for call in transport.calls) == [1, 2, 2]
@@ -0,0 +1,93 @@
+import pytest
+import random
+from datetime import datetime
+from src.models.user import User, Job, db
+from src.services.geo_index import radius_search, nearest, bbox_search
+from src.utils.geo import (
+    geohash_encode, geohash_bounds, geohash_neighbours, haversine_km,
+    precision_for_radius, prefix_upper_bound,
+)
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+@pytest.fixture
+def app():
+    """Create a test Flask application."""
+    from main import app as flask_app
+    flask_app.config['TESTING'] = True
+    flask_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.drop_all()
+
+def seed_jobs(points):
+    admin = User(email="geo-admin@test.com", password_hash="x", role="admin",
+                 first_name="Geo", last_name="Admin")
+    db.session.add(admin)
+    db.session.flush()
+    jobs = []
+    for lat, lng in points:
+        job = Job(title="Site", job_type="Security", address="Somewhere",
+                  arrival_time=datetime.utcnow(), agents_required=1, status='open',
+                  created_by=admin.id, location_lat=str(lat), location_lng=str(lng))
+        db.session.add(job)
+        jobs.append(job)
+    db.session.commit()
+    return jobs
+
+def test_haversine_known_distance():
+    # London (Charing Cross) to Dartford is roughly 25 km
+    d = haversine_km(51.5074, -0.1278, 51.4462, 0.2187)
+    assert 24 < d < 26
+
+def test_geohash_roundtrip_and_neighbours():
+    gh = geohash_encode(51.4462, 0.2187, 7)
+    min_lat, min_lng, max_lat, max_lng = geohash_bounds(gh)
+    assert min_lat <= 51.4462 <= max_lat
+    assert min_lng <= 0.2187 <= max_lng
+    cells = geohash_neighbours(gh)
+    assert len(cells) == 9 and gh in cells
+    assert prefix_upper_bound('gcpz') == 'gcq'
+    assert prefix_upper_bound('zzz') is None
+
+def test_precision_cells_cover_radius():
+    p = precision_for_radius(52.0, 3.0)
+    # Cells at this precision must be at least 3 km wide at UK latitudes
+    min_lat, min_lng, max_lat, max_lng = geohash_bounds(geohash_encode(52.0, -1.0, p))
+    assert haversine_km(min_lat, min_lng, max_lat, min_lng) >= 3.0
+    assert haversine_km(52.0, min_lng, 52.0, max_lng) >= 3.0
+
+def test_job_coordinates_synced_from_strings(app):
+    with app.app_context():
+        job = seed_jobs([(51.5, -0.12)])[0]
+        assert job.latitude == pytest.approx(51.5)
+        assert job.geohash and job.geohash.startswith('gcpu')
+        job.location_lat = 'not a number'
+        db.session.commit()
+        assert job.latitude is None and job.geohash is None
+
+def test_radius_nearest_and_bbox_match_brute_force(app):
+    with app.app_context():
+        rnd = random.Random(42)
+        points = [(51.0 + rnd.random(), -1.0 + rnd.random() * 2) for _ in range(300)]
+        seed_jobs(points)
+        lat, lng = 51.5, 0.0
+
+        expected = sorted(
+            (haversine_km(lat, lng, p[0], p[1]), i) for i, p in enumerate(points)
+        )
+        within = [d for d, _ in expected if d <= 15.0]
+        hits = radius_search(Job, lat, lng, 15.0)
+        assert [round(d, 6) for _, d in hits] == [round(d, 6) for d in within]
+
+        knn = nearest(Job, lat, lng, k=5)
+        assert [round(d, 6) for _, d in knn] == [round(d, 6) for d, _ in expected[:5]]
+
+        boxed = bbox_search(Job, 51.2, -0.5, 51.6, 0.5)
+        brute = [p for p in points if 51.2 <= p[0] <= 51.6 and -0.5 <= p[1] <= 0.5]
+        assert len(boxed) == len(brute)
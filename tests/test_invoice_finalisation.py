@@ -0,0 +1,145 @@
+import pytest
+from datetime import datetime, timedelta
+from flask_jwt_extended import create_access_token
+from src.models.user import User, Job, Invoice, InvoiceLine, InvoiceJob, Notification, db
+from src.services import invoice_finalisation
+from src.services import telegram_notifications
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+@pytest.fixture
+def app():
+    """Create a test Flask application."""
+    from main import app as flask_app
+    flask_app.config['TESTING'] = True
+    flask_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.drop_all()
+
+class FakeS3:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.uploads = []
+
+    def is_configured(self):
+        return True
+
+    def upload_invoice_pdf(self, agent_id, invoice_number, pdf_data, filename=None, issue_date=None):
+        if self.failures:
+            self.failures -= 1
+            return {'success': False, 'error': 'S3 timeout'}
+        with open(pdf_data, 'rb') as f:
+            self.uploads.append((invoice_number, f.read()[:4]))
+        return {'success': True, 'file_key': f"invoices/{agent_id}/{filename}"}
+
+@pytest.fixture
+def setup(app, monkeypatch):
+    queued = []
+    admin_messages = []
+    monkeypatch.setattr(invoice_finalisation, 'enqueue', lambda invoice_id, app=None: queued.append(invoice_id))
+    monkeypatch.setattr(telegram_notifications, '_send_admin_group', lambda text: admin_messages.append(text) or True)
+    with app.app_context():
+        admin = User(email="admin@test.com", password_hash="x", role='admin', first_name="Admin", last_name="Test")
+        agent = User(email="agent@test.com", password_hash="x", role='agent', first_name="Sam", last_name="Agent")
+        db.session.add_all([admin, agent])
+        db.session.flush()
+        jobs = [Job(title=f"Site {i}", job_type="Security", address=f"{i} High Street, Dartford DA1 3EN",
+                    arrival_time=datetime.utcnow() - timedelta(days=3), agents_required=1,
+                    status='open', created_by=admin.id) for i in range(3)]
+        db.session.add_all(jobs)
+        db.session.commit()
+        token = create_access_token(identity=str(agent.id))
+        return {'token': token, 'agent_id': agent.id, 'job_ids': [j.id for j in jobs],
+                'queued': queued, 'admin_messages': admin_messages}
+
+def submit(app, setup):
+    time_entries = [{'jobId': job_id, 'entries': [
+        {'work_date': (datetime.utcnow() - timedelta(days=d)).strftime('%Y-%m-%d'), 'hours': 8, 'rate_net': 15, 'notes': ''}
+        for d in range(1, 6)]} for job_id in setup['job_ids']]
+    return app.test_client().post('/api/agent/invoice', json={'time_entries': time_entries, 'extras_amount': 20},
+                                  headers={'Authorization': f"Bearer {setup['token']}"})
+
+@pytest.mark.query_budget(16)  # includes the uninvoiced-work ledger UPDATE
+def test_submission_persists_and_returns_fast(app, setup, monkeypatch):
+    from src.routes import agent as agent_routes
+    renders = []
+    monkeypatch.setattr(agent_routes, 'generate_invoice_pdf', lambda *a, **kw: renders.append(1))
+    response = submit(app, setup)
+    assert response.status_code == 201, response.get_json()
+    body = response.get_json()
+    assert body['finalisation_status'] == 'pending'
+    # Rendering, upload and notifications are left to the queue
+    assert renders == [] and setup['admin_messages'] == []
+    with app.app_context():
+        invoice = db.session.get(Invoice, body['invoice_id'])
+        assert setup['queued'] == [invoice.id]
+        assert InvoiceLine.query.filter_by(invoice_id=invoice.id).count() == 15
+        assert InvoiceJob.query.filter_by(invoice_id=invoice.id).count() == 3
+        assert float(invoice.total_amount) == 15 * 8 * 15 + 20
+        assert invoice.finalisation_payload
+
+    # Unknown jobs are rejected before anything is written
+    bad = app.test_client().post('/api/agent/invoice', json={'time_entries': [
+        {'jobId': 9999, 'entries': [{'work_date': '2026-01-01', 'hours': 1, 'rate_net': 10}]}]},
+        headers={'Authorization': f"Bearer {setup['token']}"})
+    assert bad.status_code == 404
+    with app.app_context():
+        assert Invoice.query.count() == 1
+
+def test_finalisation_retries_upload_then_completes(app, setup, monkeypatch):
+    fake_s3 = FakeS3(failures=1)
+    monkeypatch.setattr(invoice_finalisation, 's3_client', fake_s3)
+    invoice_id = submit(app, setup).get_json()['invoice_id']
+    client = app.test_client()
+    headers = {'Authorization': f"Bearer {setup['token']}"}
+
+    with app.app_context():
+        assert invoice_finalisation.finalise_invoice(invoice_id) == 'pending'
+        status = client.get(f'/api/agent/invoices/{invoice_id}/status', headers=headers).get_json()
+        assert status['attempts'] == 1 and 'S3 timeout' in status['error'] and not status['pdf_ready']
+
+        # Not due until the backoff passes
+        assert invoice_finalisation.finalise_invoice(invoice_id) is None
+        invoice = db.session.get(Invoice, invoice_id)
+        invoice.finalisation_due_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+
+        assert invoice_finalisation.finalise_invoice(invoice_id) == 'complete'
+        assert fake_s3.uploads == [(invoice.invoice_number, b'%PDF')]
+        assert invoice.pdf_file_key.endswith('.pdf') and invoice.finalisation_locked_until is None
+        assert Notification.query.filter_by(user_id=setup['agent_id'], type='invoice_generated').count() == 1
+        messages = setup['admin_messages']
+        assert any('Invoice Submitted' in m for m in messages)
+        assert sum('All Invoices Submitted' in m for m in messages) == 3
+
+        status = client.get(f'/api/agent/invoices/{invoice_id}/status', headers=headers).get_json()
+        assert status['finalisation_status'] == 'complete' and status['pdf_ready'] and status['error'] is None
+
+def test_finalisation_renders_once_and_notifies_once(app, setup, monkeypatch):
+    from src.routes import agent as agent_routes
+    from src.services import mailer
+    renders = []
+    generate = agent_routes.generate_invoice_pdf
+    monkeypatch.setattr(agent_routes, 'generate_invoice_pdf', lambda *a, **kw: renders.append(1) or generate(*a, **kw))
+    monkeypatch.setattr(mailer, 'wake', lambda: None)
+    monkeypatch.setattr(invoice_finalisation, 's3_client', FakeS3())
+    app.config['INVOICE_EMAIL_TO'] = 'accounts@test.com'
+    try:
+        invoice_id = submit(app, setup).get_json()['invoice_id']
+        with app.app_context():
+            assert invoice_finalisation.finalise_invoice(invoice_id) == 'complete'
+            assert len(renders) == 1
+            assert mailer.OutboxEmail.query.filter_by(category='invoice').count() == 1
+
+            # A retried notify stage doesn't repeat the agent's notification
+            invoice_finalisation._notify(db.session.get(Invoice, invoice_id))
+            db.session.commit()
+            assert Notification.query.filter_by(user_id=setup['agent_id'], type='invoice_generated').count() == 1
+    finally:
+        app.config.pop('INVOICE_EMAIL_TO', None)
@@ -0,0 +1,153 @@
+import pytest
+from datetime import date, datetime, timedelta
+from flask_jwt_extended import create_access_token
+from src.models.user import User, Job, JobAssignment, Invoice, InvoiceJob, InvoiceLine, SupplierProfile, db
+from src.services import invoice_ledger
+from src.services.slot_allocation import accept_assignment, decline_assignment
+from src.utils import perf
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+@pytest.fixture
+def app():
+    """Create a test Flask application."""
+    from main import app as flask_app
+    flask_app.config['TESTING'] = True
+    flask_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.drop_all()
+
+def seed(jobs=3, email="agent@test.com"):
+    admin = User(email="admin@test.com", password_hash="x", role='admin', first_name="Admin", last_name="Test")
+    agent = User(email=email, password_hash="x", role='agent', first_name="Sam", last_name="Agent")
+    db.session.add_all([admin, agent])
+    db.session.flush()
+    created = [Job(title=f"Site {i}", job_type="Security", address=f"{i} High Street, Dartford DA1 3EN",
+                   arrival_time=datetime(2026, 9, 1, 9, 0) + timedelta(days=i), agents_required=1,
+                   status='open', created_by=admin.id) for i in range(jobs)]
+    db.session.add_all(created)
+    db.session.flush()
+    assignments = [JobAssignment(job_id=job.id, agent_id=agent.id, status='accepted') for job in created]
+    db.session.add_all(assignments)
+    db.session.commit()
+    return admin, agent, created, assignments
+
+def add_invoice(agent_id, number, job_ids=(), work_dates=(), assignment_ids=()):
+    invoice = Invoice(agent_id=agent_id, invoice_number=number, issue_date=date(2026, 10, 1),
+                      due_date=date(2026, 10, 31), total_amount=100, status='sent')
+    db.session.add(invoice)
+    db.session.flush()
+    db.session.add_all([InvoiceJob(invoice_id=invoice.id, job_id=job_id, hours_worked=8) for job_id in job_ids])
+    db.session.add_all([InvoiceLine(invoice_id=invoice.id, work_date=d, hours=8) for d in work_dates])
+    db.session.add_all([InvoiceLine(invoice_id=invoice.id, job_assignment_id=a, work_date=date(2026, 10, 1), hours=8)
+                        for a in assignment_ids])
+    invoice_ledger.refresh([invoice.id])
+    db.session.commit()
+    return invoice.id
+
+def invoiceable(app, agent_id):
+    response = app.test_client().get('/api/agent/invoiceable-jobs',
+                                     headers={'Authorization': f"Bearer {create_access_token(identity=str(agent_id))}"})
+    assert response.status_code == 200
+    return [job['id'] for job in response.get_json()]
+
+def test_invoiceable_jobs_follow_invoice_links_dates_and_deletes(app):
+    with app.app_context():
+        _, agent, jobs, assignments = seed(jobs=4)
+        assignments[3].status = 'declined'
+        db.session.commit()
+        assert [a.invoice_state for a in assignments] == ['uninvoiced'] * 3 + [None]
+        assert invoiceable(app, agent.id) == [jobs[2].id, jobs[1].id, jobs[0].id]
+
+        linked = add_invoice(agent.id, "INV-1", job_ids=[jobs[0].id])
+        add_invoice(agent.id, "INV-2", work_dates=[jobs[1].arrival_time.date()])  # legacy time-entry invoice
+        assert invoiceable(app, agent.id) == [jobs[2].id]
+        assert db.session.get(JobAssignment, assignments[0].id).invoice_state == 'invoiced'
+
+        # Moving the job off the invoiced date frees it again
+        jobs[1].arrival_time = jobs[1].arrival_time + timedelta(days=10)
+        db.session.commit()
+        assert invoiceable(app, agent.id) == [jobs[1].id, jobs[2].id]
+
+        token = create_access_token(identity=str(agent.id))
+        response = app.test_client().delete(f'/api/agent/invoices/{linked}', headers={'Authorization': f"Bearer {token}"})
+        assert response.status_code == 200
+        assert invoiceable(app, agent.id) == [jobs[1].id, jobs[2].id, jobs[0].id]
+
+def test_status_changes_keep_state(app):
+    with app.app_context():
+        _, agent, jobs, assignments = seed(jobs=2)
+        offer = JobAssignment(job_id=jobs[1].id, agent_id=agent.id, status='pending')
+        jobs[1].agents_required = 2
+        db.session.add(offer)
+        db.session.commit()
+        assert offer.invoice_state is None
+
+        accept_assignment(offer)
+        db.session.commit()
+        assert offer.invoice_state == 'uninvoiced'
+
+        add_invoice(agent.id, "INV-1", job_ids=[jobs[0].id])
+        decline_assignment(assignments[0])
+        decline_assignment(offer)
+        db.session.commit()
+        assert assignments[0].invoice_state == 'invoiced'
+        assert offer.invoice_state is None
+
+def test_supplier_pending_uses_assignment_lines_only(app):
+    with app.app_context():
+        admin, supplier_user, jobs, assignments = seed(jobs=3, email="ops@supplier.test")
+        db.session.add(SupplierProfile(email="ops@supplier.test", display_name="Supplier Ltd"))
+        for a in assignments:
+            a.supplied_by_email = "ops@supplier.test"
+            a.supplier_headcount = 2
+        db.session.commit()
+
+        # A line dated on job 1's arrival doesn't cover supplier-supplied work
+        add_invoice(supplier_user.id, "SUP-1", assignment_ids=[assignments[0].id],
+                    work_dates=[jobs[1].arrival_time.date()])
+
+        def pending(user_id, url):
+            token = create_access_token(identity=str(user_id))
+            response = app.test_client().get(url, headers={'Authorization': f"Bearer {token}"})
+            assert response.status_code == 200
+            return [row['job_assignment_id'] for row in response.get_json()['assignments']]
+
+        expected = [assignments[2].id, assignments[1].id]
+        assert pending(supplier_user.id, '/api/me/supplier/pending-assignments') == expected
+        assert pending(admin.id, '/api/suppliers/ops@supplier.test/pending-assignments') == expected
+
+def test_invoiceable_jobs_cost_does_not_grow_with_history(app):
+    with app.app_context():
+        _, agent, jobs, _ = seed(jobs=3)
+        token = create_access_token(identity=str(agent.id))
+        client = app.test_client()
+
+        def count():
+            db.session.expire_all()
+            with perf.count_queries() as statements:
+                response = client.get('/api/agent/invoiceable-jobs', headers={'Authorization': f"Bearer {token}"})
+            assert response.status_code == 200 and len(response.get_json()) == 3
+            assert not any('invoice_lines' in sql or 'invoice_jobs' in sql for sql in statements)
+            return len(statements)
+
+        fresh = count()
+        for n in range(40):
+            add_invoice(agent.id, f"OLD-{n}", work_dates=[date(2024, 1, 1) + timedelta(days=n)])
+        assert count() == fresh
+
+def test_recompute_backfills_from_legacy_rules(app):
+    with app.app_context():
+        _, agent, jobs, assignments = seed(jobs=3)
+        add_invoice(agent.id, "INV-1", job_ids=[jobs[0].id], work_dates=[jobs[1].arrival_time.date()])
+        db.session.execute(JobAssignment.__table__.update().values(invoice_state=None))
+        assert invoice_ledger.recompute() == 3
+        db.session.commit()
+        assert [db.session.get(JobAssignment, a.id).invoice_state for a in assignments] == \
+            ['invoiced', 'invoiced', 'uninvoiced']
@@ -0,0 +1,55 @@
+import gzip
+import json
+import pytest
+from datetime import date, datetime
+from decimal import Decimal
+from flask import jsonify
+from src.utils import compression, json_provider
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+@pytest.fixture
+def app():
+    """Create a test Flask application."""
+    from main import app as flask_app
+    flask_app.config['TESTING'] = True
+    return flask_app
+
+ROW = {'id': 7, 'amount': Decimal('12.50'), 'work_date': date(2026, 10, 19),
+       'created_at': datetime(2026, 10, 19, 9, 30, 15, 250000), 'agents': {3: "Sam"}, 'notes': "Ünïcode"}
+EXPECTED = {'id': 7, 'amount': 12.5, 'work_date': "2026-10-19", 'created_at': "2026-10-19T09:30:15.250000",
+            'agents': {'3': "Sam"}, 'notes': "Ünïcode"}
+
+@pytest.mark.parametrize('use_orjson', [False, True])
+def test_provider_writes_decimals_and_dates_like_the_helpers(app, monkeypatch, use_orjson):
+    if use_orjson:
+        monkeypatch.setattr(json_provider, 'orjson', pytest.importorskip('orjson'))
+    else:
+        monkeypatch.setattr(json_provider, 'orjson', None)
+
+    with app.test_request_context():
+        response = jsonify(ROW)
+        assert json.loads(response.get_data()) == EXPECTED
+        assert app.json.loads(app.json.dumps([ROW])) == [EXPECTED]
+        with pytest.raises(TypeError):
+            app.json.dumps({'x': object()})
+
+def test_large_responses_are_compressed_when_accepted(app, monkeypatch):
+    monkeypatch.setattr(compression, 'brotli', None)
+    rows = [dict(ROW, id=n) for n in range(200)]
+
+    with app.test_request_context(headers={'Accept-Encoding': 'gzip, deflate, br'}):
+        response = compression._after_request(jsonify(rows))
+        assert response.headers['Content-Encoding'] == 'gzip' and 'Accept-Encoding' in response.vary
+        assert json.loads(gzip.decompress(response.get_data())) == [dict(EXPECTED, id=n) for n in range(200)]
+        assert int(response.headers['Content-Length']) == len(response.get_data())
+
+        small = compression._after_request(jsonify({'ok': True}))
+        assert 'Content-Encoding' not in small.headers and 'Accept-Encoding' in small.vary
+
+    with app.test_request_context(headers={'Accept-Encoding': 'gzip;q=0'}):
+        response = compression._after_request(jsonify(rows))
+        assert 'Content-Encoding' not in response.headers and 'Accept-Encoding' in response.vary
@@ -0,0 +1,162 @@
+import socketserver
+import threading
+import pytest
+from datetime import datetime, timedelta
+from email.mime.text import MIMEText
+from src.models.user import db
+from src.models.email_outbox import OutboxEmail
+from src.services import mailer
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+class DebuggingSMTPServer(socketserver.ThreadingTCPServer):
+    """Minimal local SMTP sink: records messages and connections, no auth or TLS."""
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.messages = []
+        self.connections = 0
+        self.reject = set()          # recipients answered with 550
+        self.drop_after = None       # close the connection after this many messages on it
+        self.lock = threading.Lock()
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write((line + '\r\n').encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        sent_here = 0
+        rcpts = []
+        self.reply('220 localhost debugging SMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip()
+            verb = command.split(' ', 1)[0].upper()
+            if verb in ('EHLO', 'HELO'):
+                self.reply('250 localhost')
+            elif verb == 'MAIL':
+                rcpts = []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                addr = command.split(':', 1)[1].strip().strip('<>')
+                if addr in server.reject:
+                    self.reply('550 No such user')
+                else:
+                    rcpts.append(addr)
+                    self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                while True:
+                    chunk = self.rfile.readline()
+                    if chunk in (b'.\r\n', b''):
+                        break
+                    data.append(chunk)
+                with server.lock:
+                    server.messages.append((rcpts, b''.join(data).decode()))
+                sent_here += 1
+                self.reply('250 Queued')
+                if server.drop_after and sent_here >= server.drop_after:
+                    return
+            elif verb == 'RSET' or verb == 'NOOP':
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+@pytest.fixture
+def smtp_server():
+    server = DebuggingSMTPServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    mailer.close_connections()
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def app(smtp_server, monkeypatch):
+    """Create a test Flask application pointed at the local SMTP sink."""
+    from main import app as flask_app
+    flask_app.config['TESTING'] = True
+    flask_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    monkeypatch.setitem(flask_app.config, 'MAIL_SERVER', '127.0.0.1')
+    monkeypatch.setitem(flask_app.config, 'MAIL_PORT', smtp_server.server_address[1])
+    monkeypatch.setitem(flask_app.config, 'MAIL_USE_TLS', False)
+    monkeypatch.setitem(flask_app.config, 'MAIL_USERNAME', None)
+    monkeypatch.setitem(flask_app.config, 'MAIL_RATE_PER_SECOND', 0)
+    monkeypatch.setattr(mailer, 'wake', lambda app=None: False)
+
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.drop_all()
+
+def make_message(to, bcc=None):
+    msg = MIMEText("Invoice attached")
+    msg['To'] = to
+    msg['Subject'] = f"Invoice for {to}"
+    if bcc:
+        msg['Bcc'] = bcc
+    return msg
+
+def test_outbox_sends_batch_over_one_connection(app, smtp_server):
+    with app.app_context():
+        for i in range(40):
+            mailer.queue_email(make_message(f"agent{i}@example.com", bcc="audit@example.com"), category='invoice')
+        assert smtp_server.messages == []
+
+        assert mailer.flush_outbox() == 40
+
+        assert smtp_server.connections == 1
+        assert len(smtp_server.messages) == 40
+        rcpts, body = smtp_server.messages[0]
+        assert rcpts == ['agent0@example.com', 'audit@example.com']
+        assert 'Bcc' not in body
+        assert OutboxEmail.query.filter_by(status='sent').count() == 40
+        assert mailer.flush_outbox() == 0
+
+def test_reconnects_when_server_drops_connection(app, smtp_server):
+    smtp_server.drop_after = 3
+    with app.app_context():
+        for i in range(7):
+            mailer.send_message(make_message(f"user{i}@example.com"))
+        assert len(smtp_server.messages) == 7
+        assert smtp_server.connections == 3
+
+def test_failures_retry_with_backoff_or_fail_permanently(app, smtp_server):
+    smtp_server.reject.add('gone@example.com')
+    with app.app_context():
+        rejected = mailer.queue_email(make_message('gone@example.com'))
+        ok = mailer.queue_email(make_message('fine@example.com'))
+        assert mailer.flush_outbox() == 1
+        assert rejected.status == 'failed' and 'gone@example.com' in rejected.last_error
+        assert ok.status == 'sent'
+
+        # Server unreachable: the email stays queued and backs off
+        app.config['MAIL_PORT'] = 1
+        mailer.close_connections()
+        later = mailer.queue_email(make_message('later@example.com'))
+        assert mailer.flush_outbox() == 0
+        assert later.status == 'queued' and later.attempts == 1 and later.locked_until is None
+        delay = (later.next_attempt_at - datetime.utcnow()).total_seconds()
+        assert 55 < delay <= mailer.BACKOFF_BASE_SECONDS
+        assert mailer.backoff_seconds(3) == 4 * mailer.BACKOFF_BASE_SECONDS
+
+        # Once due and reachable again it goes out
+        app.config['MAIL_PORT'] = smtp_server.server_address[1]
+        later.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+        assert mailer.flush_outbox() == 1 and later.status == 'sent'
@@ -0,0 +1,168 @@
+import json
+import pytest
+from flask_jwt_extended import create_access_token
+from datetime import datetime
+from src.models.user import User, Job, Notification, db
+from src.services import notification_stream
+from src.services.notifications import bulk_notify_agents, notify_agent
+from src.utils import perf
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+@pytest.fixture
+def app():
+    """Create a test Flask application."""
+    from main import app as flask_app
+    flask_app.config['TESTING'] = True
+    flask_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    flask_app.config['TELEGRAM_ENABLED'] = False
+
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def make_agent(n=0):
+    agent = User(email=f"stream{n}@test.com", password_hash="x", role='agent', first_name="S", last_name=str(n))
+    db.session.add(agent)
+    db.session.commit()
+    return agent.id
+
+def auth(agent_id):
+    return {'Authorization': f"Bearer {create_access_token(identity=str(agent_id))}"}
+
+def unread(agent_id):
+    db.session.expire_all()
+    return db.session.get(User, agent_id).unread_notifications
+
+def counted(agent_id):
+    return Notification.query.filter(Notification.user_id == agent_id, Notification.is_read.isnot(True)).count()
+
+def frames(response, count):
+    """Read `count` non-comment SSE frames from a streamed response."""
+    out = []
+    chunks = iter(response.response)
+    while len(out) < count:
+        chunk = next(chunks)
+        chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+        if chunk.startswith((':', 'retry:')):
+            continue
+        fields = dict(line.split(': ', 1) for line in chunk.strip().split('\n'))
+        out.append((fields.get('id'), fields['event'], json.loads(fields['data'])))
+    return out
+
+def test_unread_counter_follows_every_change(app, client):
+    agent = make_agent()
+    notify_agent(agent, "One", "First")
+    bulk_notify_agents([agent, agent], "Two", "Second")
+    assert unread(agent) == counted(agent) == 3
+
+    first = Notification.query.filter_by(user_id=agent).order_by(Notification.id).first()
+    assert client.put(f"/api/notifications/{first.id}/read", headers=auth(agent)).status_code == 200
+    assert unread(agent) == 2
+    # Marking an already-read row again changes nothing
+    client.put(f"/api/notifications/{first.id}/read", headers=auth(agent))
+    assert unread(agent) == 2
+
+    last = Notification.query.filter_by(user_id=agent).order_by(Notification.id.desc()).first()
+    client.delete(f"/api/notifications/{last.id}", headers=auth(agent))
+    assert unread(agent) == counted(agent) == 1
+
+    with perf.count_queries() as statements:
+        response = client.get('/api/notifications/unread-count', headers=auth(agent))
+    assert response.get_json() == {'unread': 1}
+    assert not any('count(' in s.lower() for s in statements)
+
+    response = client.put('/api/notifications/read-all', headers=auth(agent))
+    assert response.get_json()['updated'] == 1
+    assert unread(agent) == counted(agent) == 0
+
+@pytest.mark.parametrize('path', ['/api/jobs/{}', '/api/admin/jobs/{}'])
+def test_deleting_a_job_takes_its_notifications_off_the_counter(app, client, path):
+    agent = make_agent()
+    admin = User(email="admin@test.com", password_hash="x", role='admin', first_name="A", last_name="Admin")
+    db.session.add(admin)
+    db.session.flush()
+    job = Job(title="Site", job_type="Security", address="1 Test Road", arrival_time=datetime(2026, 11, 1, 9),
+              agents_required=1, status='open', created_by=admin.id)
+    db.session.add(job)
+    db.session.flush()
+    db.session.add_all([Notification(user_id=agent, title="Job", message="New job", job_id=job.id),
+                        Notification(user_id=agent, title="Other", message="Unrelated")])
+    db.session.commit()
+    assert unread(agent) == 2
+
+    assert client.delete(path.format(job.id), headers=auth(admin.id)).status_code == 200
+    assert unread(agent) == counted(agent) == 1
+
+def test_delta_listing(app, client):
+    agent = make_agent()
+    for n in range(3):
+        notify_agent(agent, f"N{n}", "Body")
+    ids = sorted(n.id for n in Notification.query.filter_by(user_id=agent))
+    response = client.get(f"/api/notifications?since_id={ids[0]}", headers=auth(agent))
+    assert sorted(n['id'] for n in response.get_json()) == ids[1:]
+
+def test_stream_delivers_new_notifications_and_counts(app, client, monkeypatch):
+    monkeypatch.setattr(notification_stream, 'HEARTBEAT_SECONDS', 0.05)
+    agent, other = make_agent(0), make_agent(1)
+    notify_agent(agent, "Before", "Already seen")
+
+    response = client.get('/api/notifications/stream', headers=auth(agent), buffered=False)
+    assert response.status_code == 200 and response.mimetype == 'text/event-stream'
+    assert frames(response, 1) == [(None, 'unread', {'unread': 1})]
+
+    notify_agent(agent, "New Job Available", "Job at 1 High Street")
+    notify_agent(other, "Not yours", "Body")
+    (event_id, kind, item), count = frames(response, 2)
+    assert kind == 'notification' and item['title'] == "New Job Available" and int(event_id) == item['id']
+    assert count == (None, 'unread', {'unread': 2})
+
+    client.put('/api/notifications/read-all', headers=auth(agent))
+    assert frames(response, 1) == [(None, 'unread', {'unread': 0})]
+    response.close()
+    assert notification_stream.broker.listening([agent]) == set()
+
+def test_stream_resumes_from_last_event_id(app, client):
+    agent = make_agent()
+    for n in range(3):
+        notify_agent(agent, f"N{n}", "Body")
+    ids = sorted(n.id for n in Notification.query.filter_by(user_id=agent))
+
+    headers = dict(auth(agent), **{'Last-Event-ID': str(ids[0])})
+    response = client.get('/api/notifications/stream', headers=headers, buffered=False)
+    replay = frames(response, 3)
+    assert [int(event_id) for event_id, kind, _ in replay[:2]] == ids[1:]
+    assert replay[2] == (None, 'unread', {'unread': 3})
+    response.close()
+
+    # Nothing is published for rolled-back work
+    subscription = notification_stream.broker.subscribe(agent)
+    db.session.add(Notification(user_id=agent, title="Draft", message="Body"))
+    db.session.flush()
+    db.session.rollback()
+    assert subscription.queue.empty()
+    notification_stream.broker.unsubscribe(subscription)
+    assert unread(agent) == 3
+
+def test_stream_cap_leaves_threads_for_requests(app, client, monkeypatch):
+    assert 0 < notification_stream.MAX_STREAMS < notification_stream.WORKER_THREADS
+    monkeypatch.setattr(notification_stream, 'MAX_STREAMS', 1)
+    agent = make_agent()
+    held = notification_stream.broker.subscribe(agent)
+
+    response = client.get('/api/notifications/stream', headers=auth(agent))
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(notification_stream.BUSY_RETRY_SECONDS)
+
+    notification_stream.broker.unsubscribe(held)
+    response = client.get('/api/notifications/stream', headers=auth(agent), buffered=False)
+    assert response.status_code == 200
+    response.close()
@@ -0,0 +1,79 @@
+import pytest
+from datetime import datetime
+from flask_jwt_extended import create_access_token
+from src.models.user import User, Job, db
+from src.models.v3_report import V3JobReport
+from src.utils import perf
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+@pytest.fixture
+def app():
+    """Create a test Flask application."""
+    from main import app as flask_app
+    flask_app.config['TESTING'] = True
+    flask_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.drop_all()
+    perf.registry.reset()
+
+@pytest.fixture
+def admin_headers(app):
+    with app.app_context():
+        admin = User(email="admin@test.com", password_hash="x", role='admin', first_name="Admin", last_name="Test")
+        db.session.add(admin)
+        db.session.commit()
+        return {'Authorization': f"Bearer {create_access_token(identity=str(admin.id))}"}
+
+def test_fingerprint_collapses_parameters():
+    a = perf.fingerprint("SELECT * FROM users WHERE users.id = 5 AND name = 'Sam'")
+    b = perf.fingerprint("SELECT *   FROM users\n WHERE users.id = 17 AND name = 'O''Neil'")
+    assert a == b == "SELECT * FROM users WHERE users.id = ? AND name = ?"
+    assert perf.fingerprint("SELECT 1 FROM t WHERE id IN (?, ?, ?)") == perf.fingerprint("SELECT 1 FROM t WHERE id IN (?)")
+
+def test_server_timing_and_n_plus_one_report(app, admin_headers):
+    with app.app_context():
+        job = Job(title="Site", job_type="Security", address="1 High Street", arrival_time=datetime.utcnow(),
+                  agents_required=1, status='open', created_by=1)
+        db.session.add(job)
+        db.session.flush()
+        for i in range(6):
+            agent = User(email=f"agent{i}@test.com", password_hash="x", role='agent', first_name="A", last_name=str(i))
+            db.session.add(agent)
+            db.session.flush()
+            db.session.add(V3JobReport(job_id=job.id, agent_id=agent.id, form_type='traveller_serve', report_data={}))
+        db.session.commit()
+        job_id = job.id
+
+    client = app.test_client()
+    perf.registry.reset()
+    response = client.get(f'/api/admin/jobs/{job_id}/v3-reports', headers=admin_headers)
+    assert response.status_code == 200
+    timing = response.headers['Server-Timing']
+    assert timing.startswith('db;dur=') and 'http;dur=' in timing and 'app;dur=' in timing
+
+    stats = client.get('/api/admin/perf?sort=n_plus_one', headers=admin_headers).get_json()
+    endpoint = stats['endpoints'][0]
+    assert endpoint['endpoint'] == 'GET /api/admin/jobs/<int:job_id>/v3-reports'
+    assert endpoint['requests'] == 1 and endpoint['n_plus_one_requests'] == 1
+    assert endpoint['max_queries'] >= 8
+    worst = endpoint['repeated_statements'][0]
+    assert worst['count'] >= 6 and 'FROM users' in worst['sql']
+
+    # Non-admins are refused
+    with app.app_context():
+        agent_token = create_access_token(identity=str(User.query.filter_by(role='agent').first().id))
+    assert client.get('/api/admin/perf', headers={'Authorization': f"Bearer {agent_token}"}).status_code == 403
+
+@pytest.mark.query_budget(3)
+def test_count_queries_tracks_this_thread(app):
+    with perf.count_queries() as statements:
+        User.query.count()
+        User.query.filter_by(role='admin').first()
+    assert len(statements) == 2
@@ -0,0 +1,171 @@
+import io
+import pytest
+from botocore.exceptions import ClientError
+from flask_jwt_extended import create_access_token
+from PIL import Image
+from src.models.user import User, db
+from src.models.report_photo import ReportPhoto
+from src.models.v3_report import V3JobReport
+from src.services import report_photos
+from src.utils.s3_client import S3Client
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+class LocalObjectStore:
+    """MinIO-style stand-in for the boto3 S3 client: objects live in memory and
+    browser uploads are checked against the presigned POST policy."""
+    endpoint = 'http://127.0.0.1:9000/v3-test'
+
+    def __init__(self):
+        self.objects = {}
+        self.policies = {}
+        self.gets = []
+
+    def generate_presigned_post(self, Bucket, Key, Fields, Conditions, ExpiresIn):
+        self.policies[Key] = Conditions
+        return {'url': self.endpoint, 'fields': dict(Fields, key=Key, policy='signed', signature='sig')}
+
+    def post(self, url, fields, data):
+        """What the app does: multipart POST of the policy fields plus the file."""
+        assert url == self.endpoint
+        for condition in self.policies[fields['key']]:
+            if isinstance(condition, list):
+                _, low, high = condition
+                if not low <= len(data) <= high:
+                    return 400
+            else:
+                (name, value), = condition.items()
+                if fields.get(name) != value:
+                    return 403
+        self.objects[fields['key']] = (data, fields['Content-Type'])
+        return 204
+
+    def _missing(self, operation):
+        return ClientError({'Error': {'Code': '404', 'Message': 'Not Found'}}, operation)
+
+    def head_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise self._missing('HeadObject')
+        data, content_type = self.objects[Key]
+        return {'ContentLength': len(data), 'ContentType': content_type}
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise self._missing('GetObject')
+        self.gets.append(Key)
+        return {'Body': io.BytesIO(self.objects[Key][0])}
+
+    def put_object(self, Bucket, Key, Body, ContentType, **kwargs):
+        self.objects[Key] = (Body, ContentType)
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f"{self.endpoint}/{Params['Key']}?X-Amz-Expires={ExpiresIn}"
+
+@pytest.fixture
+def app():
+    """Create a test Flask application."""
+    from main import app as flask_app
+    flask_app.config['TESTING'] = True
+    flask_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.drop_all()
+
+@pytest.fixture
+def store(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'AKIATEST')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'secret')
+    monkeypatch.setenv('AWS_S3_REGION', 'eu-west-2')
+    monkeypatch.setenv('AWS_S3_BUCKET', 'v3-test')
+    client = S3Client()
+    client.s3_client = LocalObjectStore()
+    from src.routes import agent as agent_routes, admin as admin_routes
+    for module in (report_photos, agent_routes, admin_routes):
+        monkeypatch.setattr(module, 's3_client', client)
+    return client.s3_client
+
+@pytest.fixture
+def setup(app, monkeypatch):
+    queued = []
+    monkeypatch.setattr(report_photos, 'enqueue', lambda photo_id, app=None: queued.append(photo_id))
+    with app.app_context():
+        agent = User(email="agent@test.com", password_hash="x", role='agent', first_name="Sam", last_name="Agent")
+        db.session.add(agent)
+        db.session.commit()
+        return {'agent_id': agent.id, 'queued': queued,
+                'headers': {'Authorization': f"Bearer {create_access_token(identity=str(agent.id))}"}}
+
+def jpeg(width, height):
+    out = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 120, 40)).save(out, 'JPEG', quality=95)
+    return out.getvalue()
+
+def test_direct_upload_then_thumbnail(app, store, setup):
+    client = app.test_client()
+    photo = jpeg(3000, 2000)
+    response = client.post('/api/agent/v3-reports/photo-uploads', headers=setup['headers'], json={'files': [
+        {'filename': 'notes.exe', 'content_type': 'application/octet-stream', 'size': 10},
+        {'filename': 'gate.jpg', 'content_type': 'image/jpeg', 'size': len(photo)},
+    ]})
+    assert response.status_code == 201, response.get_json()
+    body = response.get_json()
+    assert len(body['uploads']) == 1 and 'notes.exe' in body['errors'][0]
+    upload = body['uploads'][0]
+    assert upload['index'] == 1   # position in the request, so the client can match its file
+    assert upload['file_key'].startswith(f"agents/{setup['agent_id']}/documents/v3_report_photo_")
+
+    # Nothing is registered until the client has uploaded to storage
+    early = client.post('/api/agent/v3-reports/photo-uploads/complete', headers=setup['headers'],
+                        json={'photo_ids': [upload['photo_id']]})
+    assert early.status_code == 400 and setup['queued'] == []
+
+    fields = upload['upload']['fields']
+    assert store.post(upload['upload']['url'], fields, b'x' * (report_photos.MAX_PHOTO_BYTES + 1)) == 400
+    assert store.post(upload['upload']['url'], dict(fields, **{'Content-Type': 'text/html'}), photo) == 403
+    assert store.post(upload['upload']['url'], fields, photo) == 204
+
+    done = client.post('/api/agent/v3-reports/photo-uploads/complete', headers=setup['headers'],
+                       json={'photo_ids': [upload['photo_id']]})
+    assert done.status_code == 200, done.get_json()
+    entry = done.get_json()['photos'][0]
+    assert entry['url'] == upload['file_key'] and entry['filename'] == 'gate.jpg'
+    assert setup['queued'] == [upload['photo_id']]
+
+    with app.app_context():
+        assert report_photos.process_photo(upload['photo_id']) == 'ready'
+        row = db.session.get(ReportPhoto, upload['photo_id'])
+        assert (row.width, row.height, row.size) == (3000, 2000, len(photo))
+        thumbnail_key = row.thumbnail_key
+        thumb_bytes, content_type = store.objects[thumbnail_key]
+        assert content_type == 'image/jpeg' and len(thumb_bytes) < len(photo)
+        assert Image.open(io.BytesIO(thumb_bytes)).size == (1280, 853)
+
+        report = V3JobReport(agent_id=setup['agent_id'], form_type='traveller_serve',
+                             report_data={'client': 'Acme'}, photo_urls=[entry])
+        db.session.add(report)
+        db.session.commit()
+        report_id = report.id
+
+    public = client.get(f'/api/public/report/{report_id}').get_json()
+    assert public['photo_urls'][0]['url'].startswith(f"{store.endpoint}/{upload['file_key']}")
+    assert public['photo_urls'][0]['thumbnail_url'].startswith(f"{store.endpoint}/{thumbnail_key}")
+
+def test_unreadable_photo_fails_without_retry(app, store, setup):
+    client = app.test_client()
+    upload = client.post('/api/agent/v3-reports/photo-uploads', headers=setup['headers'], json={'files': [
+        {'filename': 'broken.png', 'content_type': 'image/png', 'size': 12}]}).get_json()['uploads'][0]
+    store.post(upload['upload']['url'], upload['upload']['fields'], b'not an image')
+    client.post('/api/agent/v3-reports/photo-uploads/complete', headers=setup['headers'],
+                json={'photo_ids': [upload['photo_id']]})
+
+    with app.app_context():
+        assert report_photos.process_photo(upload['photo_id']) == 'failed'
+        row = db.session.get(ReportPhoto, upload['photo_id'])
+        assert 'Not a readable image' in row.last_error and row.locked_until is None
+        assert report_photos.thumbnail_keys([row.file_key]) == {}
+        assert report_photos.process_due() == 0
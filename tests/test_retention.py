@@ -0,0 +1,139 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from flask_jwt_extended import create_access_token
+from src.models.user import User, Notification, db
+from src.models.admin_message import AdminMessage, AdminMessageDelivery
+from src.models.archive import ArchivedRecord
+from src.models.contact_form import ContactFormSubmission
+from src.models.crm_contact import CRMContact
+from src.models.crm_email import CRMEmail
+from src.models.crm_user import CRMUser
+from src.services import retention
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+@pytest.fixture
+def app():
+    """Create a test Flask application."""
+    from main import app as flask_app
+    flask_app.config['TESTING'] = True
+    flask_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.drop_all()
+
+@pytest.fixture
+def fast(monkeypatch):
+    monkeypatch.setattr(retention, 'BATCH_SIZE', 3)
+    monkeypatch.setattr(retention, 'BATCH_PAUSE', 0)
+
+def seed():
+    now = datetime.utcnow()
+    old, recent = now - timedelta(days=400), now - timedelta(days=5)
+    admin = User(email="admin@test.com", password_hash="x", role='admin', first_name="A", last_name="Admin")
+    agents = [User(email=f"keep{n}@test.com", password_hash="x", role='agent', first_name="K", last_name=str(n))
+              for n in range(2)]
+    db.session.add_all([admin] + agents)
+    db.session.flush()
+    # Seven old notifications for agent 0 (four unread), one recent for each agent
+    for n in range(5):
+        db.session.add(Notification(user_id=agents[0].id, title=f"Old {n}", message="m", sent_at=old, is_read=n >= 3))
+    db.session.add_all([Notification(user_id=agents[0].id, title="Old 5", message="m", sent_at=old, is_read=False),
+                        Notification(user_id=agents[0].id, title="Old 6", message="m", sent_at=old, is_read=True)])
+    db.session.add_all([Notification(user_id=agent.id, title="Recent", message="m", sent_at=recent) for agent in agents])
+
+    message = AdminMessage(admin_id=admin.id, message="Hello", created_at=old)
+    db.session.add(message)
+    db.session.flush()
+    db.session.add_all([AdminMessageDelivery(message_id=message.id, agent_id=agents[1].id, status='success', created_at=when)
+                        for when in (old, recent)])
+
+    base = dict(last_name="L", email="c@test.com", phone="1", created_at=old, updated_at=old)
+    db.session.add_all([ContactFormSubmission(first_name="Closed", status='resolved', stage='email_sent', **base),
+                        ContactFormSubmission(first_name="Open", status='pending', stage='saved', **base),
+                        ContactFormSubmission(first_name="Retrying", status='spam', stage='failed', due_at=now, **base)])
+
+    crm_user = CRMUser(username="crm", email="crm@test.com", password_hash="x")
+    db.session.add(crm_user)
+    db.session.flush()
+    contact = CRMContact(name="Client", email="client@test.com", contact_type='eviction_client', owner_id=crm_user.id)
+    db.session.add(contact)
+    db.session.flush()
+    db.session.add_all([CRMEmail(contact_id=contact.id, user_id=crm_user.id, email_uid=f"INBOX_{n}", sender="a@test.com",
+                                 recipient="b@test.com", date=now - timedelta(days=days), body_text="Body " * 50)
+                        for n, days in enumerate((900, 800, 30))])
+    db.session.commit()
+    return admin.id, [agent.id for agent in agents]
+
+def test_run_archives_in_batches_and_keeps_counters(app, fast):
+    admin_id, (agent, other) = seed()
+    assert db.session.get(User, agent).unread_notifications == 5
+
+    summary = retention.run()
+    assert summary['complete'] is True
+    assert summary['archived'] == {'notifications': 7, 'admin_message_deliveries': 1,
+                                   'crm_emails': 2, 'contact_form_submissions': 1}
+
+    assert [n.title for n in Notification.query.filter_by(user_id=agent)] == ["Recent"]
+    db.session.expire_all()
+    assert db.session.get(User, agent).unread_notifications == 1
+    assert db.session.get(User, other).unread_notifications == 1
+    assert {s.first_name for s in ContactFormSubmission.query} == {"Open", "Retrying"}
+    assert CRMEmail.query.count() == 1 and AdminMessageDelivery.query.count() == 1
+
+    record = ArchivedRecord.query.filter_by(source_table='crm_emails').order_by(ArchivedRecord.source_id).first()
+    assert record.data['body_text'] == "Body " * 50 and record.data['email_uid'] == "INBOX_0"
+    assert len(record.payload) < len(record.data['body_text'])
+
+    # Nothing left to move; the run is a cheap no-op
+    assert sum(retention.run()['archived'].values()) == 0
+    assert retention.status()['last_run']['complete'] is True
+
+def test_run_is_resumable_within_a_time_budget(app, fast, monkeypatch):
+    seed()
+    summary = retention.run(tables=['notifications'], max_seconds=0)
+    assert summary == dict(summary, complete=False, archived={'notifications': 0})
+    assert Notification.query.count() == 9
+
+    # A failing batch rolls back whole: nothing archived without its delete
+    def failing_delete(*args, **kwargs):
+        raise RuntimeError("connection lost")
+    monkeypatch.setattr(retention, 'adjust_unread_counters', failing_delete)
+    assert retention.run(tables=['notifications'])['complete'] is False
+    assert Notification.query.count() == 9 and ArchivedRecord.query.count() == 0
+
+    monkeypatch.undo()
+    monkeypatch.setattr(retention, 'BATCH_PAUSE', 0)
+    assert retention.run(tables=['notifications'])['archived'] == {'notifications': 7}
+    assert ArchivedRecord.query.count() == 7
+
+def test_archive_api(app):
+    admin_id, (agent, other) = seed()
+    retention.run()
+    headers = {'Authorization': f"Bearer {create_access_token(identity=str(admin_id))}"}
+    client = app.test_client()
+
+    response = client.get(f"/api/admin/archive/notifications?owner_id={agent}&per_page=5", headers=headers)
+    body = response.get_json()
+    assert response.status_code == 200 and body['has_more'] is True
+    assert len(body['records']) == 5 and all(r['data']['user_id'] == agent for r in body['records'])
+
+    day = (datetime.utcnow() - timedelta(days=900)).strftime('%Y-%m-%d')
+    response = client.get(f"/api/admin/archive/crm_emails?start={day}&end={day}", headers=headers)
+    assert [r['data']['email_uid'] for r in response.get_json()['records']] == ["INBOX_0"]
+
+    assert client.get("/api/admin/archive/users", headers=headers).status_code == 404
+    assert client.get("/api/admin/retention", headers=headers).get_json()['last_run']['complete'] is True
+    agent_headers = {'Authorization': f"Bearer {create_access_token(identity=str(agent))}"}
+    assert client.get("/api/admin/archive/notifications", headers=agent_headers).status_code == 403
+
+def test_sync_guard_handles_aware_dates(app):
+    aware = datetime.now(timezone.utc) - timedelta(days=retention.POLICIES['crm_emails'].days + 1)
+    assert retention.is_expired('crm_emails', aware)
+    assert not retention.is_expired('crm_emails', datetime.now(timezone.utc))
+    assert not retention.is_expired('jobs', aware)
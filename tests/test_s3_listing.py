@@ -0,0 +1,133 @@
+import pytest
+from datetime import date, datetime
+from src.models.user import User, Invoice, db
+from src.services import invoice_storage
+from src.utils.s3_client import S3Client, invoice_key, legacy_invoice_key
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+class FakePaginator:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def paginate(self, Bucket, Prefix, PaginationConfig):
+        keys = sorted(k for k in self.backend.objects if k.startswith(Prefix))
+        size = PaginationConfig['PageSize']
+        for start in range(0, max(len(keys), 1), size):
+            self.backend.list_calls += 1
+            chunk = keys[start:start + size]
+            yield {'Contents': [{'Key': k, 'Size': len(self.backend.objects[k]),
+                                 'LastModified': datetime(2026, 3, 1)} for k in chunk]} if chunk else {}
+
+class FakeBoto:
+    """In-memory stand-in for the boto3 S3 client."""
+    def __init__(self):
+        self.objects = {}
+        self.list_calls = 0
+
+    def get_paginator(self, name):
+        assert name == 'list_objects_v2'
+        return FakePaginator(self)
+
+    def head_object(self, **kwargs):
+        raise AssertionError("listing must not HEAD objects")
+
+    def list_objects_v2(self, **kwargs):
+        raise AssertionError("listing must use the paginator")
+
+    def copy_object(self, Bucket, Key, CopySource, **kwargs):
+        self.objects[Key] = self.objects[CopySource['Key']]
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop(Key, None)
+
+@pytest.fixture
+def app():
+    """Create a test Flask application."""
+    from main import app as flask_app
+    flask_app.config['TESTING'] = True
+    flask_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.drop_all()
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'AKIATEST')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'secret')
+    monkeypatch.setenv('AWS_S3_REGION', 'eu-west-2')
+    monkeypatch.setenv('AWS_S3_BUCKET', 'v3-test')
+    client = S3Client()
+    client.s3_client = FakeBoto()
+    return client
+
+def make_agent():
+    agent = User(email="agent@test.com", password_hash="x", role='agent', first_name="Sam", last_name="Agent")
+    db.session.add(agent)
+    db.session.flush()
+    return agent
+
+def make_invoice(agent, number, issue_date, key=None):
+    invoice = Invoice(agent_id=agent.id, invoice_number=number, issue_date=issue_date,
+                      due_date=issue_date, total_amount=100, status='submitted', pdf_file_key=key)
+    db.session.add(invoice)
+    return invoice
+
+def test_key_layout():
+    assert invoice_key(7, 'INV-1.pdf', date(2026, 3, 9)) == 'invoices/2026/03/7/INV-1.pdf'
+    assert legacy_invoice_key(7, 'INV-1.pdf') == 'invoices/7/INV-1.pdf'
+
+def test_period_listing_pages_past_1000_keys_without_head(app, client):
+    with app.app_context():
+        agent = make_agent()
+        for i in range(1500):
+            key = invoice_key(agent.id, f"M-{i}.pdf", date(2026, 3, 1 + i % 28))
+            client.s3_client.objects[key] = b'%PDF'
+            make_invoice(agent, f"M-{i}", date(2026, 3, 1 + i % 28), key)
+        # Other months are neither listed nor returned
+        for i in range(50):
+            key = invoice_key(agent.id, f"A-{i}.pdf", date(2026, 4, 2))
+            client.s3_client.objects[key] = b'%PDF'
+            make_invoice(agent, f"A-{i}", date(2026, 4, 2), key)
+        # A row not yet migrated is found under the legacy folder
+        client.s3_client.objects[legacy_invoice_key(agent.id, 'OLD-1.pdf')] = b'%PDF-old'
+        make_invoice(agent, 'OLD-1', date(2026, 3, 15))
+        db.session.commit()
+
+        march = client.get_all_invoices_for_period(2026, 3)
+        assert len(march) == 1501
+        assert client.s3_client.list_calls == 3  # two pages for March, one for the legacy folder
+        legacy = next(item for item in march if item['metadata']['invoice_number'] == 'OLD-1')
+        assert legacy['file_key'] == f"invoices/{agent.id}/OLD-1.pdf" and legacy['size'] == 8
+
+        assert len(client.list_agent_invoices(agent.id)) == 1551
+
+def test_migration_dry_run_then_apply(app, client):
+    with app.app_context():
+        agent = make_agent()
+        for i in range(3):
+            client.s3_client.objects[legacy_invoice_key(agent.id, f"INV-{i}.pdf")] = b'%PDF'
+            make_invoice(agent, f"INV-{i}", date(2026, 1 + i, 5))
+        make_invoice(agent, 'INV-GONE', date(2026, 1, 5))
+        client.s3_client.objects[legacy_invoice_key(agent.id, 'stray.pdf')] = b'%PDF'
+        db.session.commit()
+
+        plan = invoice_storage.migrate_invoice_keys(client=client)
+        assert [m['to'] for m in plan['moved']] == [f"invoices/2026/0{i + 1}/{agent.id}/INV-{i}.pdf" for i in range(3)]
+        assert plan['missing'] == [f"invoices/{agent.id}/INV-GONE.pdf"] and plan['orphans'] == 1
+        assert Invoice.query.filter(Invoice.pdf_file_key.isnot(None)).count() == 0
+
+        done = invoice_storage.migrate_invoice_keys(apply=True, delete_old=True, client=client)
+        assert len(done['moved']) == 3 and not done['errors']
+        moved = Invoice.query.filter_by(invoice_number='INV-1').first()
+        assert moved.pdf_file_key == f"invoices/2026/02/{agent.id}/INV-1.pdf"
+        assert moved.pdf_file_key in client.s3_client.objects
+        assert legacy_invoice_key(agent.id, 'INV-1.pdf') not in client.s3_client.objects
+
+        # Re-running is a no-op for migrated rows
+        assert invoice_storage.migrate_invoice_keys(apply=True, client=client)['moved'] == []
@@ -0,0 +1,52 @@
+import time
+import pytest
+import boto3
+from src.utils import s3_client as s3_module
+from src.utils.s3_client import S3Client
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+@pytest.fixture
+def client(monkeypatch):
+    """An S3Client with dummy credentials; presigning is offline so no AWS access is needed."""
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'AKIATEST')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'secret')
+    monkeypatch.setenv('AWS_S3_REGION', 'eu-west-2')
+    monkeypatch.setenv('AWS_S3_BUCKET', 'v3-test')
+    return S3Client()
+
+def test_presigned_urls_are_cached_per_key_and_disposition(client, monkeypatch):
+    def no_new_clients(*args, **kwargs):
+        raise AssertionError("generate_presigned_url must reuse the shared client")
+    monkeypatch.setattr(boto3, 'client', no_new_clients)
+
+    first = client.generate_presigned_url('reports/1/photo.jpg')
+    assert 'response-content-disposition=inline' in first
+    assert client.generate_presigned_url('reports/1/photo.jpg') == first
+    attachment = client.generate_presigned_url('reports/1/photo.jpg', disposition='attachment')
+    assert attachment != first and 'attachment' in attachment
+    assert client.presign_cache.hits == 1 and client.presign_cache.misses == 2
+
+    # A short-lived request never gets a longer-lived cached URL
+    assert 'X-Amz-Expires=300' in client.generate_presigned_url('reports/1/photo.jpg', expiration=300)
+
+    # Close to expiry the URL is re-signed
+    client.generate_presigned_url('reports/1/photo.jpg')
+    misses = client.presign_cache.misses
+    now = time.time()
+    monkeypatch.setattr(s3_module.time, 'time', lambda: now + 3600 - 60)
+    assert 'X-Amz-Expires=3600' in client.generate_presigned_url('reports/1/photo.jpg')
+    assert client.presign_cache.misses == misses + 1
+
+def test_presign_many_for_a_report(client):
+    keys = [f"reports/7/photo_{i}.jpg" for i in range(50)] + ['', None, 'reports/7/photo_0.jpg']
+    urls = client.presign_many(keys)
+    assert len(urls) == 50 and all(url and 'v3-test' in url for url in urls.values())
+    assert client.presign_cache.misses == 50 and client.presign_cache.hits == 0
+
+    # Reopening the report signs nothing new
+    assert client.presign_many(keys) == urls
+    assert client.presign_cache.misses == 50 and client.presign_cache.hits == 50
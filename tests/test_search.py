@@ -0,0 +1,138 @@
+import pytest
+from datetime import datetime, timedelta
+from flask_jwt_extended import create_access_token
+from src.models.user import User, Job, db
+from src.models.crm_contact import CRMContact
+from src.models.crm_user import CRMUser
+from src.models.police_interaction import PoliceInteraction
+from src.models.search_document import SearchDocument
+from src.services import search
+from src.utils import perf
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+@pytest.fixture
+def app():
+    """Create a test Flask application."""
+    from main import app as flask_app
+    flask_app.config['TESTING'] = True
+    flask_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.drop_all()
+
+def make_job(title, address, postcode, status='open'):
+    job = Job(title=title, job_type='TRAVELLER_EVICTION', address=address, postcode=postcode, status=status,
+              arrival_time=datetime.utcnow() + timedelta(days=1))
+    db.session.add(job)
+    db.session.flush()
+    return job
+
+def seed():
+    admin = User(email="admin@test.com", password_hash="x", role='admin', first_name="A", last_name="Admin")
+    agent = User(email="agent@test.com", password_hash="x", role='agent', first_name="B", last_name="Agent")
+    owner = CRMUser(username="owner", email="owner@test.com", password_hash="x")
+    other = CRMUser(username="other", email="other@test.com", password_hash="x")
+    db.session.add_all([admin, agent, owner, other])
+    db.session.flush()
+    jobs = [make_job("Retail park eviction", "1 Retail Park, Coventry", "CV1 2AB"),
+            make_job(None, "14 Station Road, Leeds", "LS6 3QW"),
+            make_job("Car park", "Retail Way, Bristol", "BS1 4DJ", status='completed')]
+    db.session.add_all([
+        CRMContact(name="Jane Smith", email="jane@smithestates.test", company_name="Smith Estates",
+                   phone="0121 496 0000", contact_type='eviction_client', owner_id=owner.id),
+        CRMContact(name="Sam Smithers", email="sam@example.test", contact_type='referral_partner', owner_id=other.id),
+        PoliceInteraction(job_address="14 Station Road, Leeds", force="West Yorkshire Police",
+                          officers=[{'shoulder_number': 'WY 4321', 'name': 'PC Holt'}], reason="Breach of peace",
+                          outcome="Attended", helpfulness=4, created_by_user_id=admin.id, created_by_role='admin'),
+    ])
+    db.session.commit()
+    return admin.id, agent.id, owner.id, other.id, [job.id for job in jobs]
+
+def headers(identity, **claims):
+    return {'Authorization': f"Bearer {create_access_token(identity=str(identity), additional_claims=claims)}"}
+
+def test_index_follows_model_changes(app):
+    admin, agent, owner, other, (retail, station, closed) = seed()
+    assert SearchDocument.query.count() == 6
+
+    def ids(entity, q):
+        hits = search.hits(entity, q)
+        return sorted(row.entity_id for row in db.session.execute(db.select(hits.c.entity_id)))
+
+    # Prefix matches on words and on compacted postcodes/identifiers
+    assert ids('job', "retail") == [retail, closed]
+    assert ids('job', "cov ret") == [retail]
+    assert ids('job', "cv12") == ids('job', "CV1 2") == [retail]
+    assert ids('police_interaction', "wy4321") != []
+    assert ids('crm_contact', "0121496") != [] and len(ids('crm_contact', "smith")) == 2
+
+    job = db.session.get(Job, station)
+    job.address = "9 Retail Road, Leeds"
+    db.session.delete(db.session.get(Job, closed))
+    db.session.commit()
+    assert ids('job', "retail") == [retail, station]
+    assert ids('job', "station") == []
+
+    # Rows written around the ORM come back with a reindex
+    db.session.execute(Job.__table__.update().where(Job.id == retail).values(address="Market Square"))
+    db.session.commit()
+    assert ids('job', "market") == []
+    assert search.reindex(['job']) == {'job': 2}
+    assert ids('job', "market") == [retail]
+    assert search.hits('job', " -- ") is None
+
+def test_unified_search_is_scoped_and_ranked(app):
+    admin, agent, owner, other, (retail, station, closed) = seed()
+    client = app.test_client()
+
+    body = client.get("/api/search?q=retail", headers=headers(admin)).get_json()
+    assert [r['id'] for r in body['results']['job']] == [retail, closed]   # "retail" twice ranks first
+    assert body['results']['police_interaction'] == []
+
+    body = client.get("/api/search?q=station&types=job,crm_contact", headers=headers(admin)).get_json()
+    assert list(body['results']) == ['job'] and body['results']['job'][0]['id'] == station
+
+    body = client.get("/api/search?q=leeds", headers=headers(agent)).get_json()
+    assert list(body['results']) == ['police_interaction'] and len(body['results']['police_interaction']) == 1
+
+    # CRM users only see their own contacts
+    body = client.get("/api/search?q=smi", headers=headers(owner, crm_user=True)).get_json()
+    assert [r['title'] for r in body['results']['crm_contact']] == ["Jane Smith"]
+
+def test_list_endpoints_use_the_index(app):
+    admin, agent, owner, other, (retail, station, closed) = seed()
+    client = app.test_client()
+
+    with perf.count_queries() as statements:
+        body = client.get("/api/jobs/search?q=retail", headers=headers(admin)).get_json()
+    assert [item['id'] for item in body['items']] == [retail] and body['total'] == 1   # completed job filtered
+    assert not any('LIKE' in sql.upper() for sql in statements)
+
+    body = client.get("/api/police-interactions?job_address=station", headers=headers(agent)).get_json()
+    assert body['total'] == 1
+    body = client.get("/api/police-interactions?job_address=coventry", headers=headers(agent)).get_json()
+    assert body['total'] == 0
+
+    CRMUser.query.get(owner).is_super_admin = True
+    db.session.commit()
+    body = client.get("/api/crm/contacts?view=team&search=smith", headers=headers(owner, crm_user=True)).get_json()
+    assert sorted(c['name'] for c in body['contacts']) == ["Jane Smith", "Sam Smithers"]
+
+def test_candidate_cap_only_applies_to_unified_search(app, monkeypatch):
+    admin, agent, owner, other, (retail, station, closed) = seed()
+    monkeypatch.setattr(search, 'MAX_CANDIDATES', 1)
+    client = app.test_client()
+
+    # The newest "retail" match is the completed job; the list still finds the open one
+    body = client.get("/api/jobs/search?q=retail", headers=headers(admin)).get_json()
+    assert [item['id'] for item in body['items']] == [retail] and body['total'] == 1
+
+    # Owner scoping happens before the cap, so the other owner's newer contact doesn't crowd it out
+    body = client.get("/api/search?q=smi", headers=headers(owner, crm_user=True)).get_json()
+    assert [r['title'] for r in body['results']['crm_contact']] == ["Jane Smith"]
@@ -0,0 +1,94 @@
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from src.models.user import User, Job, JobAssignment, db
+from src.services.slot_allocation import (
+    accept_assignment, decline_assignment, ACCEPTED, FILLED, FULL, NOT_PENDING,
+)
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+@pytest.fixture
+def app():
+    """Create a test Flask application."""
+    from main import app as flask_app
+    flask_app.config['TESTING'] = True
+    flask_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.drop_all()
+
+def create_job_with_offers(agents_required, n_agents):
+    admin = User(email="admin@test.com", password_hash="x", role='admin', first_name="Admin", last_name="Test")
+    db.session.add(admin)
+    agents = [User(email=f"a{i}@test.com", password_hash="x", role='agent', first_name=f"A{i}", last_name="Test")
+              for i in range(n_agents)]
+    db.session.add_all(agents)
+    db.session.flush()
+    job = Job(title="Site", job_type="Security", address="1 Test Road",
+              arrival_time=datetime.utcnow() + timedelta(days=1), agents_required=agents_required,
+              status='open', created_by=admin.id)
+    db.session.add(job)
+    db.session.flush()
+    assignments = [JobAssignment(job_id=job.id, agent_id=a.id, status='pending') for a in agents]
+    db.session.add_all(assignments)
+    db.session.commit()
+    return job.id, [a.id for a in assignments]
+
+def test_accept_fills_job_and_expires_other_offers(app):
+    with app.app_context():
+        job_id, assignment_ids = create_job_with_offers(2, 4)
+        first, second, third, fourth = [db.session.get(JobAssignment, i) for i in assignment_ids]
+
+        assert accept_assignment(first) == ACCEPTED
+        db.session.commit()
+        assert accept_assignment(first) == NOT_PENDING
+        assert accept_assignment(second) == FILLED
+        db.session.commit()
+
+        job = db.session.get(Job, job_id)
+        assert job.slots_filled == 2 and job.status == 'filled'
+        assert third.status == 'expired' and fourth.status == 'expired'
+        assert accept_assignment(third, from_statuses=('pending', 'expired')) == FULL
+        db.session.commit()
+        assert third.status == 'declined'
+
+        # Withdrawing an acceptance frees the slot and reopens the job
+        assert decline_assignment(first)
+        db.session.commit()
+        assert job.slots_filled == 1 and job.status == 'open'
+
+def test_parallel_accepts_never_overfill(app):
+    with app.app_context():
+        # Each thread needs its own connection for the race to be real
+        if db.engine.url.database in (None, '', ':memory:'):
+            pytest.skip("parallel accepts need a file-backed database")
+        job_id, assignment_ids = create_job_with_offers(5, 60)
+
+    def respond(assignment_id):
+        with app.app_context():
+            try:
+                assignment = db.session.get(JobAssignment, assignment_id)
+                outcome = accept_assignment(assignment)
+                db.session.commit()
+                return outcome
+            except Exception:
+                db.session.rollback()
+                raise
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        outcomes = list(pool.map(respond, assignment_ids))
+
+    with app.app_context():
+        job = db.session.get(Job, job_id)
+        accepted = JobAssignment.query.filter_by(job_id=job_id, status='accepted').count()
+        assert accepted == 5
+        assert job.slots_filled == 5 and job.status == 'filled'
+        assert outcomes.count(ACCEPTED) + outcomes.count(FILLED) == 5
+        assert outcomes.count(FILLED) == 1
+        assert set(outcomes) <= {ACCEPTED, FILLED, FULL, NOT_PENDING}
@@ -0,0 +1,120 @@
+import pytest
+from datetime import datetime, timedelta
+from src.models.user import User, db
+from src.models.crm_user import CRMUser
+from src.models.telegram_update import TelegramUpdate
+from src.services import telegram_updates
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+@pytest.fixture
+def app():
+    """Create a test Flask application."""
+    from main import app as flask_app
+    flask_app.config['TESTING'] = True
+    flask_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    flask_app.config['TELEGRAM_WEBHOOK_SECRET'] = 'hook-secret'
+
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.drop_all()
+
+@pytest.fixture
+def sent(monkeypatch):
+    """Capture replies instead of calling Telegram; queue chats instead of running workers."""
+    messages = []
+    monkeypatch.setattr(telegram_updates, 'send_message', lambda chat_id, text: messages.append((chat_id, text)) or {'ok': True})
+    monkeypatch.setattr(telegram_updates, 'get_bot_info', lambda: {'ok': True, 'result': {'username': 'TestBot'}})
+    queued = []
+    monkeypatch.setattr(telegram_updates, 'enqueue', lambda chat_id, app=None: queued.append(chat_id) or True)
+    return messages, queued
+
+def update(update_id, text, chat_id=555, username="agent_tg"):
+    return {'update_id': update_id,
+            'message': {'chat': {'id': chat_id, 'username': username}, 'text': text}}
+
+def test_webhook_stores_and_acks_redeliveries_once(app, sent):
+    messages, queued = sent
+    client = app.test_client()
+
+    assert client.post("/api/telegram/webhook/wrong", json=update(1, "/start")).status_code == 403
+    for _ in range(3):   # Telegram redelivering the same update
+        response = client.post("/api/telegram/webhook/hook-secret", json=update(1, "/start"))
+        assert response.status_code == 200 and response.get_json() == {'ok': True}
+    assert client.post("/webhooks/telegram/hook-secret", json={'update_id': 2}).status_code == 200
+
+    assert TelegramUpdate.query.count() == 1 and queued == ['555']
+    assert messages == []   # nothing handled on the request
+
+    assert telegram_updates.process_chat('555') == 1
+    assert len(messages) == 1 and "@TestBot" in messages[0][1]
+    row = db.session.get(TelegramUpdate, 1)
+    assert row.status == 'done' and row.processed_at is not None
+    assert telegram_updates.process_chat('555') == 0
+
+def test_links_agents_then_crm_users(app, sent):
+    messages, queued = sent
+    agent = User(email="a@test.com", password_hash="x", role='agent', first_name="A", last_name="Agent",
+                 telegram_link_code="AGENT1")
+    crm_user = CRMUser(username="crm", email="crm@test.com", password_hash="x", telegram_link_code="CRM001")
+    db.session.add_all([agent, crm_user])
+    db.session.commit()
+    agent_id, crm_id = agent.id, crm_user.id
+
+    telegram_updates.ingest(update(10, "/start AGENT1", chat_id=1))
+    telegram_updates.ingest(update(11, "/link CRM001", chat_id=2, username="crm_tg"))
+    telegram_updates.ingest(update(12, "/link NOPE", chat_id=3))
+    for chat in ('1', '2', '3'):
+        telegram_updates.process_chat(chat)
+
+    agent, crm_user = db.session.get(User, agent_id), db.session.get(CRMUser, crm_id)
+    assert (agent.telegram_chat_id, agent.telegram_link_code, agent.telegram_opt_in) == ('1', None, True)
+    assert (crm_user.telegram_chat_id, crm_user.telegram_username, crm_user.telegram_link_code) == ('2', 'crm_tg', None)
+    assert [chat for chat, _ in messages] == ['1', '2', '3']
+    assert "invalid or expired" in messages[2][1]
+
+def test_chat_updates_run_in_order_and_failures_retry(app, sent, monkeypatch):
+    messages, queued = sent
+    for update_id in (23, 21, 22):
+        telegram_updates.ingest(update(update_id, f"hello {update_id}"))
+
+    handled = []
+    def flaky(payload):
+        handled.append(payload['update_id'])
+        if payload['update_id'] == 22 and handled.count(22) == 1:
+            raise RuntimeError("telegram timeout")
+    monkeypatch.setattr(telegram_updates, 'handle_update', flaky)
+
+    # 22 fails: the chat stops there rather than running 23 out of order
+    assert telegram_updates.process_chat('555') == 1
+    row = db.session.get(TelegramUpdate, 22)
+    assert (row.status, row.attempts, row.last_error) == ('pending', 1, "telegram timeout")
+    assert telegram_updates.process_chat('555') == 0   # backing off
+
+    row.due_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+    assert telegram_updates.process_chat('555') == 2
+    assert handled == [21, 22, 22, 23]
+
+    # Another worker holding the head of a chat blocks the rest of it
+    telegram_updates.ingest(update(24, "one"))
+    telegram_updates.ingest(update(25, "two"))
+    db.session.get(TelegramUpdate, 24).locked_until = datetime.utcnow() + timedelta(seconds=30)
+    db.session.commit()
+    assert telegram_updates.process_chat('555') == 0 and handled[-1] == 23
+
+def test_prune_keeps_pending_and_recent(app, sent):
+    old = datetime.utcnow() - timedelta(days=telegram_updates.KEEP_DAYS + 1)
+    db.session.add_all([
+        TelegramUpdate(update_id=1, chat_id='1', payload='{}', status='done', received_at=old),
+        TelegramUpdate(update_id=2, chat_id='1', payload='{}', status='failed', received_at=old),
+        TelegramUpdate(update_id=3, chat_id='1', payload='{}', status='pending', received_at=old),
+        TelegramUpdate(update_id=4, chat_id='1', payload='{}', status='done', received_at=datetime.utcnow()),
+    ])
+    db.session.commit()
+    assert telegram_updates.prune() == 2
+    assert sorted(u.update_id for u in TelegramUpdate.query) == [3, 4]
@@ -0,0 +1,101 @@
+import threading
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from src.models.user import db
+from src.models.weather_cache import WeatherCacheEntry
+from src.services import weather as weather_service
+from src.services.telegram_notifications import fetch_weather
+from src.utils.geo import haversine_km
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+@pytest.fixture
+def app():
+    """Create a test Flask application."""
+    from main import app as flask_app
+    flask_app.config['TESTING'] = True
+    flask_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.drop_all()
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+        self.status_code = 200
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Stub OpenWeather: records calls and sleeps briefly like a real round trip."""
+    calls = []
+    lock = threading.Lock()
+
+    def fake_get(url, params=None, timeout=None):
+        with lock:
+            calls.append(url)
+        time.sleep(0.05)
+        if url.endswith('/forecast'):
+            return FakeResponse({'list': [{'dt': 0, 'main': {'temp': 9.0}, 'weather': [{'description': 'rain'}]}]})
+        return FakeResponse({'main': {'temp': 11.2, 'feels_like': 10.0, 'humidity': 80},
+                             'weather': [{'description': 'light rain', 'icon': '10d'}],
+                             'wind': {'speed': 4.0}})
+
+    monkeypatch.setenv('OPENWEATHER_API_KEY', 'test-key')
+    monkeypatch.setattr(weather_service._http, 'get', fake_get)
+    weather_service.clear_cache()
+    yield calls
+    weather_service.clear_cache()
+
+def test_grid_cell_is_about_two_km():
+    key, lat, lng = weather_service.grid_cell(51.5074, -0.1278)
+    assert haversine_km(51.5074, -0.1278, lat, lng) < 1.5
+    # Points a few hundred metres apart usually share a cell; far points never do
+    assert weather_service.grid_cell(51.5, -0.12)[0] != weather_service.grid_cell(51.53, -0.12)[0]
+
+def test_blast_to_many_agents_hits_upstream_once(app, upstream):
+    with app.app_context():
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            results = list(pool.map(lambda _: fetch_weather(51.5074, -0.1278), range(200)))
+    assert len(upstream) == 1
+    assert all(r['summary'] == 'Light rain' for r in results)
+
+    # Repeat lookups are served from memory
+    hits = weather_service.cache_stats()['memory_hits']
+    for _ in range(1000):
+        weather_service.current_weather(51.5074, -0.1278)
+    assert weather_service.cache_stats()['memory_hits'] == hits + 1000
+    assert len(upstream) == 1
+
+def test_current_and_forecast_fetch_in_parallel_and_persist(app, upstream, monkeypatch):
+    # Each fetch waits for the other, so fetching them one after the other breaks the barrier
+    both_in_flight = threading.Barrier(2, timeout=5)
+    get = weather_service._http.get
+
+    def get_together(*args, **kwargs):
+        both_in_flight.wait()
+        return get(*args, **kwargs)
+    monkeypatch.setattr(weather_service._http, 'get', get_together)
+
+    with app.app_context():
+        current, forecast = weather_service.current_and_forecast(51.38, -0.30)
+        assert current['main']['temp'] == 11.2 and forecast['list']
+        assert len(upstream) == 2
+
+        assert WeatherCacheEntry.query.count() == 2
+        # A fresh process (empty memory cache) reuses the persisted rows
+        weather_service.clear_cache()
+        weather_service.current_and_forecast(51.38, -0.30)
+        assert len(upstream) == 2
+        assert weather_service.cache_stats()['db_hits'] == 2
@@ -0,0 +1,165 @@
+import base64
+import io
+import json
+import threading
+import time
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from py_vapid import Vapid02
+from requests.adapters import HTTPAdapter
+from requests.models import Response
+from src.models.user import User, PushSubscription, db
+from src.services import web_push
+from src.utils import perf
+import sys
+import os
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+@pytest.fixture
+def app():
+    """Create a test Flask application."""
+    from main import app as flask_app
+    flask_app.config['TESTING'] = True
+    flask_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.drop_all()
+
+def b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+class PushService(HTTPAdapter):
+    """Answers every push after `latency` seconds; endpoints in `gone` get 410."""
+
+    def __init__(self, latency=0.05, gone=()):
+        super().__init__()
+        self.latency = latency
+        self.gone = set(gone)
+        self.requests = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        with self._lock:
+            self.requests.append(request)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.latency)
+        with self._lock:
+            self.active -= 1
+        response = Response()
+        response.status_code = 410 if request.url in self.gone else 201
+        response.reason = 'Gone' if response.status_code == 410 else 'Created'
+        response.raw = io.BytesIO(b'')
+        response.url = request.url
+        response.request = request
+        return response
+
+@pytest.fixture
+def push_service(monkeypatch):
+    service = PushService()
+    monkeypatch.setattr(web_push._session, 'adapters', {'https://': service})
+    web_push.clear_caches()
+    yield service
+    web_push.clear_caches()
+
+@pytest.fixture
+def vapid_key():
+    key = Vapid02()
+    key.generate_keys()
+    raw = key.private_key.private_numbers().private_value.to_bytes(32, 'big')
+    return b64(raw)
+
+def subscription(endpoint):
+    browser_key = ec.generate_private_key(ec.SECP256R1()).public_key().public_bytes(
+        serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint)
+    return json.dumps({'endpoint': endpoint, 'keys': {'p256dh': b64(browser_key), 'auth': b64(os.urandom(16))}})
+
+def make_subscribers(count, hosts=('fcm.googleapis.com',)):
+    user_ids = []
+    for n in range(count):
+        user = User(email=f"browser{n}@test.com", password_hash="x", role='agent', first_name="B", last_name=str(n))
+        db.session.add(user)
+        db.session.flush()
+        user_ids.append(user.id)
+        host = hosts[n % len(hosts)]
+        db.session.add(PushSubscription(user_id=user.id, subscription_json=subscription(f"https://{host}/push/{n}")))
+    db.session.commit()
+    return user_ids
+
+def test_broadcast_is_concurrent_and_prunes_in_one_batch(app, push_service, vapid_key):
+    user_ids = make_subscribers(100)
+    push_service.gone = {'https://fcm.googleapis.com/push/3', 'https://fcm.googleapis.com/push/42'}
+
+    with perf.count_queries() as statements:
+        result = web_push.send_web_push(user_ids, "New Job Available", "A job is available", vapid_key, 'mailto:ops@test.com')
+        db.session.commit()
+
+    # Pushes overlap on the pool instead of going out one at a time
+    assert 1 < push_service.peak <= web_push.MAX_WORKERS
+    assert result == {'subscriptions': 100, 'sent': 98, 'failed': 2, 'expired': 2}
+    assert len(push_service.requests) == 100
+    # One SELECT of (id, json) and one DELETE
+    assert len([s for s in statements if s.lstrip().upper().startswith(('SELECT', 'DELETE'))]) == 2
+    assert PushSubscription.query.count() == 98
+
+    request = push_service.requests[0]
+    assert request.headers['Content-Encoding'] == 'aes128gcm'
+    assert request.headers['Authorization'].startswith('vapid t=')
+    assert int(request.headers['TTL']) == web_push.TTL_SECONDS
+
+def test_vapid_signature_cached_per_audience(app, push_service, vapid_key, monkeypatch):
+    user_ids = make_subscribers(30, hosts=('fcm.googleapis.com', 'updates.push.services.mozilla.com', 'web.push.apple.com'))
+    signed = []
+    original = Vapid02.sign
+
+    def counting_sign(self, claims, *args, **kwargs):
+        signed.append(claims['aud'])
+        return original(self, claims, *args, **kwargs)
+
+    monkeypatch.setattr(Vapid02, 'sign', counting_sign)
+    for _ in range(2):
+        web_push.send_web_push(user_ids, "Title", "Body", vapid_key, 'mailto:ops@test.com')
+        db.session.commit()
+    assert sorted(signed) == ['https://fcm.googleapis.com', 'https://updates.push.services.mozilla.com', 'https://web.push.apple.com']
+
+    tokens = {r.url.split('/push/')[0]: r.headers['Authorization'] for r in push_service.requests}
+    assert len(set(tokens.values())) == 3
+
+    # Re-signed once the cached JWT is within the refresh margin of expiry
+    monkeypatch.setattr(web_push.time, 'time', lambda: time.time_ns() / 1e9 + web_push.JWT_LIFETIME)
+    web_push.send_web_push(user_ids[:1], "Title", "Body", vapid_key, 'mailto:ops@test.com')
+    db.session.commit()
+    assert len(signed) == 4
+
+def test_malformed_subscriptions_and_bad_key(app, push_service, vapid_key):
+    user_ids = make_subscribers(3)
+    db.session.add(PushSubscription(user_id=user_ids[0], subscription_json='{"endpoint": "https://fcm.googleapis.com/x"}'))
+    db.session.add(PushSubscription(user_id=user_ids[1], subscription_json='not json'))
+    db.session.commit()
+
+    result = web_push.send_web_push(user_ids, "Title", "Body", 'dev-vapid-private-key', 'mailto:ops@test.com')
+    db.session.commit()
+    assert result == {'subscriptions': 5, 'sent': 0, 'failed': 5, 'expired': 0}
+    assert push_service.requests == [] and PushSubscription.query.count() == 5
+
+    result = web_push.send_web_push(user_ids, "Title", "Body", vapid_key, 'mailto:ops@test.com')
+    db.session.commit()
+    assert result == {'subscriptions': 5, 'sent': 3, 'failed': 2, 'expired': 2}
+    assert PushSubscription.query.count() == 3
+
+def test_trigger_push_uses_dispatcher(app, push_service, vapid_key, monkeypatch):
+    from src.routes.notifications import _send_legacy_web_push
+    monkeypatch.setitem(app.config, 'VAPID_PRIVATE_KEY', vapid_key)
+    user_ids = make_subscribers(4)
+    push_service.gone = {'https://fcm.googleapis.com/push/1'}
+    result = _send_legacy_web_push(user_ids, "Title", "Body")
+    db.session.commit()
+    assert result['sent'] == 3 and result['expired'] == 1
+    assert PushSubscription.query.count() == 3
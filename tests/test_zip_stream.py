@@ -0,0 +1,141 @@
+import io
+import os
+import threading
+import time
+import zipfile
+import pytest
+from datetime import datetime
+from src.models.user import User, db
+from src.models.v3_report import V3JobReport
+from src.utils import zip_stream
+from src.utils.zip_stream import StreamingZip, ZipEntry
+import sys
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+class Photos:
+    """Fake photo store that records fetches and how many ran at once."""
+    def __init__(self, count, size=20000, delay=0.02):
+        self.blobs = {f"agents/1/documents/v3_report_photo_{i}.jpg": os.urandom(size + i) for i in range(count)}
+        self.delay = delay
+        self.fetches = []
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def fetch(self, key):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            self.fetches.append(key)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        return self.blobs[key]
+
+    def entries(self):
+        return [ZipEntry(f"photo_{i + 1}.jpg", len(blob), lambda key=key: self.fetch(key), cache_key=key)
+                for i, (key, blob) in enumerate(self.blobs.items())]
+
+@pytest.fixture(autouse=True)
+def fresh_crc_cache():
+    zip_stream.crc_cache.clear()
+    yield
+    zip_stream.crc_cache.clear()
+
+def test_archive_streams_stored_entries_concurrently():
+    photos = Photos(30)
+    archive = StreamingZip(photos.entries(), datetime(2026, 10, 1, 12, 30))
+    body = b''.join(archive.iter_range())
+
+    assert len(body) == archive.size
+    with zipfile.ZipFile(io.BytesIO(body)) as zf:
+        assert zf.testzip() is None
+        infos = zf.infolist()
+        assert [i.filename for i in infos] == [f"photo_{n}.jpg" for n in range(1, 31)]
+        assert all(i.compress_type == zipfile.ZIP_STORED for i in infos)
+        assert zf.read('photo_2.jpg') == list(photos.blobs.values())[1]
+    assert 1 < photos.peak <= zip_stream.PREFETCH
+
+def test_first_bytes_before_any_photo_arrives():
+    release = threading.Event()
+    entry = ZipEntry('photo_1.jpg', 4, lambda: release.wait(5) and b'\xff\xd8\xff\xe0')
+    stream = StreamingZip([entry], datetime(2026, 10, 1)).iter_range()
+    first = next(stream)
+    assert first.startswith(b'PK\x03\x04') and not release.is_set()
+    release.set()
+    assert b''.join(stream).startswith(b'\xff\xd8\xff\xe0')
+
+def test_ranges_resume_mid_archive():
+    photos = Photos(8, delay=0)
+    archive = StreamingZip(photos.entries(), datetime(2026, 10, 1))
+    full = b''.join(archive.iter_range())
+
+    for start in (0, 1, 29, 20040, archive.size // 2, archive.size - 30, archive.size - 1):
+        assert b''.join(archive.iter_range(start)) == full[start:]
+    assert b''.join(archive.iter_range(100, 200)) == full[100:200]
+
+    # Resuming near the end needs every CRC: cached ones avoid re-reading skipped photos
+    photos.fetches.clear()
+    assert b''.join(archive.iter_range(archive.size - 100)) == full[-100:]
+    assert photos.fetches == []
+    zip_stream.crc_cache.clear()
+    assert b''.join(archive.iter_range(archive.size - 100)) == full[-100:]
+    assert len(photos.fetches) == 8
+
+class PhotoStore:
+    def __init__(self, blobs):
+        self.blobs = blobs
+
+    def is_configured(self):
+        return True
+
+    def get_object_info(self, key):
+        return {'size': len(self.blobs[key])} if key in self.blobs else None
+
+    def download_bytes(self, key):
+        return self.blobs[key]
+
+@pytest.fixture
+def app():
+    """Create a test Flask application."""
+    from main import app as flask_app
+    flask_app.config['TESTING'] = True
+    flask_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+        db.drop_all()
+
+def test_download_endpoint_supports_range_and_if_range(app, monkeypatch):
+    from src.routes import admin as admin_routes
+    blobs = {f"agents/1/documents/v3_report_photo_{i}.jpg": os.urandom(5000) for i in range(5)}
+    monkeypatch.setattr(admin_routes, 's3_client', PhotoStore(blobs))
+    with app.app_context():
+        agent = User(email="agent@test.com", password_hash="x", role='agent', first_name="Sam", last_name="Agent")
+        db.session.add(agent)
+        db.session.flush()
+        keys = list(blobs) + ['agents/1/documents/v3_report_photo_gone.jpg']
+        report = V3JobReport(agent_id=agent.id, form_type='traveller_serve', report_data={'client': 'Acme Ltd'},
+                             photo_urls=[{'url': k} for k in keys])
+        db.session.add(report)
+        db.session.commit()
+        url = f'/api/public/report/{report.id}/photos/download'
+
+    client = app.test_client()
+    full = client.get(url)
+    assert full.status_code == 200 and full.headers['Accept-Ranges'] == 'bytes'
+    assert int(full.headers['Content-Length']) == len(full.data)
+    assert 'report_1_Acme_Ltd_photos.zip' in full.headers['Content-Disposition']
+    with zipfile.ZipFile(io.BytesIO(full.data)) as zf:
+        assert zf.namelist() == [f"photo_{n}.jpg" for n in range(1, 6)]
+
+    etag = full.headers['ETag']
+    part = client.get(url, headers={'Range': 'bytes=12000-', 'If-Range': etag})
+    assert part.status_code == 206 and part.data == full.data[12000:]
+    assert part.headers['Content-Range'] == f"bytes 12000-{len(full.data) - 1}/{len(full.data)}"
+
+    assert client.get(url, headers={'Range': 'bytes=12000-', 'If-Range': '"stale"'}).status_code == 200
+    assert client.get(url, headers={'Range': f'bytes={len(full.data)}-'}).status_code == 416